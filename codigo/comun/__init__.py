@@ -0,0 +1 @@
+# Utilidades compartidas entre el pipeline (limpieza, carga) y la web.
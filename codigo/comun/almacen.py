@@ -0,0 +1,490 @@
+import json
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from rdflib import Graph, URIRef, BNode, Literal
+from rdflib.store import Store
+from rdflib.plugins.parsers.ntriples import W3CNTriplesParser
+from comun.grafos_nombrados import (CAPAS_BAJO_DEMANDA, RUTA_INDICE, CargadorGrafos, filtrar_grafos, leer_indice,
+                                    interpretar_seleccion)
+
+# Almacenes de tripletas intercambiables para la web y las pruebas.
+# Todos exponen la misma interfaz minima:
+#   parse(ruta, format)  -> carga un archivo del pipeline (.nt / .ttl)
+#   consultar(sparql)    -> lista de filas con acceso por nombre (fila.nombre) y posicion (fila[0])
+#   __len__()            -> numero de tripletas
+#
+#   rdflib   : Graph en memoria (modo original, siempre disponible)
+#   sqlite   : Graph de rdflib sobre un archivo SQLite con indices SPO/POS/OSP
+#   oxigraph : almacen embebido en disco con motor SPARQL propio (requiere pyoxigraph)
+
+ALMACENES_DISPONIBLES = ("rdflib", "sqlite", "oxigraph")
+
+ruta_modulo = os.path.dirname(os.path.abspath(__file__))
+directorio_raiz = os.path.abspath(os.path.join(ruta_modulo, "..", ".."))
+CARPETA_ALMACENES = os.path.join(directorio_raiz, "datos", "almacen")
+
+try:
+    import pyoxigraph
+except ImportError:
+    pyoxigraph = None
+
+# El parser SPARQL de rdflib (gramatica pyparsing global) no es seguro entre hilos: dos consultas
+# a la vez pueden dejarlo roto para el resto del proceso. Las consultas de todos los almacenes
+# basados en rdflib se serializan; al ser Python puro y no soltar el GIL no se pierde paralelismo.
+CERROJO_SPARQL_RDFLIB = threading.Lock()
+
+
+class AlmacenRdflib:
+    nombre = "rdflib"
+
+    def __init__(self, grafo=None):
+        self.grafo = grafo if grafo is not None else Graph()
+
+    def parse(self, ruta, format="nt"):
+        self.grafo.parse(ruta, format=format)
+
+    def consultar(self, sparql):
+        with CERROJO_SPARQL_RDFLIB:
+            return list(self.grafo.query(sparql))
+
+    def __len__(self):
+        return len(self.grafo)
+
+    def cargado(self, ruta):
+        return False
+
+    def registrar_carga(self, ruta):
+        pass
+
+
+# --- SQLITE ---
+
+class TiendaSQLite(Store):
+    """
+    Store de rdflib sobre SQLite. Los terminos se codifican en una tabla diccionario
+    y las tripletas se guardan como enteros con tres indices (SPO, POS, OSP), de modo
+    que cada patron de la consulta SPARQL se resuelve con una busqueda indexada.
+    """
+    context_aware = False
+    formula_aware = False
+    transaction_aware = False
+    graph_aware = False
+
+    def __init__(self, ruta):
+        super().__init__()
+        self.ruta = ruta
+        self.conexion = sqlite3.connect(ruta, check_same_thread=False)
+        self.cerrojo = threading.Lock()
+        self.espacios = {}
+        self.cache_terminos = {}
+        self.conexion.executescript("""
+            PRAGMA journal_mode = WAL;
+            PRAGMA synchronous = OFF;
+            CREATE TABLE IF NOT EXISTS terminos (
+                id INTEGER PRIMARY KEY, tipo TEXT, valor TEXT, tipo_dato TEXT, idioma TEXT,
+                UNIQUE (tipo, valor, tipo_dato, idioma));
+            CREATE TABLE IF NOT EXISTS tripletas (
+                s INTEGER, p INTEGER, o INTEGER, PRIMARY KEY (s, p, o)) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS idx_pos ON tripletas (p, o, s);
+            CREATE INDEX IF NOT EXISTS idx_osp ON tripletas (o, s, p);
+            CREATE TABLE IF NOT EXISTS fuentes (clave TEXT PRIMARY KEY, valor TEXT);
+        """)
+
+    @staticmethod
+    def clave_termino(termino):
+        if isinstance(termino, Literal):
+            return ("L", str(termino), str(termino.datatype or ""), termino.language or "")
+        if isinstance(termino, BNode):
+            return ("B", str(termino), "", "")
+        return ("U", str(termino), "", "")
+
+    @staticmethod
+    def termino_de_fila(tipo, valor, tipo_dato, idioma):
+        if tipo == "L":
+            return Literal(valor, datatype=tipo_dato or None, lang=idioma or None)
+        if tipo == "B":
+            return BNode(valor)
+        return URIRef(valor)
+
+    def id_termino(self, termino, crear=False):
+        clave = self.clave_termino(termino)
+        fila = self.conexion.execute(
+            "SELECT id FROM terminos WHERE tipo=? AND valor=? AND tipo_dato=? AND idioma=?", clave).fetchone()
+        if fila:
+            return fila[0]
+        if not crear:
+            return None
+        return self.conexion.execute(
+            "INSERT INTO terminos (tipo, valor, tipo_dato, idioma) VALUES (?, ?, ?, ?)", clave).lastrowid
+
+    def termino(self, identificador):
+        if identificador not in self.cache_terminos:
+            fila = self.conexion.execute(
+                "SELECT tipo, valor, tipo_dato, idioma FROM terminos WHERE id=?", (identificador,)).fetchone()
+            self.cache_terminos[identificador] = self.termino_de_fila(*fila)
+        return self.cache_terminos[identificador]
+
+    def cargar_ntriples(self, ruta, tamano_lote=50000):
+        """Carga masiva en streaming: el parser de N-Triples alimenta lotes de inserciones."""
+        tienda = self
+        ids = {}
+        lote = []
+
+        def codificar(termino):
+            clave = tienda.clave_termino(termino)
+            if clave not in ids:
+                ids[clave] = tienda.id_termino(termino, crear=True)
+            return ids[clave]
+
+        class Sumidero:
+            def triple(self, s, p, o):
+                lote.append((codificar(s), codificar(p), codificar(o)))
+                if len(lote) >= tamano_lote:
+                    volcar()
+
+        def volcar():
+            tienda.conexion.executemany("INSERT OR IGNORE INTO tripletas VALUES (?, ?, ?)", lote)
+            lote.clear()
+
+        with self.cerrojo:
+            with open(ruta, "rb") as archivo:
+                W3CNTriplesParser(Sumidero()).parse(archivo)
+            volcar()
+            self.conexion.commit()
+
+    def add(self, triple, context=None, quoted=False):
+        with self.cerrojo:
+            self.conexion.execute("INSERT OR IGNORE INTO tripletas VALUES (?, ?, ?)",
+                                  tuple(self.id_termino(t, crear=True) for t in triple))
+
+    def remove(self, triple, context=None):
+        with self.cerrojo:
+            condiciones, parametros = self._condiciones(triple)
+            if condiciones is None:
+                return
+            self.conexion.execute(f"DELETE FROM tripletas {condiciones}", parametros)
+
+    def commit(self):
+        self.conexion.commit()
+
+    def _condiciones(self, triple):
+        condiciones, parametros = [], []
+        for columna, termino in zip(("s", "p", "o"), triple):
+            if termino is None:
+                continue
+            identificador = self.id_termino(termino)
+            if identificador is None:
+                return None, None
+            condiciones.append(f"{columna}=?")
+            parametros.append(identificador)
+        return ("WHERE " + " AND ".join(condiciones)) if condiciones else "", parametros
+
+    def triples(self, triple_pattern, context=None):
+        with self.cerrojo:
+            condiciones, parametros = self._condiciones(triple_pattern)
+            if condiciones is None:
+                return
+            filas = self.conexion.execute(f"SELECT s, p, o FROM tripletas {condiciones}", parametros).fetchall()
+            resultado = [(self.termino(s), self.termino(p), self.termino(o)) for s, p, o in filas]
+        for tripleta in resultado:
+            yield tripleta, iter(())
+
+    def __len__(self, context=None):
+        with self.cerrojo:
+            return self.conexion.execute("SELECT COUNT(*) FROM tripletas").fetchone()[0]
+
+    def contexts(self, triple=None):
+        return iter(())
+
+    def bind(self, prefix, namespace, override=True):
+        self.espacios[prefix] = namespace
+
+    def namespace(self, prefix):
+        return self.espacios.get(prefix)
+
+    def prefix(self, namespace):
+        for prefijo, espacio in self.espacios.items():
+            if espacio == namespace:
+                return prefijo
+        return None
+
+    def namespaces(self):
+        yield from self.espacios.items()
+
+    def leer_fuentes(self):
+        return {clave: json.loads(valor) for clave, valor in self.conexion.execute("SELECT clave, valor FROM fuentes")}
+
+    def guardar_fuente(self, nombre, firma):
+        with self.cerrojo:
+            self.conexion.execute("INSERT OR REPLACE INTO fuentes VALUES (?, ?)", (nombre, json.dumps(firma)))
+            self.conexion.commit()
+
+    def vaciar(self):
+        with self.cerrojo:
+            self.conexion.executescript("DELETE FROM tripletas; DELETE FROM terminos; DELETE FROM fuentes;")
+            self.cache_terminos.clear()
+
+
+class AlmacenSQLite(AlmacenRdflib):
+    nombre = "sqlite"
+
+    def __init__(self, ruta):
+        self.tienda = TiendaSQLite(ruta)
+        super().__init__(Graph(store=self.tienda))
+
+    def parse(self, ruta, format="nt"):
+        if format == "nt":
+            self.tienda.cargar_ntriples(ruta)
+        else:
+            self.grafo.parse(ruta, format=format)
+            self.tienda.commit()
+
+    def fuentes_registradas(self):
+        return self.tienda.leer_fuentes()
+
+    def cargado(self, ruta):
+        return self.fuentes_registradas().get(os.path.basename(ruta)) == firma_archivo(ruta)
+
+    def registrar_carga(self, ruta):
+        self.tienda.guardar_fuente(os.path.basename(ruta), firma_archivo(ruta))
+
+    def vaciar(self):
+        self.tienda.vaciar()
+
+
+# --- OXIGRAPH ---
+
+class FilaResultado:
+    """Fila de resultados con la misma forma de acceso que las de rdflib."""
+    __slots__ = ("_variables", "_valores")
+
+    def __init__(self, variables, valores):
+        self._variables = variables
+        self._valores = valores
+
+    def __getattr__(self, nombre):
+        try:
+            return self._valores[self._variables.index(nombre)]
+        except ValueError:
+            raise AttributeError(nombre)
+
+    def __getitem__(self, indice):
+        return self._valores[indice]
+
+    def __iter__(self):
+        return iter(self._valores)
+
+    def __len__(self):
+        return len(self._valores)
+
+
+def termino_oxigraph_a_rdflib(termino):
+    if termino is None:
+        return None
+    if isinstance(termino, pyoxigraph.NamedNode):
+        return URIRef(termino.value)
+    if isinstance(termino, pyoxigraph.BlankNode):
+        return BNode(termino.value)
+    idioma = termino.language
+    return Literal(termino.value, lang=idioma, datatype=None if idioma else termino.datatype.value)
+
+
+class AlmacenOxigraph:
+    nombre = "oxigraph"
+    FORMATOS = {"nt": "N_TRIPLES", "turtle": "TURTLE", "nquads": "N_QUADS"}
+
+    def __init__(self, ruta, solo_lectura=False):
+        if pyoxigraph is None:
+            raise ImportError("El almacen 'oxigraph' requiere el paquete pyoxigraph (pip install pyoxigraph)")
+        self.ruta = ruta
+        # En escritura RocksDB bloquea la carpeta para un solo proceso; en lectura la pueden abrir todos los workers
+        self.almacen = pyoxigraph.Store.read_only(ruta) if solo_lectura else pyoxigraph.Store(ruta)
+        self.ruta_fuentes = self.archivo_fuentes(ruta)
+
+    @staticmethod
+    def archivo_fuentes(ruta):
+        return os.path.join(ruta, "fuentes_cargadas.json")
+
+    def parse(self, ruta, format="nt"):
+        formato = getattr(pyoxigraph.RdfFormat, self.FORMATOS[format])
+        self.almacen.bulk_load(path=ruta, format=formato)
+        self.almacen.flush()
+
+    def consultar(self, sparql):
+        soluciones = self.almacen.query(sparql)
+        variables = [variable.value for variable in soluciones.variables]
+        return [FilaResultado(variables, [termino_oxigraph_a_rdflib(solucion[v]) for v in variables])
+                for solucion in soluciones]
+
+    def __len__(self):
+        return len(self.almacen)
+
+    def fuentes_registradas(self):
+        if not os.path.exists(self.ruta_fuentes):
+            return {}
+        with open(self.ruta_fuentes, encoding="utf-8") as archivo:
+            return json.load(archivo)
+
+    def cargado(self, ruta):
+        return self.fuentes_registradas().get(os.path.basename(ruta)) == firma_archivo(ruta)
+
+    def registrar_carga(self, ruta):
+        fuentes = self.fuentes_registradas()
+        fuentes[os.path.basename(ruta)] = firma_archivo(ruta)
+        with open(self.ruta_fuentes, "w", encoding="utf-8") as archivo:
+            json.dump(fuentes, archivo)
+
+    def vaciar(self):
+        self.almacen.clear()
+        if os.path.exists(self.ruta_fuentes):
+            os.remove(self.ruta_fuentes)
+
+
+def firma_archivo(ruta):
+    """Identifica un archivo cargado (tamaño y fecha) para reutilizar un almacen en disco ya construido."""
+    return [os.path.getsize(ruta), int(os.path.getmtime(ruta))]
+
+
+def descartar_si_obsoleto(almacen, carpeta_fuentes, permitidos=None):
+    """
+    Un almacen persistente solo se reutiliza si todos los archivos que contiene siguen igual y
+    estan entre los permitidos (los de la seleccion actual); si el pipeline ha regenerado alguno,
+    o la seleccion ha dejado fuera grafos cargados antes, se vacia y se vuelve a cargar desde cero.
+    """
+    if not hasattr(almacen, "fuentes_registradas"):
+        return
+    sobrantes = sorted(set(almacen.fuentes_registradas()) - set(permitidos)) if permitidos is not None else []
+    if sobrantes:
+        print(f"Almacen {almacen.nombre} con grafos fuera de la seleccion ({', '.join(sobrantes)}): se reconstruye.")
+        almacen.vaciar()
+        return
+    for nombre, firma in almacen.fuentes_registradas().items():
+        ruta = os.path.join(carpeta_fuentes, nombre)
+        if not os.path.exists(ruta) or firma_archivo(ruta) != firma:
+            print(f"Almacen {almacen.nombre} obsoleto ({nombre} ha cambiado): se reconstruye.")
+            almacen.vaciar()
+            return
+
+
+def crear_almacen(tipo, carpeta_almacenes=None):
+    """Fabrica de almacenes. Los persistentes guardan su indice en datos/almacen/<tipo>."""
+    carpeta_almacenes = carpeta_almacenes or os.path.join(CARPETA_ALMACENES, tipo)
+    if tipo == "rdflib":
+        return AlmacenRdflib()
+    os.makedirs(carpeta_almacenes, exist_ok=True)
+    if tipo == "sqlite":
+        return AlmacenSQLite(os.path.join(carpeta_almacenes, "grafo.sqlite"))
+    if tipo == "oxigraph":
+        return AlmacenOxigraph(os.path.join(carpeta_almacenes, "oxigraph"))
+    raise ValueError(f"Almacen desconocido '{tipo}'. Opciones: {', '.join(ALMACENES_DISPONIBLES)}")
+
+
+def fuentes_necesarias(seleccion, rutas_maestro=(), ruta_indice=RUTA_INDICE):
+    """
+    Archivos (nombre -> ruta) que puede llegar a contener el almacen con esta seleccion: los grafos
+    declarados mas las capas que se cargan bajo demanda o, sin dataset, el primer grafo maestro disponible.
+    """
+    indice = leer_indice(ruta_indice)
+    if indice is not None:
+        ampliada = seleccion + [(capa, None) for capa in CAPAS_BAJO_DEMANDA]
+        return {entrada["archivo"]: os.path.join(os.path.dirname(ruta_indice), entrada["archivo"])
+                for entrada in filtrar_grafos(indice, ampliada)}
+    for ruta, _ in rutas_maestro:
+        if os.path.exists(ruta):
+            return {os.path.basename(ruta): ruta}
+    return {}
+
+
+def llenar_almacen(almacen, seleccion, rutas_maestro=(), ruta_indice=RUTA_INDICE):
+    """Llena el almacen con la seleccion del dataset (devolviendo su CargadorGrafos) o con el grafo maestro."""
+    permitidos = fuentes_necesarias(seleccion, rutas_maestro, ruta_indice)
+    indice = leer_indice(ruta_indice)
+    if indice is not None:
+        carpeta_dataset = os.path.dirname(ruta_indice)
+        descartar_si_obsoleto(almacen, carpeta_dataset, permitidos)
+        cargador = CargadorGrafos(almacen, indice, carpeta_dataset)
+        cargador.cargar(seleccion)
+        return almacen, cargador
+    for ruta, formato in rutas_maestro:
+        if os.path.exists(ruta):
+            descartar_si_obsoleto(almacen, os.path.dirname(ruta), permitidos)
+            if not almacen.cargado(ruta):
+                almacen.parse(ruta, format=formato)
+                almacen.registrar_carga(ruta)
+            break
+    return almacen, None
+
+
+@contextmanager
+def cerrojo_exclusivo(ruta):
+    """Cerrojo entre procesos sobre un archivo (flock en POSIX, msvcrt.locking en Windows); se suelta al salir."""
+    with open(ruta, "w") as archivo:
+        try:
+            import fcntl
+        except ImportError:
+            fcntl = None
+        if fcntl is not None:
+            fcntl.flock(archivo, fcntl.LOCK_EX)
+            yield
+            return
+        import msvcrt
+        while True:
+            try:
+                msvcrt.locking(archivo.fileno(), msvcrt.LK_LOCK, 1)
+                break
+            except OSError:  # LK_LOCK se rinde tras unos 10 s; la construccion puede tardar mas
+                continue
+        try:
+            yield
+        finally:
+            archivo.seek(0)
+            msvcrt.locking(archivo.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def abrir_oxigraph_solo_lectura(seleccion, rutas_maestro=(), ruta_indice=RUTA_INDICE, carpeta_almacenes=None):
+    """
+    Oxigraph para varios workers: el primero que llega (con un cerrojo de archivo) lo construye o lo
+    actualiza en escritura, incluidas enteras las capas bajo demanda, y lo cierra; despues cada proceso
+    lo abre en modo lectura. Si ya esta al dia nadie lo abre en escritura (lo que compactaria archivos
+    que otros workers estan leyendo).
+    """
+    carpeta = carpeta_almacenes or os.path.join(CARPETA_ALMACENES, "oxigraph")
+    ruta = os.path.join(carpeta, "oxigraph")
+    os.makedirs(carpeta, exist_ok=True)
+    ampliada = seleccion + [(capa, None) for capa in CAPAS_BAJO_DEMANDA]
+    necesarias = fuentes_necesarias(seleccion, rutas_maestro, ruta_indice)
+    with cerrojo_exclusivo(os.path.join(carpeta, "construccion.lock")):
+        ruta_fuentes = AlmacenOxigraph.archivo_fuentes(ruta)
+        registradas = {}
+        if os.path.exists(ruta_fuentes):
+            with open(ruta_fuentes, encoding="utf-8") as archivo:
+                registradas = json.load(archivo)
+        if registradas != {nombre: firma_archivo(ruta_fuente) for nombre, ruta_fuente in necesarias.items()}:
+            print("Construyendo el almacen oxigraph (una sola vez para todos los workers)...")
+            escritura = AlmacenOxigraph(ruta)
+            llenar_almacen(escritura, ampliada, rutas_maestro, ruta_indice)
+            del escritura
+    almacen = AlmacenOxigraph(ruta, solo_lectura=True)
+    indice = leer_indice(ruta_indice)
+    if indice is None:
+        return almacen, None
+    # Todo lo que se podria pedir bajo demanda ya esta dentro: el cargador no tiene que escribir nada
+    cargador = CargadorGrafos(almacen, indice, os.path.dirname(ruta_indice))
+    cargador.cargados.update(entrada["nombre"] for entrada in filtrar_grafos(indice, ampliada))
+    return almacen, cargador
+
+
+def abrir_almacen(tipo, seleccion_texto, rutas_maestro=(), ruta_indice=RUTA_INDICE, carpeta_almacenes=None,
+                  solo_lectura=False):
+    """
+    Crea el almacen y lo llena: con el dataset por grafos nombrados si existe
+    (devolviendo tambien su CargadorGrafos para la carga perezosa) o, si no,
+    con el primer grafo maestro disponible de rutas_maestro [(ruta, formato), ...].
+    solo_lectura (la web, con varios workers) abre oxigraph en modo lectura tras construirlo.
+    """
+    seleccion = interpretar_seleccion(seleccion_texto)
+    if solo_lectura and tipo == "oxigraph":
+        return abrir_oxigraph_solo_lectura(seleccion, rutas_maestro, ruta_indice, carpeta_almacenes)
+    return llenar_almacen(crear_almacen(tipo, carpeta_almacenes), seleccion, rutas_maestro, ruta_indice)
@@ -0,0 +1,140 @@
+import json
+import os
+import re
+import numpy as np
+import pandas as pd
+from scipy.sparse import csr_matrix, load_npz, save_npz
+
+# Indice de companeros de equipo sobre matrices dispersas.
+# Cada columna es una aparicion de un equipo en un partido (id_partido, uri_equipo) y cada fila un jugador:
+#   B[j, c] = 1 si el jugador j jugo en esa aparicion
+#   M[j, c] = su mas/menos en ella
+# B @ B.T da los partidos jugados juntos por cada pareja (la diagonal son los partidos de cada jugador)
+# y M @ B.T + B @ M.T el mas/menos sumado de la pareja en esos partidos. Filtrar por temporada es
+# quedarse con las columnas de esa temporada.
+
+ruta_modulo = os.path.dirname(os.path.abspath(__file__))
+directorio_raiz = os.path.abspath(os.path.join(ruta_modulo, "..", ".."))
+CARPETA_COMPANEROS = os.path.join(directorio_raiz, "datos", "procesados", "companeros")
+
+
+def extraer_id(url):
+    match = re.search(r'/(\d+)/?', str(url))
+    return match.group(1) if match else "desconocido"
+
+
+class IndiceCompaneros:
+    def __init__(self, incidencia, mas_menos, ids, nombres, temporada_columna):
+        self.incidencia = incidencia.tocsr()
+        self.mas_menos = mas_menos.tocsr()
+        self.ids = list(ids)
+        self.nombres = list(nombres)
+        self.temporada_columna = np.asarray(temporada_columna)
+        self.posicion = {identificador: i for i, identificador in enumerate(self.ids)}
+        self._cache_temporadas = {}
+
+    @classmethod
+    def desde_tablas(cls, tabla_detallada, tabla_jugadores=None):
+        """Construye el indice desde capa2_estadisticas_detalladas (y capa1_jugadores para los nombres)."""
+        ids_jugador = tabla_detallada['url_jugador'].map(extraer_id)
+        filas, ids = pd.factorize(ids_jugador, sort=True)
+        apariciones = tabla_detallada['id_partido'].astype(str) + "|" + tabla_detallada['uri_equipo'].astype(str)
+        columnas, claves = pd.factorize(apariciones)
+        forma = (len(ids), len(claves))
+        incidencia = csr_matrix((np.ones(len(filas)), (filas, columnas)), shape=forma)
+        mas_menos = csr_matrix((tabla_detallada['mas_menos'].fillna(0).to_numpy(dtype=float), (filas, columnas)), shape=forma)
+        # Temporada de cada columna: la de cualquiera de sus filas (todas comparten partido)
+        temporada_columna = np.zeros(len(claves), dtype=int)
+        temporada_columna[columnas] = tabla_detallada['ano_inicio'].to_numpy()
+
+        nombres = [""] * len(ids)
+        if tabla_jugadores is not None:
+            por_id = dict(zip(tabla_jugadores['url_jugador'].map(extraer_id), tabla_jugadores['nombre_jugador']))
+            nombres = [por_id.get(identificador, "") for identificador in ids]
+        return cls(incidencia, mas_menos, ids, nombres, temporada_columna)
+
+    # --- Persistencia ---
+
+    def guardar(self, carpeta=CARPETA_COMPANEROS):
+        os.makedirs(carpeta, exist_ok=True)
+        save_npz(os.path.join(carpeta, "incidencia.npz"), self.incidencia)
+        save_npz(os.path.join(carpeta, "mas_menos.npz"), self.mas_menos)
+        with open(os.path.join(carpeta, "indice.json"), "w", encoding="utf-8") as archivo:
+            json.dump({"ids": self.ids, "nombres": self.nombres,
+                       "temporada_columna": self.temporada_columna.tolist()}, archivo, ensure_ascii=False)
+
+    @classmethod
+    def cargar(cls, carpeta=CARPETA_COMPANEROS):
+        """Devuelve el indice guardado por limpieza/capa2_companeros.py, o None si aun no existe."""
+        ruta_indice = os.path.join(carpeta, "indice.json")
+        if not os.path.exists(ruta_indice):
+            return None
+        with open(ruta_indice, encoding="utf-8") as archivo:
+            meta = json.load(archivo)
+        return cls(load_npz(os.path.join(carpeta, "incidencia.npz")), load_npz(os.path.join(carpeta, "mas_menos.npz")),
+                   meta["ids"], meta["nombres"], meta["temporada_columna"])
+
+    # --- Consultas ---
+
+    def temporadas(self):
+        return sorted(int(t) for t in np.unique(self.temporada_columna))
+
+    def _matrices(self, temporada=None):
+        """Matrices restringidas a las columnas de una temporada (toda la carrera si es None)."""
+        if temporada is None:
+            return self.incidencia, self.mas_menos
+        if temporada not in self._cache_temporadas:
+            columnas = np.flatnonzero(self.temporada_columna == temporada)
+            self._cache_temporadas[temporada] = (self.incidencia[:, columnas], self.mas_menos[:, columnas])
+        return self._cache_temporadas[temporada]
+
+    def pareja(self, id_a, id_b, temporada=None):
+        """Partidos jugados juntos y mas/menos sumado de la pareja en ellos."""
+        if id_a not in self.posicion or id_b not in self.posicion:
+            return None
+        incidencia, mas_menos = self._matrices(temporada)
+        a, b = self.posicion[id_a], self.posicion[id_b]
+        juntos = incidencia[a].multiply(incidencia[b])
+        mas_menos_pareja = (mas_menos[a].multiply(incidencia[b]) + mas_menos[b].multiply(incidencia[a])).sum()
+        return {"partidos_juntos": int(juntos.sum()), "mas_menos_pareja": float(mas_menos_pareja)}
+
+    def companeros(self, identificador, temporada=None, k=10):
+        """Los k companeros con mas partidos juntos (desempate por mas/menos de la pareja)."""
+        if identificador not in self.posicion:
+            return None
+        incidencia, mas_menos = self._matrices(temporada)
+        fila = self.posicion[identificador]
+        columna = incidencia[fila].T
+        juntos = np.asarray((incidencia @ columna).todense()).ravel()
+        pareja = np.asarray((mas_menos @ columna).todense()).ravel() + np.asarray((incidencia @ mas_menos[fila].T).todense()).ravel()
+        juntos[fila] = 0
+        return self._mejores(juntos, pareja, k)
+
+    def _mejores(self, juntos, pareja, k):
+        candidatos = np.flatnonzero(juntos)
+        orden = candidatos[np.lexsort((-pareja[candidatos], -juntos[candidatos]))][:k]
+        return [{"id": self.ids[j], "nombre": self.nombres[j], "partidos_juntos": int(juntos[j]),
+                 "mas_menos_pareja": float(pareja[j])} for j in orden]
+
+    def top_k_todos(self, k=10, temporada=None):
+        """Tabla con los k companeros de cada jugador, usando la matriz completa B @ B.T de una vez."""
+        incidencia, mas_menos = self._matrices(temporada)
+        coincidencias = (incidencia @ incidencia.T).tocsr()
+        # Indices ordenados: a igualdad de partidos y mas/menos, mismo orden que companeros()
+        coincidencias.sort_indices()
+        pareja = (mas_menos @ incidencia.T + incidencia @ mas_menos.T).tocsr()
+        filas = []
+        for j in range(coincidencias.shape[0]):
+            inicio, fin = coincidencias.indptr[j], coincidencias.indptr[j + 1]
+            vecinos, juntos = coincidencias.indices[inicio:fin], coincidencias.data[inicio:fin]
+            fuera_diagonal = vecinos != j
+            vecinos, juntos = vecinos[fuera_diagonal], juntos[fuera_diagonal]
+            if not len(vecinos):
+                continue
+            valores_pareja = np.asarray(pareja[j, vecinos].todense()).ravel()
+            orden = np.lexsort((-valores_pareja, -juntos))[:k]
+            for puesto, indice in enumerate(orden, start=1):
+                filas.append((self.ids[j], "carrera" if temporada is None else temporada, puesto, self.ids[vecinos[indice]],
+                              self.nombres[vecinos[indice]], int(juntos[indice]), float(valores_pareja[indice])))
+        return pd.DataFrame(filas, columns=["id_jugador", "temporada", "puesto", "id_companero", "nombre_companero",
+                                            "partidos_juntos", "mas_menos_pareja"])
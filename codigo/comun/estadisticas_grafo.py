@@ -0,0 +1,206 @@
+import json
+import os
+import re
+import time
+
+# Documento de estadisticas del grafo maestro, calculado por unificar_final.py al publicar el grafo:
+# recuento por clase, por temporada y por liga y los jugadores destacados (top-N de carrera y maximo
+# anotador de cada temporada). Se guarda dos veces:
+#   - como tripletas VoID (void:Dataset con sus particiones por clase y subconjuntos por temporada
+#     y liga) y feb:Highlight, en el grafo nombrado "estadisticas" y en el maestro
+#   - como JSON en datos/grafo/estadisticas.json, que la web lee al arrancar: la portada no
+#     lanza ninguna consulta
+# Se calcula recorriendo el N-Triples linea a linea (una sola pasada, sin cargar el grafo).
+
+ruta_modulo = os.path.dirname(os.path.abspath(__file__))
+directorio_raiz = os.path.abspath(os.path.join(ruta_modulo, "..", ".."))
+RUTA_ESTADISTICAS = os.path.join(directorio_raiz, "datos", "grafo", "estadisticas.json")
+
+FEB = "http://www.tfg-basket.es/ontologia/primera-feb#"
+SCHEMA = "https://schema.org/"
+VOID = "http://rdfs.org/ns/void#"
+RDF_TYPE = "<http://www.w3.org/1999/02/22-rdf-syntax-ns#type>"
+XSD = "http://www.w3.org/2001/XMLSchema#"
+RECURSO = "https://bball-intelligence.com/resource/"
+IRI_DATASET = f"{RECURSO}dataset/bball-intelligence"
+
+TOP_N = 5
+# Clases que se cuentan por temporada (todas tienen feb:duringSeason)
+CLASES_POR_TEMPORADA = {f"<{SCHEMA}SportsEvent>": "partidos", f"<{FEB}TeamSeason>": "equipos",
+                        f"<{FEB}PlayerSeasonAnalysis>": "jugadores"}
+# Nombre corto de los totales de la portada
+TOTALES = {f"<{SCHEMA}Person>": "jugadores", f"<{SCHEMA}SportsEvent>": "partidos",
+           f"<{SCHEMA}SportsOrganization>": "clubes", f"<{FEB}Season>": "temporadas", f"<{FEB}League>": "ligas",
+           f"<{FEB}MatchPerformance>": "actuaciones"}
+# Metrica de los destacados de carrera -> propiedad del feb:CareerAnalysis
+METRICAS_DESTACADOS = {"puntos": "totalPoints", "valoracion": "totalEfficiency", "partidos": "gamesPlayed",
+                       "rebotes": "totalRebounds", "asistencias": "totalAssists"}
+
+PATRON_ANO = re.compile(r"/season/(\d{4})>")
+PATRON_ID = re.compile(r"/(\d+)>$")
+
+
+def _literal(resto):
+    """Valor lexico del objeto literal de una linea N-Triples ('"22.0"^^<...> .' -> '22.0')."""
+    return resto[1:resto.rindex('"')]
+
+
+def _id(iri):
+    busqueda = PATRON_ID.search(iri)
+    return busqueda.group(1) if busqueda else iri.strip("<>")
+
+
+def calcular_estadisticas(lineas, top_n=TOP_N):
+    """Recorre las lineas N-Triples del grafo y devuelve el documento de estadisticas (dict)."""
+    predicados_destacados = {f"<{FEB}{propiedad}>": metrica for metrica, propiedad in METRICAS_DESTACADOS.items()}
+    puntos_temporada = f"<{FEB}totalPoints>"
+    durante = f"<{FEB}duringSeason>"
+    en_liga = f"<{FEB}inLeague>"
+    nombre = f"<{SCHEMA}name>"
+    carrera_de = f"<{FEB}hasCareerAnalysis>"
+    analisis_de = f"<{FEB}hasSeasonAnalysis>"
+
+    tripletas = 0
+    clases = {}
+    clase_sujeto, temporada_sujeto, liga_sujeto = {}, {}, {}
+    nombres, persona_de = {}, {}
+    valores = {metrica: {} for metrica in METRICAS_DESTACADOS}
+    puntos_analisis = {}
+    for linea in lineas:
+        linea = linea.rstrip()
+        if not linea:
+            continue
+        tripletas += 1
+        sujeto, predicado, resto = linea.split(" ", 2)
+        if predicado == RDF_TYPE:
+            clase = resto[:-2].rstrip()
+            clases[clase] = clases.get(clase, 0) + 1
+            if clase in CLASES_POR_TEMPORADA:
+                clase_sujeto[sujeto] = clase
+        elif predicado == durante:
+            busqueda = PATRON_ANO.search(resto)
+            if busqueda:
+                temporada_sujeto[sujeto] = int(busqueda.group(1))
+        elif predicado == en_liga:
+            liga_sujeto[sujeto] = resto[:-2].rstrip()
+        elif predicado == nombre and sujeto.startswith(f"<{RECURSO}person/"):
+            nombres[sujeto] = _literal(resto)
+        elif predicado in (carrera_de, analisis_de):
+            persona_de[resto[:-2].rstrip()] = sujeto
+        if predicado in predicados_destacados and sujeto.startswith(f"<{RECURSO}player-career/"):
+            valores[predicados_destacados[predicado]][sujeto] = float(_literal(resto))
+        if predicado == puntos_temporada and sujeto.startswith(f"<{RECURSO}player-season-analysis/"):
+            puntos_analisis[sujeto] = float(_literal(resto))
+
+    temporadas = {}
+    for sujeto, clase in clase_sujeto.items():
+        temporada = temporada_sujeto.get(sujeto)
+        if temporada is not None:
+            recuento = temporadas.setdefault(temporada, {clave: 0 for clave in CLASES_POR_TEMPORADA.values()})
+            recuento[CLASES_POR_TEMPORADA[clase]] += 1
+
+    ligas = {}
+    for sujeto, liga in liga_sujeto.items():
+        datos_liga = ligas.setdefault(liga, {"equipos_temporada": 0, "temporadas": set()})
+        datos_liga["equipos_temporada"] += 1
+        if sujeto in temporada_sujeto:
+            datos_liga["temporadas"].add(temporada_sujeto[sujeto])
+
+    def jugador(analisis, valor):
+        persona = persona_de.get(analisis, "")
+        return {"id": _id(persona), "nombre": nombres.get(persona, ""), "valor": valor}
+
+    destacados = {}
+    for metrica, por_analisis in valores.items():
+        mejores = sorted(por_analisis.items(), key=lambda par: (-par[1], par[0]))[:top_n]
+        destacados[metrica] = [jugador(analisis, valor) for analisis, valor in mejores]
+
+    maximos_anotadores = {}
+    for analisis, puntos in puntos_analisis.items():
+        temporada = temporada_sujeto.get(analisis)
+        actual = maximos_anotadores.get(temporada)
+        if temporada is not None and (actual is None or (-puntos, analisis) < (-actual[1], actual[0])):
+            maximos_anotadores[temporada] = (analisis, puntos)
+
+    return {
+        "tripletas": tripletas,
+        "totales": {corto: clases.get(clase, 0) for clase, corto in TOTALES.items()},
+        "clases": {clase.strip("<>"): total for clase, total in sorted(clases.items())},
+        "temporadas": {str(t): temporadas[t] for t in sorted(temporadas)},
+        "ligas": {_id(liga): {"equipos_temporada": datos["equipos_temporada"], "temporadas": sorted(datos["temporadas"])}
+                  for liga, datos in sorted(ligas.items())},
+        "destacados": destacados,
+        "maximos_anotadores": {str(t): jugador(*maximos_anotadores[t]) for t in sorted(maximos_anotadores)},
+    }
+
+
+def _entero(valor):
+    return f'"{int(valor)}"^^<{XSD}integer>'
+
+
+def tripletas_estadisticas(estadisticas):
+    """Lineas N-Triples del documento: descripcion VoID del dataset y feb:Highlight por destacado."""
+    dataset = f"<{IRI_DATASET}>"
+    lineas = [f"{dataset} {RDF_TYPE} <{VOID}Dataset> .",
+              f"{dataset} <{VOID}triples> {_entero(estadisticas['tripletas'])} .",
+              f"{dataset} <{VOID}classes> {_entero(len(estadisticas['clases']))} ."]
+
+    def particion(padre, nombre, clase, total):
+        nodo = f"<{IRI_DATASET}/{nombre}>"
+        lineas.extend([f"{padre} <{VOID}classPartition> {nodo} .",
+                       f"{nodo} <{VOID}class> <{clase}> .",
+                       f"{nodo} <{VOID}entities> {_entero(total)} ."])
+
+    for clase, total in estadisticas["clases"].items():
+        particion(dataset, f"clase/{clase.rsplit('/', 1)[-1].rsplit('#', 1)[-1]}", clase, total)
+
+    clase_por_clave = {clave: clase.strip("<>") for clase, clave in CLASES_POR_TEMPORADA.items()}
+    for temporada, recuento in estadisticas["temporadas"].items():
+        subconjunto = f"<{IRI_DATASET}/temporada/{temporada}>"
+        lineas.extend([f"{dataset} <{VOID}subset> {subconjunto} .",
+                       f"{subconjunto} {RDF_TYPE} <{VOID}Dataset> .",
+                       f"{subconjunto} <{FEB}duringSeason> <{RECURSO}season/{temporada}> ."])
+        for clave, total in recuento.items():
+            particion(subconjunto, f"temporada/{temporada}/{clave}", clase_por_clave[clave], total)
+
+    for liga, datos in estadisticas["ligas"].items():
+        subconjunto = f"<{IRI_DATASET}/liga/{liga}>"
+        lineas.extend([f"{dataset} <{VOID}subset> {subconjunto} .",
+                       f"{subconjunto} {RDF_TYPE} <{VOID}Dataset> .",
+                       f"{subconjunto} <{FEB}inLeague> <{RECURSO}league/{liga}> ."])
+        particion(subconjunto, f"liga/{liga}/equipos", f"{FEB}TeamSeason", datos["equipos_temporada"])
+
+    def destacado(nombre, metrica, posicion, jugador_destacado, temporada=None):
+        nodo = f"<{IRI_DATASET}/destacado/{nombre}>"
+        lineas.extend([f"{dataset} <{FEB}hasHighlight> {nodo} .",
+                       f"{nodo} {RDF_TYPE} <{FEB}Highlight> .",
+                       f"{nodo} <{FEB}highlightMetric> \"{metrica}\"^^<{XSD}string> .",
+                       f"{nodo} <{FEB}rank> {_entero(posicion)} .",
+                       f"{nodo} <{FEB}highlightPlayer> <{RECURSO}person/{jugador_destacado['id']}> .",
+                       f"{nodo} <{FEB}highlightValue> \"{jugador_destacado['valor']}\"^^<{XSD}float> ."])
+        if temporada is not None:
+            lineas.append(f"{nodo} <{FEB}duringSeason> <{RECURSO}season/{temporada}> .")
+
+    for metrica, jugadores in estadisticas["destacados"].items():
+        for posicion, jugador_destacado in enumerate(jugadores, start=1):
+            destacado(f"{metrica}/{posicion}", metrica, posicion, jugador_destacado)
+    for temporada, jugador_destacado in estadisticas["maximos_anotadores"].items():
+        destacado(f"anotador/{temporada}", "puntos_temporada", 1, jugador_destacado, temporada)
+    return lineas
+
+
+def guardar_estadisticas(estadisticas, ruta=RUTA_ESTADISTICAS):
+    """Escribe el JSON con la fecha de generacion (solo aqui: las tripletas no llevan fecha, asi el grafo
+    maestro sale identico cuando no cambian las entradas y las etapas que dependen de el no se repiten)."""
+    temporal = ruta + ".tmp"
+    with open(temporal, "w", encoding="utf-8") as archivo:
+        json.dump({"generado": time.strftime("%Y-%m-%dT%H:%M:%S"), **estadisticas}, archivo, indent=2, ensure_ascii=False)
+    os.replace(temporal, ruta)
+
+
+def leer_estadisticas(ruta=RUTA_ESTADISTICAS):
+    """Documento de estadisticas o None si el grafo aun no se ha unificado con esta version."""
+    if not os.path.exists(ruta):
+        return None
+    with open(ruta, encoding="utf-8") as archivo:
+        return json.load(archivo)
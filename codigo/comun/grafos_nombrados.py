@@ -0,0 +1,104 @@
+import json
+import os
+import threading
+from rdflib import Graph
+
+# Esquema de grafos nombrados del dataset: uno por capa y, en las capas con
+# datos de temporada (capa2 y capa3), uno por temporada. Lo comparten
+# unificar_final.py (que lo genera) y la web / pruebas (que lo cargan).
+
+BASE_GRAFOS = "https://bball-intelligence.com/graph/"
+CAPAS_POR_TEMPORADA = ("capa2", "capa3")
+# Capas que la web carga por temporadas bajo demanda aunque no esten declaradas (actuaciones de la ficha de jugador)
+CAPAS_BAJO_DEMANDA = ("capa2",)
+
+ruta_modulo = os.path.dirname(os.path.abspath(__file__))
+directorio_raiz = os.path.abspath(os.path.join(ruta_modulo, "..", ".."))
+CARPETA_DATASET = os.path.join(directorio_raiz, "datos", "grafo", "dataset")
+RUTA_INDICE = os.path.join(CARPETA_DATASET, "indice.json")
+
+
+def nombre_grafo(capa, temporada=None):
+    """Nombre corto del grafo, usado tambien como nombre de archivo: capa1, capa2_2015..."""
+    return f"{capa}_{temporada}" if temporada else capa
+
+
+def iri_grafo(capa, temporada=None):
+    return f"{BASE_GRAFOS}{capa}/{temporada}" if temporada else f"{BASE_GRAFOS}{capa}"
+
+
+def leer_indice(ruta_indice=RUTA_INDICE):
+    """Devuelve la lista de grafos del dataset o None si aun no se ha generado."""
+    if not os.path.exists(ruta_indice):
+        return None
+    with open(ruta_indice, encoding="utf-8") as archivo:
+        return json.load(archivo)["grafos"]
+
+
+def interpretar_seleccion(texto):
+    """
+    Convierte una declaracion como "capa1,capa3:2020,interlinking" en pares (capa, temporada).
+    Una capa sin temporada selecciona todas sus temporadas.
+    """
+    seleccion = []
+    for parte in texto.split(","):
+        parte = parte.strip()
+        if not parte:
+            continue
+        capa, _, temporada = parte.partition(":")
+        seleccion.append((capa, int(temporada) if temporada else None))
+    return seleccion
+
+
+def filtrar_grafos(indice, seleccion):
+    elegidos = []
+    for entrada in indice:
+        for capa, temporada in seleccion:
+            if entrada["capa"] == capa and (temporada is None or entrada["temporada"] == temporada):
+                elegidos.append(entrada)
+                break
+    return elegidos
+
+
+class CargadorGrafos:
+    """
+    Carga en un unico destino solo los grafos nombrados declarados y, bajo demanda,
+    las temporadas que se vayan necesitando (por ejemplo las actuaciones de capa2).
+    El destino es un Graph de rdflib o cualquier almacen con parse(ruta, format);
+    si el almacen es persistente y ya contiene un archivo, no se vuelve a parsear.
+    """
+
+    def __init__(self, grafo, indice, carpeta=CARPETA_DATASET):
+        self.grafo = grafo
+        self.indice = indice
+        self.carpeta = carpeta
+        self.cargados = set()
+        self._cerrojo = threading.Lock()
+
+    def cargar(self, seleccion):
+        with self._cerrojo:
+            for entrada in filtrar_grafos(self.indice, seleccion):
+                if entrada["nombre"] in self.cargados:
+                    continue
+                ruta = os.path.join(self.carpeta, entrada["archivo"])
+                if not getattr(self.grafo, "cargado", lambda _: False)(ruta):
+                    self.grafo.parse(ruta, format="nt")
+                    getattr(self.grafo, "registrar_carga", lambda _: None)(ruta)
+                self.cargados.add(entrada["nombre"])
+
+    def asegurar_temporadas(self, capa, temporadas):
+        """Carga perezosa: solo parsea las temporadas de la capa que aun no esten en memoria."""
+        pendientes = [(capa, temporada) for temporada in temporadas
+                      if nombre_grafo(capa, temporada) not in self.cargados]
+        if pendientes:
+            self.cargar(pendientes)
+
+
+def crear_grafo_seleccionado(seleccion_texto, ruta_indice=RUTA_INDICE):
+    """Atajo para scripts: Graph con los grafos declarados, o None si no hay dataset."""
+    indice = leer_indice(ruta_indice)
+    if indice is None:
+        return None, None
+    cargador = CargadorGrafos(Graph(), indice, os.path.dirname(ruta_indice))
+    cargador.cargar(interpretar_seleccion(seleccion_texto))
+    return cargador.grafo, cargador
@@ -0,0 +1,122 @@
+import json
+import os
+
+# Registro de ligas y fases de competicion que recorre el pipeline. Cada combinacion (liga, fase)
+# es una particion: se descarga y se limpia por separado (en paralelo desde el orquestador) y
+# limpieza/combinar_particiones.py junta las elegidas en los CSV de capa1/capa2 de siempre, que
+# son los que leen capa3, la carga RDF y la web.
+#
+# La particion por defecto (194, regular) conserva las rutas originales de datos/bruto, asi que
+# lo ya descargado sirve tal cual. Las demas van a datos/bruto/ligas/<id>-<slug>/ y todas las
+# salidas limpias a datos/procesados/particiones/<id>-<fase>/.
+#
+# Para anadir una liga basta con declararla en datos/ligas.json con las mismas claves que LIGAS
+# (el id y el slug son los de la URL de proballers: /liga/<id>/<slug>/equipos/<año>), p. ej.
+#   {"<id>": {"slug": "<slug>", "nombre": "LEB Plata", "desde": 2015, "hasta": 2025}}
+
+directorio_raiz = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+RUTA_LIGAS_EXTRA = os.path.join(directorio_raiz, "datos", "ligas.json")
+
+LIGAS = {
+    194: {
+        "slug": "spain-leb-gold",
+        "nombre": "Primera FEB (LEB Oro)",
+        "desde": 2015,
+        "hasta": 2025,
+        # Nombres de equipo mal escritos en el maestro de equipos/plantillas (capa1)
+        "correcciones_nombres": {'Ourence': 'Ourense', 'C.B. Prat': 'CB Prat'},
+        # Carpetas de equipo (normalizadas) que el emparejamiento aproximado no resuelve bien (capa2)
+        "correcciones_equipos": {
+            'ii': 'https://www.proballers.com/es/baloncesto/equipo/2244/fc-barcelona-ii',
+            'rvb': 'https://www.proballers.com/es/baloncesto/equipo/146/real-valladolid',
+            'manresa': 'https://www.proballers.com/es/baloncesto/equipo/214/manresa',
+            'ourence': 'https://www.proballers.com/es/baloncesto/equipo/670/ourense',
+            'leyma coruna': 'https://www.proballers.com/es/baloncesto/equipo/2114/leyma-coruna',
+        },
+    },
+}
+
+# Fase -> titulo de la seccion en las paginas de proballers (plantillas y partidos de un jugador)
+FASES = {"regular": "Temporada Regular", "playoffs": "Playoffs", "copa": "Copa"}
+
+PARTICION_POR_DEFECTO = (194, "regular")
+
+
+def registro_ligas():
+    """LIGAS mas las declaradas en datos/ligas.json (si existe)."""
+    ligas = dict(LIGAS)
+    if os.path.exists(RUTA_LIGAS_EXTRA):
+        with open(RUTA_LIGAS_EXTRA, encoding="utf-8") as archivo:
+            for id_liga, datos in json.load(archivo).items():
+                ligas[int(id_liga)] = {"correcciones_nombres": {}, "correcciones_equipos": {}, **datos}
+    return ligas
+
+
+def liga(id_liga):
+    ligas = registro_ligas()
+    if id_liga not in ligas:
+        raise ValueError(f"Liga desconocida {id_liga}. Registradas: {', '.join(map(str, sorted(ligas)))} "
+                         f"(las nuevas se declaran en {RUTA_LIGAS_EXTRA})")
+    return ligas[id_liga]
+
+
+def interpretar_particiones(texto):
+    """'194:regular,194:playoffs' -> [(194, 'regular'), (194, 'playoffs')]; una liga sin fase es la regular."""
+    particiones = []
+    for parte in texto.split(","):
+        parte = parte.strip()
+        if not parte:
+            continue
+        id_liga, _, fase = parte.partition(":")
+        fase = fase or "regular"
+        if fase not in FASES:
+            raise ValueError(f"Fase desconocida '{fase}'. Opciones: {', '.join(FASES)}")
+        liga(int(id_liga))
+        if (int(id_liga), fase) not in particiones:
+            particiones.append((int(id_liga), fase))
+    return particiones
+
+
+def clave_particion(id_liga, fase):
+    return f"{id_liga}-{fase}"
+
+
+def sufijo_particion(id_liga, fase):
+    """Sufijo para nombres de etapa y de metricas: vacio en la particion por defecto."""
+    return "" if (id_liga, fase) == PARTICION_POR_DEFECTO else f"@{clave_particion(id_liga, fase)}"
+
+
+def sufijo_liga(id_liga):
+    """Igual que sufijo_particion para las etapas que solo dependen de la liga (equipos, plantillas, capa1)."""
+    return "" if id_liga == PARTICION_POR_DEFECTO[0] else f"@{id_liga}"
+
+
+def rutas_liga(id_liga):
+    """Rutas (relativas a la raiz del repositorio) de los maestros descargados de una liga."""
+    if id_liga == PARTICION_POR_DEFECTO[0]:
+        base = os.path.join("datos", "bruto")
+    else:
+        base = os.path.join("datos", "bruto", "ligas", f"{id_liga}-{liga(id_liga)['slug']}")
+    return {"equipos": os.path.join(base, "equipos", "maestro_equipos.csv"),
+            "plantillas": os.path.join(base, "plantillas", "maestro_plantillas.csv"),
+            "capa1": os.path.join("datos", "procesados", "ligas", str(id_liga), "capa1")}
+
+
+def rutas_particion(id_liga, fase):
+    """Rutas de las fichas de partidos descargadas y de la capa2 limpia de una particion."""
+    if (id_liga, fase) == PARTICION_POR_DEFECTO:
+        temporadas = os.path.join("datos", "bruto", "temporadas")
+    else:
+        temporadas = os.path.join("datos", "bruto", "ligas", f"{id_liga}-{liga(id_liga)['slug']}", fase, "temporadas")
+    return {**rutas_liga(id_liga), "temporadas": temporadas,
+            "capa2": os.path.join("datos", "procesados", "particiones", clave_particion(id_liga, fase), "capa2")}
+
+
+def argumentos_particion(argv):
+    """(id_liga, fase) de los argumentos --liga y --fase de un script (por defecto, la particion por defecto)."""
+    id_liga = int(argv[argv.index("--liga") + 1]) if "--liga" in argv else PARTICION_POR_DEFECTO[0]
+    fase = argv[argv.index("--fase") + 1] if "--fase" in argv else PARTICION_POR_DEFECTO[1]
+    if fase not in FASES:
+        raise ValueError(f"Fase desconocida '{fase}'. Opciones: {', '.join(FASES)}")
+    liga(id_liga)
+    return id_liga, fase
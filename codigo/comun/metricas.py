@@ -0,0 +1,236 @@
+import atexit
+import cProfile
+import collections
+import functools
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:  # Windows: no hay getrusage
+    resource = None
+
+# Instrumentacion ligera del pipeline: tramos cronometrados (descarga, parseo, resolucion de
+# equipos, agregacion, serializacion...), contadores de filas/tripletas y memoria maxima (RSS).
+# Cada script crea un Metricas("<etapa>") y al terminar se vuelcan en datos/metricas/.
+#
+# Variables de entorno:
+#   BBALL_METRICAS = jsonl (por defecto) | prometheus | off
+#       jsonl      -> una linea JSON por tramo/contador en datos/metricas/metricas.jsonl (se acumula entre ejecuciones)
+#       prometheus -> formato de texto de Prometheus en datos/metricas/<etapa>.prom (ultima ejecucion)
+#   BBALL_PERFIL = cprofile | muestreo  (opcional, desactivado por defecto)
+#       cprofile -> volcado .prof de la etapa (abrir con pstats o snakeviz)
+#       muestreo -> perfilador por muestreo de pilas, en formato "collapsed" para flamegraph.pl / speedscope
+#   BBALL_PERFIL_INTERVALO = segundos entre muestras del perfilador por muestreo (por defecto 0.005)
+
+ruta_modulo = os.path.dirname(os.path.abspath(__file__))
+directorio_raiz = os.path.abspath(os.path.join(ruta_modulo, "..", ".."))
+CARPETA_METRICAS = os.path.join(directorio_raiz, "datos", "metricas")
+CARPETA_PERFILES = os.path.join(CARPETA_METRICAS, "perfiles")
+
+
+def rss_maximo_mb():
+    """Memoria maxima del proceso hasta ahora (ru_maxrss viene en KB en Linux); None si no se puede medir."""
+    if resource is not None:
+        return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+    try:
+        import psutil
+    except ImportError:
+        return None
+    # En Windows psutil da el pico del working set; en otras plataformas sin resource no hay pico
+    pico = getattr(psutil.Process().memory_info(), "peak_wset", None)
+    return round(pico / (1024 * 1024), 1) if pico is not None else None
+
+
+class PerfiladorMuestreo:
+    """Muestrea periodicamente la pila del hilo principal y cuenta las pilas repetidas."""
+
+    def __init__(self, intervalo):
+        self.intervalo = intervalo
+        self.pilas = collections.Counter()
+        self.hilo_objetivo = threading.main_thread().ident
+        self.parar = threading.Event()
+        self.hilo = threading.Thread(target=self._muestrear, daemon=True)
+
+    def _muestrear(self):
+        while not self.parar.wait(self.intervalo):
+            marco = sys._current_frames().get(self.hilo_objetivo)
+            pila = []
+            while marco is not None:
+                codigo = marco.f_code
+                pila.append(f"{os.path.basename(codigo.co_filename)}:{codigo.co_name}:{marco.f_lineno}")
+                marco = marco.f_back
+            if pila:
+                self.pilas[";".join(reversed(pila))] += 1
+
+    def iniciar(self):
+        self.hilo.start()
+
+    def detener(self, ruta):
+        self.parar.set()
+        self.hilo.join()
+        with open(ruta, "w", encoding="utf-8") as archivo:
+            for pila, veces in self.pilas.most_common():
+                archivo.write(f"{pila} {veces}\n")
+
+
+class Metricas:
+    def __init__(self, etapa):
+        self.etapa = etapa
+        self.formato = os.environ.get("BBALL_METRICAS", "jsonl").lower()
+        self.ejecucion = time.strftime("%Y%m%dT%H%M%S")
+        self.inicio = time.perf_counter()
+        self.tramos = []
+        self.contadores = collections.Counter()
+        self.cerrojo = threading.Lock()
+        self.cerrado = False
+        self.fase_abierta = None
+        self.acumulados = collections.defaultdict(lambda: [0.0, 0])
+
+        self.modo_perfil = os.environ.get("BBALL_PERFIL", "").lower()
+        self.perfilador = None
+        if self.modo_perfil == "cprofile":
+            self.perfilador = cProfile.Profile()
+            self.perfilador.enable()
+        elif self.modo_perfil == "muestreo":
+            self.perfilador = PerfiladorMuestreo(float(os.environ.get("BBALL_PERFIL_INTERVALO", "0.005")))
+            self.perfilador.iniciar()
+
+        # Se vuelca al salir aunque el script termine con sys.exit o una excepcion
+        atexit.register(self.cerrar)
+
+    @contextmanager
+    def tramo(self, nombre):
+        """Cronometra un bloque: with metricas.tramo("serializar"): ..."""
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            with self.cerrojo:
+                self.tramos.append({"tramo": nombre, "segundos": round(time.perf_counter() - inicio, 4),
+                                    "rss_max_mb": rss_maximo_mb()})
+
+    def fase(self, nombre):
+        """
+        Para scripts lineales: cierra la fase anterior (si la hay) y abre otra,
+        sin tener que reindentar bloques enteros dentro de un with.
+        """
+        self._cerrar_fase()
+        self.fase_abierta = (nombre, time.perf_counter())
+
+    def _cerrar_fase(self):
+        if self.fase_abierta is None:
+            return
+        nombre, inicio = self.fase_abierta
+        self.fase_abierta = None
+        with self.cerrojo:
+            self.tramos.append({"tramo": nombre, "segundos": round(time.perf_counter() - inicio, 4),
+                                "rss_max_mb": rss_maximo_mb()})
+
+    @contextmanager
+    def acumular(self, nombre):
+        """
+        Como tramo(), pero para bloques que se repiten muchas veces (una descarga por jugador,
+        resolver un equipo por fila...): suma tiempo y repeticiones en un unico tramo.
+        """
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            acumulado = self.acumulados[nombre]
+            acumulado[0] += time.perf_counter() - inicio
+            acumulado[1] += 1
+
+    def cronometrar(self, nombre):
+        """Decorador equivalente a acumular() para funciones enteras."""
+        def decorador(funcion):
+            @functools.wraps(funcion)
+            def envoltura(*args, **kwargs):
+                with self.acumular(nombre):
+                    return funcion(*args, **kwargs)
+            return envoltura
+        return decorador
+
+    def anotar(self, nombre, segundos, **extra):
+        """Registra un tramo medido en otro sitio (por ejemplo dentro de un proceso hijo)."""
+        with self.cerrojo:
+            self.tramos.append({"tramo": nombre, "segundos": round(segundos, 4), **extra})
+
+    def contar(self, nombre, cantidad=1):
+        with self.cerrojo:
+            self.contadores[nombre] += cantidad
+
+    def _volcar_perfil(self):
+        if self.perfilador is None:
+            return None
+        os.makedirs(CARPETA_PERFILES, exist_ok=True)
+        if self.modo_perfil == "cprofile":
+            self.perfilador.disable()
+            ruta = os.path.join(CARPETA_PERFILES, f"{self.etapa}_{self.ejecucion}.prof")
+            self.perfilador.dump_stats(ruta)
+        else:
+            ruta = os.path.join(CARPETA_PERFILES, f"{self.etapa}_{self.ejecucion}.collapsed")
+            self.perfilador.detener(ruta)
+        return ruta
+
+    def _escribir_jsonl(self, total):
+        base = {"etapa": self.etapa, "ejecucion": self.ejecucion}
+        with open(os.path.join(CARPETA_METRICAS, "metricas.jsonl"), "a", encoding="utf-8") as archivo:
+            for tramo in self.tramos:
+                archivo.write(json.dumps({**base, "tipo": "tramo", **tramo}) + "\n")
+            for nombre, valor in self.contadores.items():
+                archivo.write(json.dumps({**base, "tipo": "contador", "contador": nombre, "valor": valor}) + "\n")
+            archivo.write(json.dumps({**base, "tipo": "total", "segundos": total, "rss_max_mb": rss_maximo_mb()}) + "\n")
+
+    def _escribir_prometheus(self, total):
+        etiqueta = f'etapa="{self.etapa}"'
+        lineas = ["# TYPE bball_tramo_segundos gauge"]
+        # Un mismo tramo puede repetirse (por ejemplo uno por archivo): se suma
+        por_tramo = collections.defaultdict(float)
+        for tramo in self.tramos:
+            por_tramo[tramo["tramo"]] += tramo["segundos"]
+        lineas += [f'bball_tramo_segundos{{{etiqueta},tramo="{nombre}"}} {segundos:.4f}' for nombre, segundos in por_tramo.items()]
+        lineas.append("# TYPE bball_contador_total counter")
+        lineas += [f'bball_contador_total{{{etiqueta},contador="{nombre}"}} {valor}' for nombre, valor in self.contadores.items()]
+        lineas.append("# TYPE bball_etapa_segundos gauge")
+        lineas.append(f"bball_etapa_segundos{{{etiqueta}}} {total:.4f}")
+        rss = rss_maximo_mb()
+        if rss is not None:
+            lineas.append("# TYPE bball_rss_maximo_bytes gauge")
+            lineas.append(f"bball_rss_maximo_bytes{{{etiqueta}}} {int(rss * 1024 * 1024)}")
+        with open(os.path.join(CARPETA_METRICAS, f"{self.etapa}.prom"), "w", encoding="utf-8") as archivo:
+            archivo.write("\n".join(lineas) + "\n")
+
+    def cerrar(self):
+        """Vuelca tramos, contadores y perfil. Es idempotente (tambien se llama desde atexit)."""
+        if self.cerrado:
+            return
+        self.cerrado = True
+        self._cerrar_fase()
+        for nombre, (segundos, llamadas) in self.acumulados.items():
+            self.tramos.append({"tramo": nombre, "segundos": round(segundos, 4), "llamadas": llamadas})
+        # Un modulo importado solo por sus funciones no deja rastro en las metricas
+        if not self.tramos and not self.contadores and self.perfilador is None:
+            return
+        total = round(time.perf_counter() - self.inicio, 4)
+        ruta_perfil = self._volcar_perfil()
+        if self.formato != "off":
+            os.makedirs(CARPETA_METRICAS, exist_ok=True)
+            if self.formato == "prometheus":
+                self._escribir_prometheus(total)
+            else:
+                self._escribir_jsonl(total)
+        # En el resumen los tramos repetidos (una fase por temporada, por ejemplo) se suman
+        por_tramo = {}
+        for tramo in self.tramos:
+            por_tramo[tramo["tramo"]] = por_tramo.get(tramo["tramo"], 0.0) + tramo["segundos"]
+        resumen = ", ".join(f"{nombre} {segundos:.2f}s" for nombre, segundos in por_tramo.items())
+        rss = rss_maximo_mb()
+        memoria = f"RSS max {rss} MB" if rss is not None else "RSS max no disponible"
+        print(f"[metricas] {self.etapa}: {total:.2f}s, {memoria}" + (f" | {resumen}" if resumen else ""))
+        if ruta_perfil:
+            print(f"[metricas] perfil guardado en {ruta_perfil}")
@@ -0,0 +1,99 @@
+import re
+import unicodedata
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+# Normalizacion de textos compartida por el scraping y la limpieza:
+#   normalizar_equipo / normalizar_equipos  nombres de equipo comparables (capa2: emparejar carpetas y rivales)
+#   nombre_para_archivo                     nombres de carpeta y archivo de las fichas (scraper 03)
+#   recortar_espacios / quitar_anio_url     limpieza de los maestros (capa1)
+#
+# normalizar_equipo da lo mismo que la version original (minusculas, NFD sin marcas Mn, fuera lo que no
+# sea [\w\s-], guiones a espacios y fuera las palabras de ruido) pero sin recorrer caracter a caracter:
+# una tabla de str.translate precalculada resuelve de una vez tildes, simbolos y guiones para todo el
+# latin (los nombres de la liga caben de sobra), los textos con otros alfabetos pasan por el camino
+# largo de unicodedata, y las palabras de ruido se quitan con una sola expresion regular. Los mismos
+# nombres se repiten miles de veces (cada rival en cada ficha), asi que el resultado se memoriza.
+
+PALABRAS_RUIDO = ['club', 'baloncesto', 'sad', 'cb', 'basket', 'basketball', 'monbus', 'movistar', 'leyma',
+                  '1', 'rio', 'sur', 'aspasia']
+
+_SIMBOLOS = re.compile(r'[^\w\s-]')
+# Cada palabra se lleva el espacio de delante y deja el de detras para la siguiente
+_RUIDO = re.compile(r' (?:' + '|'.join(map(re.escape, PALABRAS_RUIDO)) + r')(?= )')
+
+
+def _limpiar_caracteres(texto):
+    """Camino largo (cualquier alfabeto): tildes fuera, simbolos fuera, guiones a espacios."""
+    texto = unicodedata.normalize('NFD', texto)
+    texto = "".join(caracter for caracter in texto if unicodedata.category(caracter) != 'Mn')
+    return _SIMBOLOS.sub('', texto).replace('-', ' ')
+
+
+def _construir_tabla():
+    """Caracter -> resultado del camino largo, para ASCII, latin extendido y las marcas combinables."""
+    tabla = {}
+    for codigo in list(range(0x250)) + list(range(0x300, 0x370)):
+        caracter = chr(codigo)
+        limpio = _limpiar_caracteres(caracter)
+        if limpio != caracter:
+            tabla[codigo] = limpio or None
+    return tabla
+
+
+_TABLA_EQUIPOS = _construir_tabla()
+
+
+@lru_cache(maxsize=16384)
+def _normalizar(texto):
+    texto = texto.lower()
+    limpio = texto.translate(_TABLA_EQUIPOS)
+    if not limpio.isascii():
+        # Queda algun caracter fuera de la tabla: el resultado de la tabla no vale, se repite entero
+        limpio = _limpiar_caracteres(texto)
+    relleno = f" {limpio} "
+    palabras = _RUIDO.findall(relleno)
+    if len(palabras) != len(set(palabras)):
+        # Con una palabra de ruido repetida el bucle original (una pasada por palabra, str.replace sin
+        # solapes) puede dejar alguna copia; se repite tal cual para dar exactamente lo mismo
+        for palabra in PALABRAS_RUIDO:
+            limpio = f" {limpio} ".replace(f" {palabra} ", " ")
+        return limpio.strip()
+    return _RUIDO.sub('', relleno).strip()
+
+
+def normalizar_equipo(texto):
+    """Nombre de equipo en minusculas, sin tildes, simbolos ni palabras de ruido ("" si falta)."""
+    if pd.isna(texto):
+        return ""
+    return _normalizar(str(texto))
+
+
+def normalizar_equipos(serie):
+    """normalizar_equipo sobre una Series: cada valor distinto se normaliza una sola vez."""
+    codigos, unicos = pd.factorize(serie)
+    normalizados = np.array([_normalizar(str(valor)) for valor in unicos] + [""], dtype=object)
+    # factorize marca los vacios con -1, que toma el "" del final
+    return pd.Series(normalizados[codigos], index=serie.index, name=serie.name)
+
+
+def nombre_para_archivo(texto):
+    """Nombre valido como carpeta o archivo en cualquier sistema (sin espacios, barras, puntos ni comillas)."""
+    if not texto:
+        return "DESCONOCIDO"
+    # Con solo cinco caracteres, cinco str.replace son mas rapidos que str.translate (que va caracter a caracter)
+    return str(texto).strip().replace(" ", "_").replace("/", "-").replace(".", "").replace('"', '').replace("'", "")
+
+
+def recortar_espacios(tabla):
+    """Quita los espacios de los extremos en todas las columnas de texto (en la misma tabla)."""
+    columnas_texto = tabla.select_dtypes(include=['object']).columns
+    tabla[columnas_texto] = tabla[columnas_texto].apply(lambda columna: columna.str.strip())
+    return tabla
+
+
+def quitar_anio_url(serie):
+    """URL de equipo por temporada (.../equipo/146/real-valladolid/2023) -> URL estable del club."""
+    return serie.str.replace(r'/\d{4}$', '', regex=True)
@@ -0,0 +1,116 @@
+import os
+import re
+import statistics
+import sys
+import time
+import unicodedata
+
+import pandas as pd
+
+# Compara comun/normalizacion.py con las funciones que sustituye (copiadas tal cual abajo) sobre los
+# textos reales del pipeline: nombres y URLs de capa1, carpetas de equipo y rivales de las fichas de
+# partido, mas unos casos limite. Primero comprueba que los resultados son identicos y despues mide.
+#   python codigo/limpieza/benchmark_normalizacion.py [repeticiones] [--fichas N]
+# --fichas limita cuantas fichas de datos/bruto/temporadas se leen para sacar los rivales (por defecto todas).
+
+ruta_script = os.path.dirname(os.path.abspath(__file__))
+raiz = os.path.abspath(os.path.join(ruta_script, "..", ".."))
+sys.path.append(os.path.join(raiz, "codigo"))
+from comun.normalizacion import _normalizar, nombre_para_archivo, normalizar_equipo, normalizar_equipos
+
+REPETICIONES = int(sys.argv[1]) if len(sys.argv) > 1 and sys.argv[1].isdigit() else 5
+MAXIMO_FICHAS = int(sys.argv[sys.argv.index("--fichas") + 1]) if "--fichas" in sys.argv else None
+
+CASOS_LIMITE = [None, float("nan"), "", "   ", "Club Baloncesto Sevilla", "CB cb Prat", "cb club cb cb",
+                "Basket  Basket Zaragoza", "Río Breogán", "Força Lleida C.E.", "Leyma Coruña - Básquet",
+                "Ourence", "Çukurova Basketbol", "Динамо Москва", "ΠΑΟΚ", "İstanbul", "éxito", "Æ ø ß ﬁ",
+                "a\tcb\tb", "1 de Mayo", "C.B. Prat 1", "Bàsquet Girona S.A.D.", "FC Barcelona II"]
+
+
+def normalizar_texto_equipo_original(texto):
+    if pd.isna(texto): return ""
+    texto_limpio = unicodedata.normalize('NFD', str(texto).lower())
+    texto_limpio = "".join([caracter for caracter in texto_limpio if unicodedata.category(caracter) != 'Mn'])
+    texto_limpio = re.sub(r'[^\w\s-]', '', texto_limpio).replace('-', ' ')
+    palabras_ruido = ['club', 'baloncesto', 'sad', 'cb', 'basket', 'basketball', 'monbus', 'movistar', 'leyma', '1', 'rio', 'sur', 'aspasia']
+    for palabra in palabras_ruido: texto_limpio = f" {texto_limpio} ".replace(f" {palabra} ", " ")
+    return texto_limpio.strip()
+
+
+def limpiar_nombre_para_archivo_original(texto_sucio):
+    if not texto_sucio: return "DESCONOCIDO"
+    return str(texto_sucio).strip().replace(" ", "_").replace("/", "-").replace(".", "").replace('"', '').replace("'", "")
+
+
+def leer_textos():
+    """Textos en el mismo orden y con las mismas repeticiones con que los normaliza capa2."""
+    equipos = pd.read_csv(os.path.join(raiz, "datos", "procesados", "capa1", "capa1_equipos_temporada.csv"))
+    maestros = list(equipos["nombre_equipo"]) + [uri.split("/")[-1] for uri in equipos["uri_equipo"]]
+    carpetas, rivales = [], []
+    ruta_temporadas = os.path.join(raiz, "datos", "bruto", "temporadas")
+    fichas = 0
+    for temporada in sorted(os.listdir(ruta_temporadas)) if os.path.isdir(ruta_temporadas) else []:
+        for equipo in sorted(os.listdir(os.path.join(ruta_temporadas, temporada))):
+            carpetas.append(equipo.replace("_", " "))
+            for archivo in sorted(os.listdir(os.path.join(ruta_temporadas, temporada, equipo))):
+                if MAXIMO_FICHAS is not None and fichas >= MAXIMO_FICHAS:
+                    break
+                try:
+                    partidos = pd.read_csv(os.path.join(ruta_temporadas, temporada, equipo, archivo), usecols=["PARTIDO"])
+                except Exception:
+                    continue
+                rivales += [str(partido).replace("vs ", "").replace("@ ", "").strip() for partido in partidos["PARTIDO"]]
+                fichas += 1
+    plantillas = pd.read_csv(os.path.join(raiz, "datos", "bruto", "plantillas", "maestro_plantillas.csv"),
+                             on_bad_lines="skip", quotechar='"')
+    archivos = list(plantillas["nombre_equipo"]) + list(plantillas["nombre_jugador"])
+    return maestros, carpetas + rivales, archivos
+
+
+def medir(funcion, repeticiones, antes=None):
+    tiempos = []
+    for _ in range(repeticiones):
+        if antes:
+            antes()
+        inicio = time.perf_counter()
+        funcion()
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+    return statistics.median(tiempos)
+
+
+def comparar():
+    maestros, busquedas, archivos = leer_textos()
+    textos = maestros + busquedas + CASOS_LIMITE
+    print(f"{len(maestros)} textos de maestros, {len(busquedas)} carpetas y rivales ({len(set(busquedas))} distintos), "
+          f"{len(archivos)} nombres de archivo")
+
+    distintos = [texto for texto in textos if normalizar_equipo(texto) != normalizar_texto_equipo_original(texto)]
+    serie = pd.Series(maestros + CASOS_LIMITE, dtype=object)
+    serie_distinta = (normalizar_equipos(serie) != serie.map(normalizar_texto_equipo_original)).sum()
+    archivos_distintos = [texto for texto in archivos + CASOS_LIMITE
+                          if nombre_para_archivo(texto) != limpiar_nombre_para_archivo_original(texto)]
+    if distintos or serie_distinta or archivos_distintos:
+        print(f"RESULTADOS DISTINTOS: {distintos[:10]} / serie {serie_distinta} / archivos {archivos_distintos[:10]}")
+        sys.exit(1)
+    print("Resultados identicos en todos los textos.\n")
+
+    vaciar = _normalizar.cache_clear
+    sin_memoria = lambda texto: "" if pd.isna(texto) else _normalizar.__wrapped__(str(texto))  # solo tabla y expresion regular
+    # nombre_para_archivo no se mide: es el mismo codigo de antes, solo cambia de sitio
+    medidas = [
+        ("normalizar equipo: original", lambda: [normalizar_texto_equipo_original(t) for t in textos], None),
+        ("normalizar equipo: sin memoria", lambda: [sin_memoria(t) for t in textos], None),
+        ("normalizar equipo: memoria vacia", lambda: [normalizar_equipo(t) for t in textos], vaciar),
+        ("normalizar equipo: memoria llena", lambda: [normalizar_equipo(t) for t in textos], None),
+        ("maestros: original por filas", lambda: [normalizar_texto_equipo_original(t) for t in maestros], None),
+        ("maestros: Series", lambda: normalizar_equipos(pd.Series(maestros, dtype=object)), vaciar),
+    ]
+    resultados = {nombre: medir(funcion, REPETICIONES, antes) for nombre, funcion, antes in medidas}
+    print(f"{'medida':<36}{'mediana ms':>12}{'aceleracion':>13}")
+    for nombre, milisegundos in resultados.items():
+        referencia = resultados[next(n for n in resultados if n.split(":")[0] == nombre.split(":")[0])]
+        print(f"{nombre:<36}{milisegundos:>12.2f}{referencia / milisegundos:>12.1f}x")
+
+
+if __name__ == "__main__":
+    comparar()
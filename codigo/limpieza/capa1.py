@@ -1,34 +1,43 @@
 import pandas as pd
-import re
+import os
+import sys
 
-def limpiar_url_equipo(url):
-    if pd.isna(url):
-        return url
-    return re.sub(r'/\d{4}$', '', url)
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from comun.metricas import Metricas
+from comun.ligas import argumentos_particion, liga, rutas_liga, sufijo_liga
+from comun.normalizacion import quitar_anio_url, recortar_espacios
+
+# Liga a limpiar: python capa1.py [--liga 194]. La salida va a datos/procesados/ligas/<id>/capa1 y
+# limpieza/combinar_particiones.py la junta con las demas ligas en datos/procesados/capa1
+ID_LIGA, _ = argumentos_particion(sys.argv)
+RUTAS = rutas_liga(ID_LIGA)
+
+metricas = Metricas(f"limpieza_capa1{sufijo_liga(ID_LIGA)}")
 
 def procesar_capa1():
     # 1. Carga de los datos brutos
     # (Asegúrate de que estas rutas existen en tu repo local/codespace)
-    copia_equipos_bruto = pd.read_csv('datos/bruto/equipos/maestro_equipos.csv')
-    copia_plantillas_bruto = pd.read_csv('datos/bruto/plantillas/maestro_plantillas.csv')
+    metricas.fase("leer_brutos")
+    copia_equipos_bruto = pd.read_csv(RUTAS["equipos"])
+    copia_plantillas_bruto = pd.read_csv(RUTAS["plantillas"])
+
+    metricas.contar("filas_equipos_bruto", len(copia_equipos_bruto))
+    metricas.contar("filas_plantillas_bruto", len(copia_plantillas_bruto))
 
     # --- LIMPIEZA INICIAL DE STRINGS ---
+    metricas.fase("limpiar")
     # Quitamos espacios en blanco extra en columnas de texto
     for df in [copia_equipos_bruto, copia_plantillas_bruto]:
-        text_cols = df.select_dtypes(include=['object']).columns
-        df[text_cols] = df[text_cols].apply(lambda x: x.str.strip())
-
-    # Diccionario para correcciones manuales (Ejemplo Ourense)
-    correcciones_equipos = {
-        'Ourence': 'Ourense',
-        'C.B. Prat': 'CB Prat' # Ejemplo de normalización
-    }
+        recortar_espacios(df)
+
+    # Diccionario para correcciones manuales de la liga (Ejemplo Ourense), en comun/ligas.py
+    correcciones_equipos = liga(ID_LIGA)["correcciones_nombres"]
     copia_equipos_bruto['nombre_equipo'] = copia_equipos_bruto['nombre_equipo'].replace(correcciones_equipos)
     copia_plantillas_bruto['nombre_equipo'] = copia_plantillas_bruto['nombre_equipo'].replace(correcciones_equipos)
 
     # --- BLOQUE 1: EQUIPOS ---
     
-    copia_equipos_bruto['uri_equipo'] = copia_equipos_bruto['url_equipo'].apply(limpiar_url_equipo)
+    copia_equipos_bruto['uri_equipo'] = quitar_anio_url(copia_equipos_bruto['url_equipo'])
 
     # capa1_equipos.csv: Identidad única del Club
     capa1_lista_equipos = copia_equipos_bruto[['uri_equipo', 'nombre_equipo']].drop_duplicates(subset=['uri_equipo'], keep='first')
@@ -52,7 +61,7 @@ def procesar_capa1():
 
     # capa1_plantillas.csv: Relaciones
     copia_plantillas_bruto['anio_inicio'] = copia_plantillas_bruto['temporada'].str.split('-').str[0].astype(int)
-    copia_plantillas_bruto['uri_equipo'] = copia_plantillas_bruto['url_equipo_origen'].apply(limpiar_url_equipo)
+    copia_plantillas_bruto['uri_equipo'] = quitar_anio_url(copia_plantillas_bruto['url_equipo_origen'])
 
     # Solo las columnas necesarias. Mantenemos anio_inicio como int.
     capa1_plantillas = copia_plantillas_bruto[['url_jugador', 'uri_equipo', 'temporada', 'anio_inicio']].copy()
@@ -61,11 +70,15 @@ def procesar_capa1():
     capa1_plantillas = capa1_plantillas.sort_values(by=['anio_inicio', 'uri_equipo', 'url_jugador'])
 
     # 2. Exportación
+    metricas.fase("escribir_csv")
+    metricas.contar("jugadores", len(capa1_lista_jugadores))
+    metricas.contar("plantillas", len(capa1_plantillas))
+    os.makedirs(RUTAS["capa1"], exist_ok=True)
     # Usamos float_format=None para asegurar que los ints no lleven .0
-    capa1_lista_equipos.to_csv('datos/procesados/capa1/capa1_equipos.csv', index=False)
-    capa1_lista_equipos_temporadas.to_csv('datos/procesados/capa1/capa1_equipos_temporada.csv', index=False)
-    capa1_lista_jugadores.to_csv('datos/procesados/capa1/capa1_jugadores.csv', index=False)
-    capa1_plantillas.to_csv('datos/procesados/capa1/capa1_plantillas.csv', index=False)
+    capa1_lista_equipos.to_csv(os.path.join(RUTAS["capa1"], 'capa1_equipos.csv'), index=False)
+    capa1_lista_equipos_temporadas.to_csv(os.path.join(RUTAS["capa1"], 'capa1_equipos_temporada.csv'), index=False)
+    capa1_lista_jugadores.to_csv(os.path.join(RUTAS["capa1"], 'capa1_jugadores.csv'), index=False)
+    capa1_plantillas.to_csv(os.path.join(RUTAS["capa1"], 'capa1_plantillas.csv'), index=False)
 
     print("Capa 1 completada con éxito y datos ordenados.")
 
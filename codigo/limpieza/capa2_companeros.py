@@ -0,0 +1,49 @@
+import pandas as pd # Importamos la librería pandas para manejar las tablas de datos
+import os # Importamos os para gestionar las carpetas de tu ordenador
+import sys # Importamos sys para poder usar los modulos comunes de codigo/
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")) # Carpeta codigo/ para importar comun
+from comun.metricas import Metricas # Instrumentacion de tiempos y contadores del pipeline
+from comun.coocurrencia import IndiceCompaneros, CARPETA_COMPANEROS # Matrices dispersas jugador x partido
+
+metricas = Metricas("companeros_capa2") # Metricas de esta etapa (se vuelcan al terminar)
+
+K_COMPANEROS = 10 # Compañeros que se guardan por jugador (en la carrera y en cada temporada)
+
+def ejecutar_companeros_capa_2(): # Función principal: índice de compañeros y sus top-k precalculados
+    print("Iniciando indice de companeros de equipo (matrices dispersas)...") # Mensaje de inicio
+
+    # --- CONFIGURACIÓN DE RUTAS ---
+    CARPETA_CAPA1 = 'datos/procesados/capa1/' # Ruta de los datos maestros (nombres)
+    CARPETA_CAPA2 = 'datos/procesados/capa2/' # Ruta de las estadísticas partido a partido
+
+    metricas.fase("leer_csv") # Tramo: lectura de las capas 1 y 2
+    try: # Intentamos cargar los archivos necesarios
+        tabla_detallada = pd.read_csv(os.path.join(CARPETA_CAPA2, 'capa2_estadisticas_detalladas.csv'),
+                                      usecols=['url_jugador', 'id_partido', 'uri_equipo', 'ano_inicio', 'mas_menos']) # Solo las columnas necesarias
+        tabla_jugadores = pd.read_csv(os.path.join(CARPETA_CAPA1, 'capa1_jugadores.csv')) # Nombres de los jugadores
+    except FileNotFoundError as error: # Si falta algún archivo
+        print(f"Error: No se han encontrado los archivos de las capas anteriores. {error}") # Avisamos del error
+        sys.exit(1) # Frenamos el programa con error (el orquestador no da la etapa por buena)
+    metricas.contar("actuaciones", len(tabla_detallada)) # Filas de entrada
+
+    # --- MATRIZ DE INCIDENCIA ---
+    metricas.fase("construir_indice") # Tramo: matrices dispersas jugador x aparición
+    indice = IndiceCompaneros.desde_tablas(tabla_detallada, tabla_jugadores) # Construimos el índice
+    indice.guardar() # Lo guardamos para la web (se carga sin volver a leer el CSV)
+    print(f" -> {indice.incidencia.shape[0]} jugadores x {indice.incidencia.shape[1]} apariciones de equipo") # Tamaño del índice
+
+    # --- TOP-K DE COMPAÑEROS ---
+    print("Calculando los companeros mas habituales de cada jugador...") # Mensaje de progreso
+    metricas.fase("top_k") # Tramo: B @ B.T por carrera y por temporada
+    tablas = [indice.top_k_todos(K_COMPANEROS)] # Toda la carrera
+    for temporada in indice.temporadas(): # Y cada temporada por separado
+        tablas.append(indice.top_k_todos(K_COMPANEROS, temporada))
+    top = pd.concat(tablas, ignore_index=True) # Una sola tabla
+    top.to_csv(os.path.join(CARPETA_COMPANEROS, 'companeros_top.csv'), index=False) # Guardamos
+    metricas.contar("filas_companeros_top", len(top)) # Filas exportadas
+
+    print(f"Proceso completado. Indice y compañeros guardados en {CARPETA_COMPANEROS}") # Fin del proceso
+
+if __name__ == "__main__": # Si se ejecuta el archivo directamente
+    ejecutar_companeros_capa_2() # Lanzamos el índice de compañeros
@@ -0,0 +1,125 @@
+import pandas as pd # Importamos la librería pandas para manejar las tablas de datos
+import numpy as np # Importamos numpy para las operaciones vectorizadas
+import os # Importamos os para gestionar las carpetas de tu ordenador
+import sys # Importamos sys para poder usar los modulos comunes de codigo/
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")) # Carpeta codigo/ para importar comun
+from comun.metricas import Metricas # Instrumentacion de tiempos y contadores del pipeline
+
+metricas = Metricas("ventanas_capa2") # Metricas de esta etapa (se vuelcan al terminar)
+
+VENTANAS = (5, 10) # Tamaños de las ventanas móviles (últimos N partidos)
+
+def convertir_minutos(columna): # Pasa una columna de minutos ("20:30" o 20) a número decimal sin bucles
+    texto = columna.astype(str) # Trabajamos siempre con texto
+    partes = texto.str.split(':', n=1, expand=True) # Separamos minutos y segundos (si los hay)
+    minutos = pd.to_numeric(partes[0], errors='coerce').fillna(0.0) # Parte entera de minutos
+    if partes.shape[1] > 1: # Solo si alguna fila venía en formato minutos:segundos
+        minutos = minutos + pd.to_numeric(partes[1], errors='coerce').fillna(0.0) / 60 # Sumamos la parte proporcional de los segundos
+    return minutos # Devolvemos la serie numérica
+
+def ejecutar_ventanas_capa_2(): # Función principal: series de forma, rachas y splits casa/fuera
+    print("Iniciando ventanas de Capa 2: forma reciente, rachas y local/visitante...") # Mensaje de inicio
+
+    # --- CONFIGURACIÓN DE RUTAS ---
+    CARPETA_CAPA2 = 'datos/procesados/capa2/' # Ruta de los datos limpios de la capa 2
+    CARPETA_VENTANAS = 'datos/procesados/ventanas/' # Ruta donde guardaremos las series precalculadas
+    os.makedirs(CARPETA_VENTANAS, exist_ok=True) # Creamos la carpeta si no existe
+
+    metricas.fase("leer_csv") # Tramo: lectura de la capa 2
+    try: # Intentamos cargar los archivos de la capa anterior
+        tabla_detallada = pd.read_csv(os.path.join(CARPETA_CAPA2, 'capa2_estadisticas_detalladas.csv')) # Estadísticas partido a partido
+        tabla_partidos = pd.read_csv(os.path.join(CARPETA_CAPA2, 'capa2_partidos.csv')) # Resultados de los partidos
+    except FileNotFoundError as error: # Si falta algún archivo
+        print(f"Error: No se han encontrado los archivos de la capa 2. {error}") # Avisamos del error
+        sys.exit(1) # Frenamos el programa con error (el orquestador no da la etapa por buena)
+    metricas.contar("actuaciones", len(tabla_detallada)) # Filas de entrada de jugadores
+    metricas.contar("partidos", len(tabla_partidos)) # Filas de entrada de partidos
+
+    # --- ORDEN ÚNICO POR JUGADOR Y FECHA ---
+    metricas.fase("ordenar") # Tramo: preparación y ordenación (se hace una sola vez)
+    datos_partido = tabla_partidos[['id_partido', 'fecha', 'uri_local']] # Solo necesitamos fecha y quién jugaba en casa
+    jugadores = tabla_detallada.merge(datos_partido, on='id_partido', how='inner') # Añadimos la fecha a cada actuación
+    jugadores['minutos'] = convertir_minutos(jugadores['minutos']) # Minutos en formato decimal
+    jugadores['intentos_ts'] = 2 * (jugadores['t2_intentados'] + jugadores['t3_intentados'] + 0.44 * jugadores['t1_intentados']) # Denominador del True Shooting
+    jugadores['local'] = (jugadores['uri_equipo'] == jugadores['uri_local']).astype(int) # 1 si jugaba en casa
+    jugadores = jugadores.sort_values(['url_jugador', 'fecha', 'id_partido'], kind='stable').reset_index(drop=True) # Orden cronológico por jugador
+
+    # --- FORMA RECIENTE DE LOS JUGADORES (VENTANAS MÓVILES) ---
+    print("Calculando medias móviles de los jugadores...") # Mensaje de progreso
+    metricas.fase("ventanas_jugadores") # Tramo: rolling por jugador
+    agrupado = jugadores.groupby('url_jugador', sort=False) # Grupos en el mismo orden que la tabla
+    jugadores['partido_numero'] = agrupado.cumcount() + 1 # Número de partido en la carrera del jugador
+    for ventana in VENTANAS: # Para cada tamaño de ventana
+        for columna in ['puntos', 'valoracion', 'minutos']: # Medias de las estadísticas de forma
+            media = agrupado[columna].rolling(ventana, min_periods=1).mean() # Media de los últimos N partidos
+            jugadores[f'{columna}_ult{ventana}'] = media.reset_index(level=0, drop=True) # Volvemos a alinear con la tabla
+        puntos = agrupado['puntos'].rolling(ventana, min_periods=1).sum().reset_index(level=0, drop=True) # Puntos en la ventana
+        intentos = agrupado['intentos_ts'].rolling(ventana, min_periods=1).sum().reset_index(level=0, drop=True) # Intentos en la ventana
+        jugadores[f'ts_ult{ventana}'] = np.where(intentos > 0, puntos / intentos.where(intentos > 0, 1) * 100, np.nan) # TS% de la ventana (vacío si no tiró)
+
+    # Acumulados de la temporada (suma corrida dentro de cada jugador y año)
+    agrupado_temporada = jugadores.groupby(['url_jugador', 'ano_inicio'], sort=False) # Grupos jugador-temporada
+    jugadores['puntos_temporada'] = agrupado_temporada['puntos'].cumsum() # Puntos acumulados en la temporada
+    jugadores['partidos_temporada'] = agrupado_temporada.cumcount() + 1 # Partidos jugados hasta la fecha
+    jugadores['media_puntos_temporada'] = jugadores['puntos_temporada'] / jugadores['partidos_temporada'] # Media de la temporada hasta ese partido
+
+    columnas_jugador = ['url_jugador', 'id_partido', 'fecha', 'ano_inicio', 'uri_equipo', 'local', 'partido_numero',
+                        'minutos', 'puntos', 'valoracion'] + \
+                       [f'{c}_ult{v}' for v in VENTANAS for c in ('puntos', 'valoracion', 'minutos', 'ts')] + \
+                       ['puntos_temporada', 'partidos_temporada', 'media_puntos_temporada']
+    jugadores[columnas_jugador].round(2).to_csv(os.path.join(CARPETA_VENTANAS, 'ventanas_jugadores.csv'), index=False) # Guardamos la serie
+    metricas.contar("filas_ventanas_jugadores", len(jugadores)) # Filas exportadas
+
+    # --- RACHAS Y FORMA DE LOS EQUIPOS ---
+    print("Calculando rachas de los equipos...") # Mensaje de progreso
+    metricas.fase("rachas_equipos") # Tramo: una fila por equipo y partido, rachas con cumsum
+    comunes = ['id_partido', 'fecha', 'ano_inicio', 'jornada'] # Columnas que comparten local y visitante
+    casa = tabla_partidos[comunes + ['uri_local', 'uri_visitante', 'puntos_local', 'puntos_visitante']].copy() # Vista del equipo local
+    casa.columns = comunes + ['uri_equipo', 'uri_rival', 'puntos_favor', 'puntos_contra'] # Renombramos a la vista del equipo
+    casa['local'] = 1 # Marcamos que jugaba en casa
+    fuera = tabla_partidos[comunes + ['uri_visitante', 'uri_local', 'puntos_visitante', 'puntos_local']].copy() # Vista del equipo visitante
+    fuera.columns = casa.columns[:-1] # Mismos nombres
+    fuera['local'] = 0 # Marcamos que jugaba fuera
+    equipos = pd.concat([casa, fuera], ignore_index=True) # Dos filas por partido
+    equipos = equipos.sort_values(['uri_equipo', 'fecha', 'id_partido'], kind='stable').reset_index(drop=True) # Orden cronológico por equipo
+    equipos['victoria'] = (equipos['puntos_favor'] > equipos['puntos_contra']).astype(int) # 1 si ganó
+    equipos['margen'] = equipos['puntos_favor'] - equipos['puntos_contra'] # Diferencia de puntos
+
+    # Racha: cada cambio de resultado abre un tramo nuevo; la posición dentro del tramo es la longitud de la racha
+    agrupado_equipo = equipos.groupby(['uri_equipo', 'ano_inicio'], sort=False) # Las rachas no cruzan temporadas
+    cambio = equipos['victoria'].ne(agrupado_equipo['victoria'].shift()) # True cuando el resultado cambia (o empieza la temporada)
+    tramo = cambio.cumsum() # Identificador de cada racha
+    longitud = equipos.groupby(tramo).cumcount() + 1 # Partidos consecutivos con el mismo resultado
+    equipos['racha'] = np.where(equipos['victoria'] == 1, longitud, -longitud) # Positiva si gana, negativa si pierde
+    equipos['victorias_temporada'] = agrupado_equipo['victoria'].cumsum() # Victorias acumuladas
+    equipos['partidos_temporada'] = agrupado_equipo.cumcount() + 1 # Partidos acumulados
+    for ventana in VENTANAS: # Forma reciente del equipo
+        for columna in ['victoria', 'puntos_favor', 'puntos_contra', 'margen']: # Medias móviles del equipo
+            media = agrupado_equipo[columna].rolling(ventana, min_periods=1).mean() # Media de los últimos N partidos
+            equipos[f'{columna}_ult{ventana}'] = media.reset_index(level=[0, 1], drop=True) # Volvemos a alinear con la tabla
+    equipos.round(2).to_csv(os.path.join(CARPETA_VENTANAS, 'ventanas_equipos.csv'), index=False) # Guardamos la serie
+    metricas.contar("filas_ventanas_equipos", len(equipos)) # Filas exportadas
+
+    # --- SPLITS LOCAL / VISITANTE ---
+    print("Calculando splits de local y visitante...") # Mensaje de progreso
+    metricas.fase("splits") # Tramo: agregados por condición de local
+    splits_equipos = equipos.groupby(['uri_equipo', 'ano_inicio', 'local']).agg( # Resumen del equipo en casa y fuera
+        partidos=('victoria', 'count'), victorias=('victoria', 'sum'),
+        puntos_favor_promedio=('puntos_favor', 'mean'), puntos_contra_promedio=('puntos_contra', 'mean'),
+        margen_promedio=('margen', 'mean')).reset_index()
+    splits_equipos['win_rate'] = splits_equipos['victorias'] / splits_equipos['partidos'] * 100 # Porcentaje de victorias
+    splits_equipos.round(2).to_csv(os.path.join(CARPETA_VENTANAS, 'splits_equipos.csv'), index=False) # Guardamos
+
+    splits_jugadores = jugadores.groupby(['url_jugador', 'ano_inicio', 'local']).agg( # Resumen del jugador en casa y fuera
+        partidos=('puntos', 'count'), minutos_promedio=('minutos', 'mean'), puntos_promedio=('puntos', 'mean'),
+        valoracion_promedio=('valoracion', 'mean'), puntos_total=('puntos', 'sum'), intentos_ts=('intentos_ts', 'sum')).reset_index()
+    splits_jugadores['ts_porcentaje'] = splits_jugadores['puntos_total'] / (splits_jugadores['intentos_ts'] + 0.001) * 100 # TS% en casa / fuera
+    splits_jugadores = splits_jugadores.drop(columns=['puntos_total', 'intentos_ts']) # Quitamos las columnas auxiliares
+    splits_jugadores.round(2).to_csv(os.path.join(CARPETA_VENTANAS, 'splits_jugadores.csv'), index=False) # Guardamos
+    metricas.contar("filas_splits", len(splits_equipos) + len(splits_jugadores)) # Filas exportadas
+
+    print(f"Proceso completado. Series de forma, rachas y splits guardados en {CARPETA_VENTANAS}") # Fin del proceso
+
+if __name__ == "__main__": # Si se ejecuta el archivo directamente
+    ejecutar_ventanas_capa_2() # Lanzamos el cálculo de ventanas
@@ -1,41 +1,104 @@
 import pandas as pd # Importamos la librería pandas para manejar las tablas de datos
 import os # Importamos os para gestionar las carpetas de tu ordenador
+import csv # Importamos csv para repartir los archivos de la capa 2 por temporada sin cargarlos enteros
+import shutil # Importamos shutil para borrar los archivos parciales al terminar
 import numpy as np # Importamos numpy para realizar operaciones matemáticas avanzadas
+import sys # Importamos sys para poder usar los modulos comunes de codigo/
 
-def ejecutar_procesamiento_capa_3(): # Función principal para calcular estadísticas avanzadas
-    print("Iniciando Capa 3: Generacion de Analitica Avanzada de Jugadores y Equipos...") # Mensaje de inicio
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")) # Carpeta codigo/ para importar comun
+from comun.metricas import Metricas # Instrumentacion de tiempos y contadores del pipeline
+from comun.ligas import PARTICION_POR_DEFECTO # Liga de los partidos de una capa 2 anterior a las particiones
 
-    # --- CONFIGURACIÓN DE RUTAS ---
-    CARPETA_CAPA1 = 'datos/procesados/capa1/' # Ruta de los datos maestros
-    CARPETA_CAPA2 = 'datos/procesados/capa2/' # Ruta de los datos limpios de la capa anterior
-    CARPETA_CAPA3 = 'datos/procesados/capa3/' # Ruta donde guardaremos los resultados finales
-    os.makedirs(CARPETA_CAPA3, exist_ok=True) # Creamos la carpeta de la capa 3 si no existe
+metricas = Metricas("limpieza_capa3") # Metricas de esta etapa (se vuelcan al terminar)
 
-    try: # Intentamos cargar todos los archivos necesarios
-        tabla_maestra_jugadores = pd.read_csv(os.path.join(CARPETA_CAPA1, 'capa1_jugadores.csv')) # Cargamos nombres y URLs de jugadores
-        tabla_maestra_equipos = pd.read_csv(os.path.join(CARPETA_CAPA1, 'capa1_equipos.csv')) # Cargamos información de equipos
-        tabla_detallada = pd.read_csv(os.path.join(CARPETA_CAPA2, 'capa2_estadisticas_detalladas.csv')) # Cargamos estadísticas partido a partido
-        tabla_partidos = pd.read_csv(os.path.join(CARPETA_CAPA2, 'capa2_partidos.csv')) # Cargamos los resultados de los partidos
-    except FileNotFoundError as error: # Si falta algún archivo
-        print(f"Error: No se han encontrado los archivos de las capas anteriores. {error}") # Avisamos del error
-        return # Frenamos el programa
+# --- CONFIGURACIÓN DE RUTAS ---
+CARPETA_CAPA1 = 'datos/procesados/capa1/' # Ruta de los datos maestros
+CARPETA_CAPA2 = 'datos/procesados/capa2/' # Ruta de los datos limpios de la capa anterior
+CARPETA_CAPA3 = 'datos/procesados/capa3/' # Ruta donde guardaremos los resultados finales
+CARPETA_PARCIALES = os.path.join(CARPETA_CAPA3, '.parciales') # Archivos intermedios del modo por temporadas (se borran al terminar)
+
+# Modo por temporadas (fuera de memoria): python capa3.py --por-temporada. Se activa solo si la capa 2
+# pesa más que este límite. Todas las agregaciones van por temporada (ano_inicio) salvo la carrera y las
+# diferencias entre temporadas, que se calculan sobre la tabla por jugador y temporada (decenas de veces
+# más pequeña que las actuaciones); así la memoria máxima es la de una temporada de actuaciones.
+LIMITE_EN_MEMORIA_MB = 512
+
+# Tablas que se agregan por temporada -> columnas por las que sale ordenada cada una (las de su groupby).
+# Con varias ligas combinadas cada temporada se agrega por separado en cada liga (id_liga de capa2_partidos).
+ORDEN_TABLAS = {
+    'jugadores': ['url_jugador', 'uri_equipo', 'id_liga', 'ano_inicio'],
+    'equipos': ['uri_equipo', 'id_liga', 'ano_inicio'],
+    'equipos_partidos': ['id_partido', 'uri_equipo'],
+    'temporadas': ['url_jugador', 'id_liga', 'ano_inicio'],
+}
+
+# Columnas que se suman tanto por temporada como en la carrera completa
+columnas_carrera = ['minutos_decimal', 'puntos', 'valoracion', 'asistencias', 'robos', 'perdidas', 'tapones',
+                    'rebotes_ofensivos', 'rebotes_defensivos', 'rebotes_totales', 'faltas_cometidas',
+                    'faltas_recibidas', 'mas_menos', 'es_doble_doble', 't2_metidos', 't2_intentados',
+                    't3_metidos', 't3_intentados', 't1_metidos', 't1_intentados',
+                    'tiros_campo_metidos', 'tiros_campo_intentados']
+columnas_promedio = ['minutos', 'puntos', 'valoracion', 'asistencias', 'rebotes_totales', 'robos', 'tapones', 'perdidas'] # Las que se muestran por partido y por 40 minutos
+
+def convertir_minutos_a_decimal(tiempo): # Función para pasar minutos de formato "20:30" a "20.5"
+    if pd.isna(tiempo): return 0.0 # Si no hay tiempo, devolvemos cero
+    if isinstance(tiempo, str) and ':' in tiempo: # Si el texto tiene dos puntos (formato minutos:segundos)
+        partes = tiempo.split(':') # Dividimos el texto por los dos puntos
+        return float(partes[0]) + float(partes[1])/60 # Sumamos los minutos y la parte proporcional de los segundos
+    return float(tiempo) # Si ya es un número, lo devolvemos tal cual
+
+def calcular_doble_doble(fila): # Función para saber si un jugador logró un doble-doble
+    # Contamos en cuántas categorías principales el jugador llegó a 10 o más
+    categorias = sum(1 for valor in [fila['puntos'], fila['rebotes_totales'], fila['asistencias'], fila['robos'], fila['tapones']] if valor >= 10)
+    return 1 if categorias >= 2 else 0 # Si llegó a 10 en 2 o más categorías, es un doble-doble
+
+def anadir_metricas_carrera(tabla): # Añade promedios y métricas avanzadas a una tabla de totales
+    for columna in columnas_promedio: # Recorremos las estadísticas principales
+        tabla[f'{columna}_promedio'] = tabla[f'{columna}_total'] / tabla['partidos_jugados'] # Media por partido
+        if columna != 'minutos': # Los minutos por 40 minutos no tienen sentido
+            tabla[f'{columna}_por_40'] = tabla[f'{columna}_total'] * 40 / (tabla['minutos_total'] + 0.001) # Ritmo por 40 minutos jugados
+    tabla['ts_porcentaje'] = (tabla['puntos_total'] / (2 * (tabla['tiros_campo_intentados_total'] + 0.44 * tabla['t1_intentados_total'] + 0.001))) * 100 # Mismas fórmulas que la capa por temporada
+    tabla['efg_porcentaje'] = ((tabla['tiros_campo_metidos_total'] + 0.5 * tabla['t3_metidos_total']) / (tabla['tiros_campo_intentados_total'] + 0.001)) * 100 # eFG% acumulado
+    tabla['valoracion_por_minuto'] = tabla['valoracion_total'] / (tabla['minutos_total'] + 0.001) # Valoración por minuto acumulada
+    tabla['posesiones_terminadas'] = tabla['tiros_campo_intentados_total'] + 0.44 * tabla['t1_intentados_total'] + tabla['perdidas_total'] # Posesiones que termina el jugador
+    tabla['ortg_individual'] = (tabla['puntos_total'] / (tabla['posesiones_terminadas'] + 0.001)) * 100 # Rating ofensivo acumulado
+    return tabla # Devolvemos la tabla ampliada
+
+def estimar_posesiones(tabla, sufijo=''): # Posesiones de un equipo: tiros + tiros libres - rebotes ofensivos + pérdidas
+    return tabla[f'tiros_campo_intentados{sufijo}'] + 0.44 * tabla[f't1_intentados{sufijo}'] - tabla[f'rebotes_ofensivos{sufijo}'] + tabla[f'perdidas{sufijo}']
+
+def anadir_four_factors(tabla): # Four factors propios y del rival a partir de totales (sirve por partido y por temporada)
+    for sufijo in ['', '_rival']: # Primero el equipo y luego su rival
+        contrario = '_rival' if sufijo == '' else '' # El rebote defensivo que cuenta es el del otro equipo
+        tabla[f'efg_porcentaje{sufijo}'] = (tabla[f'tiros_campo_metidos{sufijo}'] + 0.5 * tabla[f't3_metidos{sufijo}']) / (tabla[f'tiros_campo_intentados{sufijo}'] + 0.001) * 100 # Tiro efectivo
+        tabla[f'tov_porcentaje{sufijo}'] = tabla[f'perdidas{sufijo}'] / (tabla[f'tiros_campo_intentados{sufijo}'] + 0.44 * tabla[f't1_intentados{sufijo}'] + tabla[f'perdidas{sufijo}'] + 0.001) * 100 # Pérdidas por jugada
+        tabla[f'orb_porcentaje{sufijo}'] = tabla[f'rebotes_ofensivos{sufijo}'] / (tabla[f'rebotes_ofensivos{sufijo}'] + tabla[f'rebotes_defensivos{contrario}'] + 0.001) * 100 # Rebotes ofensivos capturados
+        tabla[f'ft_rate{sufijo}'] = tabla[f't1_metidos{sufijo}'] / (tabla[f'tiros_campo_intentados{sufijo}'] + 0.001) # Tiros libres anotados por tiro de campo
+    tabla['pace_real'] = (tabla['posesiones_propias'] + tabla['posesiones_rival']) / 2 / tabla['partidos'] # Ritmo con las posesiones de los dos equipos
+    posesiones_partido = (tabla['posesiones_propias'] + tabla['posesiones_rival']) / 2 # Mismo número de posesiones para atacar y defender
+    tabla['ortg_real'] = tabla['puntos'] / (posesiones_partido + 0.001) * 100 # Puntos anotados cada 100 posesiones
+    tabla['drtg_equipo'] = tabla['puntos_rival'] / (posesiones_partido + 0.001) * 100 # Puntos recibidos cada 100 posesiones
+    tabla['net_rating'] = tabla['ortg_real'] - tabla['drtg_equipo'] # Diferencia entre ataque y defensa
+    return tabla # Devolvemos la tabla ampliada
+
+def agregar_temporadas(tabla_detallada, tabla_partidos): # Todas las agregaciones que se hacen dentro de una temporada
+    # Sirve igual para todas las temporadas juntas (modo en memoria) que para una sola (modo por temporadas):
+    # todos los groupby llevan ano_inicio o id_partido, y un partido pertenece a una única temporada y liga
+    metricas.contar("actuaciones", len(tabla_detallada)) # Filas de entrada partido a partido
 
     # --- LIMPIEZA Y PREPARACIÓN DE DATOS ---
-    
-    def convertir_minutos_a_decimal(tiempo): # Función para pasar minutos de formato "20:30" a "20.5"
-        if pd.isna(tiempo): return 0.0 # Si no hay tiempo, devolvemos cero
-        if isinstance(tiempo, str) and ':' in tiempo: # Si el texto tiene dos puntos (formato minutos:segundos)
-            partes = tiempo.split(':') # Dividimos el texto por los dos puntos
-            return float(partes[0]) + float(partes[1])/60 # Sumamos los minutos y la parte proporcional de los segundos
-        return float(tiempo) # Si ya es un número, lo devolvemos tal cual
-    
+    metricas.fase("preparar") # Tramo: conversiones y columnas derivadas
+    if 'id_liga' not in tabla_partidos.columns: # Capa 2 generada antes de las particiones por liga
+        tabla_partidos = tabla_partidos.assign(id_liga=PARTICION_POR_DEFECTO[0]) # Todo es de la liga por defecto
+    ligas_partido = tabla_partidos.set_index('id_partido')['id_liga'] # Liga de cada partido
+    tabla_detallada['id_liga'] = tabla_detallada['id_partido'].map(ligas_partido).fillna(PARTICION_POR_DEFECTO[0]).astype(int) # Liga de cada actuación
     tabla_detallada['minutos_decimal'] = tabla_detallada['minutos'].apply(convertir_minutos_a_decimal) # Aplicamos la conversión de minutos
-    
+
     # Lista de columnas que deben ser números para poder sumarlas
-    columnas_a_limpiar = ['puntos', 'valoracion', 'asistencias', 'robos', 'perdidas', 'tapones', 
-                          'rebotes_ofensivos', 'rebotes_defensivos', 'rebotes_totales', 
+    columnas_a_limpiar = ['puntos', 'valoracion', 'asistencias', 'robos', 'perdidas', 'tapones',
+                          'rebotes_ofensivos', 'rebotes_defensivos', 'rebotes_totales',
                           'faltas_cometidas', 'faltas_recibidas', 'mas_menos']
-    
+
     for columna in columnas_a_limpiar: # Recorremos cada columna de la lista
         if columna in tabla_detallada.columns: # Si la columna existe en nuestra tabla
             tabla_detallada[columna] = tabla_detallada[columna].fillna(0) # Cambiamos los valores vacíos por un cero
@@ -45,20 +108,15 @@ def ejecutar_procesamiento_capa_3(): # Función principal para calcular estadís
     # Calculamos el total de tiros de campo (sumando tiros de 2 y de 3 puntos)
     tabla_detallada['tiros_campo_metidos'] = tabla_detallada['t2_metidos'] + tabla_detallada['t3_metidos']
     tabla_detallada['tiros_campo_intentados'] = tabla_detallada['t2_intentados'] + tabla_detallada['t3_intentados']
-
-    def calcular_doble_doble(fila): # Función para saber si un jugador logró un doble-doble
-        # Contamos en cuántas categorías principales el jugador llegó a 10 o más
-        categorias = sum(1 for valor in [fila['puntos'], fila['rebotes_totales'], fila['asistencias'], fila['robos'], fila['tapones']] if valor >= 10)
-        return 1 if categorias >= 2 else 0 # Si llegó a 10 en 2 o más categorías, es un doble-doble
-    
     tabla_detallada['es_doble_doble'] = tabla_detallada.apply(calcular_doble_doble, axis=1) # Aplicamos la función a cada partido
 
     # --- ANALÍTICA DE JUGADORES (RESUMEN POR TEMPORADA) ---
     print("Calculando promedios y totales de los jugadores...") # Mensaje de progreso
-    
-    # Agrupamos los datos por jugador, equipo y año
-    agrupado_jugadores = tabla_detallada.groupby(['url_jugador', 'uri_equipo', 'ano_inicio'])
-    
+    metricas.fase("agregar_jugadores") # Tramo: resumen por jugador, equipo y temporada
+
+    # Agrupamos los datos por jugador, equipo, liga y año
+    agrupado_jugadores = tabla_detallada.groupby(ORDEN_TABLAS['jugadores'])
+
     # Definimos qué queremos hacer con cada dato (sumar totales o calcular promedios)
     operaciones_jugador = {
         'minutos_decimal': ['sum', 'mean'],
@@ -91,63 +149,59 @@ def ejecutar_procesamiento_capa_3(): # Función principal para calcular estadís
     resultados_jugadores = resultados_jugadores.loc[:, ~resultados_jugadores.columns.str.contains('_partidos')] # Quitamos columnas de cuenta sobrantes
 
     # --- FÓRMULAS DE ESTADÍSTICA AVANZADA (JUGADORES) ---
-    
+
     # True Shooting %: Mide la eficiencia de tiro teniendo en cuenta triples y tiros libres
     resultados_jugadores['ts_porcentaje'] = (resultados_jugadores['puntos_total'] / (2 * (resultados_jugadores['tiros_campo_intentados_total'] + 0.44 * resultados_jugadores['t1_intentados_total'] + 0.001))) * 100
-    
+
     # Effective Field Goal %: Mide la eficiencia de tiro dando más valor al triple
     resultados_jugadores['efg_porcentaje'] = ((resultados_jugadores['tiros_campo_metidos_total'] + 0.5 * resultados_jugadores['t3_metidos_total']) / (resultados_jugadores['tiros_campo_intentados_total'] + 0.001)) * 100
-    
+
     # Ratio Asistencias/Pérdidas: Cuántas asistencias da el jugador por cada balón que pierde
     resultados_jugadores['ratio_ast_to'] = resultados_jugadores['asistencias_total'] / (resultados_jugadores['perdidas_total'] + 0.001)
-    
+
     # Valoración por minuto: Eficiencia general en relación al tiempo que está en pista
     resultados_jugadores['valoracion_por_minuto'] = resultados_jugadores['valoracion_total'] / (resultados_jugadores['minutos_total'] + 0.001)
-    
+
     # Posesiones Terminadas: Estimación de cuántas posesiones del equipo finaliza este jugador
     resultados_jugadores['posesiones_terminadas'] = resultados_jugadores['tiros_campo_intentados_total'] + 0.44 * resultados_jugadores['t1_intentados_total'] + resultados_jugadores['perdidas_total']
-    
+
     # Rating Ofensivo Individual: Puntos que produciría el jugador si terminara 100 posesiones
     resultados_jugadores['ortg_individual'] = (resultados_jugadores['puntos_total'] / (resultados_jugadores['posesiones_terminadas'] + 0.001)) * 100
 
-    # Combinamos con la tabla maestra para recuperar el nombre real del jugador
-    resultados_jugadores_final = resultados_jugadores.merge(tabla_maestra_jugadores, on='url_jugador', how='left')
-    # Guardamos los resultados de los jugadores redondeando a 2 decimales
-    resultados_jugadores_final.round(2).to_csv(os.path.join(CARPETA_CAPA3, 'capa3_jugadores_avanzado.csv'), index=False)
-
 
     # --- ANALÍTICA DE EQUIPOS (RESUMEN POR TEMPORADA) ---
     print("Calculando promedios y totales de los equipos...") # Mensaje de progreso
+    metricas.fase("agregar_equipos") # Tramo: resumen por equipo y temporada
 
     # Columnas que vamos a sumar para obtener los totales del equipo en cada partido
     columnas_totales_equipo = ['puntos', 'valoracion', 'asistencias', 'robos', 'perdidas', 'tapones',
-                               'rebotes_ofensivos', 'rebotes_defensivos', 'rebotes_totales', 
+                               'rebotes_ofensivos', 'rebotes_defensivos', 'rebotes_totales',
                                'faltas_cometidas', 'faltas_recibidas', 'mas_menos',
-                               't2_metidos', 't2_intentados', 't3_metidos', 't3_intentados', 
+                               't2_metidos', 't2_intentados', 't3_metidos', 't3_intentados',
                                't1_metidos', 't1_intentados', 'tiros_campo_metidos', 'tiros_campo_intentados']
-    
+
     # Sumamos las estadísticas de todos los jugadores para tener el total del equipo por cada partido
     equipo_por_partido = tabla_detallada.groupby(['id_partido', 'uri_equipo'])[columnas_totales_equipo].sum().reset_index()
-    
+
     # Cruzamos con la tabla de partidos para saber quién ganó y quién perdió
-    datos_basicos_partidos = tabla_partidos[['id_partido', 'uri_local', 'uri_visitante', 'puntos_local', 'puntos_visitante', 'ano_inicio']]
+    datos_basicos_partidos = tabla_partidos[['id_partido', 'uri_local', 'uri_visitante', 'puntos_local', 'puntos_visitante', 'id_liga', 'ano_inicio']]
     equipo_por_partido = equipo_por_partido.merge(datos_basicos_partidos, on='id_partido')
 
     def determinar_victoria(fila): # Función para saber si el equipo ganó el partido
         if fila['uri_equipo'] == fila['uri_local']: # Si el equipo jugaba como local
             return 1 if fila['puntos_local'] > fila['puntos_visitante'] else 0 # Gana si metió más puntos que el visitante
         return 1 if fila['puntos_visitante'] > fila['puntos_local'] else 0 # Si era visitante, gana si metió más que el local
-    
+
     equipo_por_partido['victoria'] = equipo_por_partido.apply(determinar_victoria, axis=1) # Aplicamos la lógica de victorias
 
-    # Agrupamos ahora los resultados por equipo y año para el resumen estacional
-    agrupado_equipos = equipo_por_partido.groupby(['uri_equipo', 'ano_inicio'])
-    
+    # Agrupamos ahora los resultados por equipo, liga y año para el resumen estacional
+    agrupado_equipos = equipo_por_partido.groupby(ORDEN_TABLAS['equipos'])
+
     # Preparamos las operaciones para el equipo (Victorias totales y promedios de juego)
     operaciones_equipo = {'victoria': ['sum', 'count']}
     for col in columnas_totales_equipo:
         operaciones_equipo[col] = ['sum', 'mean']
-    
+
     resultados_equipos = agrupado_equipos.agg(operaciones_equipo) # Realizamos los cálculos
     resultados_equipos.columns = [f"{col[0]}_{col[1]}" for col in resultados_equipos.columns] # Unimos nombres de columnas
     resultados_equipos = resultados_equipos.reset_index() # Reorganizamos el índice
@@ -155,36 +209,196 @@ def ejecutar_procesamiento_capa_3(): # Función principal para calcular estadís
     # Renombramos las columnas para que sean claras
     resultados_equipos.columns = [c.replace('_sum', '_total').replace('_mean', '_promedio').replace('_count', '_partidos') for c in resultados_equipos.columns]
     resultados_equipos = resultados_equipos.rename(columns={'victoria_partidos': 'partidos_jugados', 'victoria_total': 'victorias_total'})
-    
+
     # --- FÓRMULAS DE ESTADÍSTICA AVANZADA (EQUIPOS) ---
-    
+
     # Porcentaje de victorias: Qué parte de los partidos jugados ha ganado el equipo
     resultados_equipos['win_rate'] = (resultados_equipos['victorias_total'] / resultados_equipos['partidos_jugados']) * 100
-    
+
     # True Shooting % del equipo: Eficiencia colectiva de tiro
     resultados_equipos['ts_porcentaje'] = (resultados_equipos['puntos_total'] / (2 * (resultados_equipos['tiros_campo_intentados_total'] + 0.44 * resultados_equipos['t1_intentados_total'] + 0.001))) * 100
-    
+
     # Ratio de Asistencias: Porcentaje de jugadas que terminan en canasta tras una asistencia
     resultados_equipos['ast_ratio'] = (resultados_equipos['asistencias_total'] * 100) / (resultados_equipos['tiros_campo_intentados_total'] + 0.44 * resultados_equipos['t1_intentados_total'] + resultados_equipos['perdidas_total'] + 0.001)
-    
+
     # Ratio de Rebote Ofensivo: Porcentaje de rebotes que el equipo captura en ataque sobre su total
     resultados_equipos['reb_ratio_ofensivo'] = (resultados_equipos['rebotes_ofensivos_total'] / (resultados_equipos['rebotes_totales_total'] + 0.001)) * 100
-    
+
     # Posesiones Totales del Equipo: Estimación de cuántos ataques ha tenido el equipo en la temporada
     resultados_equipos['posesiones_totales'] = resultados_equipos['tiros_campo_intentados_total'] + 0.44 * resultados_equipos['t1_intentados_total'] - resultados_equipos['rebotes_ofensivos_total'] + resultados_equipos['perdidas_total']
     resultados_equipos['posesiones_por_partido'] = resultados_equipos['posesiones_totales'] / resultados_equipos['partidos_jugados'] # Ritmo de juego (Pace)
-    
+
     # Rating Ofensivo del Equipo: Cuántos puntos mete el equipo cada 100 ataques
     resultados_equipos['ortg_equipo'] = (resultados_equipos['puntos_total'] / (resultados_equipos['posesiones_totales'] + 0.001)) * 100
 
+    # --- RATINGS CON DATOS DEL RIVAL (DRTG, NET RATING, FOUR FACTORS) ---
+    print("Cruzando cada partido con las estadisticas del rival...") # Mensaje de progreso
+    metricas.fase("ratings_rival") # Tramo: cruce de cada equipo con su rival en el mismo partido
+
+    # Columnas del rival que necesitamos, con el sufijo _rival para distinguirlas
+    columnas_rival = ['uri_equipo', 'puntos', 'tiros_campo_metidos', 'tiros_campo_intentados', 't3_metidos',
+                      't1_metidos', 't1_intentados', 'rebotes_ofensivos', 'rebotes_defensivos', 'perdidas']
+    tabla_rival = equipo_por_partido[['id_partido'] + columnas_rival].rename(columns={c: f'{c}_rival' for c in columnas_rival})
+    partidos_con_rival = equipo_por_partido.merge(tabla_rival, on='id_partido') # Cruce del partido consigo mismo
+    partidos_con_rival = partidos_con_rival[partidos_con_rival['uri_equipo'] != partidos_con_rival['uri_equipo_rival']].copy() # Nos quedamos con el otro equipo
+
+    partidos_con_rival['posesiones_propias'] = estimar_posesiones(partidos_con_rival) # Posesiones del equipo en el partido
+    partidos_con_rival['posesiones_rival'] = estimar_posesiones(partidos_con_rival, '_rival') # Posesiones del rival
+    partidos_con_rival['partidos'] = 1 # Cada fila es un partido (así la misma fórmula sirve al sumar la temporada)
+    partidos_con_rival = anadir_four_factors(partidos_con_rival) # Ratings y four factors de cada partido
+
+    # Temporada: se suman los totales de los partidos y se recalculan los ratios (no se promedian ratios)
+    columnas_suma_rival = ['partidos', 'posesiones_propias', 'posesiones_rival', 'puntos'] + [c for c in columnas_rival if c not in ('uri_equipo', 'puntos')] + \
+                          [f'{c}_rival' for c in columnas_rival if c != 'uri_equipo']
+    ratings_temporada = partidos_con_rival.groupby(ORDEN_TABLAS['equipos'])[columnas_suma_rival].sum().reset_index() # Totales por equipo, liga y temporada
+    ratings_temporada = anadir_four_factors(ratings_temporada) # Mismas fórmulas sobre los totales
+    columnas_ratings = ['pace_real', 'ortg_real', 'drtg_equipo', 'net_rating'] + \
+                       [f'{factor}{sufijo}' for sufijo in ['', '_rival'] for factor in ['efg_porcentaje', 'tov_porcentaje', 'orb_porcentaje', 'ft_rate']]
+    ratings_temporada = ratings_temporada.rename(columns={'partidos': 'partidos_con_rival'}) # Partidos en los que tenemos datos de los dos equipos
+    resultados_equipos = resultados_equipos.merge(ratings_temporada[ORDEN_TABLAS['equipos'] + ['partidos_con_rival'] + columnas_ratings],
+                                                  on=ORDEN_TABLAS['equipos'], how='left') # Añadimos los ratings a la tabla de equipos
+
+    # Detalle por partido para la web y el grafo
+    columnas_partido = ['id_partido', 'uri_equipo', 'uri_equipo_rival', 'id_liga', 'ano_inicio', 'victoria', 'puntos', 'puntos_rival',
+                        'posesiones_propias', 'posesiones_rival'] + columnas_ratings
+
+    # --- ANALÍTICA POR JUGADOR Y TEMPORADA (BASE DE LA CARRERA) ---
+    metricas.fase("agregar_temporadas") # Tramo: resumen por jugador, liga y temporada juntando todos sus equipos
+
+    # Una sola pasada sobre las actuaciones: totales por jugador, liga y temporada juntando todos sus equipos
+    operaciones_temporada = {f'{columna}_total': (columna, 'sum') for columna in columnas_carrera} # Suma de cada estadística
+    operaciones_temporada['partidos_jugados'] = ('puntos', 'count') # Número de partidos de la temporada
+    operaciones_temporada['equipos_temporada'] = ('uri_equipo', 'nunique') # Equipos en los que jugó esa temporada
+    temporadas_jugador = tabla_detallada.groupby(ORDEN_TABLAS['temporadas']).agg(**operaciones_temporada).reset_index() # Realizamos los cálculos
+    temporadas_jugador = temporadas_jugador.rename(columns={'minutos_decimal_total': 'minutos_total'}) # Mismo nombre que en la tabla por equipo
+    temporadas_jugador = anadir_metricas_carrera(temporadas_jugador) # Promedios y métricas avanzadas de cada temporada
+
+    return {'jugadores': resultados_jugadores, 'equipos': resultados_equipos,
+            'equipos_partidos': partidos_con_rival[columnas_partido], 'temporadas': temporadas_jugador} # Las cuatro tablas de la temporada
+
+def escribir_resultados(partes, tabla_maestra_jugadores, tabla_maestra_equipos): # Junta las tablas por temporada, calcula la carrera y guarda la capa 3
+    # Con varias temporadas se ordena igual que lo habría dejado un único groupby sobre todas
+    partes = {nombre: tabla.sort_values(ORDEN_TABLAS[nombre], kind='stable').reset_index(drop=True) for nombre, tabla in partes.items()}
+    resultados_jugadores, resultados_equipos, temporadas_jugador = partes['jugadores'], partes['equipos'], partes['temporadas']
+
+    metricas.fase("escribir_temporadas") # Tramo: exportacion de las tablas por temporada
+    # Combinamos con la tabla maestra para recuperar el nombre real del jugador
+    resultados_jugadores_final = resultados_jugadores.merge(tabla_maestra_jugadores, on='url_jugador', how='left')
+    # Guardamos los resultados de los jugadores redondeando a 2 decimales
+    metricas.contar("filas_jugadores_avanzado", len(resultados_jugadores_final)) # Filas exportadas de jugadores
+    resultados_jugadores_final.round(2).to_csv(os.path.join(CARPETA_CAPA3, 'capa3_jugadores_avanzado.csv'), index=False)
+
+    metricas.contar("filas_equipos_partidos", len(partes['equipos_partidos'])) # Filas exportadas por partido
+    partes['equipos_partidos'].round(2).to_csv(os.path.join(CARPETA_CAPA3, 'capa3_equipos_partidos.csv'), index=False)
+
     # Recuperamos el nombre oficial del equipo desde el maestro de equipos
     nombres_de_equipos = tabla_maestra_equipos[['uri_equipo', 'nombre_equipo']].drop_duplicates('uri_equipo')
     resultados_equipos_final = resultados_equipos.merge(nombres_de_equipos, on='uri_equipo', how='left')
 
     # Guardamos los resultados finales de los equipos con 2 decimales
+    metricas.contar("filas_equipos_avanzado", len(resultados_equipos_final)) # Filas exportadas de equipos
     resultados_equipos_final.round(2).to_csv(os.path.join(CARPETA_CAPA3, 'capa3_equipos_avanzado.csv'), index=False)
 
+
+    # --- ANALÍTICA DE CARRERA (TODAS LAS TEMPORADAS Y EQUIPOS) ---
+    print("Calculando trayectorias y carreras de los jugadores...") # Mensaje de progreso
+    metricas.fase("agregar_carreras") # Tramo: resumen por jugador en toda su carrera
+
+    # Diferencia con la temporada anterior jugada en la misma liga (la primera temporada queda vacía)
+    temporadas_jugador = temporadas_jugador.sort_values(ORDEN_TABLAS['temporadas']) # Ordenamos cronológicamente cada jugador en cada liga
+    columnas_delta = ['minutos_promedio', 'puntos_promedio', 'valoracion_promedio', 'ts_porcentaje', 'efg_porcentaje', 'ortg_individual', 'valoracion_por_minuto']
+    diferencias = temporadas_jugador.groupby(['url_jugador', 'id_liga'])[columnas_delta].diff() # Resta vectorizada fila a fila dentro de cada jugador y liga
+    temporadas_jugador[[f'delta_{columna}' for columna in columnas_delta]] = diferencias.to_numpy() # Guardamos las diferencias
+
+    # La carrera se agrega sobre la tabla por temporada (mucho más pequeña que las actuaciones). Es la del
+    # jugador en todas las ligas combinadas: una temporada jugada en dos ligas cuenta una sola vez
+    columnas_suma = [f'{columna}_total' for columna in columnas_carrera if columna != 'minutos_decimal'] + ['minutos_total', 'partidos_jugados']
+    carrera_jugador = temporadas_jugador.groupby('url_jugador')[columnas_suma].sum() # Totales de toda la carrera
+    carrera_jugador['temporadas_jugadas'] = temporadas_jugador.groupby('url_jugador')['ano_inicio'].nunique() # Temporadas distintas
+    carrera_jugador['primera_temporada'] = temporadas_jugador.groupby('url_jugador')['ano_inicio'].min() # Año de debut (en cualquiera de las ligas)
+    carrera_jugador['ultima_temporada'] = temporadas_jugador.groupby('url_jugador')['ano_inicio'].max() # Última temporada registrada
+    carrera_jugador['equipos_distintos'] = resultados_jugadores.groupby('url_jugador')['uri_equipo'].nunique() # Clubes distintos en toda la carrera
+    carrera_jugador = anadir_metricas_carrera(carrera_jugador.reset_index()) # Promedios y métricas avanzadas de la carrera
+
+    # Recuperamos el nombre del jugador y guardamos ambas tablas con 2 decimales
+    temporadas_jugador_final = temporadas_jugador.merge(tabla_maestra_jugadores, on='url_jugador', how='left')
+    carrera_jugador_final = carrera_jugador.merge(tabla_maestra_jugadores, on='url_jugador', how='left')
+    metricas.contar("filas_jugadores_temporadas", len(temporadas_jugador_final)) # Filas exportadas por temporada
+    metricas.contar("filas_jugadores_carrera", len(carrera_jugador_final)) # Filas exportadas de carrera
+    temporadas_jugador_final.round(2).to_csv(os.path.join(CARPETA_CAPA3, 'capa3_jugadores_temporadas.csv'), index=False)
+    carrera_jugador_final.round(2).to_csv(os.path.join(CARPETA_CAPA3, 'capa3_jugadores_carrera.csv'), index=False)
+
+def repartir_por_temporada(ruta_origen, carpeta_destino): # Copia cada fila de un CSV al archivo de su temporada, sin cargarlo entero
+    os.makedirs(carpeta_destino, exist_ok=True) # Creamos la carpeta de los trozos
+    archivos_abiertos = {} # Un archivo abierto por temporada (son pocas)
+    escritores = {} # Y su escritor de CSV
+    with open(ruta_origen, encoding='utf-8', newline='') as archivo_origen: # Abrimos el CSV de la capa 2
+        lector = csv.reader(archivo_origen) # Registros completos: un campo entre comillas puede contener saltos de línea
+        cabecera = next(lector) # Primera fila con los nombres de las columnas
+        posicion_ano = cabecera.index('ano_inicio') # Columna con el año de la temporada
+        for fila in lector: # Leemos registro a registro
+            ano = fila[posicion_ano] # Año de la fila (los campos se copian como texto, sin convertir nada)
+            if ano not in escritores: # Primera fila de esa temporada
+                archivos_abiertos[ano] = open(os.path.join(carpeta_destino, f'{ano}.csv'), 'w', encoding='utf-8', newline='') # Creamos su archivo
+                escritores[ano] = csv.writer(archivos_abiertos[ano], lineterminator='\n') # Fin de línea como el de pandas
+                escritores[ano].writerow(cabecera) # Con la misma cabecera
+            escritores[ano].writerow(fila) # Copiamos la fila (con comillas si las necesita)
+    for archivo in archivos_abiertos.values(): archivo.close() # Cerramos todos los trozos
+    return set(archivos_abiertos) # Temporadas encontradas
+
+def procesar_por_temporada(): # Modo fuera de memoria: una temporada de actuaciones en memoria cada vez
+    metricas.fase("repartir_temporadas") # Tramo: reparto de la capa 2 en un archivo por temporada
+    shutil.rmtree(CARPETA_PARCIALES, ignore_errors=True) # Quitamos restos de una ejecución anterior que no terminara
+    carpeta_actuaciones = os.path.join(CARPETA_PARCIALES, 'actuaciones') # Trozos de capa2_estadisticas_detalladas
+    carpeta_partidos = os.path.join(CARPETA_PARCIALES, 'partidos') # Trozos de capa2_partidos
+    carpeta_resultados = os.path.join(CARPETA_PARCIALES, 'resultados') # Agregados parciales de cada temporada
+    temporadas = repartir_por_temporada(os.path.join(CARPETA_CAPA2, 'capa2_estadisticas_detalladas.csv'), carpeta_actuaciones) # Repartimos las actuaciones
+    repartir_por_temporada(os.path.join(CARPETA_CAPA2, 'capa2_partidos.csv'), carpeta_partidos) # Y los partidos
+    os.makedirs(carpeta_resultados, exist_ok=True) # Carpeta de los agregados parciales
+
+    for ano in sorted(temporadas, key=int): # Recorremos las temporadas en orden
+        print(f"Temporada {ano}:") # Mensaje de progreso
+        metricas.fase("leer_csv") # Tramo: lectura de los trozos de la temporada
+        tabla_detallada = pd.read_csv(os.path.join(carpeta_actuaciones, f'{ano}.csv')) # Actuaciones de la temporada
+        ruta_partidos = os.path.join(carpeta_partidos, f'{ano}.csv') # Partidos de la temporada
+        tabla_partidos = pd.read_csv(ruta_partidos) if os.path.exists(ruta_partidos) else pd.DataFrame(columns=['id_partido', 'uri_local', 'uri_visitante', 'puntos_local', 'puntos_visitante', 'id_liga', 'ano_inicio']) # Puede no haber partidos
+        partes = agregar_temporadas(tabla_detallada, tabla_partidos) # Agregamos la temporada
+        metricas.fase("volcar_parciales") # Tramo: escritura de los agregados de la temporada
+        for nombre, tabla in partes.items(): # Guardamos cada tabla parcial en disco
+            tabla.to_csv(os.path.join(carpeta_resultados, f'{nombre}_{ano}.csv'), index=False) # Los decimales se escriben completos (sin redondear)
+        del tabla_detallada, tabla_partidos, partes # Liberamos la temporada antes de pasar a la siguiente
+
+    metricas.fase("leer_parciales") # Tramo: lectura de los agregados de todas las temporadas (tablas pequeñas)
+    partes = {nombre: pd.concat([pd.read_csv(os.path.join(carpeta_resultados, f'{nombre}_{ano}.csv'), float_precision='round_trip')
+                                 for ano in sorted(temporadas, key=int)], ignore_index=True) for nombre in ORDEN_TABLAS} # Una tabla por tipo
+    shutil.rmtree(CARPETA_PARCIALES, ignore_errors=True) # Ya no hacen falta los archivos intermedios
+    return partes # Devolvemos los agregados de todas las temporadas
+
+def ejecutar_procesamiento_capa_3(): # Función principal para calcular estadísticas avanzadas
+    print("Iniciando Capa 3: Generacion de Analitica Avanzada de Jugadores y Equipos...") # Mensaje de inicio
+    os.makedirs(CARPETA_CAPA3, exist_ok=True) # Creamos la carpeta de la capa 3 si no existe
+
+    metricas.fase("leer_csv") # Tramo: lectura de capas 1 y 2
+    try: # Intentamos cargar todos los archivos necesarios
+        tabla_maestra_jugadores = pd.read_csv(os.path.join(CARPETA_CAPA1, 'capa1_jugadores.csv')) # Cargamos nombres y URLs de jugadores
+        tabla_maestra_equipos = pd.read_csv(os.path.join(CARPETA_CAPA1, 'capa1_equipos.csv')) # Cargamos información de equipos
+        tamano_capa2_mb = (os.path.getsize(os.path.join(CARPETA_CAPA2, 'capa2_estadisticas_detalladas.csv')) +
+                           os.path.getsize(os.path.join(CARPETA_CAPA2, 'capa2_partidos.csv'))) / 2**20 # Tamaño de la capa 2 en disco
+    except FileNotFoundError as error: # Si falta algún archivo
+        print(f"Error: No se han encontrado los archivos de las capas anteriores. {error}") # Avisamos del error
+        sys.exit(1) # Frenamos el programa con error (el orquestador no da la etapa por buena)
+
+    if "--por-temporada" in sys.argv or tamano_capa2_mb > LIMITE_EN_MEMORIA_MB: # Si se pide o la capa 2 es demasiado grande
+        print(f"Procesando temporada a temporada (capa 2: {tamano_capa2_mb:.0f} MB)...") # Avisamos del modo
+        partes = procesar_por_temporada() # Agregados de todas las temporadas, calculados una a una
+    else: # Si cabe en memoria, todo de una vez
+        tabla_detallada = pd.read_csv(os.path.join(CARPETA_CAPA2, 'capa2_estadisticas_detalladas.csv')) # Cargamos estadísticas partido a partido
+        tabla_partidos = pd.read_csv(os.path.join(CARPETA_CAPA2, 'capa2_partidos.csv')) # Cargamos los resultados de los partidos
+        partes = agregar_temporadas(tabla_detallada, tabla_partidos) # Agregamos todas las temporadas juntas
+
+    escribir_resultados(partes, tabla_maestra_jugadores, tabla_maestra_equipos) # Carrera, nombres y exportación
+
     print(f"Proceso completado. Se han generado las estadisticas avanzadas para jugadores y equipos.") # Fin del proceso
 
 if __name__ == "__main__": # Si se ejecuta el archivo directamente
-    ejecutar_procesamiento_capa_3() # Lanzamos la analítica avanzada
\ No newline at end of file
+    ejecutar_procesamiento_capa_3() # Lanzamos la analítica avanzada
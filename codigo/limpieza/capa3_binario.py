@@ -0,0 +1,29 @@
+import os # Importamos os para gestionar las carpetas de tu ordenador
+import sys # Importamos sys para poder usar los modulos de codigo/
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")) # Carpeta codigo/ para importar comun y web
+from comun.metricas import Metricas # Instrumentacion de tiempos y contadores del pipeline
+from web.modelo_compacto import ModeloCompacto, CARPETA_BINARIO # Modelo de lectura de la web y su carpeta binaria
+
+metricas = Metricas("binario_capa3") # Metricas de esta etapa (se vuelcan al terminar)
+
+def ejecutar_binario_capa_3(): # Función principal: columnas binarias para que la web las abra con memmap
+    print("Iniciando volcado binario de actuaciones y analisis para la web...") # Mensaje de inicio
+
+    metricas.fase("construir_modelo") # Tramo: lectura de capa1, capa2 y capa3 en el modelo compacto
+    try: # Intentamos montar el modelo desde las capas procesadas
+        modelo = ModeloCompacto() # Mismo modelo que usa la web con BBALL_FUENTE=compacto
+    except FileNotFoundError as error: # Si falta algún archivo
+        print(f"Error: No se han encontrado los archivos de las capas anteriores. {error}") # Avisamos del error
+        sys.exit(1) # Frenamos el programa con error (el orquestador no da la etapa por buena)
+    metricas.contar("actuaciones", len(modelo.actuaciones)) # Filas de partido
+    metricas.contar("analisis", len(modelo.analisis)) # Filas de analisis de capa3
+
+    metricas.fase("escribir_columnas") # Tramo: una columna por archivo de ancho fijo
+    modelo.exportar_binario() # Columnas .bin, indices por jugador y equipo y esquema.json
+    print(f" -> {modelo.bytes_ocupados() / (1024 * 1024):.1f} MB en columnas binarias") # Tamaño total
+
+    print(f"Proceso completado. Archivos guardados en {CARPETA_BINARIO}") # Fin del proceso
+
+if __name__ == "__main__": # Si se ejecuta el archivo directamente
+    ejecutar_binario_capa_3() # Lanzamos el volcado binario
@@ -0,0 +1,183 @@
+import pandas as pd # Importamos la librería pandas para manejar las tablas de datos
+import numpy as np # Importamos numpy para las operaciones numéricas
+import hashlib # Importamos hashlib para comprobar si los partidos ya procesados han cambiado
+import json # Importamos json para guardar el estado entre ejecuciones
+import os # Importamos os para gestionar las carpetas de tu ordenador
+import sys # Importamos sys para leer los argumentos y usar los modulos comunes
+import time # Importamos time para medir la duración total
+from scipy.sparse import csr_matrix # Matriz dispersa: cada partido solo toca dos equipos
+from scipy.sparse.linalg import lsqr # Mínimos cuadrados sobre la matriz dispersa
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")) # Carpeta codigo/ para importar comun
+from comun.metricas import Metricas # Instrumentacion de tiempos y contadores del pipeline
+from comun.ligas import PARTICION_POR_DEFECTO # Liga de los partidos de una capa 2 anterior a las particiones
+
+metricas = Metricas("ratings_capa3") # Metricas de esta etapa (se vuelcan al terminar)
+
+# Motor de ratings sobre la tabla de partidos: Elo partido a partido en orden de fecha y SRS
+# (Simple Rating System) por temporada con mínimos cuadrados, más la fuerza del calendario (SOS).
+# Cada liga (id_liga de capa2_partidos) es un sistema aparte: su propio Elo, su regresión a la media
+# y su SRS con media cero entre sus equipos. Es incremental por liga: si los partidos ya procesados
+# de una liga no han cambiado, solo se procesan sus jornadas nuevas.
+#
+#   python codigo/limpieza/capa3_ratings.py [--completo]
+
+ELO_INICIAL = 1500 # Rating de un equipo que aparece por primera vez
+K_ELO = 20 # Cuánto se mueve el rating en cada partido
+VENTAJA_LOCAL_ELO = 60 # Puntos Elo que se suman al local al calcular la probabilidad
+REGRESION_TEMPORADA = 1 / 3 # Fracción del rating que vuelve a la media al empezar cada temporada
+
+CARPETA_CAPA2 = 'datos/procesados/capa2/' # Ruta de la tabla de partidos
+CARPETA_RATINGS = 'datos/procesados/ratings/' # Ruta donde guardaremos los ratings
+RUTA_HISTORIAL = os.path.join(CARPETA_RATINGS, 'elo_historial.csv') # Serie temporal del Elo (una fila por equipo y partido)
+RUTA_TEMPORADAS = os.path.join(CARPETA_RATINGS, 'ratings_temporada.csv') # Elo final, SRS y SOS por equipo y temporada
+RUTA_ESTADO = os.path.join(CARPETA_RATINGS, 'estado_ratings.json') # Estado para la actualización incremental (uno por liga)
+COLUMNAS_PARTIDOS = ['id_partido', 'fecha', 'ano_inicio', 'id_liga', 'uri_local', 'uri_visitante', 'puntos_local', 'puntos_visitante']
+
+def huella_partidos(partidos): # Resumen de los partidos procesados para detectar cambios en jornadas antiguas
+    texto = partidos[['id_partido', 'puntos_local', 'puntos_visitante']].to_csv(index=False) # Solo importa el resultado
+    return hashlib.sha1(texto.encode('utf-8')).hexdigest() # Huella corta del bloque
+
+def multiplicador_margen(margen, diferencia_ganador): # Ajuste por margen de victoria (evita inflar a los favoritos)
+    return np.log(abs(margen) + 1) * 2.2 / (diferencia_ganador * 0.001 + 2.2) # Fórmula habitual de Elo con margen
+
+def procesar_elo(partidos, ratings, temporada_actual): # Recorre los partidos en orden y devuelve el historial
+    historial = [] # Filas de la serie temporal
+    for fila in partidos.itertuples(index=False): # Un partido tras otro (el Elo depende del orden)
+        if fila.ano_inicio != temporada_actual: # Cambio de temporada
+            for equipo in ratings: # Todos los equipos vuelven parcialmente a la media
+                ratings[equipo] += (ELO_INICIAL - ratings[equipo]) * REGRESION_TEMPORADA
+            temporada_actual = fila.ano_inicio # Recordamos la temporada en curso
+        elo_local = ratings.get(fila.uri_local, ELO_INICIAL) # Rating del local antes del partido
+        elo_visitante = ratings.get(fila.uri_visitante, ELO_INICIAL) # Rating del visitante antes del partido
+        diferencia = elo_local + VENTAJA_LOCAL_ELO - elo_visitante # Diferencia a favor del local
+        prob_local = 1 / (1 + 10 ** (-diferencia / 400)) # Probabilidad esperada de que gane el local
+        margen = fila.puntos_local - fila.puntos_visitante # Margen real del partido
+        resultado_local = 1.0 if margen > 0 else 0.0 # 1 si ganó el local
+        diferencia_ganador = diferencia if margen > 0 else -diferencia # Diferencia vista desde el ganador
+        cambio = K_ELO * multiplicador_margen(margen, diferencia_ganador) * (resultado_local - prob_local) # Puntos que cambian de manos
+        ratings[fila.uri_local] = elo_local + cambio # Nuevo rating del local
+        ratings[fila.uri_visitante] = elo_visitante - cambio # Nuevo rating del visitante
+        historial.append((fila.id_partido, fila.fecha, fila.ano_inicio, fila.id_liga, fila.uri_local, fila.uri_visitante, 1, elo_local, elo_local + cambio, prob_local, margen)) # Vista del local
+        historial.append((fila.id_partido, fila.fecha, fila.ano_inicio, fila.id_liga, fila.uri_visitante, fila.uri_local, 0, elo_visitante, elo_visitante - cambio, 1 - prob_local, -margen)) # Vista del visitante
+    columnas = ['id_partido', 'fecha', 'ano_inicio', 'id_liga', 'uri_equipo', 'uri_rival', 'local', 'elo_antes', 'elo_despues', 'prob_victoria', 'margen']
+    return pd.DataFrame(historial, columns=columnas), temporada_actual # Devolvemos la serie y la temporada en la que nos quedamos
+
+def calcular_srs(partidos_temporada): # SRS de una temporada de una liga: rating_local - rating_visitante + ventaja_local = margen
+    equipos = pd.Index(pd.unique(pd.concat([partidos_temporada['uri_local'], partidos_temporada['uri_visitante']]))) # Equipos de la temporada
+    n_partidos, n_equipos = len(partidos_temporada), len(equipos) # Tamaño del sistema
+    filas = np.repeat(np.arange(n_partidos), 3) # Cada partido ocupa tres celdas: local, visitante y ventaja de campo
+    columnas = np.column_stack([equipos.get_indexer(partidos_temporada['uri_local']),
+                                equipos.get_indexer(partidos_temporada['uri_visitante']),
+                                np.full(n_partidos, n_equipos)]).ravel() # La última columna es la ventaja de campo
+    valores = np.tile([1.0, -1.0, 1.0], n_partidos) # +1 local, -1 visitante, +1 ventaja
+    matriz = csr_matrix((valores, (filas, columnas)), shape=(n_partidos + 1, n_equipos + 1)) # Sistema disperso
+    matriz = matriz.tolil() # Formato cómodo para añadir la fila de restricción
+    matriz[n_partidos, :n_equipos] = 1.0 # Restricción: la media de los ratings es cero
+    margenes = np.append((partidos_temporada['puntos_local'] - partidos_temporada['puntos_visitante']).to_numpy(dtype=float), 0.0) # Lado derecho
+    solucion = lsqr(matriz.tocsr(), margenes)[0] # Resolución por mínimos cuadrados
+    srs = pd.Series(solucion[:n_equipos], index=equipos) # Rating de cada equipo (puntos sobre un rival medio)
+
+    # Fuerza del calendario: media del SRS de los rivales a los que se enfrentó cada equipo
+    rivales = pd.concat([pd.DataFrame({'uri_equipo': partidos_temporada['uri_local'], 'rival': partidos_temporada['uri_visitante']}),
+                         pd.DataFrame({'uri_equipo': partidos_temporada['uri_visitante'], 'rival': partidos_temporada['uri_local']})])
+    rivales['srs_rival'] = rivales['rival'].map(srs) # Rating del rival en cada partido
+    sos = rivales.groupby('uri_equipo')['srs_rival'].mean() # Media por equipo
+    return pd.DataFrame({'srs': srs, 'sos': sos}).rename_axis('uri_equipo').reset_index(), solucion[n_equipos] # Ratings y ventaja de campo de la temporada
+
+def ejecutar_ratings(completo=False): # Función principal del motor de ratings
+    inicio = time.perf_counter() # Cronómetro de la etapa
+    print("Iniciando motor de ratings: Elo, SRS y fuerza del calendario...") # Mensaje de inicio
+    os.makedirs(CARPETA_RATINGS, exist_ok=True) # Creamos la carpeta si no existe
+
+    metricas.fase("leer_csv") # Tramo: lectura de los partidos
+    try: # Intentamos cargar la tabla de partidos
+        partidos = pd.read_csv(os.path.join(CARPETA_CAPA2, 'capa2_partidos.csv'), usecols=lambda columna: columna in COLUMNAS_PARTIDOS)
+    except FileNotFoundError as error: # Si falta el archivo
+        print(f"Error: No se ha encontrado la tabla de partidos. {error}") # Avisamos del error
+        sys.exit(1) # Frenamos el programa con error (el orquestador no da la etapa por buena)
+    if 'id_liga' not in partidos.columns: # Capa 2 generada antes de las particiones por liga
+        partidos['id_liga'] = PARTICION_POR_DEFECTO[0] # Todo es de la liga por defecto
+    partidos = partidos.sort_values(['fecha', 'id_partido'], kind='stable').reset_index(drop=True) # Orden cronológico único
+    ligas = sorted(int(id_liga) for id_liga in partidos['id_liga'].unique()) # Cada liga es un sistema de ratings aparte
+
+    # --- ¿ACTUALIZACIÓN INCREMENTAL? ---
+    metricas.fase("elo") # Tramo: Elo partido a partido
+    estado_anterior = {} # Estado de la ejecución anterior, por liga
+    if not completo and os.path.exists(RUTA_ESTADO) and os.path.exists(RUTA_HISTORIAL): # Solo si hay algo previo
+        with open(RUTA_ESTADO, encoding='utf-8') as archivo:
+            estado_anterior = json.load(archivo).get('ligas', {}) # Un estado sin ligas (versión anterior) no sirve: se recalcula todo
+
+    nuevo_estado, historiales_nuevos, completas, temporadas_afectadas = {}, [], [], [] # Resultados de esta ejecución
+    for id_liga in ligas: # Recorremos las ligas por separado
+        partidos_liga = partidos[partidos['id_liga'] == id_liga].reset_index(drop=True) # Partidos de la liga en orden
+        estado = estado_anterior.get(str(id_liga)) # Estado de la liga, si lo hay
+        if estado is not None:
+            procesados = estado['partidos_procesados'] # Número de partidos ya incluidos
+            if procesados > len(partidos_liga) or huella_partidos(partidos_liga.iloc[:procesados]) != estado['huella']: # Algún partido antiguo cambió
+                print(f" -> Liga {id_liga}: los partidos ya procesados han cambiado, se recalcula entera.") # Avisamos
+                estado = None # Recalculamos la liga desde cero
+
+        if estado is None: # Cálculo completo de la liga
+            nuevos = partidos_liga # Todos sus partidos
+            ratings, temporada_actual = {}, None # Sin ratings previos
+            completas.append(id_liga) # Su historial anterior se descarta
+        else: # Solo las jornadas nuevas
+            nuevos = partidos_liga.iloc[estado['partidos_procesados']:] # Partidos posteriores al último procesado
+            ratings, temporada_actual = estado['elo'], estado['temporada'] # Continuamos donde lo dejamos
+        print(f" -> Liga {id_liga}: {len(nuevos)} partidos nuevos de {len(partidos_liga)} ({'completo' if estado is None else 'incremental'})") # Resumen
+        metricas.contar(f"partidos_nuevos_{id_liga}", len(nuevos)) # Partidos procesados en esta ejecución
+
+        historial_nuevo, temporada_actual = procesar_elo(nuevos, ratings, temporada_actual) # Elo de los partidos nuevos
+        historiales_nuevos.append(historial_nuevo) # Se escribe al final, junto con el de las demás ligas
+        temporadas_afectadas += [(id_liga, temporada) for temporada in sorted(nuevos['ano_inicio'].unique())] # Temporadas que hay que recalcular
+        nuevo_estado[str(id_liga)] = {'partidos_procesados': len(partidos_liga), 'huella': huella_partidos(partidos_liga),
+                                      'temporada': None if temporada_actual is None else int(temporada_actual),
+                                      'elo': {equipo: round(valor, 4) for equipo, valor in ratings.items()}} # Ratings actuales de la liga
+
+    historial_nuevo = pd.concat(historiales_nuevos, ignore_index=True) if historiales_nuevos else procesar_elo(partidos, {}, None)[0] # Filas nuevas de todas las ligas
+    continuan = [id_liga for id_liga in ligas if id_liga not in completas] # Ligas cuyos resultados anteriores siguen valiendo
+    reescribir = bool(completas) or set(estado_anterior) != set(nuevo_estado) # Alguna liga se rehace o desaparece
+    if reescribir: # Se reescribe la serie con las ligas que continúan más las filas nuevas
+        historial_anterior = pd.read_csv(RUTA_HISTORIAL) if estado_anterior else historial_nuevo.iloc[:0] # Serie de la ejecución anterior
+        historial_anterior = historial_anterior[historial_anterior['id_liga'].isin(continuan)] # Solo las ligas que continúan
+        historial = pd.concat([historial_anterior, historial_nuevo], ignore_index=True) # Serie completa
+        historial.round(2).to_csv(RUTA_HISTORIAL, index=False)
+    else: # Todas incrementales: se añaden las filas al final
+        if len(historial_nuevo):
+            historial_nuevo.round(2).to_csv(RUTA_HISTORIAL, mode='a', header=False, index=False)
+        historial = pd.read_csv(RUTA_HISTORIAL) # Serie completa (para el Elo final de cada temporada)
+
+    # --- SRS Y SOS POR LIGA Y TEMPORADA (solo las temporadas con partidos nuevos) ---
+    metricas.fase("srs") # Tramo: mínimos cuadrados por liga y temporada
+    anteriores = pd.read_csv(RUTA_TEMPORADAS) if estado_anterior and os.path.exists(RUTA_TEMPORADAS) else None # Ratings que no cambian
+    tablas = [] # Resultados de cada temporada recalculada
+    for id_liga, temporada in temporadas_afectadas: # Recorremos las temporadas afectadas de cada liga
+        partidos_temporada = partidos[(partidos['id_liga'] == id_liga) & (partidos['ano_inicio'] == temporada)] # Partidos de esa liga y temporada
+        tabla, ventaja = calcular_srs(partidos_temporada) # SRS y SOS (media cero entre los equipos de la liga)
+        tabla['id_liga'] = id_liga # Liga
+        tabla['ano_inicio'] = temporada # Año de la temporada
+        tabla['ventaja_local_temporada'] = ventaja # Ventaja de campo estimada en puntos
+        historial_temporada = historial[(historial['id_liga'] == id_liga) & (historial['ano_inicio'] == temporada)] # Elo de esa temporada
+        resumen = historial_temporada.groupby('uri_equipo').agg(elo_final=('elo_despues', 'last'), elo_maximo=('elo_despues', 'max'),
+                                                                partidos=('margen', 'count'), margen_promedio=('margen', 'mean')) # Último Elo y margen medio
+        tablas.append(tabla.merge(resumen.reset_index(), on='uri_equipo', how='left')) # Unimos ambos ratings
+    if tablas or reescribir: # Solo si hubo temporadas que recalcular o cambió el conjunto de ligas
+        recalculadas = pd.concat(tablas, ignore_index=True) if tablas else None # Nuevas filas
+        if anteriores is not None: # Conservamos las temporadas sin cambios de las ligas que continúan
+            conservar = [id_liga in continuan and (id_liga, ano) not in temporadas_afectadas
+                         for id_liga, ano in zip(anteriores['id_liga'], anteriores['ano_inicio'])]
+            recalculadas = pd.concat([anteriores[conservar], recalculadas], ignore_index=True)
+        columnas = ['uri_equipo', 'id_liga', 'ano_inicio', 'partidos', 'elo_final', 'elo_maximo', 'srs', 'sos', 'margen_promedio', 'ventaja_local_temporada']
+        recalculadas = recalculadas[columnas].sort_values(['id_liga', 'ano_inicio', 'srs'], ascending=[True, True, False]) # Orden de lectura cómodo
+        recalculadas.round(2).to_csv(RUTA_TEMPORADAS, index=False) # Guardamos
+        metricas.contar("temporadas_recalculadas", len(temporadas_afectadas)) # Temporadas rehechas
+
+    # --- ESTADO PARA LA PRÓXIMA EJECUCIÓN ---
+    with open(RUTA_ESTADO, 'w', encoding='utf-8') as archivo:
+        json.dump({'ligas': nuevo_estado}, archivo, indent=1) # Guardamos el estado de cada liga
+
+    print(f"Proceso completado en {time.perf_counter() - inicio:.3f} s. Ratings guardados en {CARPETA_RATINGS}") # Fin del proceso
+
+if __name__ == "__main__": # Si se ejecuta el archivo directamente
+    ejecutar_ratings(completo="--completo" in sys.argv) # Lanzamos el motor de ratings
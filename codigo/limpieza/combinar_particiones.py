@@ -0,0 +1,103 @@
+import os
+import shutil
+import sys
+import pandas as pd
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from comun.metricas import Metricas
+from comun.ligas import PARTICION_POR_DEFECTO, clave_particion, interpretar_particiones, rutas_liga, rutas_particion
+
+# Junta la capa1 de cada liga y la capa2 de cada particion (liga, fase) en las carpetas de siempre
+# (datos/procesados/capa1 y capa2), que son las que leen capa3, la carga RDF y la web.
+#   python combinar_particiones.py [--particiones 194:regular,194:playoffs] [--capas capa1,capa2]
+# Sin --particiones se usa BBALL_PARTICIONES o la particion por defecto. Con una sola liga o
+# particion los CSV se copian tal cual. --capas limita la combinacion a esas capas (el orquestador
+# combina capa1 en cuanto estan las ligas, sin esperar a la limpieza de capa2).
+
+CARPETA_CAPA1 = os.path.join("datos", "procesados", "capa1")
+CARPETA_CAPA2 = os.path.join("datos", "procesados", "capa2")
+
+# Archivo -> (columnas que identifican una fila, orden de salida); el mismo orden que escribe capa1.py
+ARCHIVOS_CAPA1 = {
+    "capa1_equipos.csv": (["uri_equipo"], ["nombre_equipo"]),
+    "capa1_equipos_temporada.csv": (["uri_equipo", "ano_inicio", "id_liga"], ["ano_inicio", "nombre_equipo"]),
+    "capa1_jugadores.csv": (["url_jugador"], ["nombre_jugador"]),
+    "capa1_plantillas.csv": (["url_jugador", "uri_equipo", "anio_inicio"], ["anio_inicio", "uri_equipo", "url_jugador"]),
+}
+# En capa2 se respeta el orden de cada particion (cronologico dentro de cada una)
+ARCHIVOS_CAPA2 = {
+    "capa2_partidos.csv": ["id_partido"],
+    "capa2_estadisticas_detalladas.csv": ["id_partido", "url_jugador"],
+}
+
+FILAS_POR_BLOQUE = 200_000
+
+def argumento(nombre, por_defecto=None):
+    if nombre in sys.argv:
+        return sys.argv[sys.argv.index(nombre) + 1]
+    return por_defecto
+
+
+# Con --capas cada combinacion es una etapa del orquestador con sus propias metricas
+metricas = Metricas("combinar_" + argumento("--capas", "particiones").replace(",", "_"))
+
+
+def combinar(origenes, destino, claves, orden=None):
+    """Concatena los CSV de origen sin filas repetidas (la primera particion manda) y escribe el destino."""
+    if len(origenes) == 1:
+        shutil.copyfile(origenes[0], destino)
+        with open(destino, encoding="utf-8") as archivo:
+            return sum(1 for _ in archivo) - 1
+    if orden:
+        tabla = pd.concat([pd.read_csv(origen) for origen in origenes], ignore_index=True)
+        tabla = tabla.drop_duplicates(subset=claves, keep="first").sort_values(by=orden, kind="stable")
+        tabla.to_csv(destino, index=False)
+        return len(tabla)
+    # Sin orden (capa2) se escribe por bloques: en memoria solo quedan las claves ya vistas
+    vistas, columnas, filas = set(), None, 0
+    with open(destino + ".tmp", "w", encoding="utf-8", newline="") as archivo:
+        for origen in origenes:
+            for bloque in pd.read_csv(origen, chunksize=FILAS_POR_BLOQUE, float_precision="round_trip"):
+                if columnas is None:
+                    columnas = list(bloque.columns)
+                    bloque.iloc[:0].to_csv(archivo, index=False)
+                claves_bloque = list(bloque[claves].itertuples(index=False, name=None))
+                nuevas = [clave not in vistas for clave in claves_bloque]
+                vistas.update(claves_bloque)
+                bloque = bloque[nuevas].drop_duplicates(subset=claves, keep="first")
+                bloque.reindex(columns=columnas).to_csv(archivo, header=False, index=False)
+                filas += len(bloque)
+    os.replace(destino + ".tmp", destino)
+    return filas
+
+
+def combinar_particiones():
+    texto = argumento("--particiones", os.environ.get("BBALL_PARTICIONES", ":".join(map(str, PARTICION_POR_DEFECTO))))
+    particiones = interpretar_particiones(texto)
+    ligas = list(dict.fromkeys(id_liga for id_liga, _ in particiones))
+    capas = set(argumento("--capas", "capa1,capa2").split(","))
+    print(f"Combinando {len(particiones)} particiones: {', '.join(clave_particion(*p) for p in particiones)}")
+
+    if "capa1" in capas:
+        metricas.fase("capa1")
+        os.makedirs(CARPETA_CAPA1, exist_ok=True)
+        for archivo, (claves, orden) in ARCHIVOS_CAPA1.items():
+            origenes = [os.path.join(rutas_liga(id_liga)["capa1"], archivo) for id_liga in ligas]
+            filas = combinar(origenes, os.path.join(CARPETA_CAPA1, archivo), claves, orden)
+            metricas.contar(f"filas_{archivo[:-4]}", filas)
+            print(f"   {archivo}: {filas} filas")
+
+    if "capa2" in capas:
+        metricas.fase("capa2")
+        os.makedirs(CARPETA_CAPA2, exist_ok=True)
+        for archivo, claves in ARCHIVOS_CAPA2.items():
+            origenes = [os.path.join(rutas_particion(*particion)["capa2"], archivo) for particion in particiones]
+            filas = combinar(origenes, os.path.join(CARPETA_CAPA2, archivo), claves)
+            metricas.contar(f"filas_{archivo[:-4]}", filas)
+            print(f"   {archivo}: {filas} filas")
+
+    print(f"Particiones combinadas en datos/procesados/{' y '.join(sorted(capas))}.")
+
+
+if __name__ == "__main__":
+    combinar_particiones()
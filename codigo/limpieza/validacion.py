@@ -0,0 +1,244 @@
+import pandas as pd # Importamos la librería pandas para manejar las tablas de datos
+import numpy as np # Importamos numpy para las comparaciones vectorizadas
+import json # Importamos json para leer los umbrales y escribir el informe
+import os # Importamos os para gestionar las carpetas de tu ordenador
+import sys # Importamos sys para leer los argumentos, usar los modulos comunes y devolver el código de salida
+import time # Importamos time para medir la duración total
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")) # Carpeta codigo/ para importar comun
+from comun.metricas import Metricas # Instrumentacion de tiempos y contadores del pipeline
+
+CAPAS = ('capa1', 'capa2', 'capa3') # Cada capa tiene su propio informe
+CAPA = sys.argv[sys.argv.index('--capa') + 1] if '--capa' in sys.argv else None # Capa pedida (sin --capa, todas)
+metricas = Metricas(f"validacion_{CAPA}" if CAPA else "validacion") # Metricas de esta etapa (se vuelcan al terminar)
+
+# Control de calidad entre capas: reglas vectorizadas (una máscara de pandas por regla, sin recorrer filas)
+# sobre las tablas de capa1, capa2 y capa3. Cada regla cuenta las filas que la incumplen y se compara con su
+# umbral (proporción máxima de filas de la tabla, 0 si no se configura). Si alguna lo supera, o no se puede
+# evaluar porque falta su tabla o una columna, el script termina con código 1 y el orquestador no carga el grafo.
+# Las reglas de cada capa (la de su tabla) escriben su propio informe: la carga RDF de una capa solo espera a
+# la validación de esa capa, no a que termine la limpieza de las siguientes.
+#
+#   python codigo/limpieza/validacion.py [--capa capa1|capa2|capa3] [--umbrales ruta.json]
+
+ruta_script = os.path.dirname(os.path.abspath(__file__)) # Carpeta de este script
+RUTA_UMBRALES = os.path.join(ruta_script, 'umbrales_validacion.json') # Umbrales por defecto (junto al script)
+CARPETA_INFORMES = 'datos/procesados/validacion' # Informes de la última validación de cada capa
+
+# Tabla -> archivo y columnas que identifican cada fila (para los ejemplos del informe)
+TABLAS = {
+    'capa1_jugadores': ('datos/procesados/capa1/capa1_jugadores.csv', ['url_jugador']),
+    'capa1_equipos': ('datos/procesados/capa1/capa1_equipos.csv', ['uri_equipo']),
+    'capa1_equipos_temporada': ('datos/procesados/capa1/capa1_equipos_temporada.csv', ['uri_equipo', 'ano_inicio']),
+    'capa1_plantillas': ('datos/procesados/capa1/capa1_plantillas.csv', ['url_jugador', 'uri_equipo', 'anio_inicio']),
+    'capa2_partidos': ('datos/procesados/capa2/capa2_partidos.csv', ['id_partido']),
+    'capa2_actuaciones': ('datos/procesados/capa2/capa2_estadisticas_detalladas.csv', ['id_partido', 'url_jugador']),
+    'capa3_jugadores': ('datos/procesados/capa3/capa3_jugadores_avanzado.csv', ['url_jugador', 'uri_equipo', 'id_liga', 'ano_inicio']),
+    'capa3_equipos': ('datos/procesados/capa3/capa3_equipos_avanzado.csv', ['uri_equipo', 'id_liga', 'ano_inicio']),
+    'capa3_carrera': ('datos/procesados/capa3/capa3_jugadores_carrera.csv', ['url_jugador']),
+}
+
+# Tablas que leen las reglas de cada capa: las suyas y las de la capa anterior a las que hacen referencia
+TABLAS_POR_CAPA = {
+    'capa1': ['capa1_jugadores', 'capa1_equipos', 'capa1_equipos_temporada', 'capa1_plantillas'],
+    'capa2': ['capa1_jugadores', 'capa2_partidos', 'capa2_actuaciones'],
+    'capa3': ['capa2_actuaciones', 'capa3_jugadores', 'capa3_equipos', 'capa3_carrera'],
+}
+
+def ruta_informe(capa): # Informe de validación de una capa
+    return os.path.join(CARPETA_INFORMES, f'informe_validacion_{capa}.json')
+
+TOLERANCIA_COBERTURA = 0.10 # Diferencia máxima entre los puntos de los jugadores y el marcador oficial (10 %)
+MINUTOS_MAXIMOS = 65 # Más que un partido con tres prórrogas
+EJEMPLOS = 5 # Filas de ejemplo por regla en el informe
+
+REGLAS = [] # Lista de (nombre, tabla, descripción, función) en el orden en que se declaran
+
+def regla(nombre, tabla, descripcion): # Decorador para declarar una regla sobre una tabla
+    def registrar(funcion): # La función recibe todas las tablas y devuelve una máscara booleana sobre la suya
+        REGLAS.append((nombre, tabla, descripcion, funcion)) # La guardamos en la lista
+        return funcion # Y la devolvemos sin cambios
+    return registrar # Devolvemos el decorador
+
+def minutos_decimales(columna): # "25:30" -> 25.5 y "25" -> 25.0 sin recorrer fila a fila
+    partes = columna.astype(str).str.split(':', n=1, expand=True) # Separamos minutos y segundos
+    minutos = pd.to_numeric(partes[0], errors='coerce') # Parte de los minutos
+    segundos = pd.to_numeric(partes[1], errors='coerce').fillna(0) if partes.shape[1] > 1 else 0 # Parte de los segundos (si la hay)
+    return minutos + segundos / 60 # Minutos con decimales
+
+# --- CAPA 1: MAESTROS ---
+
+@regla('jugadores_duplicados', 'capa1_jugadores', 'La misma URL de jugador aparece más de una vez')
+def _(t): return t['capa1_jugadores'].duplicated('url_jugador')
+
+@regla('equipos_duplicados', 'capa1_equipos', 'La misma URI de club aparece más de una vez')
+def _(t): return t['capa1_equipos'].duplicated('uri_equipo')
+
+@regla('equipos_temporada_duplicados', 'capa1_equipos_temporada', 'Un club aparece dos veces en la misma temporada y liga')
+def _(t): return t['capa1_equipos_temporada'].duplicated([c for c in ['uri_equipo', 'ano_inicio', 'id_liga'] if c in t['capa1_equipos_temporada']])
+
+@regla('plantillas_duplicadas', 'capa1_plantillas', 'El mismo jugador figura dos veces en la plantilla de un equipo y temporada')
+def _(t): return t['capa1_plantillas'].duplicated(['url_jugador', 'uri_equipo', 'anio_inicio'])
+
+@regla('plantillas_jugador_desconocido', 'capa1_plantillas', 'Jugador de una plantilla que no está en el maestro de jugadores')
+def _(t): return ~t['capa1_plantillas']['url_jugador'].isin(t['capa1_jugadores']['url_jugador'])
+
+@regla('plantillas_equipo_desconocido', 'capa1_plantillas', 'Equipo de una plantilla que no está en el maestro de equipos')
+def _(t): return ~t['capa1_plantillas']['uri_equipo'].isin(t['capa1_equipos']['uri_equipo'])
+
+# --- CAPA 2: PARTIDOS ---
+
+@regla('partidos_duplicados', 'capa2_partidos', 'El mismo ID de partido aparece más de una vez')
+def _(t): return t['capa2_partidos'].duplicated('id_partido')
+
+@regla('partido_contra_si_mismo', 'capa2_partidos', 'El equipo local y el visitante son el mismo')
+def _(t): return t['capa2_partidos']['uri_local'] == t['capa2_partidos']['uri_visitante']
+
+@regla('marcador_imposible', 'capa2_partidos', 'Empate o marcador sin puntos (en baloncesto no hay empates)')
+def _(t):
+    partidos = t['capa2_partidos'] # Tabla de partidos
+    return (partidos['puntos_local'] == partidos['puntos_visitante']) | (partidos['puntos_local'] <= 0) | (partidos['puntos_visitante'] <= 0)
+
+@regla('cobertura_ambos_equipos', 'capa2_partidos', f'Los puntos de los jugadores se alejan más de un {TOLERANCIA_COBERTURA:.0%} del marcador en los dos equipos')
+def _(t):
+    partidos = t['capa2_partidos'] # Tabla de partidos
+    fuera_local = (partidos['cobertura_local'].fillna(0) - 1).abs() > TOLERANCIA_COBERTURA # Local fuera de tolerancia (sin jugadores cuenta como fuera)
+    fuera_visitante = (partidos['cobertura_visitante'].fillna(0) - 1).abs() > TOLERANCIA_COBERTURA # Visitante fuera de tolerancia
+    return fuera_local & fuera_visitante
+
+@regla('partido_pocos_jugadores', 'capa2_partidos', 'Partido con menos de 5 actuaciones registradas')
+def _(t):
+    jugadores_por_partido = t['capa2_actuaciones']['id_partido'].value_counts() # Actuaciones de cada partido
+    return t['capa2_partidos']['id_partido'].map(jugadores_por_partido).fillna(0) < 5
+
+# --- CAPA 2: ACTUACIONES ---
+
+@regla('actuaciones_duplicadas', 'capa2_actuaciones', 'El mismo jugador aparece dos veces en un partido')
+def _(t): return t['capa2_actuaciones'].duplicated(['id_partido', 'url_jugador'])
+
+@regla('tiros_imposibles', 'capa2_actuaciones', 'Más tiros anotados que intentados (de 1, 2 o 3)')
+def _(t):
+    actuaciones = t['capa2_actuaciones'] # Tabla de actuaciones
+    return np.logical_or.reduce([actuaciones[f't{n}_metidos'] > actuaciones[f't{n}_intentados'] for n in (1, 2, 3)])
+
+@regla('minutos_fuera_de_rango', 'capa2_actuaciones', f'Minutos negativos, ilegibles o por encima de {MINUTOS_MAXIMOS}')
+def _(t):
+    minutos = minutos_decimales(t['capa2_actuaciones']['minutos']) # Minutos con decimales
+    return minutos.isna() | (minutos < 0) | (minutos > MINUTOS_MAXIMOS)
+
+@regla('estadisticas_negativas', 'capa2_actuaciones', 'Puntos, rebotes, asistencias, robos, tapones, pérdidas, faltas o tiros negativos')
+def _(t):
+    columnas = ['puntos', 'rebotes_ofensivos', 'rebotes_defensivos', 'rebotes_totales', 'asistencias', 'robos', 'tapones', 'perdidas',
+                'faltas_cometidas', 'faltas_recibidas', 't1_intentados', 't2_intentados', 't3_intentados'] # Ninguna puede ser negativa
+    return (t['capa2_actuaciones'][columnas] < 0).any(axis=1)
+
+@regla('puntos_no_cuadran', 'capa2_actuaciones', 'Los puntos no son 2 x T2 + 3 x T3 + T1')
+def _(t):
+    actuaciones = t['capa2_actuaciones'] # Tabla de actuaciones
+    return actuaciones['puntos'] != 2 * actuaciones['t2_metidos'] + 3 * actuaciones['t3_metidos'] + actuaciones['t1_metidos']
+
+@regla('rebotes_no_cuadran', 'capa2_actuaciones', 'Rebotes ofensivos + defensivos distintos de los totales')
+def _(t):
+    actuaciones = t['capa2_actuaciones'] # Tabla de actuaciones
+    return actuaciones['rebotes_ofensivos'] + actuaciones['rebotes_defensivos'] != actuaciones['rebotes_totales']
+
+@regla('actuacion_jugador_desconocido', 'capa2_actuaciones', 'Jugador que no está en el maestro de capa 1')
+def _(t): return ~t['capa2_actuaciones']['url_jugador'].isin(t['capa1_jugadores']['url_jugador'])
+
+@regla('actuacion_sin_partido', 'capa2_actuaciones', 'Actuación de un partido que no está en la tabla de partidos')
+def _(t): return ~t['capa2_actuaciones']['id_partido'].isin(t['capa2_partidos']['id_partido'])
+
+@regla('actuacion_equipo_ajeno', 'capa2_actuaciones', 'El equipo del jugador no es ni el local ni el visitante del partido')
+def _(t):
+    partidos = t['capa2_partidos'].drop_duplicates('id_partido').set_index('id_partido') # Partido -> equipos
+    actuaciones = t['capa2_actuaciones'] # Tabla de actuaciones
+    local = actuaciones['id_partido'].map(partidos['uri_local']) # Local del partido de cada actuación
+    visitante = actuaciones['id_partido'].map(partidos['uri_visitante']) # Visitante del partido de cada actuación
+    return local.notna() & (actuaciones['uri_equipo'] != local) & (actuaciones['uri_equipo'] != visitante)
+
+# --- CAPA 3: AGREGADOS ---
+
+@regla('porcentajes_fuera_de_rango', 'capa3_jugadores', 'TS% o eFG% negativos o por encima de 150')
+def _(t):
+    jugadores = t['capa3_jugadores'] # Tabla de jugadores por equipo y temporada
+    porcentajes = jugadores[['ts_porcentaje', 'efg_porcentaje']] # Sin tiros quedan vacíos, y eso no es un error
+    return ((porcentajes < 0) | (porcentajes > 150)).any(axis=1)
+
+@regla('victorias_imposibles', 'capa3_equipos', 'Más victorias que partidos o porcentaje de victorias fuera de 0-100')
+def _(t):
+    equipos = t['capa3_equipos'] # Tabla de equipos por liga y temporada
+    return (equipos['victorias_total'] > equipos['partidos_jugados']) | (equipos['win_rate'] < 0) | (equipos['win_rate'] > 100)
+
+@regla('carrera_no_cuadra', 'capa3_carrera', 'Partidos de carrera distintos de las actuaciones del jugador en capa 2, o temporadas invertidas')
+def _(t):
+    carrera = t['capa3_carrera'] # Tabla de carrera
+    actuaciones_por_jugador = t['capa2_actuaciones']['url_jugador'].value_counts() # Actuaciones de cada jugador
+    partidos_capa2 = carrera['url_jugador'].map(actuaciones_por_jugador).fillna(0) # Las mismas, alineadas con la carrera
+    return (carrera['partidos_jugados'] != partidos_capa2) | (carrera['primera_temporada'] > carrera['ultima_temporada'])
+
+def leer_umbrales(ruta): # Umbral (proporción máxima de filas) de cada regla
+    if not os.path.exists(ruta): return {}, 0.0 # Sin archivo, todas las reglas a cero
+    with open(ruta, encoding='utf-8') as archivo: # Abrimos el archivo de umbrales
+        configuracion = json.load(archivo) # Lo leemos
+    return configuracion.get('por_regla', {}), configuracion.get('por_defecto', 0.0) # Umbrales por regla y por defecto
+
+def validar_capa(capa, tablas, umbrales, umbral_por_defecto): # Aplica las reglas de una capa y escribe su informe
+    metricas.fase("reglas") # Tramo: evaluación de las reglas
+    resultados = {} # Resultado de cada regla
+    for nombre, tabla, descripcion, funcion in REGLAS: # Recorremos las reglas
+        if not tabla.startswith(capa): # Solo las de las tablas de esta capa
+            continue
+        umbral = umbrales.get(nombre, umbral_por_defecto) # Proporción máxima permitida
+        try: # Una tabla que falta no impide evaluar las demás reglas (pero la validación falla igualmente)
+            mascara = pd.Series(funcion(tablas), index=tablas[tabla].index) # Filas que incumplen la regla
+        except KeyError as error: # Falta la tabla o una columna
+            resultados[nombre] = {'tabla': tabla, 'descripcion': descripcion, 'estado': 'sin_datos', 'detalle': f'falta {error}'}
+            continue # Pasamos a la siguiente regla
+        violaciones = int(mascara.sum()) # Filas que la incumplen
+        proporcion = violaciones / len(mascara) if len(mascara) else 0.0 # Sobre el total de la tabla
+        claves = TABLAS[tabla][1] # Columnas que identifican la fila
+        resultados[nombre] = {
+            'tabla': tabla, 'descripcion': descripcion, 'filas': len(mascara), 'violaciones': violaciones,
+            'proporcion': round(proporcion, 6), 'umbral': umbral, 'estado': 'fallo' if proporcion > umbral else 'ok',
+            'ejemplos': tablas[tabla].loc[mascara, claves].head(EJEMPLOS).astype(str).to_dict('records'), # Primeras filas afectadas
+        }
+        metricas.contar(f"violaciones_{nombre}", violaciones) # Lo dejamos también en las metricas
+
+    fallidas = [nombre for nombre, resultado in resultados.items() if resultado['estado'] != 'ok'] # Reglas por encima del umbral o sin datos (tabla o columna ausente)
+    # Sin fecha ni duración: con los mismos datos el informe sale idéntico y el orquestador no repite las cargas RDF
+    informe = {'filas': {nombre: len(tablas[nombre]) for nombre in TABLAS_POR_CAPA[capa] if nombre in tablas},
+               'fallidas': fallidas, 'reglas': resultados}
+
+    metricas.fase("escribir_informe") # Tramo: escritura del informe
+    os.makedirs(CARPETA_INFORMES, exist_ok=True) # Creamos la carpeta si no existe
+    with open(ruta_informe(capa), 'w', encoding='utf-8') as archivo: # Guardamos el informe completo
+        json.dump(informe, archivo, indent=2, ensure_ascii=False)
+
+    print(f"{'regla':<32}{'tabla':<26}{'violaciones':>12}{'umbral':>10}  estado") # Resumen compacto por pantalla
+    for nombre, resultado in resultados.items(): # Una línea por regla
+        print(f"{nombre:<32}{resultado['tabla']:<26}{resultado.get('violaciones', '-'):>12}{resultado.get('umbral', '-'):>10}  {resultado['estado']}")
+    print(f"{capa}: {len(resultados)} reglas, {len(fallidas)} fallidas (por encima del umbral o sin datos). Informe en {ruta_informe(capa)}")
+    return fallidas # Reglas que hacen fallar la validación
+
+def validar(): # Lee las tablas de las capas pedidas, aplica sus reglas y escribe un informe por capa
+    inicio = time.perf_counter() # Empezamos a medir
+    if CAPA is not None and CAPA not in CAPAS: # Capa mal escrita
+        print(f"Capa desconocida '{CAPA}'. Opciones: {', '.join(CAPAS)}")
+        sys.exit(2)
+    capas = [CAPA] if CAPA else list(CAPAS) # Capas a validar
+    ruta_umbrales = sys.argv[sys.argv.index('--umbrales') + 1] if '--umbrales' in sys.argv else RUTA_UMBRALES # Umbrales elegidos
+    umbrales, umbral_por_defecto = leer_umbrales(ruta_umbrales) # Los cargamos
+
+    metricas.fase("leer_csv") # Tramo: lectura de las tablas
+    necesarias = dict.fromkeys(nombre for capa in capas for nombre in TABLAS_POR_CAPA[capa]) # Solo las que usan sus reglas
+    tablas = {nombre: pd.read_csv(TABLAS[nombre][0]) for nombre in necesarias if os.path.exists(TABLAS[nombre][0])} # Solo las que existen
+
+    fallidas = [] # Reglas fallidas de todas las capas validadas
+    for capa in capas: # Un informe por capa
+        fallidas += validar_capa(capa, tablas, umbrales, umbral_por_defecto)
+    print(f"Validación en {time.perf_counter() - inicio:.3f} s: {len(fallidas)} reglas fallidas")
+    if fallidas: # Si alguna regla supera su umbral o no se ha podido evaluar, el build falla
+        sys.exit(1)
+
+if __name__ == "__main__": # Si se ejecuta el archivo directamente
+    validar() # Lanzamos la validación
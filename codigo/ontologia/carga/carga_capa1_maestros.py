@@ -3,6 +3,8 @@ from rdflib import Graph, Literal, RDF, URIRef, Namespace
 from rdflib.namespace import XSD
 import re
 import os
+import sys
+from delta_grafo import modo_delta_activado, registrar_delta, lineas_de_grafo
 
 # 1. Configuración de Namespaces (ESTRICTO SEGÚN TU .TTL)
 FEB = Namespace("http://www.tfg-basket.es/ontologia/primera-feb#")
@@ -16,6 +18,10 @@ base_datos = os.path.join(root_dir, "datos", "procesados", "capa1")
 ruta_grafo = os.path.join(root_dir, "datos", "grafo")
 ruta_salida = os.path.join(ruta_grafo, "capa1_maestros.ttl")
 
+sys.path.append(os.path.join(root_dir, "codigo"))
+from comun.metricas import Metricas
+metricas = Metricas("carga_capa1")
+
 g = Graph()
 g.bind("feb", FEB)
 g.bind("res", RES)
@@ -30,7 +36,9 @@ print(f"--- Iniciando carga de Capa 1: Sincronizada con Ontología ---")
 try:
     # --- A. JUGADORES (schema:Person) ---
     print("Procesando jugadores...")
+    metricas.fase("jugadores")
     df_jug = pd.read_csv(os.path.join(base_datos, 'capa1_jugadores.csv'))
+    metricas.contar("filas_jugadores", len(df_jug))
     for _, row in df_jug.iterrows():
         p_id = extraer_id(row['url_jugador'])
         uri_person = RES[f"person/{p_id}"]
@@ -40,7 +48,9 @@ try:
 
     # --- B. CLUBES (schema:SportsOrganization) ---
     print("Procesando clubes...")
+    metricas.fase("clubes")
     df_eq = pd.read_csv(os.path.join(base_datos, 'capa1_equipos.csv'))
+    metricas.contar("filas_clubes", len(df_eq))
     for _, row in df_eq.iterrows():
         c_id = extraer_id(row['uri_equipo'])
         uri_club = RES[f"club/{c_id}"]
@@ -50,7 +60,9 @@ try:
 
     # --- C. LIGAS, TEMPORADAS Y EQUIPOS-TEMPORADA (feb:...) ---
     print("Procesando ligas y temporadas...")
+    metricas.fase("equipos_temporada")
     df_et = pd.read_csv(os.path.join(base_datos, 'capa1_equipos_temporada.csv'))
+    metricas.contar("filas_equipos_temporada", len(df_et))
     for _, row in df_et.iterrows():
         c_id = extraer_id(row['uri_equipo'])
         year, liga_id = str(row['ano_inicio']), str(row['id_liga'])
@@ -75,7 +87,9 @@ try:
 
     # --- D. PLANTILLAS (feb:RosterItem) ---
     print("Procesando plantillas...")
+    metricas.fase("plantillas")
     df_pl = pd.read_csv(os.path.join(base_datos, 'capa1_plantillas.csv'))
+    metricas.contar("filas_plantillas", len(df_pl))
     for _, row in df_pl.iterrows():
         p_id = extraer_id(row['url_jugador'])
         c_id = extraer_id(row['uri_equipo'])
@@ -89,9 +103,14 @@ try:
         g.add((uri_roster, FEB.rosterInTeam, RES[f"team-season/{c_id}_{year}"]))
 
     # --- 3. GUARDADO ---
+    metricas.contar("tripletas", len(g))
     os.makedirs(ruta_grafo, exist_ok=True)
+    if modo_delta_activado():
+        registrar_delta(lineas_de_grafo(g), ruta_salida)
+    metricas.fase("serializar")
     g.serialize(destination=ruta_salida, format="turtle")
     print(f"--- ÉXITO: {len(g)} tripletas guardadas en {ruta_salida} ---")
 
 except Exception as e:
-    print(f"Error en Capa 1: {e}")
\ No newline at end of file
+    print(f"Error en Capa 1: {e}")
+    sys.exit(1)
@@ -3,6 +3,8 @@ from rdflib import Graph, Literal, RDF, Namespace
 from rdflib.namespace import XSD
 import re
 import os
+import sys
+from delta_grafo import modo_delta_activado, registrar_delta, lineas_de_grafo
 
 # 1. Configuración de Namespaces (SEGÚN TU .TTL)
 FEB = Namespace("http://www.tfg-basket.es/ontologia/primera-feb#")
@@ -16,6 +18,10 @@ dir_capa2 = os.path.join(root_dir, "datos", "procesados", "capa2")
 ruta_grafo = os.path.join(root_dir, "datos", "grafo")
 ruta_salida = os.path.join(ruta_grafo, "capa2_eventos.ttl")
 
+sys.path.append(os.path.join(root_dir, "codigo"))
+from comun.metricas import Metricas
+metricas = Metricas("carga_capa2")
+
 g = Graph()
 g.bind("feb", FEB)
 g.bind("res", RES)
@@ -30,7 +36,9 @@ print(f"--- Cargando Capa 2 siguiendo tu Ontología ---")
 try:
     # --- A. PARTIDOS (schema:SportsEvent) ---
     print("Procesando partidos...")
+    metricas.fase("partidos")
     df_partidos = pd.read_csv(os.path.join(dir_capa2, 'capa2_partidos.csv'))
+    metricas.contar("filas_partidos", len(df_partidos))
     for _, fila in df_partidos.iterrows():
         uri_partido = RES[f"match/{fila['id_partido']}"]
         
@@ -38,6 +46,9 @@ try:
         g.add((uri_partido, FEB.startDate, Literal(fila['fecha'], datatype=XSD.date)))
         g.add((uri_partido, FEB.matchday, Literal(fila['jornada'], datatype=XSD.integer)))
         g.add((uri_partido, FEB.duringSeason, RES[f"season/{fila['ano_inicio']}"]))
+        # Fase de la competicion (regular, playoffs, copa) en las capas combinadas por particion
+        if 'fase' in fila and pd.notna(fila['fase']):
+            g.add((uri_partido, FEB.competitionPhase, Literal(fila['fase'], datatype=XSD.string)))
         
         # Mapeo de equipos según tu ontología
         id_local = extraer_id(fila['uri_local'])
@@ -47,7 +58,9 @@ try:
 
     # --- B. ACTUACIONES (feb:MatchPerformance) ---
     print("Procesando estadísticas detalladas...")
+    metricas.fase("actuaciones")
     df_stats = pd.read_csv(os.path.join(dir_capa2, 'capa2_estadisticas_detalladas.csv'))
+    metricas.contar("filas_actuaciones", len(df_stats))
     
     for _, fila in df_stats.iterrows():
         p_id = extraer_id(fila['url_jugador'])
@@ -88,9 +101,14 @@ try:
                 g.add((uri_perf, predicado, Literal(fila[col], datatype=tipo)))
 
     # --- 4. GUARDADO ---
+    metricas.contar("tripletas", len(g))
     os.makedirs(ruta_grafo, exist_ok=True)
+    if modo_delta_activado():
+        registrar_delta(lineas_de_grafo(g), ruta_salida)
+    metricas.fase("serializar")
     g.serialize(destination=ruta_salida, format="turtle")
     print(f"--- ÉXITO: {len(g)} tripletas guardadas en {ruta_salida} ---")
 
 except Exception as e:
-    print(f"Error: {e}")
\ No newline at end of file
+    print(f"Error: {e}")
+    sys.exit(1)
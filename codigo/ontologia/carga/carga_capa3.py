@@ -3,6 +3,8 @@ from rdflib import Graph, Literal, RDF, Namespace
 from rdflib.namespace import XSD
 import re
 import os
+import sys
+from delta_grafo import modo_delta_activado, registrar_delta, lineas_de_grafo
 
 # 1. Configuración de Namespaces (SEGÚN TU .TTL)
 FEB = Namespace("http://www.tfg-basket.es/ontologia/primera-feb#")
@@ -16,6 +18,11 @@ dir_capa3 = os.path.join(root_dir, "datos", "procesados", "capa3")
 ruta_grafo = os.path.join(root_dir, "datos", "grafo")
 ruta_salida = os.path.join(ruta_grafo, "capa3_analisis.ttl")
 
+sys.path.append(os.path.join(root_dir, "codigo"))
+from comun.metricas import Metricas
+from comun.ligas import PARTICION_POR_DEFECTO
+metricas = Metricas("carga_capa3")
+
 g = Graph()
 g.bind("feb", FEB); g.bind("res", RES); g.bind("schema", SCHEMA)
 
@@ -23,12 +30,30 @@ def extraer_id(url):
     match = re.search(r'/(\d+)/?', str(url))
     return match.group(1) if match else "desconocido"
 
+# Ratings calculados con el rival: comunes al análisis de temporada y al de cada partido
+METRICAS_RIVAL = {
+    'pace_real': FEB.truePace,
+    'ortg_real': FEB.ortgAdjusted,
+    'drtg_equipo': FEB.drtgTeam,
+    'net_rating': FEB.netRating,
+    'efg_porcentaje': FEB.teamEfgPercentage,
+    'efg_porcentaje_rival': FEB.oppEfgPercentage,
+    'tov_porcentaje': FEB.tovPercentage,
+    'tov_porcentaje_rival': FEB.oppTovPercentage,
+    'orb_porcentaje': FEB.orbPercentage,
+    'orb_porcentaje_rival': FEB.oppOrbPercentage,
+    'ft_rate': FEB.ftRate,
+    'ft_rate_rival': FEB.oppFtRate
+}
+
 print(f"--- Cargando Capa 3: Inteligencia Estadística ---")
 
 try:
     # --- A. ANÁLISIS DE EQUIPOS (feb:TeamAnalysis) ---
     print("Procesando análisis avanzado de equipos...")
+    metricas.fase("analisis_equipos")
     df_eq_adv = pd.read_csv(os.path.join(dir_capa3, 'capa3_equipos_avanzado.csv'))
+    metricas.contar("filas_analisis_equipos", len(df_eq_adv))
     for _, fila in df_eq_adv.iterrows():
         c_id = extraer_id(fila['uri_equipo'])
         year = str(fila['ano_inicio'])
@@ -49,17 +74,41 @@ try:
             'reb_ratio_ofensivo': FEB.offRebRatio,
             'posesiones_totales': FEB.totalPossessions,
             'posesiones_por_partido': FEB.pace,
-            'ortg_equipo': FEB.ortgTeam
+            'ortg_equipo': FEB.ortgTeam,
+            'partidos_con_rival': FEB.gamesWithOpponent,
+            **METRICAS_RIVAL
         }
         
         for col, predicado in metricas_eq.items():
             if pd.notnull(fila[col]):
-                tipo = XSD.integer if 'total' in col else XSD.float
+                tipo = XSD.integer if 'total' in col or col == 'partidos_con_rival' else XSD.float
                 g.add((uri_analysis, predicado, Literal(fila[col], datatype=tipo)))
 
+    # --- A2. RATINGS POR PARTIDO (feb:TeamGameAnalysis) ---
+    print("Procesando ratings de equipo por partido...")
+    metricas.fase("analisis_partidos")
+    df_eq_part = pd.read_csv(os.path.join(dir_capa3, 'capa3_equipos_partidos.csv'))
+    metricas.contar("filas_analisis_partidos", len(df_eq_part))
+    metricas_partido = {'posesiones_propias': FEB.possessions, 'posesiones_rival': FEB.oppPossessions, **METRICAS_RIVAL}
+    for _, fila in df_eq_part.iterrows():
+        c_id = extraer_id(fila['uri_equipo'])
+        year = str(fila['ano_inicio'])
+
+        # El año al final de la URI reparte el análisis en el grafo de su temporada
+        uri_analysis = RES[f"team-game-analysis/{fila['id_partido']}_{c_id}_{year}"]
+        g.add((uri_analysis, RDF.type, FEB.TeamGameAnalysis))
+        g.add((RES[f"match/{fila['id_partido']}"], FEB.hasGameAnalysis, uri_analysis))
+        g.add((uri_analysis, FEB.analyzedTeam, RES[f"team-season/{c_id}_{year}"]))
+
+        for col, predicado in metricas_partido.items():
+            if pd.notnull(fila[col]):
+                g.add((uri_analysis, predicado, Literal(fila[col], datatype=XSD.float)))
+
     # --- B. ANÁLISIS DE JUGADORES (feb:PlayerAnalysis) ---
     print("Procesando análisis avanzado de jugadores...")
+    metricas.fase("analisis_jugadores")
     df_jug_adv = pd.read_csv(os.path.join(dir_capa3, 'capa3_jugadores_avanzado.csv'))
+    metricas.contar("filas_analisis_jugadores", len(df_jug_adv))
     for _, fila in df_jug_adv.iterrows():
         p_id = extraer_id(fila['url_jugador'])
         c_id = extraer_id(fila['uri_equipo'])
@@ -89,10 +138,102 @@ try:
                 tipo = XSD.integer if 'total' in col else XSD.float
                 g.add((uri_analysis, predicado, Literal(fila[col], datatype=tipo)))
 
+    # --- C. EVOLUCIÓN POR TEMPORADA (feb:PlayerSeasonAnalysis) ---
+    # Temporada completa del jugador sumando todos sus equipos, con la diferencia respecto a la anterior
+    print("Procesando evolución por temporada de los jugadores...")
+    metricas.fase("analisis_temporadas")
+    df_temp = pd.read_csv(os.path.join(dir_capa3, 'capa3_jugadores_temporadas.csv'))
+    metricas.contar("filas_analisis_temporadas", len(df_temp))
+    metricas_temp = {
+        'partidos_jugados': FEB.gamesPlayed,
+        'equipos_temporada': FEB.teamsPlayed,
+        'minutos_total': FEB.totalMinutes,
+        'puntos_total': FEB.totalPoints,
+        'puntos_promedio': FEB.avgPoints,
+        'valoracion_promedio': FEB.avgEfficiency,
+        'minutos_promedio': FEB.avgMinutes,
+        'ts_porcentaje': FEB.tsPercentage,
+        'efg_porcentaje': FEB.efgPercentage,
+        'ortg_individual': FEB.ortgIndividual,
+        'valoracion_por_minuto': FEB.valPerMinute,
+        'delta_puntos_promedio': FEB.deltaAvgPoints,
+        'delta_minutos_promedio': FEB.deltaAvgMinutes,
+        'delta_valoracion_promedio': FEB.deltaAvgEfficiency,
+        'delta_ts_porcentaje': FEB.deltaTsPercentage,
+        'delta_valoracion_por_minuto': FEB.deltaValPerMinute
+    }
+    for _, fila in df_temp.iterrows():
+        p_id = extraer_id(fila['url_jugador'])
+        year = str(fila['ano_inicio'])
+        # Una temporada por liga: las ligas distintas de la de por defecto llevan su id en la URI
+        liga_id = fila['id_liga'] if 'id_liga' in fila else PARTICION_POR_DEFECTO[0]
+        clave = p_id if liga_id == PARTICION_POR_DEFECTO[0] else f"{p_id}_{liga_id}"
+
+        # El año al final de la URI lo usa unificar_final.py para repartirlo en el grafo de su temporada
+        uri_analysis = RES[f"player-season-analysis/{clave}_{year}"]
+        g.add((uri_analysis, RDF.type, FEB.PlayerSeasonAnalysis))
+        g.add((RES[f"person/{p_id}"], FEB.hasSeasonAnalysis, uri_analysis))
+        g.add((uri_analysis, FEB.duringSeason, RES[f"season/{year}"]))
+
+        for col, predicado in metricas_temp.items():
+            if pd.notnull(fila[col]):
+                tipo = XSD.integer if col in ('partidos_jugados', 'equipos_temporada') or col.endswith('_total') else XSD.float
+                g.add((uri_analysis, predicado, Literal(fila[col], datatype=tipo)))
+
+    # --- D. CARRERA COMPLETA (feb:CareerAnalysis) ---
+    print("Procesando carreras de los jugadores...")
+    metricas.fase("analisis_carreras")
+    df_carrera = pd.read_csv(os.path.join(dir_capa3, 'capa3_jugadores_carrera.csv'))
+    metricas.contar("filas_analisis_carreras", len(df_carrera))
+    metricas_carrera = {
+        'partidos_jugados': FEB.gamesPlayed,
+        'temporadas_jugadas': FEB.seasonsPlayed,
+        'equipos_distintos': FEB.teamsPlayed,
+        'primera_temporada': FEB.firstSeason,
+        'ultima_temporada': FEB.lastSeason,
+        'minutos_total': FEB.totalMinutes,
+        'puntos_total': FEB.totalPoints,
+        'valoracion_total': FEB.totalEfficiency,
+        'asistencias_total': FEB.totalAssists,
+        'rebotes_totales_total': FEB.totalRebounds,
+        'es_doble_doble_total': FEB.totalDoubleDoubles,
+        'minutos_promedio': FEB.avgMinutes,
+        'puntos_promedio': FEB.avgPoints,
+        'valoracion_promedio': FEB.avgEfficiency,
+        'asistencias_promedio': FEB.avgAssists,
+        'rebotes_totales_promedio': FEB.avgTotalRebounds,
+        'puntos_por_40': FEB.pointsPer40,
+        'valoracion_por_40': FEB.efficiencyPer40,
+        'rebotes_totales_por_40': FEB.reboundsPer40,
+        'asistencias_por_40': FEB.assistsPer40,
+        'ts_porcentaje': FEB.tsPercentage,
+        'efg_porcentaje': FEB.efgPercentage,
+        'ortg_individual': FEB.ortgIndividual,
+        'valoracion_por_minuto': FEB.valPerMinute
+    }
+    columnas_enteras = ('partidos_jugados', 'temporadas_jugadas', 'equipos_distintos', 'primera_temporada', 'ultima_temporada')
+    for _, fila in df_carrera.iterrows():
+        p_id = extraer_id(fila['url_jugador'])
+
+        # Sin año en la URI: la carrera va al grafo general de capa3
+        uri_analysis = RES[f"player-career/{p_id}"]
+        g.add((uri_analysis, RDF.type, FEB.CareerAnalysis))
+        g.add((RES[f"person/{p_id}"], FEB.hasCareerAnalysis, uri_analysis))
+
+        for col, predicado in metricas_carrera.items():
+            if pd.notnull(fila[col]):
+                tipo = XSD.integer if col in columnas_enteras or col.endswith('_total') else XSD.float
+                g.add((uri_analysis, predicado, Literal(fila[col], datatype=tipo)))
+
     # --- 3. GUARDADO ---
+    metricas.contar("tripletas", len(g))
     os.makedirs(ruta_grafo, exist_ok=True)
+    if modo_delta_activado():
+        registrar_delta(lineas_de_grafo(g), ruta_salida)
+    metricas.fase("serializar")
     g.serialize(destination=ruta_salida, format="turtle")
     print(f"--- ÉXITO: Capa 3 generada con {len(g)} tripletas en {ruta_salida} ---")
 
 except Exception as e:
-    print(f"Error en Capa 3: {e}")
\ No newline at end of file
+    print(f"Error en Capa 3: {e}")
+    sys.exit(1)
@@ -0,0 +1,165 @@
+import hashlib
+import json
+import os
+import sys
+import time
+from collections import defaultdict
+from rdflib import Graph
+
+# Modo delta: en lugar de obligar a recargar el grafo entero en cada ejecucion,
+# comparamos la nueva version con la anterior sujeto a sujeto (por huella SHA-1)
+# y publicamos solo las tripletas añadidas y eliminadas.
+
+ruta_script = os.path.dirname(os.path.abspath(__file__))
+directorio_raiz = os.path.abspath(os.path.join(ruta_script, "..", "..", ".."))
+CARPETA_DELTAS = os.path.join(directorio_raiz, "datos", "grafo", "deltas")
+NOMBRE_INSTANTANEA = "ultima_version.nt"
+
+
+def modo_delta_activado():
+    """El modo delta se activa pasando --delta al script de carga."""
+    return "--delta" in sys.argv
+
+
+def lineas_de_grafo(grafo):
+    """Serializa un grafo rdflib como conjunto de lineas N-Triples."""
+    texto = grafo.serialize(format="nt")
+    return {linea for linea in texto.splitlines() if linea.strip()}
+
+
+def lineas_de_archivo(ruta):
+    """Lee un archivo de grafo (N-Triples directamente, Turtle parseando) como lineas N-Triples."""
+    if not os.path.exists(ruta):
+        return set()
+    if ruta.endswith(".nt"):
+        with open(ruta, encoding="utf-8") as archivo:
+            return {linea.rstrip("\n") for linea in archivo if linea.strip()}
+    grafo = Graph()
+    grafo.parse(ruta, format="turtle")
+    return lineas_de_grafo(grafo)
+
+
+def agrupar_por_sujeto(lineas):
+    """Agrupa lineas N-Triples por su sujeto (IRI o nodo en blanco, nunca llevan espacios)."""
+    grupos = defaultdict(list)
+    for linea in lineas:
+        grupos[linea.split(" ", 1)[0]].append(linea)
+    return grupos
+
+
+def huella_sujeto(lineas_sujeto):
+    return hashlib.sha1("\n".join(sorted(lineas_sujeto)).encode("utf-8")).hexdigest()
+
+
+def calcular_delta(lineas_anteriores, lineas_nuevas):
+    """
+    Compara dos versiones de un grafo por huella de sujeto.
+    Solo los sujetos cuya huella cambia se comparan tripleta a tripleta.
+    Los nodos en blanco no tienen etiqueta estable entre ejecuciones, asi que
+    aparecen como eliminados y añadidos (nuestras capas no generan ninguno).
+    """
+    grupos_anteriores = agrupar_por_sujeto(lineas_anteriores)
+    grupos_nuevos = agrupar_por_sujeto(lineas_nuevas)
+
+    anadidas, eliminadas = [], []
+    sujetos_cambiados = 0
+    for sujeto in set(grupos_anteriores) | set(grupos_nuevos):
+        previas = grupos_anteriores.get(sujeto, [])
+        actuales = grupos_nuevos.get(sujeto, [])
+        if previas and actuales and huella_sujeto(previas) == huella_sujeto(actuales):
+            continue
+        sujetos_cambiados += 1
+        anadidas.extend(set(actuales) - set(previas))
+        eliminadas.extend(set(previas) - set(actuales))
+
+    return {
+        "anadidas": sorted(anadidas),
+        "eliminadas": sorted(eliminadas),
+        "sujetos_totales": len(grupos_nuevos),
+        "sujetos_cambiados": sujetos_cambiados,
+    }
+
+
+def escribir_sparql_update(ruta, anadidas, eliminadas):
+    """Changeset en SPARQL Update: las lineas N-Triples son validas dentro de DATA { }."""
+    with open(ruta, "w", encoding="utf-8") as archivo:
+        archivo.write("DELETE DATA {\n")
+        archivo.writelines(f"  {linea}\n" for linea in eliminadas)
+        archivo.write("} ;\nINSERT DATA {\n")
+        archivo.writelines(f"  {linea}\n" for linea in anadidas)
+        archivo.write("}\n")
+
+
+def escribir_lineas(ruta, lineas):
+    with open(ruta, "w", encoding="utf-8") as archivo:
+        archivo.writelines(f"{linea}\n" for linea in lineas)
+
+
+def huella_archivo(ruta):
+    with open(ruta, "rb") as archivo:
+        return hashlib.sha1(archivo.read()).hexdigest()
+
+
+def registrar_delta(lineas_nuevas, ruta_salida):
+    """
+    Genera el changeset de una salida del pipeline frente a su version anterior.
+    Debe llamarse ANTES de sobrescribir ruta_salida: si aun no existe instantanea
+    previa, se usa el archivo de salida existente como version anterior.
+
+    Escribe en datos/grafo/deltas/<nombre>/<id_build>/:
+      anadidas.nt, eliminadas.nt, cambios.ru y manifiesto.json
+    y actualiza la instantanea ultima_version.nt para la siguiente ejecucion.
+    """
+    nombre = os.path.splitext(os.path.basename(ruta_salida))[0]
+    carpeta_nombre = os.path.join(CARPETA_DELTAS, nombre)
+    ruta_instantanea = os.path.join(carpeta_nombre, NOMBRE_INSTANTANEA)
+    ruta_ultimo_manifiesto = os.path.join(carpeta_nombre, "ultimo_manifiesto.json")
+
+    if os.path.exists(ruta_instantanea):
+        lineas_anteriores = lineas_de_archivo(ruta_instantanea)
+    else:
+        lineas_anteriores = lineas_de_archivo(ruta_salida)
+
+    build_anterior = None
+    if os.path.exists(ruta_ultimo_manifiesto):
+        with open(ruta_ultimo_manifiesto, encoding="utf-8") as archivo:
+            build_anterior = json.load(archivo).get("build")
+
+    delta = calcular_delta(lineas_anteriores, lineas_nuevas)
+
+    id_build = time.strftime("%Y%m%dT%H%M%S")
+    if os.path.exists(os.path.join(carpeta_nombre, id_build)):
+        id_build = f"{id_build}_{time.time_ns() % 1000000:06d}"
+    carpeta_build = os.path.join(carpeta_nombre, id_build)
+    os.makedirs(carpeta_build, exist_ok=True)
+
+    ruta_anadidas = os.path.join(carpeta_build, "anadidas.nt")
+    ruta_eliminadas = os.path.join(carpeta_build, "eliminadas.nt")
+    ruta_update = os.path.join(carpeta_build, "cambios.ru")
+    escribir_lineas(ruta_anadidas, delta["anadidas"])
+    escribir_lineas(ruta_eliminadas, delta["eliminadas"])
+    escribir_sparql_update(ruta_update, delta["anadidas"], delta["eliminadas"])
+    escribir_lineas(ruta_instantanea, sorted(lineas_nuevas))
+
+    manifiesto = {
+        "grafo": nombre,
+        "build": id_build,
+        "build_anterior": build_anterior,
+        "tripletas_totales": len(lineas_nuevas),
+        "sujetos_totales": delta["sujetos_totales"],
+        "sujetos_cambiados": delta["sujetos_cambiados"],
+        "tripletas_anadidas": len(delta["anadidas"]),
+        "tripletas_eliminadas": len(delta["eliminadas"]),
+        "archivos": {
+            os.path.basename(ruta): {"bytes": os.path.getsize(ruta), "sha1": huella_archivo(ruta)}
+            for ruta in (ruta_anadidas, ruta_eliminadas, ruta_update)
+        },
+    }
+    with open(os.path.join(carpeta_build, "manifiesto.json"), "w", encoding="utf-8") as archivo:
+        json.dump(manifiesto, archivo, indent=2)
+    with open(ruta_ultimo_manifiesto, "w", encoding="utf-8") as archivo:
+        json.dump(manifiesto, archivo, indent=2)
+
+    print(f"Delta {nombre}: +{manifiesto['tripletas_anadidas']} / -{manifiesto['tripletas_eliminadas']} tripletas "
+          f"({manifiesto['sujetos_cambiados']} de {manifiesto['sujetos_totales']} sujetos cambiados) -> {carpeta_build}")
+    return manifiesto
@@ -1,36 +1,268 @@
-from rdflib import Graph
+from rdflib import Graph, Dataset
+from concurrent.futures import ProcessPoolExecutor
+from collections import defaultdict
+import json
 import os
+import re
+import shutil
+import sys
+import time
+from delta_grafo import modo_delta_activado, registrar_delta, lineas_de_archivo
 
 # Configuracion de rutas
 ruta_script = os.path.dirname(os.path.abspath(__file__))
 directorio_raiz = os.path.abspath(os.path.join(ruta_script, "..", "..", ".."))
 carpeta_grafo = os.path.join(directorio_raiz, "datos", "grafo")
+carpeta_partes = os.path.join(carpeta_grafo, ".partes")
 
-# Lista de archivos que componen el grafo completo
-archivos_entrada = [
-    "capa1_maestros.ttl", 
-    "capa2_eventos.ttl", 
-    "capa3_analisis.ttl",
-    "interlinking_wikidata.ttl"
-]
+sys.path.append(os.path.join(directorio_raiz, "codigo"))
+from comun.grafos_nombrados import CARPETA_DATASET, RUTA_INDICE, nombre_grafo, iri_grafo
+from comun.metricas import Metricas
+from comun.estadisticas_grafo import RUTA_ESTADISTICAS, calcular_estadisticas, tripletas_estadisticas, guardar_estadisticas
 
-grafo_maestro = Graph()
+# Lista de archivos que componen el grafo completo y la capa (grafo nombrado) de cada uno
+archivos_entrada = {
+    "capa1_maestros.ttl": "capa1",
+    "capa2_eventos.ttl": "capa2",
+    "capa3_analisis.ttl": "capa3",
+    "interlinking_wikidata.ttl": "interlinking"
+}
+
+ruta_salida_nt = os.path.join(carpeta_grafo, "bball_intelligence_MASTER.nt")
+ruta_salida_nq = os.path.join(carpeta_grafo, "bball_intelligence_MASTER.nq")
+ruta_salida_master = os.path.join(carpeta_grafo, "bball_intelligence_MASTER.ttl")
+ruta_salida_trig = os.path.join(carpeta_grafo, "bball_intelligence_MASTER.trig")
+
+PREDICADO_TEMPORADA = "<http://www.tfg-basket.es/ontologia/primera-feb#duringSeason>"
+PREDICADO_PARTIDO = "<http://www.tfg-basket.es/ontologia/primera-feb#playedMatch>"
+PATRON_ANALISIS = re.compile(r"-analysis/[^>]*_(\d{4})>")
+PATRON_TEMPORADA = re.compile(r"/season/(\d{4})>")
+
+
+def etiquetar_nodos_en_blanco(linea, prefijo):
+    """Renombra los nodos en blanco de una linea N-Triples para que no colisionen entre archivos."""
+    sujeto, predicado, resto = linea.split(" ", 2)
+    if sujeto.startswith("_:"):
+        sujeto = f"_:{prefijo}{sujeto[2:]}"
+    if resto.startswith("_:"):
+        resto = f"_:{prefijo}{resto[2:]}"
+    return f"{sujeto} {predicado} {resto}"
+
+
+def clasificador_capa2(lineas):
+    """Temporada de cada partido (feb:duringSeason) y de cada actuacion (via feb:playedMatch)."""
+    temporada_partido, partido_actuacion = {}, {}
+    for linea in lineas:
+        sujeto, predicado, resto = linea.split(" ", 2)
+        if predicado == PREDICADO_TEMPORADA:
+            busqueda = PATRON_TEMPORADA.search(resto)
+            if busqueda:
+                temporada_partido[sujeto] = int(busqueda.group(1))
+        elif predicado == PREDICADO_PARTIDO:
+            partido_actuacion[sujeto] = resto.rsplit(" ", 1)[0]
+
+    def temporada(linea):
+        sujeto = linea.split(" ", 1)[0]
+        if sujeto in temporada_partido:
+            return temporada_partido[sujeto]
+        return temporada_partido.get(partido_actuacion.get(sujeto))
+    return temporada
 
-print("--- Iniciando Unificacion Final del Grafo con Enlaces Externos ---")
 
-for nombre_archivo in archivos_entrada:
+def temporada_capa3(linea):
+    """Los analisis llevan el año al final de su URI; vale tanto si es sujeto como objeto."""
+    busqueda = PATRON_ANALISIS.search(linea)
+    return int(busqueda.group(1)) if busqueda else None
+
+
+def parsear_a_ntriples(indice, nombre_archivo, capa):
+    """
+    Trabajo de cada proceso: parsea un Turtle y lo reparte en partes N-Triples,
+    una por grafo nombrado (capa, o capa y temporada para capa2/capa3).
+    Cada grafo rdflib ya es un conjunto, asi que dentro de una parte no hay duplicados.
+    """
     ruta_completa = os.path.join(carpeta_grafo, nombre_archivo)
-    if os.path.exists(ruta_completa):
-        print(f"Añadiendo: {nombre_archivo}...")
-        grafo_maestro.parse(ruta_completa, format="turtle")
+    inicio = time.perf_counter()
+    grafo = Graph()
+    grafo.parse(ruta_completa, format="turtle")
+    tiempos = {"parseo": time.perf_counter() - inicio}
+
+    inicio = time.perf_counter()
+    prefijo = f"f{indice}x"
+    lineas = []
+    for linea in grafo.serialize(format="nt").splitlines():
+        if not linea.strip():
+            continue
+        if "_:" in linea:
+            linea = etiquetar_nodos_en_blanco(linea, prefijo)
+        lineas.append(linea)
+    del grafo
+    # rdflib serializa en el orden de sus conjuntos, que cambia en cada proceso: ordenadas, el maestro sale
+    # identico byte a byte cuando no cambian las entradas (y las etapas que lo usan no se repiten)
+    lineas.sort()
+
+    if capa == "capa2":
+        temporada_de = clasificador_capa2(lineas)
+    elif capa == "capa3":
+        temporada_de = temporada_capa3
     else:
-        print(f"Aviso: No se encontro el archivo {nombre_archivo}")
+        temporada_de = lambda linea: None
+
+    por_grafo = defaultdict(list)
+    for linea in lineas:
+        por_grafo[temporada_de(linea)].append(linea)
+
+    partes = []
+    for temporada, lineas_grafo in por_grafo.items():
+        nombre = nombre_grafo(capa, temporada)
+        ruta_parte = os.path.join(carpeta_partes, f"{nombre}.nt")
+        with open(ruta_parte, "w", encoding="utf-8") as archivo:
+            archivo.writelines(f"{linea}\n" for linea in lineas_grafo)
+        partes.append({"nombre": nombre, "capa": capa, "temporada": temporada, "iri": iri_grafo(capa, temporada),
+                       "archivo": f"{nombre}.nt", "ruta": ruta_parte, "tripletas": len(lineas_grafo)})
+    tiempos["reparto"] = time.perf_counter() - inicio
+    return nombre_archivo, partes, tiempos
+
+
+def unir_partes(partes, ruta_destino):
+    """
+    Concatena las partes N-Triples en el grafo por defecto eliminando tripletas repetidas entre capas.
+    Solo se guardan en memoria las capas pequeñas; la mayor (capa2) se vuelca en streaming
+    comprobando contra ellas, asi la memoria no crece con los eventos.
+    """
+    tamano_capa = defaultdict(int)
+    for parte in partes:
+        tamano_capa[parte["capa"]] += parte["tripletas"]
+    capa_mayor = max(tamano_capa, key=tamano_capa.get) if tamano_capa else None
+
+    vistas = set()
+    escritas = 0
+    with open(ruta_destino, "w", encoding="utf-8") as salida:
+        for parte in [p for p in partes if p["capa"] != capa_mayor]:
+            with open(parte["ruta"], encoding="utf-8") as archivo:
+                for linea in archivo:
+                    if linea not in vistas:
+                        vistas.add(linea)
+                        salida.write(linea)
+                        escritas += 1
+        for parte in [p for p in partes if p["capa"] == capa_mayor]:
+            with open(parte["ruta"], encoding="utf-8") as archivo:
+                for linea in archivo:
+                    if linea not in vistas:
+                        salida.write(linea)
+                        escritas += 1
+    return escritas
+
+
+def escribir_dataset(partes):
+    """
+    Publica el dataset por grafos nombrados: un .nt por grafo en datos/grafo/dataset
+    (para cargar solo lo necesario), su indice.json y el N-Quads completo.
+    """
+    with open(ruta_salida_nq, "w", encoding="utf-8") as salida_nq:
+        for parte in partes:
+            sufijo = f" <{parte['iri']}> .\n"
+            with open(parte["ruta"], encoding="utf-8") as archivo:
+                for linea in archivo:
+                    salida_nq.write(linea.rstrip()[:-1].rstrip() + sufijo)
+
+    carpeta_temporal = CARPETA_DATASET + ".tmp"
+    shutil.rmtree(carpeta_temporal, ignore_errors=True)
+    os.makedirs(carpeta_temporal)
+    for parte in partes:
+        shutil.move(parte["ruta"], os.path.join(carpeta_temporal, parte["archivo"]))
+    indice = [{clave: valor for clave, valor in parte.items() if clave != "ruta"}
+              for parte in sorted(partes, key=lambda p: (p["capa"], p["temporada"] or 0))]
+    with open(os.path.join(carpeta_temporal, os.path.basename(RUTA_INDICE)), "w", encoding="utf-8") as archivo:
+        json.dump({"grafos": indice}, archivo, indent=2)
+    shutil.rmtree(CARPETA_DATASET, ignore_errors=True)
+    os.replace(carpeta_temporal, CARPETA_DATASET)
+
+
+def unificar_grafo(generar_turtle=False, generar_trig=False):
+    print("--- Iniciando Unificacion Final del Grafo con Enlaces Externos ---")
+    metricas = Metricas("unificar")
+    os.makedirs(carpeta_partes, exist_ok=True)
+
+    tareas = []
+    for indice, (nombre_archivo, capa) in enumerate(archivos_entrada.items()):
+        if os.path.exists(os.path.join(carpeta_grafo, nombre_archivo)):
+            print(f"Añadiendo: {nombre_archivo}...")
+            tareas.append((indice, nombre_archivo, capa))
+        else:
+            print(f"Aviso: No se encontro el archivo {nombre_archivo}")
+
+    # Cada archivo se parsea en su propio proceso
+    partes = []
+    metricas.fase("parsear_capas")
+    with ProcessPoolExecutor(max_workers=max(1, len(tareas))) as ejecutor:
+        futuros = [ejecutor.submit(parsear_a_ntriples, *tarea) for tarea in tareas]
+        for futuro in futuros:
+            nombre_archivo, partes_archivo, tiempos = futuro.result()
+            total = sum(parte["tripletas"] for parte in partes_archivo)
+            for tramo, segundos in tiempos.items():
+                metricas.anotar(f"{tramo}_{nombre_archivo}", segundos)
+            metricas.contar(f"tripletas_{nombre_archivo}", total)
+            print(f" -> {nombre_archivo}: {total} tripletas en {len(partes_archivo)} grafos nombrados")
+            partes.extend(partes_archivo)
+
+    # Guardar el resultado final (N-Triples por concatenacion)
+    metricas.fase("unir_partes")
+    ruta_temporal = os.path.join(carpeta_grafo, "bball_intelligence_MASTER.tmp.nt")
+    total_tripletas = unir_partes(partes, ruta_temporal)
+
+    # Estadisticas del grafo (recuentos y destacados) para la portada: se anaden al maestro y como grafo
+    # nombrado propio; void:triples cuenta el grafo sin ellas
+    metricas.fase("estadisticas")
+    with open(ruta_temporal, encoding="utf-8") as archivo:
+        estadisticas = calcular_estadisticas(archivo)
+    lineas_estadisticas = tripletas_estadisticas(estadisticas)
+    ruta_parte = os.path.join(carpeta_partes, "estadisticas.nt")
+    for destino, modo in ((ruta_parte, "w"), (ruta_temporal, "a")):
+        with open(destino, modo, encoding="utf-8") as archivo:
+            archivo.writelines(f"{linea}\n" for linea in lineas_estadisticas)
+    partes.append({"nombre": "estadisticas", "capa": "estadisticas", "temporada": None, "iri": iri_grafo("estadisticas"),
+                   "archivo": "estadisticas.nt", "ruta": ruta_parte, "tripletas": len(lineas_estadisticas)})
+    total_tripletas += len(lineas_estadisticas)
+    metricas.contar("tripletas", total_tripletas)
+    if modo_delta_activado():
+        metricas.fase("delta")
+        registrar_delta(lineas_de_archivo(ruta_temporal), ruta_salida_nt)
+    os.replace(ruta_temporal, ruta_salida_nt)
+    guardar_estadisticas(estadisticas)
+
+    # Dataset por capas y temporadas (N-Quads + un .nt por grafo nombrado)
+    metricas.fase("escribir_dataset")
+    escribir_dataset(partes)
+    shutil.rmtree(carpeta_partes, ignore_errors=True)
+    metricas.contar("grafos_nombrados", len(partes))
+
+    # El Turtle/TriG "bonito" es lento (ordena y agrupa sujetos): solo bajo peticion
+    if generar_turtle:
+        print("Generando Turtle legible (--turtle)...")
+        metricas.fase("serializar_turtle")
+        grafo_maestro = Graph()
+        grafo_maestro.parse(ruta_salida_nt, format="nt")
+        grafo_maestro.serialize(destination=ruta_salida_master, format="turtle")
+    if generar_trig:
+        print("Generando TriG legible (--trig)...")
+        metricas.fase("serializar_trig")
+        dataset = Dataset()
+        dataset.parse(ruta_salida_nq, format="nquads")
+        dataset.serialize(destination=ruta_salida_trig, format="trig")
+
+    metricas.cerrar()
+    print("-" * 30)
+    print(f"PROCESO COMPLETADO CON EXITO")
+    print(f"Total de tripletas en el grafo final: {total_tripletas}")
+    print(f"Archivo maestro generado en: {ruta_salida_nt}")
+    print(f"Dataset por grafos nombrados: {ruta_salida_nq} ({len(partes)} grafos en {CARPETA_DATASET})")
+    print(f"Estadisticas del grafo: {RUTA_ESTADISTICAS}")
+    if generar_turtle:
+        print(f"Version Turtle generada en: {ruta_salida_master}")
+    if generar_trig:
+        print(f"Version TriG generada en: {ruta_salida_trig}")
 
-# Guardar el resultado final
-ruta_salida_master = os.path.join(carpeta_grafo, "bball_intelligence_MASTER.ttl")
-grafo_maestro.serialize(destination=ruta_salida_master, format="turtle")
 
-print("-" * 30)
-print(f"PROCESO COMPLETADO CON EXITO")
-print(f"Total de tripletas en el grafo final: {len(grafo_maestro)}")
-print(f"Archivo maestro generado en: {ruta_salida_master}")
\ No newline at end of file
+if __name__ == "__main__":
+    unificar_grafo(generar_turtle="--turtle" in sys.argv, generar_trig="--trig" in sys.argv)
@@ -3,6 +3,7 @@ import requests
 import time
 import os
 import re
+import sys
 from rdflib import Graph, URIRef, Namespace, OWL
 
 # 1. Configuracion de Namespaces y URLs
@@ -108,4 +109,5 @@ try:
     print(f"\nProceso finalizado. Enlaces creados: {exitos}")
 
 except Exception as e:
-    print(f"Error critico: {e}")
\ No newline at end of file
+    print(f"Error critico: {e}")
+    sys.exit(1)
@@ -0,0 +1,64 @@
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+# Compara los almacenes de tripletas (rdflib, sqlite, oxigraph) sobre el grafo del pipeline
+# con las mismas consultas que lanza la web. Cada almacen se construye desde cero en una
+# carpeta temporal, asi el tiempo de carga es el de un primer arranque.
+#   python benchmark_almacenes.py [repeticiones]
+
+ruta_script = os.path.dirname(os.path.abspath(__file__))
+raiz = os.path.abspath(os.path.join(ruta_script, "..", "..", ".."))
+ruta_grafo = os.path.join(raiz, "datos", "grafo", "bball_intelligence_MASTER.nt")
+ruta_grafo_ttl = os.path.join(raiz, "datos", "grafo", "bball_intelligence_MASTER.ttl")
+
+sys.path.append(os.path.join(raiz, "codigo"))
+from comun.almacen import ALMACENES_DISPONIBLES, abrir_almacen
+from catalogo_consultas import elegir_parametros, consultas_web
+
+GRAFOS_COMPLETOS = "capa1,capa2,capa3,interlinking"
+REPETICIONES = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+
+
+def medir(almacen, consulta, repeticiones):
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        filas = almacen.consultar(consulta)
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+    return statistics.median(tiempos), len(filas)
+
+
+def comparar_almacenes():
+    resultados = {}
+    for tipo in ALMACENES_DISPONIBLES:
+        with tempfile.TemporaryDirectory() as carpeta:
+            inicio = time.perf_counter()
+            try:
+                almacen, _ = abrir_almacen(tipo, GRAFOS_COMPLETOS, [(ruta_grafo, "nt"), (ruta_grafo_ttl, "turtle")],
+                                           carpeta_almacenes=carpeta)
+            except ImportError as error:
+                print(f"[{tipo}] omitido: {error}")
+                continue
+            carga = time.perf_counter() - inicio
+            print(f"[{tipo}] {len(almacen)} tripletas cargadas en {carga:.2f} s")
+
+            resultados[tipo] = {"carga": carga}
+            for nombre, consulta in consultas_web(elegir_parametros(almacen)["jugador"]).items():
+                mediana, n_filas = medir(almacen, consulta, REPETICIONES)
+                resultados[tipo][nombre] = mediana
+                print(f"   {nombre:<10} {mediana:9.2f} ms  ({n_filas} filas)")
+            del almacen
+
+    print("-" * 30)
+    print(f"Mediana de {REPETICIONES} ejecuciones (ms); carga en segundos")
+    columnas = ["carga", "inicio", "buscador", "perfil", "partidos"]
+    print(f"{'almacen':<10}" + "".join(f"{columna:>11}" for columna in columnas))
+    for tipo, medidas in resultados.items():
+        print(f"{tipo:<10}" + "".join(f"{medidas.get(columna, float('nan')):>11.2f}" for columna in columnas))
+
+
+if __name__ == "__main__":
+    comparar_almacenes()
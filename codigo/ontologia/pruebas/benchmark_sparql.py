@@ -0,0 +1,140 @@
+import json
+import multiprocessing
+import os
+import re
+import resource
+import statistics
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+# Benchmark de consultas SPARQL sobre el grafo maestro para detectar regresiones.
+# Carga bball_intelligence_MASTER (N-Triples o, si no existe, el Turtle) y versiones
+# sinteticas ampliadas (x2, x5, x10 temporadas) clonando los eventos de capa2 con
+# las temporadas e identificadores desplazados. Para cada escala mide el tiempo de
+# carga, la memoria maxima y la latencia p50/p95 del catalogo de consultas.
+#   python benchmark_sparql.py [--escalas 1,2,5,10] [--repeticiones 20] [--almacen rdflib] [--salida ruta.json]
+
+ruta_script = os.path.dirname(os.path.abspath(__file__))
+raiz = os.path.abspath(os.path.join(ruta_script, "..", "..", ".."))
+ruta_grafo = os.path.join(raiz, "datos", "grafo", "bball_intelligence_MASTER.nt")
+ruta_grafo_ttl = os.path.join(raiz, "datos", "grafo", "bball_intelligence_MASTER.ttl")
+carpeta_resultados = os.path.join(raiz, "datos", "benchmarks")
+
+sys.path.append(os.path.join(raiz, "codigo"))
+from comun.almacen import crear_almacen
+from catalogo_consultas import elegir_parametros, catalogo_completo
+
+SUJETOS_CAPA2 = ("<https://bball-intelligence.com/resource/match/", "<https://bball-intelligence.com/resource/performance/")
+# Años dentro de las URIs de partido/actuacion/temporada y en las fechas de los partidos
+PATRON_ANO = re.compile(r'(/(?:match|performance|season)/)(\d{4})|"(\d{4})(-\d{2}-\d{2}")')
+
+
+def argumento(nombre, por_defecto):
+    if nombre in sys.argv:
+        return sys.argv[sys.argv.index(nombre) + 1]
+    return por_defecto
+
+
+def lineas_maestro():
+    """Lineas N-Triples del grafo maestro (el Turtle se convierte al vuelo si no hay .nt)."""
+    if os.path.exists(ruta_grafo):
+        with open(ruta_grafo, encoding="utf-8") as archivo:
+            return [linea for linea in archivo if linea.strip()]
+    from rdflib import Graph
+    grafo = Graph()
+    grafo.parse(ruta_grafo_ttl, format="turtle")
+    return [f"{linea}\n" for linea in grafo.serialize(format="nt").splitlines() if linea.strip()]
+
+
+def desplazar_temporadas(linea, anos):
+    def sustituir(coincidencia):
+        if coincidencia.group(1):
+            return f"{coincidencia.group(1)}{int(coincidencia.group(2)) + anos}"
+        return f'"{int(coincidencia.group(3)) + anos}{coincidencia.group(4)}'
+    return PATRON_ANO.sub(sustituir, linea)
+
+
+def generar_escala(lineas, escala, ruta_destino):
+    """
+    Grafo x<escala>: el maestro mas (escala - 1) copias de los partidos y actuaciones,
+    cada una desplazada tantos años como temporadas abarca capa2, de modo que las copias
+    parecen temporadas nuevas de los mismos jugadores y clubes.
+    """
+    lineas_capa2 = [linea for linea in lineas if linea.startswith(SUJETOS_CAPA2)]
+    anos = [int(ano) for ano in re.findall(r"/season/(\d{4})>", "".join(lineas_capa2))]
+    tramo = (max(anos) - min(anos) + 1) if anos else 1
+    with open(ruta_destino, "w", encoding="utf-8") as salida:
+        salida.writelines(lineas)
+        for copia in range(1, escala):
+            salida.writelines(desplazar_temporadas(linea, copia * tramo) for linea in lineas_capa2)
+    return len(lineas) + (escala - 1) * len(lineas_capa2)
+
+
+def percentil(tiempos, p):
+    return statistics.quantiles(tiempos, n=100, method="inclusive")[p - 1] if len(tiempos) > 1 else tiempos[0]
+
+
+def medir_escala(ruta_nt, tipo_almacen, repeticiones):
+    """Se ejecuta en un proceso nuevo (spawn) para que la memoria maxima sea solo la de esta escala."""
+    rss_inicial = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    with tempfile.TemporaryDirectory() as carpeta:
+        almacen = crear_almacen(tipo_almacen, carpeta)
+        inicio = time.perf_counter()
+        almacen.parse(ruta_nt, format="nt")
+        carga = time.perf_counter() - inicio
+        rss_final = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+        parametros = elegir_parametros(almacen)
+        consultas = {}
+        for nombre, consulta in catalogo_completo(parametros).items():
+            tiempos = []
+            for _ in range(repeticiones):
+                inicio = time.perf_counter()
+                filas = almacen.consultar(consulta)
+                tiempos.append((time.perf_counter() - inicio) * 1000)
+            consultas[nombre] = {"filas": len(filas), "p50_ms": round(percentil(tiempos, 50), 3),
+                                 "p95_ms": round(percentil(tiempos, 95), 3)}
+        tripletas = len(almacen)
+        del almacen
+
+    # ru_maxrss viene en KB en Linux
+    return {"tripletas": tripletas, "carga_s": round(carga, 3),
+            "memoria_max_mb": round(rss_final / 1024, 1), "memoria_carga_mb": round((rss_final - rss_inicial) / 1024, 1),
+            "parametros": parametros, "consultas": consultas}
+
+
+def ejecutar_benchmark():
+    escalas = [int(escala) for escala in argumento("--escalas", "1,2,5,10").split(",")]
+    repeticiones = int(argumento("--repeticiones", "20"))
+    tipo_almacen = argumento("--almacen", "rdflib")
+    ruta_resultado = argumento("--salida", os.path.join(carpeta_resultados, f"sparql_{time.strftime('%Y%m%dT%H%M%S')}.json"))
+
+    print("--- Benchmark SPARQL del grafo maestro ---")
+    lineas = lineas_maestro()
+    informe = {"fecha": time.strftime("%Y-%m-%dT%H:%M:%S"), "almacen": tipo_almacen,
+               "repeticiones": repeticiones, "escalas": {}}
+
+    with tempfile.TemporaryDirectory() as carpeta:
+        for escala in escalas:
+            ruta_nt = os.path.join(carpeta, f"maestro_x{escala}.nt")
+            total = generar_escala(lineas, escala, ruta_nt)
+            print(f"Escala x{escala}: {total} lineas, midiendo con {tipo_almacen}...")
+            with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as ejecutor:
+                resultado = ejecutor.submit(medir_escala, ruta_nt, tipo_almacen, repeticiones).result()
+            informe["escalas"][f"x{escala}"] = resultado
+            print(f"   carga {resultado['carga_s']} s | memoria max {resultado['memoria_max_mb']} MB")
+            for nombre, medidas in resultado["consultas"].items():
+                print(f"   {nombre:<22} p50 {medidas['p50_ms']:>10.2f} ms | p95 {medidas['p95_ms']:>10.2f} ms "
+                      f"({medidas['filas']} filas)")
+            os.remove(ruta_nt)
+
+    os.makedirs(os.path.dirname(ruta_resultado), exist_ok=True)
+    with open(ruta_resultado, "w", encoding="utf-8") as archivo:
+        json.dump(informe, archivo, indent=2)
+    print(f"Informe guardado en: {ruta_resultado}")
+
+
+if __name__ == "__main__":
+    ejecutar_benchmark()
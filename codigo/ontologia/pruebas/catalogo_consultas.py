@@ -0,0 +1,107 @@
+# Catalogo fijo de consultas representativas para los benchmarks.
+# Las cuatro primeras son las que lanza la web (app.py); el resto cubren los
+# usos analiticos previstos: clasificaciones por temporada, cara a cara entre
+# dos clubes y la carrera de un jugador.
+
+PREFIJOS = """
+PREFIX feb: <http://www.tfg-basket.es/ontologia/primera-feb#>
+PREFIX schema: <https://schema.org/>
+PREFIX owl: <http://www.w3.org/2002/07/owl#>
+"""
+
+# Consultas para elegir los parametros del catalogo a partir de los propios datos
+CONSULTA_JUGADOR_MAS_ACTIVO = PREFIJOS + """
+SELECT ?jugador (COUNT(?act) AS ?n) WHERE { ?act feb:performer ?jugador . }
+GROUP BY ?jugador ORDER BY DESC(?n) LIMIT 1
+"""
+CONSULTA_PRIMER_JUGADOR = PREFIJOS + "SELECT ?jugador WHERE { ?jugador a schema:Person } LIMIT 1"
+CONSULTA_PRIMER_PARTIDO = PREFIJOS + """
+SELECT ?local ?visitante ?temporada WHERE {
+    ?partido feb:homeTeam ?local ; feb:awayTeam ?visitante ; feb:duringSeason ?temporada .
+} LIMIT 1
+"""
+
+
+def elegir_parametros(almacen):
+    """Jugador con mas actuaciones, y un par de clubes y una temporada con partido (si hay capa2)."""
+    filas = almacen.consultar(CONSULTA_JUGADOR_MAS_ACTIVO) or almacen.consultar(CONSULTA_PRIMER_JUGADOR)
+    parametros = {
+        "jugador": str(filas[0][0]),
+        "club_a": "https://bball-intelligence.com/resource/club/0",
+        "club_b": "https://bball-intelligence.com/resource/club/0",
+        "temporada": 2020,
+    }
+    filas = almacen.consultar(CONSULTA_PRIMER_PARTIDO)
+    if filas:
+        parametros["club_a"], parametros["club_b"] = str(filas[0][0]), str(filas[0][1])
+        parametros["temporada"] = int(str(filas[0][2]).rsplit("/", 1)[-1])
+    return parametros
+
+
+def consultas_web(jugador, busqueda="garcia"):
+    """Las consultas de app.py (inicio, buscador y ficha de jugador)."""
+    return {
+        "inicio": "SELECT (COUNT(?p) AS ?total) WHERE { ?p a <https://schema.org/Person> }",
+        "buscador": PREFIJOS + f"""
+            SELECT ?uri ?nombre ?wikidata WHERE {{
+                ?uri a schema:Person ; schema:name ?nombre .
+                FILTER(regex(str(?nombre), "{busqueda}", "i"))
+                OPTIONAL {{ ?uri owl:sameAs ?wikidata . }}
+            }} ORDER BY ?nombre LIMIT 50""",
+        "perfil": PREFIJOS + f"""
+            SELECT ?nombre ?url_pb ?wikidata ?ts ?efg ?val_min ?ortg WHERE {{
+                <{jugador}> schema:name ?nombre ; schema:url ?url_pb .
+                OPTIONAL {{ <{jugador}> owl:sameAs ?wikidata . }}
+                OPTIONAL {{
+                    <{jugador}> feb:hasPlayerAnalysis ?analisis .
+                    OPTIONAL {{ ?analisis feb:tsPercentage ?ts . }}
+                    OPTIONAL {{ ?analisis feb:efgPercentage ?efg . }}
+                    OPTIONAL {{ ?analisis feb:valPerMinute ?val_min . }}
+                    OPTIONAL {{ ?analisis feb:ortgIndividual ?ortg . }}
+                }}
+            }} ORDER BY DESC(?analisis) LIMIT 1""",
+        "partidos": PREFIJOS + f"""
+            SELECT ?fecha ?puntos ?valoracion WHERE {{
+                ?act feb:performer <{jugador}> ;
+                     feb:playedMatch ?partido ;
+                     feb:points ?puntos ;
+                     feb:efficiencyValue ?valoracion .
+                ?partido feb:startDate ?fecha .
+            }} ORDER BY DESC(?fecha) LIMIT 10""",
+    }
+
+
+def consultas_analiticas(jugador, club_a, club_b, temporada):
+    return {
+        "clasificacion_puntos": PREFIJOS + f"""
+            SELECT ?jugador (SUM(?puntos) AS ?total) (COUNT(?act) AS ?partidos) WHERE {{
+                ?partido feb:duringSeason <https://bball-intelligence.com/resource/season/{temporada}> .
+                ?act feb:playedMatch ?partido ; feb:performer ?jugador ; feb:points ?puntos .
+            }} GROUP BY ?jugador ORDER BY DESC(?total) LIMIT 20""",
+        "clasificacion_ts": PREFIJOS + f"""
+            SELECT ?nombre ?ts WHERE {{
+                ?persona schema:name ?nombre ; feb:hasPlayerAnalysis ?analisis .
+                ?analisis feb:tsPercentage ?ts .
+                FILTER(STRENDS(STR(?analisis), "_{temporada}"))
+            }} ORDER BY DESC(?ts) LIMIT 20""",
+        "cara_a_cara": PREFIJOS + f"""
+            SELECT ?partido ?fecha ?local WHERE {{
+                {{ ?partido feb:homeTeam <{club_a}> ; feb:awayTeam <{club_b}> . BIND(<{club_a}> AS ?local) }}
+                UNION
+                {{ ?partido feb:homeTeam <{club_b}> ; feb:awayTeam <{club_a}> . BIND(<{club_b}> AS ?local) }}
+                ?partido feb:startDate ?fecha .
+            }} ORDER BY ?fecha""",
+        "carrera_jugador": PREFIJOS + f"""
+            SELECT ?temporada (COUNT(?act) AS ?partidos) (SUM(?puntos) AS ?puntos_totales)
+                   (AVG(?valoracion) AS ?valoracion_media) WHERE {{
+                ?act feb:performer <{jugador}> ; feb:playedMatch ?partido ;
+                     feb:points ?puntos ; feb:efficiencyValue ?valoracion .
+                ?partido feb:duringSeason ?temporada .
+            }} GROUP BY ?temporada ORDER BY ?temporada""",
+    }
+
+
+def catalogo_completo(parametros):
+    consultas = consultas_web(parametros["jugador"])
+    consultas.update(consultas_analiticas(**parametros))
+    return consultas
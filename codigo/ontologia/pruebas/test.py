@@ -1,14 +1,23 @@
-from rdflib import Graph
 import os
+import sys
 
 # Rutas
 ruta_script = os.path.dirname(os.path.abspath(__file__))
 raiz = os.path.abspath(os.path.join(ruta_script, "..", "..", ".."))
-ruta_grafo = os.path.join(raiz, "datos", "grafo", "bball_intelligence_MASTER.ttl")
+ruta_grafo = os.path.join(raiz, "datos", "grafo", "bball_intelligence_MASTER.nt")
+ruta_grafo_ttl = os.path.join(raiz, "datos", "grafo", "bball_intelligence_MASTER.ttl")
+
+sys.path.append(os.path.join(raiz, "codigo"))
+from comun.almacen import abrir_almacen
+
+# La consulta solo necesita nombres (capa1), los analisis de 2020 (capa3) y los enlaces externos
+GRAFOS_DECLARADOS = "capa1,capa3:2020,interlinking"
+TIPO_ALMACEN = os.environ.get("BBALL_ALMACEN", "rdflib")
 
 print("Cargando grafo maestro (esto puede tardar unos segundos por el volumen)...")
-grafo = Graph()
-grafo.parse(ruta_grafo, format="turtle")
+grafo, cargador = abrir_almacen(TIPO_ALMACEN, GRAFOS_DECLARADOS, [(ruta_grafo, "nt"), (ruta_grafo_ttl, "turtle")])
+if cargador is not None:
+    print(f"Dataset por grafos nombrados: cargados {GRAFOS_DECLARADOS} (almacen {grafo.nombre})")
 
 # Consulta: Top 10 jugadores TS% en 2020 con Wikidata
 consulta_sparql = """
@@ -32,7 +41,7 @@ LIMIT 10
 """
 
 print("--- RESULTADOS TOP 10 TS% (2020) CON ENLACE EXTERNO ---")
-resultados = grafo.query(consulta_sparql)
+resultados = grafo.consultar(consulta_sparql)
 
 for fila in resultados:
     print(f"Jugador: {fila.nombre} | TS%: {fila.ts}% | WD: {fila.wikidata}")
\ No newline at end of file
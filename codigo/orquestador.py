@@ -0,0 +1,391 @@
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from comun.ligas import (PARTICION_POR_DEFECTO, interpretar_particiones, rutas_liga, rutas_particion,
+                         sufijo_liga, sufijo_particion)
+
+# Orquestador del pipeline completo: scraping -> limpieza -> carga RDF -> interlinking -> unificacion.
+# Cada etapa declara sus entradas y salidas; las dependencias entre etapas se deducen de ellas
+# (una etapa depende de las que producen sus entradas). Una etapa se salta si la huella de sus
+# entradas (y de su propio script) no ha cambiado desde la ultima ejecucion correcta y sus
+# salidas siguen existiendo. Las etapas independientes se ejecutan a la vez.
+#
+#   python codigo/orquestador.py [--forzar] [--solo etapa1,etapa2] [--scraping] [--hilos N] [--lista]
+#                                [--particiones 194:regular,194:playoffs]
+#
+#   --forzar    ejecuta las etapas aunque esten al dia
+#   --solo      limita la ejecucion a esas etapas (sus dependencias se dan por buenas)
+#   --scraping  permite ejecutar las etapas que descargan de internet aunque ya tengan salida
+#   --hilos     numero maximo de etapas simultaneas (por defecto 4)
+#   --lista     muestra las etapas y su estado sin ejecutar nada
+#   --particiones  ligas y fases a procesar (liga:fase, ver comun/ligas.py); por defecto
+#                  BBALL_PARTICIONES o 194:regular
+
+ruta_script = os.path.dirname(os.path.abspath(__file__))
+directorio_raiz = os.path.abspath(os.path.join(ruta_script, ".."))
+RUTA_ESTADO = os.path.join(directorio_raiz, "datos", ".estado_pipeline.json")
+CARPETA_LOGS = os.path.join(directorio_raiz, "datos", ".logs_pipeline")
+
+# Rutas relativas a la raiz del repositorio (los scripts se lanzan siempre desde ella)
+CAPA1 = ["datos/procesados/capa1/capa1_equipos.csv", "datos/procesados/capa1/capa1_equipos_temporada.csv",
+         "datos/procesados/capa1/capa1_jugadores.csv", "datos/procesados/capa1/capa1_plantillas.csv"]
+CAPA2 = ["datos/procesados/capa2/capa2_partidos.csv", "datos/procesados/capa2/capa2_estadisticas_detalladas.csv"]
+UMBRALES_VALIDACION = "codigo/limpieza/umbrales_validacion.json"
+# Un informe de validacion por capa: cada carga RDF espera solo al de la suya
+INFORMES_VALIDACION = {capa: f"datos/procesados/validacion/informe_validacion_{capa}.json" for capa in ("capa1", "capa2", "capa3")}
+
+
+def etapas_particionadas(particiones):
+    """
+    Descarga y limpieza de cada liga (equipos, plantillas, capa1) y de cada particion (liga, fase):
+    fichas de partido y capa2. Cada una es una etapa propia con sufijo "@<liga>" o "@<liga>-<fase>"
+    (la particion por defecto conserva el nombre de siempre), asi que las de ligas o fases distintas
+    corren a la vez. combinar_capa1 y combinar_capa2 las juntan en las capas que leen las demas
+    etapas (por separado, para que la carga RDF de capa1 no espere a la limpieza de capa2).
+    """
+    etapas = []
+    for id_liga in dict.fromkeys(id_liga for id_liga, _ in particiones):
+        rutas, sufijo, argumentos = rutas_liga(id_liga), sufijo_liga(id_liga), ["--liga", str(id_liga)]
+        capa1 = [os.path.join(rutas["capa1"], os.path.basename(ruta)) for ruta in CAPA1]
+        etapas += [
+            {"nombre": f"scraping_equipos{sufijo}", "script": "codigo/web-scrapping/01_capturar_equipos.py", "red": True,
+             "argumentos": argumentos, "entradas": [], "salidas": [rutas["equipos"]]},
+            {"nombre": f"scraping_plantillas{sufijo}", "script": "codigo/web-scrapping/02_capturar_plantillas.py", "red": True,
+             "argumentos": argumentos, "entradas": [rutas["equipos"]], "salidas": [rutas["plantillas"]]},
+            {"nombre": f"limpieza_capa1{sufijo}", "script": "codigo/limpieza/capa1.py",
+             "argumentos": argumentos, "entradas": [rutas["equipos"], rutas["plantillas"]], "salidas": capa1},
+        ]
+    for id_liga, fase in particiones:
+        rutas, sufijo = rutas_particion(id_liga, fase), sufijo_particion(id_liga, fase)
+        argumentos = ["--liga", str(id_liga), "--fase", fase]
+        etapas += [
+            {"nombre": f"scraping_jugadores{sufijo}", "script": "codigo/web-scrapping/03_capturar_jugadores.py", "red": True,
+             "argumentos": argumentos, "entradas": [rutas["plantillas"]], "salidas": [rutas["temporadas"]]},
+            {"nombre": f"limpieza_capa2{sufijo}", "script": "codigo/limpieza/capa2.py", "argumentos": argumentos,
+             "entradas": [os.path.join(rutas["capa1"], "capa1_equipos_temporada.csv"),
+                          os.path.join(rutas["capa1"], "capa1_jugadores.csv"), rutas["temporadas"]],
+             "salidas": [os.path.join(rutas["capa2"], os.path.basename(ruta)) for ruta in CAPA2]},
+        ]
+    texto_particiones = ",".join(f"{id_liga}:{fase}" for id_liga, fase in particiones)
+    etapas += [
+        {"nombre": f"combinar_{capa}", "script": "codigo/limpieza/combinar_particiones.py",
+         "argumentos": ["--particiones", texto_particiones, "--capas", capa],
+         "entradas": [salida for etapa in etapas if etapa["nombre"].startswith(f"limpieza_{capa}") for salida in etapa["salidas"]],
+         "salidas": combinadas}
+        for capa, combinadas in (("capa1", CAPA1), ("capa2", CAPA2))
+    ]
+    return etapas
+
+
+ETAPAS_COMUNES = [
+    {"nombre": "ventanas_capa2", "script": "codigo/limpieza/capa2_ventanas.py",
+     "entradas": ["datos/procesados/capa2/capa2_partidos.csv", "datos/procesados/capa2/capa2_estadisticas_detalladas.csv"],
+     "salidas": ["datos/procesados/ventanas/ventanas_jugadores.csv", "datos/procesados/ventanas/ventanas_equipos.csv",
+                 "datos/procesados/ventanas/splits_jugadores.csv", "datos/procesados/ventanas/splits_equipos.csv"]},
+    {"nombre": "companeros_capa2", "script": "codigo/limpieza/capa2_companeros.py",
+     "entradas": ["datos/procesados/capa1/capa1_jugadores.csv", "datos/procesados/capa2/capa2_estadisticas_detalladas.csv"],
+     "salidas": ["datos/procesados/companeros/incidencia.npz", "datos/procesados/companeros/mas_menos.npz",
+                 "datos/procesados/companeros/indice.json", "datos/procesados/companeros/companeros_top.csv"]},
+    {"nombre": "limpieza_capa3", "script": "codigo/limpieza/capa3.py",
+     "entradas": ["datos/procesados/capa1/capa1_jugadores.csv", "datos/procesados/capa1/capa1_equipos.csv",
+                  "datos/procesados/capa2/capa2_partidos.csv", "datos/procesados/capa2/capa2_estadisticas_detalladas.csv"],
+     "salidas": ["datos/procesados/capa3/capa3_jugadores_avanzado.csv", "datos/procesados/capa3/capa3_equipos_avanzado.csv",
+                 "datos/procesados/capa3/capa3_jugadores_temporadas.csv", "datos/procesados/capa3/capa3_jugadores_carrera.csv",
+                 "datos/procesados/capa3/capa3_equipos_partidos.csv"]},
+    {"nombre": "ratings_capa3", "script": "codigo/limpieza/capa3_ratings.py",
+     "entradas": ["datos/procesados/capa2/capa2_partidos.csv"],
+     "salidas": ["datos/procesados/ratings/elo_historial.csv", "datos/procesados/ratings/ratings_temporada.csv"]},
+    {"nombre": "binario_capa3", "script": "codigo/limpieza/capa3_binario.py",
+     "entradas": ["datos/procesados/capa1/capa1_jugadores.csv", "datos/procesados/capa1/capa1_equipos.csv",
+                  "datos/procesados/capa1/capa1_equipos_temporada.csv", "datos/procesados/capa1/capa1_plantillas.csv",
+                  "datos/procesados/capa2/capa2_partidos.csv", "datos/procesados/capa2/capa2_estadisticas_detalladas.csv",
+                  "datos/procesados/capa3/capa3_jugadores_avanzado.csv", "datos/procesados/capa3/capa3_jugadores_temporadas.csv",
+                  "datos/procesados/capa3/capa3_jugadores_carrera.csv"],
+     "salidas": ["datos/procesados/binario/esquema.json"]},
+    # Si alguna regla de una capa supera su umbral la etapa falla y esa capa no se carga en el grafo
+    {"nombre": "validacion_capa1", "script": "codigo/limpieza/validacion.py", "argumentos": ["--capa", "capa1"],
+     "entradas": CAPA1 + [UMBRALES_VALIDACION],
+     "salidas": [INFORMES_VALIDACION["capa1"]]},
+    {"nombre": "validacion_capa2", "script": "codigo/limpieza/validacion.py", "argumentos": ["--capa", "capa2"],
+     "entradas": ["datos/procesados/capa1/capa1_jugadores.csv"] + CAPA2 + [UMBRALES_VALIDACION],
+     "salidas": [INFORMES_VALIDACION["capa2"]]},
+    {"nombre": "validacion_capa3", "script": "codigo/limpieza/validacion.py", "argumentos": ["--capa", "capa3"],
+     "entradas": ["datos/procesados/capa2/capa2_estadisticas_detalladas.csv",
+                  "datos/procesados/capa3/capa3_jugadores_avanzado.csv", "datos/procesados/capa3/capa3_equipos_avanzado.csv",
+                  "datos/procesados/capa3/capa3_jugadores_carrera.csv", UMBRALES_VALIDACION],
+     "salidas": [INFORMES_VALIDACION["capa3"]]},
+    {"nombre": "carga_capa1", "script": "codigo/ontologia/carga/carga_capa1_maestros.py",
+     "entradas": ["datos/procesados/capa1/capa1_equipos.csv", "datos/procesados/capa1/capa1_equipos_temporada.csv",
+                  "datos/procesados/capa1/capa1_jugadores.csv", "datos/procesados/capa1/capa1_plantillas.csv",
+                  INFORMES_VALIDACION["capa1"]],
+     "salidas": ["datos/grafo/capa1_maestros.ttl"]},
+    {"nombre": "carga_capa2", "script": "codigo/ontologia/carga/carga_capa2.py",
+     "entradas": ["datos/procesados/capa2/capa2_partidos.csv", "datos/procesados/capa2/capa2_estadisticas_detalladas.csv",
+                  INFORMES_VALIDACION["capa2"]],
+     "salidas": ["datos/grafo/capa2_eventos.ttl"]},
+    {"nombre": "carga_capa3", "script": "codigo/ontologia/carga/carga_capa3.py",
+     "entradas": ["datos/procesados/capa3/capa3_jugadores_avanzado.csv", "datos/procesados/capa3/capa3_equipos_avanzado.csv",
+                  "datos/procesados/capa3/capa3_jugadores_temporadas.csv", "datos/procesados/capa3/capa3_jugadores_carrera.csv",
+                  "datos/procesados/capa3/capa3_equipos_partidos.csv", INFORMES_VALIDACION["capa3"]],
+     "salidas": ["datos/grafo/capa3_analisis.ttl"]},
+    {"nombre": "interlinking_wikidata", "script": "codigo/ontologia/interlinking/generar_enlace.py", "red": True,
+     "entradas": ["datos/procesados/capa1/capa1_jugadores.csv"],
+     "salidas": ["datos/grafo/interlinking_wikidata.ttl"]},
+    {"nombre": "enriquecimiento_fotos", "script": "codigo/ontologia/interlinking/enriquecer_datos.py", "red": True,
+     "entradas": ["datos/grafo/interlinking_wikidata.ttl"],
+     "salidas": ["datos/grafo/enriquecimiento_fotos.ttl"]},
+    {"nombre": "unificar", "script": "codigo/ontologia/carga/unificar_final.py",
+     "entradas": ["datos/grafo/capa1_maestros.ttl", "datos/grafo/capa2_eventos.ttl",
+                  "datos/grafo/capa3_analisis.ttl", "datos/grafo/interlinking_wikidata.ttl"],
+     "salidas": ["datos/grafo/bball_intelligence_MASTER.nt", "datos/grafo/bball_intelligence_MASTER.nq",
+                 "datos/grafo/dataset/indice.json", "datos/grafo/estadisticas.json"]},
+]
+
+
+def construir_etapas(particiones):
+    return etapas_particionadas(particiones) + ETAPAS_COMUNES
+
+
+ETAPAS = construir_etapas([PARTICION_POR_DEFECTO])
+
+
+def argumento(nombre, por_defecto=None):
+    if nombre in sys.argv:
+        return sys.argv[sys.argv.index(nombre) + 1]
+    return por_defecto
+
+
+def calcular_dependencias(etapas):
+    """Una etapa depende de todas las etapas que generan alguna de sus entradas."""
+    productor = {salida: etapa["nombre"] for etapa in etapas for salida in etapa["salidas"]}
+    return {etapa["nombre"]: sorted({productor[entrada] for entrada in etapa["entradas"]
+                                     if entrada in productor and productor[entrada] != etapa["nombre"]})
+            for etapa in etapas}
+
+
+def archivos_de(ruta):
+    """Una entrada puede ser un archivo o una carpeta (se recorre entera, en orden estable)."""
+    if os.path.isdir(ruta):
+        for carpeta, subcarpetas, archivos in os.walk(ruta):
+            subcarpetas.sort()
+            for archivo in sorted(archivos):
+                yield os.path.join(carpeta, archivo)
+    elif os.path.exists(ruta):
+        yield ruta
+
+
+class CacheHuellas:
+    """
+    SHA-1 por archivo reutilizado mientras no cambien su tamaño ni su fecha de modificacion,
+    para no releer en cada ejecucion las miles de fichas de datos/bruto/temporadas.
+    """
+
+    def __init__(self, huellas):
+        self.huellas = huellas
+        self.cerrojo = threading.Lock()
+
+    def huella(self, ruta):
+        informacion = os.stat(ruta)
+        clave = os.path.relpath(ruta, directorio_raiz)
+        with self.cerrojo:
+            guardada = self.huellas.get(clave)
+        if guardada and guardada[0] == informacion.st_size and guardada[1] == informacion.st_mtime_ns:
+            return guardada[2]
+        sha1 = hashlib.sha1()
+        with open(ruta, "rb") as archivo:
+            for bloque in iter(lambda: archivo.read(1 << 20), b""):
+                sha1.update(bloque)
+        with self.cerrojo:
+            self.huellas[clave] = [informacion.st_size, informacion.st_mtime_ns, sha1.hexdigest()]
+        return sha1.hexdigest()
+
+    def huella_etapa(self, etapa):
+        """Huella conjunta de las entradas de la etapa, de su script y de sus argumentos."""
+        sha1 = hashlib.sha1()
+        sha1.update(" ".join(etapa.get("argumentos", [])).encode("utf-8"))
+        for entrada in [etapa["script"]] + etapa["entradas"]:
+            for ruta in archivos_de(os.path.join(directorio_raiz, entrada)):
+                sha1.update(os.path.relpath(ruta, directorio_raiz).encode("utf-8"))
+                sha1.update(self.huella(ruta).encode("utf-8"))
+        return sha1.hexdigest()
+
+
+def leer_estado():
+    if not os.path.exists(RUTA_ESTADO):
+        return {"etapas": {}, "huellas": {}}
+    with open(RUTA_ESTADO, encoding="utf-8") as archivo:
+        return json.load(archivo)
+
+
+def guardar_estado(estado):
+    os.makedirs(os.path.dirname(RUTA_ESTADO), exist_ok=True)
+    ruta_temporal = RUTA_ESTADO + ".tmp"
+    with open(ruta_temporal, "w", encoding="utf-8") as archivo:
+        json.dump(estado, archivo, indent=2)
+    os.replace(ruta_temporal, RUTA_ESTADO)
+
+
+def salidas_presentes(etapa):
+    return all(os.path.exists(os.path.join(directorio_raiz, salida)) for salida in etapa["salidas"])
+
+
+def esperar_proceso(proceso):
+    """
+    Espera al hijo y devuelve (codigo de salida, memoria maxima en MB). La memoria sale de
+    os.wait4 en POSIX; sin wait4 (Windows) se muestrea con psutil mientras corre, y si
+    tampoco hay psutil es None.
+    """
+    if hasattr(os, "wait4"):
+        _, estado_salida, uso = os.wait4(proceso.pid, 0)
+        proceso.returncode = os.waitstatus_to_exitcode(estado_salida)
+        return proceso.returncode, round(uso.ru_maxrss / 1024, 1)  # ru_maxrss viene en KB en Linux
+    try:
+        import psutil
+    except ImportError:
+        return proceso.wait(), None
+    pico = None
+    while True:
+        try:
+            memoria = psutil.Process(proceso.pid).memory_info()
+            pico = max(pico or 0, getattr(memoria, "peak_wset", memoria.rss))
+        except psutil.Error:
+            pass
+        try:
+            codigo = proceso.wait(timeout=0.5)
+        except subprocess.TimeoutExpired:
+            continue
+        return codigo, None if pico is None else round(pico / (1024 * 1024), 1)
+
+
+def ejecutar_script(etapa):
+    """
+    Lanza el script con la raiz del repositorio como directorio de trabajo y espera a que
+    termine midiendo su memoria maxima (esperar_proceso).
+    La salida de cada etapa va a su propio log para no mezclar las que corren a la vez.
+    """
+    os.makedirs(CARPETA_LOGS, exist_ok=True)
+    ruta_log = os.path.join(CARPETA_LOGS, f"{etapa['nombre']}.log")
+    inicio = time.perf_counter()
+    with open(ruta_log, "w", encoding="utf-8") as log:
+        proceso = subprocess.Popen([sys.executable, os.path.join(directorio_raiz, etapa["script"])] + etapa.get("argumentos", []),
+                                   cwd=directorio_raiz, stdout=log, stderr=subprocess.STDOUT,
+                                   env={**os.environ, "PYTHONUNBUFFERED": "1"})
+        codigo_salida, memoria_max_mb = esperar_proceso(proceso)
+    return {
+        "codigo_salida": codigo_salida,
+        "segundos": round(time.perf_counter() - inicio, 2),
+        "memoria_max_mb": memoria_max_mb,
+        "log": os.path.relpath(ruta_log, directorio_raiz),
+    }
+
+
+def ejecutar_pipeline():
+    forzar = "--forzar" in sys.argv
+    permitir_red = "--scraping" in sys.argv
+    hilos = int(argumento("--hilos", "4"))
+    solo = set(argumento("--solo", "").split(",")) - {""}
+    particiones = interpretar_particiones(argumento("--particiones", os.environ.get("BBALL_PARTICIONES", "194:regular")))
+    todas = construir_etapas(particiones)
+
+    nombres = [etapa["nombre"] for etapa in todas]
+    desconocidas = solo - set(nombres)
+    if desconocidas:
+        print(f"Etapas desconocidas: {', '.join(sorted(desconocidas))}. Disponibles: {', '.join(nombres)}")
+        sys.exit(2)
+
+    etapas = {etapa["nombre"]: etapa for etapa in todas}
+    dependencias = calcular_dependencias(todas)
+    estado = leer_estado()
+    cache = CacheHuellas(estado.setdefault("huellas", {}))
+    cerrojo_estado = threading.Lock()
+
+    def decidir(nombre):
+        """Devuelve (ejecutar, motivo, huella) para una etapa cuyas dependencias ya han terminado."""
+        etapa = etapas[nombre]
+        if solo and nombre not in solo:
+            return False, "fuera de --solo", None
+        if etapa.get("red") and not permitir_red and salidas_presentes(etapa):
+            return False, "descarga ya hecha (usa --scraping)", None
+        faltan = [entrada for entrada in etapa["entradas"] if not os.path.exists(os.path.join(directorio_raiz, entrada))]
+        if faltan:
+            return False, f"faltan entradas: {', '.join(faltan)}", None
+        huella = cache.huella_etapa(etapa)
+        anterior = estado["etapas"].get(nombre, {})
+        if not forzar and anterior.get("huella") == huella and salidas_presentes(etapa):
+            return False, "al dia", huella
+        return True, "entradas cambiadas" if anterior else "primera ejecucion", huella
+
+    if "--lista" in sys.argv:
+        for nombre in nombres:
+            ejecutar, motivo, _ = decidir(nombre)
+            depende = ", ".join(dependencias[nombre]) or "-"
+            print(f"{nombre:<32} {'EJECUTAR' if ejecutar else 'saltar':<9} {motivo:<40} depende de: {depende}")
+        return
+
+    def trabajo(nombre):
+        ejecutar, motivo, huella = decidir(nombre)
+        if not ejecutar:
+            return {"estado": "saltada", "motivo": motivo}
+        print(f"[{nombre}] ejecutando ({motivo})...")
+        resultado = ejecutar_script(etapas[nombre])
+        if resultado["codigo_salida"] != 0 or not salidas_presentes(etapas[nombre]):
+            resultado["estado"] = "fallida"
+        else:
+            resultado["estado"] = "ejecutada"
+            with cerrojo_estado:
+                estado["etapas"][nombre] = {"huella": huella, "fecha": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                                            "segundos": resultado["segundos"],
+                                            "memoria_max_mb": resultado["memoria_max_mb"]}
+                guardar_estado(estado)
+        memoria = "no disponible" if resultado["memoria_max_mb"] is None else f"{resultado['memoria_max_mb']} MB"
+        print(f"[{nombre}] {resultado['estado']} en {resultado['segundos']} s "
+              f"(memoria max {memoria}, log: {resultado['log']})")
+        return resultado
+
+    print("--- Pipeline BBall Intelligence ---")
+    inicio = time.perf_counter()
+    resultados = {}
+    pendientes = list(nombres)
+    en_curso = {}
+    with ThreadPoolExecutor(max_workers=hilos) as ejecutor:
+        while pendientes or en_curso:
+            # Lanzamos todas las etapas cuyas dependencias ya han terminado
+            for nombre in list(pendientes):
+                previas = dependencias[nombre]
+                if any(resultados.get(previa, {}).get("estado") in ("fallida", "cancelada") for previa in previas):
+                    resultados[nombre] = {"estado": "cancelada", "motivo": "fallo una dependencia"}
+                    pendientes.remove(nombre)
+                elif all(previa in resultados for previa in previas):
+                    en_curso[ejecutor.submit(trabajo, nombre)] = nombre
+                    pendientes.remove(nombre)
+            if not en_curso:
+                continue
+            terminados, _ = wait(en_curso, return_when=FIRST_COMPLETED)
+            for futuro in terminados:
+                resultados[en_curso.pop(futuro)] = futuro.result()
+
+    with cerrojo_estado:
+        guardar_estado(estado)
+
+    print("-" * 30)
+    print(f"{'etapa':<32}{'estado':<11}{'segundos':>10}{'memoria MB':>12}  detalle")
+    for nombre in nombres:
+        resultado = resultados[nombre]
+        segundos = f"{resultado['segundos']:.2f}" if "segundos" in resultado else "-"
+        memoria = f"{resultado['memoria_max_mb']:.1f}" if resultado.get("memoria_max_mb") is not None else "-"
+        print(f"{nombre:<32}{resultado['estado']:<11}{segundos:>10}{memoria:>12}  {resultado.get('motivo', '')}")
+    print(f"Tiempo total: {time.perf_counter() - inicio:.2f} s")
+
+    if any(resultado["estado"] in ("fallida", "cancelada") for resultado in resultados.values()):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    ejecutar_pipeline()
@@ -1,5 +1,6 @@
 import time
 import os
+import sys
 import pandas as pd
 from bs4 import BeautifulSoup
 from selenium import webdriver
@@ -7,10 +8,19 @@ from selenium.webdriver.chrome.service import Service
 from webdriver_manager.chrome import ChromeDriverManager
 from selenium.webdriver.chrome.options import Options
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from comun.metricas import Metricas
+from comun.ligas import argumentos_particion, liga, rutas_liga, sufijo_liga
+
 # --- CONFIGURACIÓN GLOBAL ---
-ANIO_INICIO = 2015 
-ANIO_FIN = 2025 
-RUTA_CSV_SALIDA = os.path.join("datos", "bruto", "equipos", "maestro_equipos.csv")
+# Liga a recorrer (registro en comun/ligas.py): python 01_capturar_equipos.py [--liga 194] [--desde 2015] [--hasta 2025]
+ID_LIGA, _ = argumentos_particion(sys.argv)
+LIGA = liga(ID_LIGA)
+ANIO_INICIO = int(sys.argv[sys.argv.index("--desde") + 1]) if "--desde" in sys.argv else LIGA["desde"]
+ANIO_FIN = int(sys.argv[sys.argv.index("--hasta") + 1]) if "--hasta" in sys.argv else LIGA["hasta"]
+RUTA_CSV_SALIDA = rutas_liga(ID_LIGA)["equipos"]
+
+metricas = Metricas(f"scraping_equipos{sufijo_liga(ID_LIGA)}")
 
 def iniciar_navegador():
     """Inicializa la instancia del navegador Chrome con las opciones definidas."""
@@ -26,7 +36,7 @@ def capturar_equipos_historicos():
     Recorre las temporadas indicadas y extrae la lista de equipos participantes.
     Genera un archivo CSV maestro con las URLs base de cada equipo por temporada.
     """
-    print("Iniciando proceso de extracción de equipos (Primera FEB / LEB Oro)...")
+    print(f"Iniciando proceso de extracción de equipos ({LIGA['nombre']})...")
     
     # Crear directorio de destino si no existe
     carpeta_destino = os.path.dirname(RUTA_CSV_SALIDA)
@@ -38,17 +48,18 @@ def capturar_equipos_historicos():
     try:
         for anio in range(ANIO_INICIO, ANIO_FIN + 1):
             # URL del listado de equipos para la temporada específica
-            url_temporada = f"https://www.proballers.com/es/baloncesto/liga/194/spain-leb-gold/equipos/{anio}"
+            url_temporada = f"https://www.proballers.com/es/baloncesto/liga/{ID_LIGA}/{LIGA['slug']}/equipos/{anio}"
             
             print(f"Procesando temporada {anio}-{anio+1} | URL: {url_temporada}")
             
-            driver.get(url_temporada)
-            time.sleep(3) # Espera para carga completa del DOM
-            
-            soup = BeautifulSoup(driver.page_source, 'html.parser')
+            with metricas.acumular("descarga"):
+                driver.get(url_temporada)
+                time.sleep(3) # Espera para carga completa del DOM
             
-            clase_tarjeta = "home-league__team-list__content__entry-team__presentation"
-            enlaces_equipos = soup.find_all('a', class_=clase_tarjeta)
+            with metricas.acumular("parseo"):
+                soup = BeautifulSoup(driver.page_source, 'html.parser')
+                clase_tarjeta = "home-league__team-list__content__entry-team__presentation"
+                enlaces_equipos = soup.find_all('a', class_=clase_tarjeta)
             
             contador_anio = 0
             
@@ -68,10 +79,11 @@ def capturar_equipos_historicos():
                         "anio_inicio": anio,
                         "nombre_equipo": nombre_equipo,
                         "url_equipo": url_completa,
-                        "id_liga": 194
+                        "id_liga": ID_LIGA
                     })
                     contador_anio += 1
             
+            metricas.contar("equipos", contador_anio)
             print(f" -> Registrados {contador_anio} equipos para la temporada {anio}.")
 
     except Exception as e:
@@ -82,8 +94,9 @@ def capturar_equipos_historicos():
         driver.quit()
         
         if lista_equipos:
-            df_equipos = pd.DataFrame(lista_equipos)
-            df_equipos.to_csv(RUTA_CSV_SALIDA, index=False, encoding='utf-8')
+            with metricas.tramo("escribir_csv"):
+                df_equipos = pd.DataFrame(lista_equipos)
+                df_equipos.to_csv(RUTA_CSV_SALIDA, index=False, encoding='utf-8')
             
             print(f"Proceso finalizado. Archivo generado: {RUTA_CSV_SALIDA}")
             print(f"Total de registros: {len(df_equipos)}")
@@ -1,5 +1,6 @@
 import time # Herramienta para manejar los tiempos de espera
 import os # Herramienta para gestionar carpetas y archivos en tu ordenador
+import sys # Herramienta para poder importar los modulos comunes de codigo/
 import pandas as pd # Libreria principal para trabajar con tablas de datos
 from bs4 import BeautifulSoup # Herramienta para leer y analizar el codigo de las paginas web
 from selenium import webdriver # Motor para controlar el navegador de forma automatica
@@ -10,11 +11,18 @@ from selenium.webdriver.common.by import By # Herramienta para buscar elementos
 from selenium.webdriver.support.ui import WebDriverWait # Herramienta para que el codigo sepa esperar
 from selenium.webdriver.support import expected_conditions as EC # Condiciones que el codigo debe esperar
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")) # Carpeta codigo/ para importar comun
+from comun.metricas import Metricas # Instrumentacion de tiempos y contadores del pipeline
+from comun.ligas import argumentos_particion, rutas_liga, sufijo_liga # Registro de ligas (rutas de cada una)
+
+ID_LIGA, _ = argumentos_particion(sys.argv) # Liga a recorrer: python 02_capturar_plantillas.py [--liga 194]
+metricas = Metricas(f"scraping_plantillas{sufijo_liga(ID_LIGA)}") # Metricas de esta etapa (se vuelcan al terminar)
+
 # --- CONFIGURACION DE RUTAS ---
 # Ruta donde esta guardado el archivo con los equipos y sus enlaces
-RUTA_MAESTRO_EQUIPOS = os.path.join("datos", "bruto", "equipos", "maestro_equipos.csv")
+RUTA_MAESTRO_EQUIPOS = rutas_liga(ID_LIGA)["equipos"]
 # Ruta donde se guardara la lista final de jugadores por equipo
-RUTA_MAESTRO_PLANTILLAS = os.path.join("datos", "bruto", "plantillas", "maestro_plantillas.csv")
+RUTA_MAESTRO_PLANTILLAS = rutas_liga(ID_LIGA)["plantillas"]
 # Numero de equipos procesados antes de reiniciar el navegador para que no vaya lento
 REINICIAR_CADA_X_EQUIPOS = 15 
 
@@ -32,7 +40,7 @@ def extraer_lista_de_plantillas(): # Funcion principal para sacar los jugadores
     
     if not os.path.exists(RUTA_MAESTRO_EQUIPOS): # Comprobamos si el archivo de equipos existe
         print("Error: No se encuentra el archivo de equipos en la ruta") # Si no existe, avisamos
-        return # Y paramos el programa
+        sys.exit(1) # Y paramos el programa con error
 
     tabla_equipos = pd.read_csv(RUTA_MAESTRO_EQUIPOS) # Leemos la tabla de equipos con los enlaces
     
@@ -45,6 +53,7 @@ def extraer_lista_de_plantillas(): # Funcion principal para sacar los jugadores
             print(f"Se han detectado {len(equipos_ya_listos)} equipos ya procesados. Saltando...") # Informamos
         except: pass # Si hay algun fallo leyendo, seguimos adelante
 
+    os.makedirs(os.path.dirname(RUTA_MAESTRO_PLANTILLAS), exist_ok=True) # Carpeta de salida (las ligas nuevas no la tienen)
     navegador = iniciar_el_navegador() # Arrancamos el navegador
     bolsa_de_jugadores = [] # Creamos un saco donde guardar los nuevos jugadores encontrados
     contador_de_equipos = 0 # Iniciamos un contador para saber por que numero de equipo vamos
@@ -66,11 +75,13 @@ def extraer_lista_de_plantillas(): # Funcion principal para sacar los jugadores
             print(f"Procesando equipo {numero_fila + 1}: {nombre_equipo_actual} ({temporada_actual})") # Informamos
             
             try: # Intentamos entrar en la web del equipo
-                navegador.get(enlace_equipo) # Vamos a la direccion web del equipo
-                WebDriverWait(navegador, 10).until(EC.presence_of_element_located((By.TAG_NAME, "table"))) # Esperamos a que salga la tabla
-                time.sleep(2) # Esperamos 2 segundos extra para que cargue todo bien
+                with metricas.acumular("descarga"): # Medimos el tiempo de carga de la pagina
+                    navegador.get(enlace_equipo) # Vamos a la direccion web del equipo
+                    WebDriverWait(navegador, 10).until(EC.presence_of_element_located((By.TAG_NAME, "table"))) # Esperamos a que salga la tabla
+                    time.sleep(2) # Esperamos 2 segundos extra para que cargue todo bien
 
-                codigo_html = BeautifulSoup(navegador.page_source, 'html.parser') # Analizamos el codigo de la pagina
+                with metricas.acumular("parseo"): # Medimos el tiempo de analisis del HTML
+                    codigo_html = BeautifulSoup(navegador.page_source, 'html.parser') # Analizamos el codigo de la pagina
                 
                 # Buscamos el titulo exacto que dice Temporada Regular
                 titulo_regular = codigo_html.find(lambda etiqueta: etiqueta.name in ["h2", "h3"] and "Temporada Regular" in etiqueta.text)
@@ -105,6 +116,8 @@ def extraer_lista_de_plantillas(): # Funcion principal para sacar los jugadores
                                 jugadores_nuevos_conteo += 1 # Sumamos uno al contador
                 
                 print(f"   Se han extraido {jugadores_nuevos_conteo} jugadores correctamente.") # Resumen del equipo
+                metricas.contar("equipos_procesados") # Contamos el equipo
+                metricas.contar("jugadores_extraidos", jugadores_nuevos_conteo) # Y sus jugadores
                 
                 if (contador_de_equipos + 1) % 5 == 0 and bolsa_de_jugadores: # Cada 5 equipos guardamos en el archivo
                     modo_archivo = 'a' if os.path.exists(RUTA_MAESTRO_PLANTILLAS) else 'w' # Decidimos si añadir o crear
@@ -113,6 +126,7 @@ def extraer_lista_de_plantillas(): # Funcion principal para sacar los jugadores
                         
             except Exception as error_detalle: # Si falla un equipo concreto
                 print(f"Error procesando este equipo: {error_detalle}") # Avisamos del error
+                metricas.contar("equipos_con_error") # Contamos el fallo
                 navegador.quit() # Cerramos navegador
                 navegador = iniciar_el_navegador() # Lo abrimos de nuevo para seguir con el resto
             
@@ -1,5 +1,6 @@
 import time # Herramienta para manejar los tiempos y esperas
 import os # Herramienta para manejar carpetas y archivos en tu ordenador
+import sys # Herramienta para poder importar los modulos comunes de codigo/
 import re # Herramienta para buscar y filtrar textos complejos
 import pandas as pd # Libreria principal para manejar tablas de datos
 from io import StringIO # Herramienta para convertir texto en archivos virtuales
@@ -12,11 +13,20 @@ from selenium.webdriver.common.by import By # Herramienta para buscar elementos
 from selenium.webdriver.support.ui import WebDriverWait # Herramienta para hacer que el codigo espere a que cargue la web
 from selenium.webdriver.support import expected_conditions as EC # Herramienta para definir que debe esperar el codigo
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")) # Carpeta codigo/ para importar comun
+from comun.metricas import Metricas # Instrumentacion de tiempos y contadores del pipeline
+from comun.ligas import FASES, argumentos_particion, rutas_particion, sufijo_particion # Registro de ligas y fases
+from comun.normalizacion import nombre_para_archivo # Nombres de carpeta y archivo validos en cualquier sistema
+
+ID_LIGA, FASE = argumentos_particion(sys.argv) # Particion a descargar: python 03_capturar_jugadores.py [--liga 194] [--fase regular]
+TITULO_FASE = FASES[FASE] # Titulo de la seccion de la web con la tabla de esa fase (ej: Temporada Regular)
+metricas = Metricas(f"scraping_jugadores{sufijo_particion(ID_LIGA, FASE)}") # Metricas de esta etapa (se vuelcan al terminar)
+
 # --- CONFIGURACION DE RUTAS ---
 # Guardamos la ruta donde esta tu archivo con la lista de todos los jugadores
-RUTA_ARCHIVO_PLANTILLAS = os.path.join("datos", "bruto", "plantillas", "maestro_plantillas.csv")
+RUTA_ARCHIVO_PLANTILLAS = rutas_particion(ID_LIGA, FASE)["plantillas"]
 # Guardamos la ruta de la carpeta donde se iran creando las temporadas y equipos
-CARPETA_BASE_ESTADISTICAS = os.path.join("datos", "bruto", "temporadas")
+CARPETA_BASE_ESTADISTICAS = rutas_particion(ID_LIGA, FASE)["temporadas"]
 # Definimos cada cuantos jugadores queremos que el navegador se cierre y se abra para no saturar el PC
 CADA_CUANTO_REINICIAR_NAVEGADOR = 25 
 
@@ -38,10 +48,6 @@ def obtener_id_del_jugador(enlace_web): # Funcion para sacar el numero identific
     except: pass # Si hay algun error, simplemente seguimos adelante
     return "ID_DESCONOCIDO" # Si no encontramos nada, le ponemos un nombre por defecto
 
-def limpiar_nombre_para_archivo(texto_sucio): # Funcion para quitar caracteres raros que Windows no acepta en archivos
-    if not texto_sucio: return "DESCONOCIDO" # Si no hay texto, devolvemos un nombre generico
-    return str(texto_sucio).strip().replace(" ", "_").replace("/", "-").replace(".", "").replace('"', '').replace("'", "") # Quitamos espacios y simbolos
-
 def formatear_anio_temporada(texto_web): # Funcion para convertir el formato 23-24 en el año 2023
     busqueda_patron = re.match(r'^(\d{2})-(\d{2})$', texto_web) # Buscamos si el texto tiene el formato de dos numeros, guion y dos numeros
     if busqueda_patron: # Si lo encontramos
@@ -50,11 +56,11 @@ def formatear_anio_temporada(texto_web): # Funcion para convertir el formato 23-
     return None # Si el formato no coincide, devolvemos un valor vacio
 
 def descargar_partidos_que_faltan(): # Funcion principal que coordina toda la descarga
-    print("Iniciando revision de partidos pendientes (Solo Temporada Regular)...") # Mensaje informativo
+    print(f"Iniciando revision de partidos pendientes (Solo {TITULO_FASE})...") # Mensaje informativo
     
     if not os.path.exists(RUTA_ARCHIVO_PLANTILLAS): # Si no encontramos el archivo de la lista de jugadores
         print("Error: No se encuentra el archivo maestro en la ruta especificada") # Avisamos del error
-        return # Paramos la ejecucion
+        sys.exit(1) # Paramos la ejecucion con error
 
     # Leemos la lista de jugadores saltando lineas mal escritas y respetando las comillas
     lista_de_jugadores = pd.read_csv(RUTA_ARCHIVO_PLANTILLAS, on_bad_lines='skip', quotechar='"')
@@ -70,8 +76,8 @@ def descargar_partidos_que_faltan(): # Funcion principal que coordina toda la de
             anio_de_inicio = int(str(fila['temporada']).split("-")[0]) # Sacamos el año en el que empieza la temporada
             id_jugador = obtener_id_del_jugador(enlace_jugador) # Obtenemos su numero de ID
             nombre_de_la_temporada = str(fila['temporada']) # Guardamos el nombre de la temporada (ej: 2023-2024)
-            nombre_equipo_limpio = limpiar_nombre_para_archivo(fila['nombre_equipo']) # Limpiamos el nombre del equipo
-            nombre_jugador_limpio = limpiar_nombre_para_archivo(fila['nombre_jugador']) # Limpiamos el nombre del jugador
+            nombre_equipo_limpio = nombre_para_archivo(fila['nombre_equipo']) # Limpiamos el nombre del equipo (sin caracteres que Windows no acepta)
+            nombre_jugador_limpio = nombre_para_archivo(fila['nombre_jugador']) # Limpiamos el nombre del jugador
             
             # Definimos la carpeta y el nombre del archivo final
             carpeta_del_equipo = os.path.join(CARPETA_BASE_ESTADISTICAS, nombre_de_la_temporada, nombre_equipo_limpio)
@@ -91,6 +97,8 @@ def descargar_partidos_que_faltan(): # Funcion principal que coordina toda la de
         except: continue # Si algo falla en una fila, pasamos a la siguiente
 
     print(f"Archivos listos: {conteo_ya_descargados} | Archivos por bajar: {conteo_por_descargar}") # Resumen
+    metricas.contar("fichas_ya_descargadas", conteo_ya_descargados) # Guardamos el resumen en las metricas
+    metricas.contar("fichas_pendientes", conteo_por_descargar)
     if conteo_por_descargar == 0: return # Si no falta nada por descargar, el programa termina aqui de forma segura
 
     # --- PARTE DE DESCARGA (Solo se ejecuta si faltan archivos) ---
@@ -105,9 +113,11 @@ def descargar_partidos_que_faltan(): # Funcion principal que coordina toda la de
         print(f"Procesando perfil {indice + 1} de {len(enlaces_a_visitar)}: {enlace}") # Avisamos de por quien vamos
 
         try: # Intentamos entrar en el perfil del jugador
-            navegador.get(enlace) # Cargamos la pagina del jugador
-            time.sleep(1) # Esperamos un segundo
-            codigo_perfil = BeautifulSoup(navegador.page_source, 'html.parser') # Analizamos el codigo de la pagina
+            with metricas.acumular("descarga"): # Medimos el tiempo de carga del perfil
+                navegador.get(enlace) # Cargamos la pagina del jugador
+                time.sleep(1) # Esperamos un segundo
+            with metricas.acumular("parseo"): # Medimos el tiempo de analisis del HTML
+                codigo_perfil = BeautifulSoup(navegador.page_source, 'html.parser') # Analizamos el codigo de la pagina
             
             # Buscamos todos los años disponibles en el menu del jugador
             anios_en_la_web = {formatear_anio_temporada(a.text) for a in codigo_perfil.find_all('a') if formatear_anio_temporada(a.text)}
@@ -116,13 +126,16 @@ def descargar_partidos_que_faltan(): # Funcion principal que coordina toda la de
                 anio_buscado = tarea['anio'] # Definimos que año queremos bajar
                 if anio_buscado in anios_en_la_web: # Si el año esta disponible en la web
                     direccion_estadisticas = f"{enlace}/partidos/{anio_buscado}" # Creamos la direccion de la tabla de partidos
-                    navegador.get(direccion_estadisticas) # Vamos a esa pagina
-                    try: # Intentamos capturar la tabla de la liga regular
-                        WebDriverWait(navegador, 8).until(EC.presence_of_element_located((By.TAG_NAME, "table"))) # Esperamos a que salga la tabla
-                        codigo_tabla = BeautifulSoup(navegador.page_source, 'html.parser') # Analizamos la pagina de estadisticas
+                    with metricas.acumular("descarga"): # Medimos el tiempo de carga de la tabla
+                        navegador.get(direccion_estadisticas) # Vamos a esa pagina
+                    try: # Intentamos capturar la tabla de la fase elegida
+                        with metricas.acumular("espera_tabla"): # Medimos lo que tarda en aparecer la tabla
+                            WebDriverWait(navegador, 8).until(EC.presence_of_element_located((By.TAG_NAME, "table"))) # Esperamos a que salga la tabla
+                        with metricas.acumular("parseo"): # Medimos el tiempo de analisis del HTML
+                            codigo_tabla = BeautifulSoup(navegador.page_source, 'html.parser') # Analizamos la pagina de estadisticas
                         
-                        # Buscamos el titulo h2 o h3 que diga Temporada Regular
-                        cabecera_regular = codigo_tabla.find(lambda etiqueta: etiqueta.name in ["h2", "h3"] and "Temporada Regular" in etiqueta.text)
+                        # Buscamos el titulo h2 o h3 de la fase (Temporada Regular, Playoffs o Copa)
+                        cabecera_regular = codigo_tabla.find(lambda etiqueta: etiqueta.name in ["h2", "h3"] and TITULO_FASE in etiqueta.text)
                         
                         if cabecera_regular: # Si encontramos ese titulo
                             tabla_fase_regular = cabecera_regular.find_next("table") # Cogemos la tabla que esta justo debajo
@@ -134,11 +147,12 @@ def descargar_partidos_que_faltan(): # Funcion principal que coordina toda la de
                                 datos_tabla = datos_tabla[datos_tabla['MIN'] != 'MIN'] # Limpiamos filas de cabecera repetidas
                             
                             datos_tabla.to_csv(tarea['ruta'], index=False) # Guardamos el archivo en tu equipo
-                            print(f"   Descargada Temporada Regular de {tarea['equipo']} ({anio_buscado})") # Exito
-                        else: # Si no encontramos el titulo de Temporada Regular
-                            print(f"   Saltando {anio_buscado}: Solo hay datos de Playoffs o Copa") # Aviso
+                            metricas.contar("fichas_descargadas") # Contamos la ficha guardada
+                            print(f"   Descargada {TITULO_FASE} de {tarea['equipo']} ({anio_buscado})") # Exito
+                        else: # Si no encontramos el titulo de la fase
+                            print(f"   Saltando {anio_buscado}: No hay datos de {TITULO_FASE}") # Aviso
                             os.makedirs(tarea['carpeta'], exist_ok=True) # Creamos la carpeta de todos modos
-                            with open(tarea['ruta'], 'w') as archivo_vacio: archivo_vacio.write("PARTIDO,FECHA\nSALTADO,PLAYOFFS") # Dejamos una marca
+                            with open(tarea['ruta'], 'w') as archivo_vacio: archivo_vacio.write(f"PARTIDO,FECHA\nSALTADO,{FASE.upper()}") # Dejamos una marca con la fase que no tenía datos
 
                     except Exception as error_tabla: # Si falla la lectura de la tabla
                         print(f"   Error al intentar leer la tabla del año {anio_buscado}: {error_tabla}")
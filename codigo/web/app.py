@@ -1,115 +1,242 @@
-from flask import Flask, render_template, request
-from rdflib import Graph, Namespace, URIRef
+from flask import Flask, render_template, request, jsonify, abort
 import os
+import sys
 
 app = Flask(__name__)
 
 # Rutas de archivos
 directorio_actual = os.path.dirname(os.path.abspath(__file__))
-ruta_grafo_maestro = os.path.abspath(os.path.join(directorio_actual, "../../datos/grafo/bball_intelligence_MASTER.ttl"))
+ruta_grafo_maestro = os.path.abspath(os.path.join(directorio_actual, "../../datos/grafo/bball_intelligence_MASTER.nt"))
+ruta_grafo_maestro_ttl = os.path.abspath(os.path.join(directorio_actual, "../../datos/grafo/bball_intelligence_MASTER.ttl"))
 
-# Namespaces
-FEB = Namespace("http://www.tfg-basket.es/ontologia/primera-feb#")
-RES = Namespace("https://bball-intelligence.com/resource/")
-SCHEMA = Namespace("https://schema.org/")
-OWL = Namespace("http://www.w3.org/2002/07/owl#")
+sys.path.append(os.path.abspath(os.path.join(directorio_actual, "..")))
+from comun.almacen import abrir_almacen
+from web.metricas_web import instrumentar
+from web.clasificaciones import IndiceClasificaciones, METRICAS, UMBRALES_MINUTOS, UMBRAL_POR_DEFECTO
+from web.series import IndiceSeries
+from web.companeros import ServicioCompaneros
+from web.similares import IndiceSimilitud, RASGOS
+from web.partidos import IndicePartidos, VistaPartidosCompacta
+from web.fuentes import FuenteGrafo, FuenteCompacta, FUENTES_DISPONIBLES
+from web.modelo_compacto import ModeloCompacto
+from comun.estadisticas_grafo import leer_estadisticas
 
-grafo_baloncesto = Graph()
-print("Cargando base de datos semantica...")
-if os.path.exists(ruta_grafo_maestro):
-    grafo_baloncesto.parse(ruta_grafo_maestro, format="turtle")
-    print("Grafo cargado exitosamente.")
+# Grafos nombrados que se cargan al arrancar (capa, o capa:temporada, separados por comas).
+# Las temporadas de capa2 no declaradas se cargan la primera vez que una pagina las necesita.
+GRAFOS_DECLARADOS = os.environ.get("BBALL_GRAFOS", "capa1,capa3,interlinking")
+
+# Motor de consultas: rdflib (en memoria), sqlite u oxigraph (en disco, se reutilizan entre arranques)
+TIPO_ALMACEN = os.environ.get("BBALL_ALMACEN", "rdflib")
+
+# Fuente de las paginas de jugadores: grafo (SPARQL), compacto (modelo de lectura sin grafo, mucha menos memoria)
+# o mmap (el mismo modelo abierto desde datos/procesados/binario, compartido entre workers por la cache del SO)
+TIPO_FUENTE = os.environ.get("BBALL_FUENTE", "grafo")
+if TIPO_FUENTE not in FUENTES_DISPONIBLES:
+    raise ValueError(f"Fuente desconocida '{TIPO_FUENTE}'. Opciones: {', '.join(FUENTES_DISPONIBLES)}")
+
+if TIPO_FUENTE in ("compacto", "mmap"):
+    print(f"Cargando modelo compacto ({'columnas binarias con memmap' if TIPO_FUENTE == 'mmap' else 'capas procesadas'})...")
+    almacen, cargador_grafos = None, None
+    modelo = ModeloCompacto.desde_binario() if TIPO_FUENTE == "mmap" else ModeloCompacto()
+    fuente = FuenteCompacta(modelo)
+    print(f"Modelo compacto listo ({len(modelo.jugadores)} jugadores, {len(modelo.actuaciones)} actuaciones, "
+          f"{modelo.bytes_ocupados() / (1024 * 1024):.1f} MB en arrays).")
+else:
+    print(f"Cargando base de datos semantica (almacen {TIPO_ALMACEN})...")
+    almacen, cargador_grafos = abrir_almacen(TIPO_ALMACEN, GRAFOS_DECLARADOS,
+                                             [(ruta_grafo_maestro, "nt"), (ruta_grafo_maestro_ttl, "turtle")],
+                                             solo_lectura=True)
+    if cargador_grafos is not None:
+        print(f"Grafos cargados: {', '.join(sorted(cargador_grafos.cargados))}")
+    else:
+        print(f"Grafo cargado exitosamente ({len(almacen)} tripletas).")
+    fuente = FuenteGrafo(almacen, cargador_grafos)
+
+# Recuentos y destacados que calcula unificar_final.py al publicar el grafo: la portada no consulta el almacen
+estadisticas = leer_estadisticas()
+
+# Latencias por ruta (consulta / render) en /metrics y log de consultas lentas (BBALL_METRICAS_WEB=0 lo desactiva)
+metricas_web = instrumentar(app, almacen, cargador_grafos)
+
+# Clasificaciones precalculadas desde los CSV de capa3 (no tocan el almacen SPARQL)
+clasificaciones = IndiceClasificaciones()
+print(f"Clasificaciones listas ({len(clasificaciones.rangos)} rankings, temporadas {clasificaciones.temporadas})")
+
+# Forma reciente, rachas y splits casa/fuera precalculados por limpieza/capa2_ventanas.py
+series = IndiceSeries()
+
+# Companeros de equipo (matrices dispersas jugador x partido de limpieza/capa2_companeros.py)
+companeros = ServicioCompaneros()
+
+# "Jugadores como X": similitud coseno entre temporadas de capa3_jugadores_avanzado.csv
+similitud = IndiceSimilitud()
+
+# Fichas de partido, temporadas de equipo y cara a cara: con el modelo compacto, sobre su indice por club;
+# si no, desde los CSV de capa2 (presupuesto en BBALL_MEMORIA_PARTIDOS_MB)
+indice_partidos = VistaPartidosCompacta(modelo) if TIPO_FUENTE in ("compacto", "mmap") else IndicePartidos()
 
 @app.route('/')
 def inicio():
-    consulta_conteo = "SELECT (COUNT(?p) AS ?total) WHERE { ?p a <https://schema.org/Person> }"
-    resultado = grafo_baloncesto.query(consulta_conteo)
-    total_jugadores = str(list(resultado)[0][0])
-    return render_template('inicio.html', cantidad=total_jugadores)
+    if estadisticas is None:
+        # Grafo unificado antes de que existiera estadisticas.json: se cuenta con una consulta
+        return render_template('inicio.html', cantidad=fuente.contar_jugadores(), estadisticas=None)
+    return render_template('inicio.html', cantidad=estadisticas['totales']['jugadores'], estadisticas=estadisticas)
 
 @app.route('/jugadores')
 def listar_jugadores():
     busqueda = request.args.get('nombre', '')
-    filtro = f'FILTER(regex(str(?nombre), "{busqueda}", "i"))' if busqueda else ""
-    
-    consulta = f"""
-    PREFIX schema: <https://schema.org/>
-    PREFIX owl: <http://www.w3.org/2002/07/owl#>
-    SELECT ?uri ?nombre ?wikidata WHERE {{
-        ?uri a schema:Person ; schema:name ?nombre .
-        {filtro}
-        OPTIONAL {{ ?uri owl:sameAs ?wikidata . }}
-    }} ORDER BY ?nombre LIMIT 50
-    """
-    
-    resultados = grafo_baloncesto.query(consulta)
-    lista_jugadores = []
-    for fila in resultados:
-        lista_jugadores.append({
-            'id': str(fila.uri).split('/')[-1],
-            'nombre': str(fila.nombre),
-            'wikidata': str(fila.wikidata) if fila.wikidata else None
-        })
+    lista_jugadores = fuente.buscar_jugadores(busqueda)
     return render_template('jugadores.html', jugadores=lista_jugadores, busqueda=busqueda)
 
 @app.route('/jugador/<id_jugador>')
 def detalle_jugador(id_jugador):
-    uri_sujeto = URIRef(f"https://bball-intelligence.com/resource/person/{id_jugador}")
-    
-    # Datos de perfil y avanzada
-    consulta_perfil = f"""
-    PREFIX schema: <https://schema.org/>
-    PREFIX feb: <http://www.tfg-basket.es/ontologia/primera-feb#>
-    PREFIX owl: <http://www.w3.org/2002/07/owl#>
-    SELECT ?nombre ?url_pb ?wikidata ?ts ?efg ?val_min ?ortg WHERE {{
-        <{uri_sujeto}> schema:name ?nombre ; schema:url ?url_pb .
-        OPTIONAL {{ <{uri_sujeto}> owl:sameAs ?wikidata . }}
-        OPTIONAL {{
-            <{uri_sujeto}> feb:hasPlayerAnalysis ?analisis .
-            OPTIONAL {{ ?analisis feb:tsPercentage ?ts . }}
-            OPTIONAL {{ ?analisis feb:efgPercentage ?efg . }}
-            OPTIONAL {{ ?analisis feb:valPerMinute ?val_min . }}
-            OPTIONAL {{ ?analisis feb:ortgIndividual ?ortg . }}
-        }}
-    }} ORDER BY DESC(?analisis) LIMIT 1
-    """
-    
-    # Actuaciones recientes
-    consulta_partidos = f"""
-    PREFIX feb: <http://www.tfg-basket.es/ontologia/primera-feb#>
-    SELECT ?fecha ?puntos ?valoracion WHERE {{
-        ?act feb:performer <{uri_sujeto}> ;
-             feb:playedMatch ?partido ;
-             feb:points ?puntos ;
-             feb:efficiencyValue ?valoracion .
-        ?partido feb:startDate ?fecha .
-    }} ORDER BY DESC(?fecha) LIMIT 10
-    """
-
-    res_p = grafo_baloncesto.query(consulta_perfil)
-    res_m = grafo_baloncesto.query(consulta_partidos)
-
-    datos = {}
-    for f in res_p:
-        datos = {
-            'nombre': str(f.nombre),
-            'url_pb': str(f.url_pb),
-            'wikidata': str(f.wikidata) if f.wikidata else None,
-            'ts': round(float(f.ts), 2) if f.ts else None,
-            'efg': round(float(f.efg), 2) if f.efg else None,
-            'val_min': round(float(f.val_min), 2) if f.val_min else None,
-            'ortg': round(float(f.ortg), 2) if f.ortg else None
-        }
-
-    partidos = []
-    for f in res_m:
-        partidos.append({
-            'fecha': str(f.fecha),
-            'puntos': int(float(f.puntos)),
-            'valoracion': int(float(f.valoracion))
-        })
-
-    return render_template('jugador.html', jugador=datos, partidos=partidos)
+    datos, partidos, carrera, evolucion = fuente.ficha_jugador(id_jugador)
+    habituales = companeros.companeros(id_jugador, k=5) or []
+
+    return render_template('jugador.html', jugador=datos, partidos=partidos, carrera=carrera, evolucion=evolucion,
+                           companeros=habituales)
+
+def parametros_clasificacion(tipo, metrica):
+    if tipo not in METRICAS or metrica not in METRICAS[tipo]:
+        abort(404)
+    liga = request.args.get('liga', clasificaciones.liga_por_defecto, type=int)
+    temporada = request.args.get('temporada', type=int)
+    if temporada is None:
+        temporadas = clasificaciones.temporadas_de(liga)
+        temporada = temporadas[-1] if temporadas else 0
+    minutos = request.args.get('minutos', UMBRAL_POR_DEFECTO, type=int)
+    return liga, temporada, clasificaciones.umbral_valido(tipo, minutos)
+
+@app.route('/clasificaciones')
+def ver_clasificaciones():
+    tipo = request.args.get('tipo', 'jugadores')
+    metrica = request.args.get('metrica', next(iter(METRICAS.get(tipo, {'': None}))))
+    liga, temporada, minutos = parametros_clasificacion(tipo, metrica)
+    n = max(1, min(request.args.get('n', 25, type=int), 200))
+    filas = clasificaciones.top(tipo, metrica, temporada, n, minutos, liga)
+    return render_template('clasificaciones.html', filas=filas, tipo=tipo, metrica=metrica, liga=liga, temporada=temporada,
+                           minutos=minutos, n=n, metricas=METRICAS, ligas=clasificaciones.nombres_ligas(),
+                           temporadas=clasificaciones.temporadas_de(liga), umbrales=UMBRALES_MINUTOS)
+
+@app.route('/api/clasificaciones/<tipo>/<metrica>')
+def api_clasificacion(tipo, metrica):
+    liga, temporada, minutos = parametros_clasificacion(tipo, metrica)
+    n = max(1, min(request.args.get('n', 25, type=int), 1000))
+    return jsonify({'tipo': tipo, 'metrica': metrica, 'liga': liga, 'temporada': temporada, 'minutos_minimos': minutos,
+                    'clasificacion': clasificaciones.top(tipo, metrica, temporada, n, minutos, liga)})
+
+@app.route('/api/clasificaciones/<tipo>/<metrica>/<identificador>')
+def api_puesto(tipo, metrica, identificador):
+    liga, temporada, minutos = parametros_clasificacion(tipo, metrica)
+    puestos = clasificaciones.puesto(tipo, metrica, temporada, identificador, minutos, liga)
+    if not puestos:
+        abort(404)
+    return jsonify({'tipo': tipo, 'metrica': metrica, 'liga': liga, 'temporada': temporada, 'minutos_minimos': minutos,
+                    'puestos': puestos})
+
+@app.route('/api/jugador/<id_jugador>/forma')
+def api_forma_jugador(id_jugador):
+    ultimos = max(1, min(request.args.get('ultimos', 10, type=int), 500))
+    partidos = series.forma_jugador(id_jugador, ultimos)
+    if partidos is None:
+        abort(404)
+    return jsonify({'jugador': id_jugador, 'partidos': partidos})
+
+@app.route('/api/equipo/<id_equipo>/forma')
+def api_forma_equipo(id_equipo):
+    resultado = series.forma_equipo(id_equipo, request.args.get('temporada', type=int))
+    if resultado is None:
+        abort(404)
+    temporada, partidos = resultado
+    return jsonify({'equipo': id_equipo, 'temporada': temporada, 'partidos': partidos})
+
+@app.route('/api/<any(jugador, equipo):tipo>/<identificador>/splits')
+def api_splits(tipo, identificador):
+    splits = series.splits(tipo, identificador, request.args.get('temporada', type=int))
+    if splits is None:
+        abort(404)
+    return jsonify({tipo: identificador, 'splits': splits})
+
+@app.route('/api/jugador/<id_jugador>/companeros')
+def api_companeros(id_jugador):
+    temporada = request.args.get('temporada', type=int)
+    k = max(1, min(request.args.get('k', 10, type=int), 100))
+    lista = companeros.companeros(id_jugador, temporada, k)
+    if lista is None:
+        abort(404)
+    return jsonify({'jugador': id_jugador, 'temporada': temporada, 'companeros': lista})
+
+@app.route('/api/jugador/<id_jugador>/companeros/<id_companero>')
+def api_pareja(id_jugador, id_companero):
+    temporada = request.args.get('temporada', type=int)
+    pareja = companeros.pareja(id_jugador, id_companero, temporada)
+    if pareja is None:
+        abort(404)
+    return jsonify({'jugador': id_jugador, 'companero': id_companero, 'temporada': temporada, **pareja})
+
+def parametros_similitud():
+    return {'temporada': request.args.get('temporada', type=int),
+            'k': max(1, min(request.args.get('k', 10, type=int), 100)),
+            'en_temporada': request.args.get('en_temporada', type=int),
+            'aproximado': request.args.get('aprox', 0, type=int) == 1}
+
+@app.route('/jugador/<id_jugador>/similares')
+def ver_similares(id_jugador):
+    parametros = parametros_similitud()
+    resultado = similitud.similares(id_jugador, **parametros)
+    if resultado is None:
+        abort(404)
+    return render_template('similares.html', resultado=resultado, rasgos=RASGOS, temporadas=similitud.temporadas_de(id_jugador),
+                           temporadas_liga=clasificaciones.temporadas, **parametros)
+
+@app.route('/api/jugador/<id_jugador>/similares')
+def api_similares(id_jugador):
+    resultado = similitud.similares(id_jugador, **parametros_similitud())
+    if resultado is None:
+        abort(404)
+    return jsonify(resultado)
+
+@app.route('/partido/<id_partido>')
+def ver_partido(id_partido):
+    partido = indice_partidos.partido(id_partido)
+    if partido is None:
+        abort(404)
+    return render_template('partido.html', partido=partido)
+
+@app.route('/api/partido/<id_partido>')
+def api_partido(id_partido):
+    partido = indice_partidos.partido(id_partido)
+    if partido is None:
+        abort(404)
+    return jsonify(partido)
+
+@app.route('/equipo/<id_equipo>/<int:temporada>')
+def ver_equipo_temporada(id_equipo, temporada):
+    equipo = indice_partidos.equipo_temporada(id_equipo, temporada)
+    if equipo is None:
+        abort(404)
+    return render_template('equipo.html', equipo=equipo)
+
+@app.route('/api/equipo/<id_equipo>/<int:temporada>')
+def api_equipo_temporada(id_equipo, temporada):
+    equipo = indice_partidos.equipo_temporada(id_equipo, temporada)
+    if equipo is None:
+        abort(404)
+    return jsonify(equipo)
+
+@app.route('/cara-a-cara/<id_a>/<id_b>')
+def ver_cara_a_cara(id_a, id_b):
+    cruce = indice_partidos.cara_a_cara(id_a, id_b)
+    if cruce is None:
+        abort(404)
+    return render_template('cara_a_cara.html', cruce=cruce)
+
+@app.route('/api/cara-a-cara/<id_a>/<id_b>')
+def api_cara_a_cara(id_a, id_b):
+    cruce = indice_partidos.cara_a_cara(id_a, id_b)
+    if cruce is None:
+        abort(404)
+    return jsonify(cruce)
 
 if __name__ == '__main__':
     app.run(debug=True, port=5000)
\ No newline at end of file
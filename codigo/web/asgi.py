@@ -0,0 +1,211 @@
+import asyncio
+import io
+import json
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+# Modo de servicio ASGI para la web (en lugar de app.run, el servidor de desarrollo de Flask).
+# Las rutas son las mismas de app.py: cada peticion se traduce a WSGI y se ejecuta en un pool
+# acotado de hilos, de modo que el bucle de eventos sigue aceptando y respondiendo mientras una
+# ficha de jugador evalua su SPARQL. Hay dos carriles, cada uno con su pool:
+#   - consultas: las rutas que consultan el almacen (ENDPOINTS_CON_CONSULTAS), BBALL_ASGI_HILOS hilos
+#   - ligero: el resto (indices en memoria, milisegundos), BBALL_ASGI_HILOS_LIGEROS hilos
+# asi una rafaga de fichas lentas no deja esperando a las clasificaciones o a la API. Encima:
+#   - tiempo limite por peticion: pasado BBALL_ASGI_TIMEOUT_S se responde 504 (el hilo termina su
+#     trabajo, un hilo de Python no se puede interrumpir, y solo entonces libera su plaza)
+#   - control de admision: en cada carril como mucho sus hilos en ejecucion y BBALL_ASGI_COLA
+#     (consultas) o BBALL_ASGI_COLA_LIGERA esperando; el resto recibe 503 con Retry-After en vez
+#     de acumular latencia
+#   - /asgi/estado devuelve los contadores en JSON (sin pasar por Flask)
+#
+# rdflib es Python puro y no suelta el GIL: los hilos no evaluan consultas en paralelo, protegen la
+# latencia del resto de peticiones. Para usar varios nucleos se arrancan varios procesos
+# (--workers), idealmente con BBALL_FUENTE=mmap para que compartan las columnas del modelo compacto
+# (clasificaciones, series, companeros y similitud se siguen construyendo en cada worker).
+#
+#   python asgi.py                                    (uvicorn en BBALL_HOST:BBALL_PUERTO, 127.0.0.1:8000)
+#   uvicorn web.asgi:aplicacion --workers 4           (desde codigo/)
+
+HILOS = int(os.environ.get("BBALL_ASGI_HILOS", "4"))
+COLA = int(os.environ.get("BBALL_ASGI_COLA", "8"))
+HILOS_LIGEROS = int(os.environ.get("BBALL_ASGI_HILOS_LIGEROS", "4"))
+COLA_LIGERA = int(os.environ.get("BBALL_ASGI_COLA_LIGERA", "64"))
+TIEMPO_LIMITE = float(os.environ.get("BBALL_ASGI_TIMEOUT_S", "30"))
+CUERPO_MAXIMO = 1024 * 1024
+
+directorio_actual = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.abspath(os.path.join(directorio_actual, "..")))
+from werkzeug.exceptions import HTTPException
+from web.app import app as app_flask, fuente, estadisticas
+
+# Endpoints de Flask que pasan por la fuente de datos (SPARQL con BBALL_FUENTE=grafo); la portada
+# solo si no hay estadisticas precalculadas
+ENDPOINTS_CON_CONSULTAS = {"listar_jugadores", "detalle_jugador"} | (set() if estadisticas else {"inicio"})
+
+
+class Carril:
+    def __init__(self, nombre, hilos, cola):
+        self.ejecutor = ThreadPoolExecutor(max_workers=hilos, thread_name_prefix=f"bball-{nombre}")
+        self.hilos = hilos
+        self.capacidad = hilos + cola
+        # Solo se modifican desde el hilo del bucle de eventos: no necesitan cerrojo
+        self.en_curso = 0
+        self.atendidas = 0
+        self.rechazadas = 0
+        self.agotadas = 0
+
+    def liberar(self, futuro):
+        self.en_curso -= 1
+
+    def estado(self):
+        return {"hilos": self.hilos, "capacidad": self.capacidad, "en_curso": self.en_curso, "atendidas": self.atendidas,
+                "rechazadas_503": self.rechazadas, "agotadas_504": self.agotadas}
+
+
+class AdaptadorASGI:
+    def __init__(self, app_wsgi, carriles, clasificar, tiempo_limite=TIEMPO_LIMITE):
+        self.app_wsgi = app_wsgi
+        self.carriles = carriles
+        self.clasificar = clasificar
+        self.tiempo_limite = tiempo_limite
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            await self._ciclo_de_vida(receive, send)
+            return
+        if scope["type"] != "http":
+            return
+        if scope["path"] == "/asgi/estado":
+            await self._responder(send, 200, json.dumps(self.estado()).encode(), "application/json")
+            return
+        carril = self.carriles[self.clasificar(scope["path"])]
+        if carril.en_curso >= carril.capacidad:
+            carril.rechazadas += 1
+            await self._responder(send, 503, "Servidor saturado, vuelve a intentarlo en unos segundos".encode(),
+                                  cabeceras=[(b"retry-after", b"1")])
+            return
+
+        cuerpo = await self._leer_cuerpo(receive)
+        if cuerpo is None:
+            await self._responder(send, 413, "Cuerpo de la peticion demasiado grande".encode())
+            return
+
+        bucle = asyncio.get_running_loop()
+        carril.en_curso += 1
+        futuro = bucle.run_in_executor(carril.ejecutor, self._ejecutar_wsgi, self._entorno(scope, cuerpo))
+        # La plaza se libera cuando el hilo acaba de verdad, aunque la peticion ya haya recibido su 504
+        futuro.add_done_callback(carril.liberar)
+        try:
+            estado, cabeceras, contenido = await asyncio.wait_for(asyncio.shield(futuro), self.tiempo_limite)
+        except asyncio.TimeoutError:
+            carril.agotadas += 1
+            await self._responder(send, 504, f"La peticion supero el limite de {self.tiempo_limite:g} s".encode())
+            return
+        carril.atendidas += 1
+        await send({"type": "http.response.start", "status": estado, "headers": cabeceras})
+        await send({"type": "http.response.body", "body": contenido})
+
+    def estado(self):
+        return {"tiempo_limite_s": self.tiempo_limite, **{nombre: carril.estado() for nombre, carril in self.carriles.items()}}
+
+    # --- Traduccion ASGI <-> WSGI ---
+
+    async def _leer_cuerpo(self, receive):
+        partes, tamano = [], 0
+        while True:
+            mensaje = await receive()
+            if mensaje["type"] == "http.disconnect":
+                break
+            trozo = mensaje.get("body", b"")
+            tamano += len(trozo)
+            if tamano > CUERPO_MAXIMO:
+                return None
+            partes.append(trozo)
+            if not mensaje.get("more_body", False):
+                break
+        return b"".join(partes)
+
+    def _entorno(self, scope, cuerpo):
+        servidor = scope.get("server") or ("localhost", 80)
+        cliente = scope.get("client") or ("", 0)
+        entorno = {
+            "REQUEST_METHOD": scope["method"],
+            "SCRIPT_NAME": scope.get("root_path", ""),
+            # WSGI espera la ruta como bytes decodificados en latin-1 (PEP 3333)
+            "PATH_INFO": scope["path"].encode("utf-8").decode("latin-1"),
+            "QUERY_STRING": scope["query_string"].decode("latin-1"),
+            "SERVER_NAME": servidor[0],
+            "SERVER_PORT": str(servidor[1]),
+            "SERVER_PROTOCOL": f"HTTP/{scope.get('http_version', '1.1')}",
+            "REMOTE_ADDR": cliente[0],
+            "wsgi.version": (1, 0),
+            "wsgi.url_scheme": scope.get("scheme", "http"),
+            "wsgi.input": io.BytesIO(cuerpo),
+            "wsgi.errors": sys.stderr,
+            "wsgi.multithread": True,
+            "wsgi.multiprocess": True,
+            "wsgi.run_once": False,
+        }
+        for nombre, valor in scope["headers"]:
+            nombre = nombre.decode("latin-1").upper().replace("-", "_")
+            clave = nombre if nombre in ("CONTENT_TYPE", "CONTENT_LENGTH") else f"HTTP_{nombre}"
+            valor = valor.decode("latin-1")
+            entorno[clave] = f"{entorno[clave]},{valor}" if clave in entorno else valor
+        return entorno
+
+    def _ejecutar_wsgi(self, entorno):
+        respuesta = {}
+        partes = []
+
+        def start_response(estado, cabeceras, exc_info=None):
+            respuesta["estado"] = int(estado.split(" ", 1)[0])
+            respuesta["cabeceras"] = [(nombre.lower().encode("latin-1"), valor.encode("latin-1")) for nombre, valor in cabeceras]
+            return partes.append
+
+        iterable = self.app_wsgi(entorno, start_response)
+        try:
+            for trozo in iterable:
+                partes.append(trozo)
+        finally:
+            if hasattr(iterable, "close"):
+                iterable.close()
+        return respuesta["estado"], respuesta["cabeceras"], b"".join(partes)
+
+    async def _responder(self, send, estado, contenido, tipo="text/plain; charset=utf-8", cabeceras=()):
+        await send({"type": "http.response.start", "status": estado,
+                    "headers": [(b"content-type", tipo.encode()), (b"content-length", str(len(contenido)).encode()), *cabeceras]})
+        await send({"type": "http.response.body", "body": contenido})
+
+    async def _ciclo_de_vida(self, receive, send):
+        while True:
+            mensaje = await receive()
+            if mensaje["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            elif mensaje["type"] == "lifespan.shutdown":
+                for carril in self.carriles.values():
+                    carril.ejecutor.shutdown(wait=False)
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+
+def carril_flask(ruta, adaptador_rutas=app_flask.url_map.bind("localhost")):
+    """Carril de una ruta segun el endpoint de Flask que la atiende (las desconocidas, al ligero: son un 404)."""
+    if fuente.nombre != "grafo":
+        return "ligero"
+    try:
+        endpoint, _ = adaptador_rutas.match(ruta)
+    except HTTPException:
+        return "ligero"
+    return "consultas" if endpoint in ENDPOINTS_CON_CONSULTAS else "ligero"
+
+
+aplicacion = AdaptadorASGI(app_flask, {"consultas": Carril("consultas", HILOS, COLA),
+                                       "ligero": Carril("ligero", HILOS_LIGEROS, COLA_LIGERA)}, carril_flask)
+
+if __name__ == '__main__':
+    try:
+        import uvicorn
+    except ImportError:
+        sys.exit("El modo ASGI necesita uvicorn (pip install uvicorn)")
+    uvicorn.run(aplicacion, host=os.environ.get("BBALL_HOST", "127.0.0.1"), port=int(os.environ.get("BBALL_PUERTO", "8000")))
@@ -0,0 +1,163 @@
+import os
+import re
+import numpy as np
+import pandas as pd
+from comun.ligas import PARTICION_POR_DEFECTO, registro_ligas
+
+# Clasificaciones por liga y temporada precalculadas desde los CSV de capa3, sin pasar por SPARQL.
+# Para cada (tipo, metrica, liga, temporada, umbral de minutos) se guardan dos arrays de numpy:
+# los valores ordenados de mayor a menor (negados, para poder usar searchsorted) y la fila
+# de la tabla que ocupa cada puesto. El top-N es un corte del array y el puesto de un
+# jugador o equipo concreto es una busqueda binaria, O(log n).
+
+directorio_actual = os.path.dirname(os.path.abspath(__file__))
+CARPETA_CAPA3 = os.path.abspath(os.path.join(directorio_actual, "../../datos/procesados/capa3"))
+
+# metrica -> (columna del CSV, etiqueta para la web)
+METRICAS = {
+    "jugadores": {
+        "ts": ("ts_porcentaje", "TS%"),
+        "efg": ("efg_porcentaje", "eFG%"),
+        "ortg": ("ortg_individual", "ORTG"),
+        "val_min": ("valoracion_por_minuto", "Valoracion/min"),
+    },
+    "equipos": {
+        "win_rate": ("win_rate", "% Victorias"),
+        "pace": ("posesiones_por_partido", "Ritmo (posesiones/partido)"),
+        "ortg": ("ortg_equipo", "ORTG"),
+        "net": ("net_rating", "Net Rating"),
+        "ts": ("ts_porcentaje", "TS%"),
+    },
+}
+
+# Minutos totales minimos en la temporada (solo jugadores; cada umbral tiene su propia clasificacion)
+UMBRALES_MINUTOS = (0, 100, 300, 600)
+UMBRAL_POR_DEFECTO = 300
+
+
+def extraer_id(url):
+    coincidencia = re.search(r'/(\d+)/?', str(url))
+    return coincidencia.group(1) if coincidencia else "desconocido"
+
+
+class IndiceClasificaciones:
+    def __init__(self, carpeta_capa3=CARPETA_CAPA3):
+        self.columnas = {}      # tipo -> {nombre_columna: array}
+        self.rangos = {}        # (tipo, metrica, liga, temporada, umbral) -> (valores negados ordenados, filas)
+        self.filas_por_id = {}  # (tipo, liga, temporada, id) -> filas (un jugador puede tener varias por cambiar de equipo)
+        self.temporadas = []    # Todas las temporadas, de cualquier liga
+        self.temporadas_por_liga = {}
+
+        ruta_equipos = os.path.join(carpeta_capa3, "capa3_equipos_avanzado.csv")
+        ruta_jugadores = os.path.join(carpeta_capa3, "capa3_jugadores_avanzado.csv")
+        nombres_equipos = {}
+        if os.path.exists(ruta_equipos):
+            df_equipos = pd.read_csv(ruta_equipos)
+            ids_equipo = df_equipos['uri_equipo'].map(extraer_id).to_numpy()
+            nombres_equipos = dict(zip(ids_equipo, df_equipos['nombre_equipo']))
+            self._registrar("equipos", df_equipos, {
+                "id": ids_equipo,
+                "nombre": df_equipos['nombre_equipo'].to_numpy(),
+                "partidos": df_equipos['partidos_jugados'].to_numpy(),
+            }, minutos=None)
+        if os.path.exists(ruta_jugadores):
+            df_jugadores = pd.read_csv(ruta_jugadores)
+            ids_equipo = df_jugadores['uri_equipo'].map(extraer_id).to_numpy()
+            self._registrar("jugadores", df_jugadores, {
+                "id": df_jugadores['url_jugador'].map(extraer_id).to_numpy(),
+                "nombre": df_jugadores['nombre_jugador'].to_numpy(),
+                "id_equipo": ids_equipo,
+                "equipo": np.array([nombres_equipos.get(i, "") for i in ids_equipo], dtype=object),
+                "partidos": df_jugadores['partidos_jugados'].to_numpy(),
+                "minutos": df_jugadores['minutos_total'].to_numpy(dtype=float),
+            }, minutos=df_jugadores['minutos_total'].to_numpy(dtype=float))
+
+    @property
+    def ligas(self):
+        return sorted(self.temporadas_por_liga)
+
+    @property
+    def liga_por_defecto(self):
+        if not self.temporadas_por_liga or PARTICION_POR_DEFECTO[0] in self.temporadas_por_liga:
+            return PARTICION_POR_DEFECTO[0]
+        return self.ligas[0]
+
+    def nombres_ligas(self):
+        registro = registro_ligas()
+        return {liga: registro.get(liga, {}).get("nombre", str(liga)) for liga in self.ligas}
+
+    def _registrar(self, tipo, df, columnas, minutos):
+        temporadas = df['ano_inicio'].to_numpy()
+        # CSV de capa3 anteriores a las particiones por liga: todo es de la liga por defecto
+        ligas = df['id_liga'].to_numpy(dtype=int) if 'id_liga' in df.columns else np.full(len(df), PARTICION_POR_DEFECTO[0])
+        # Una metrica cuya columna aun no existe (CSV generado con una version anterior) queda sin clasificacion
+        disponibles = [metrica for metrica, (columna, _) in METRICAS[tipo].items() if columna in df.columns]
+        for metrica in disponibles:
+            columnas[metrica] = df[METRICAS[tipo][metrica][0]].to_numpy(dtype=float)
+        self.columnas[tipo] = columnas
+        self.temporadas = sorted(set(self.temporadas) | set(int(t) for t in np.unique(temporadas)))
+
+        for fila, (liga, temporada, identificador) in enumerate(zip(ligas, temporadas, columnas["id"])):
+            self.filas_por_id.setdefault((tipo, int(liga), int(temporada), identificador), []).append(fila)
+
+        umbrales = UMBRALES_MINUTOS if minutos is not None else (0,)
+        for liga, temporada in sorted(set(zip(ligas.tolist(), temporadas.tolist()))):
+            self.temporadas_por_liga.setdefault(int(liga), set()).add(int(temporada))
+            # Cada liga tiene su propia clasificacion: no se mezclan equipos ni jugadores de ligas distintas
+            en_temporada = (ligas == liga) & (temporadas == temporada)
+            for metrica in disponibles:
+                valores = columnas[metrica]
+                validas = en_temporada & ~np.isnan(valores)
+                for umbral in umbrales:
+                    filas = np.flatnonzero(validas & (minutos >= umbral) if umbral else validas)
+                    # Orden estable: a igualdad de valor se respeta el orden del CSV
+                    filas = filas[np.argsort(-valores[filas], kind="stable")]
+                    self.rangos[(tipo, metrica, int(liga), int(temporada), umbral)] = (-valores[filas], filas)
+
+    def temporadas_de(self, liga):
+        return sorted(self.temporadas_por_liga.get(liga, ()))
+
+    def umbral_valido(self, tipo, minutos):
+        """Ajusta el minimo pedido al umbral precalculado inmediatamente inferior."""
+        if tipo != "jugadores":
+            return 0
+        return max(u for u in UMBRALES_MINUTOS if u <= max(0, minutos))
+
+    def _fila_a_dict(self, tipo, metrica, fila, puesto):
+        columnas = self.columnas[tipo]
+        entrada = {"puesto": int(puesto), "id": str(columnas["id"][fila]), "nombre": str(columnas["nombre"][fila]),
+                   "partidos": int(columnas["partidos"][fila]), "valor": round(float(columnas[metrica][fila]), 2)}
+        if tipo == "jugadores":
+            entrada.update({"id_equipo": str(columnas["id_equipo"][fila]), "equipo": str(columnas["equipo"][fila]),
+                            "minutos": int(columnas["minutos"][fila])})
+        return entrada
+
+    def top(self, tipo, metrica, temporada, n=25, minutos=UMBRAL_POR_DEFECTO, liga=None):
+        liga = self.liga_por_defecto if liga is None else liga
+        clave = (tipo, metrica, liga, temporada, self.umbral_valido(tipo, minutos))
+        if clave not in self.rangos:
+            return []
+        negados, filas = self.rangos[clave]
+        # Puesto de competicion: los empates comparten puesto (1, 2, 2, 4...)
+        puestos = np.searchsorted(negados, negados[:n], side="left") + 1
+        return [self._fila_a_dict(tipo, metrica, fila, puesto) for fila, puesto in zip(filas[:n], puestos)]
+
+    def puesto(self, tipo, metrica, temporada, identificador, minutos=UMBRAL_POR_DEFECTO, liga=None):
+        """Puesto de un jugador/equipo en una temporada de una liga (una entrada por equipo si cambio de club)."""
+        liga = self.liga_por_defecto if liga is None else liga
+        umbral = self.umbral_valido(tipo, minutos)
+        clave = (tipo, metrica, liga, temporada, umbral)
+        if clave not in self.rangos:
+            return []
+        negados, filas_ordenadas = self.rangos[clave]
+        columnas = self.columnas[tipo]
+        resultado = []
+        for fila in self.filas_por_id.get((tipo, liga, temporada, identificador), []):
+            valor = columnas[metrica][fila]
+            if np.isnan(valor) or (tipo == "jugadores" and columnas["minutos"][fila] < umbral):
+                continue
+            puesto = np.searchsorted(negados, -valor, side="left") + 1
+            entrada = self._fila_a_dict(tipo, metrica, fila, puesto)
+            entrada["total"] = len(filas_ordenadas)
+            resultado.append(entrada)
+        return resultado
@@ -0,0 +1,39 @@
+import os
+import pandas as pd
+from comun.coocurrencia import IndiceCompaneros, CARPETA_COMPANEROS
+from web.series import a_registros
+
+# Companeros de equipo desde el indice de limpieza/capa2_companeros.py.
+# El top-k de cada jugador (carrera y por temporada) ya viene precalculado en companeros_top.csv;
+# las consultas que no caben ahi (k mayor o una pareja concreta) van a las matrices dispersas.
+
+
+class ServicioCompaneros:
+    def __init__(self, carpeta=CARPETA_COMPANEROS):
+        self.indice = IndiceCompaneros.cargar(carpeta)
+        self.top = None
+        self.grupos = {}
+        self.k_precalculado = 0
+        ruta_top = os.path.join(carpeta, "companeros_top.csv")
+        if os.path.exists(ruta_top):
+            self.top = pd.read_csv(ruta_top, dtype={"id_jugador": str, "id_companero": str, "temporada": str})
+            self.grupos = self.top.groupby(["id_jugador", "temporada"]).indices
+            self.k_precalculado = int(self.top["puesto"].max()) if len(self.top) else 0
+
+    def disponible(self):
+        return self.indice is not None
+
+    def companeros(self, id_jugador, temporada=None, k=10):
+        clave = (id_jugador, "carrera" if temporada is None else str(temporada))
+        if k <= self.k_precalculado and clave in self.grupos:
+            filas = self.top.iloc[self.grupos[clave][:k]]
+            return a_registros(filas.drop(columns=["id_jugador", "temporada", "puesto"]).rename(
+                columns={"id_companero": "id", "nombre_companero": "nombre"}))
+        if self.indice is None:
+            return None
+        return self.indice.companeros(id_jugador, temporada, k)
+
+    def pareja(self, id_a, id_b, temporada=None):
+        if self.indice is None:
+            return None
+        return self.indice.pareja(id_a, id_b, temporada)
@@ -0,0 +1,245 @@
+import math
+import re
+from rdflib import Namespace, URIRef
+
+# Fuentes de datos de las paginas de jugadores (inicio, buscador y ficha).
+# Las dos devuelven exactamente las mismas estructuras para las plantillas:
+#   grafo    : consultas SPARQL sobre el almacen (rdflib, sqlite u oxigraph), el modo original
+#   compacto : modelo de lectura de web/modelo_compacto.py, sin cargar el grafo (BBALL_FUENTE=compacto,
+#              o BBALL_FUENTE=mmap para abrirlo desde las columnas binarias)
+
+FEB = Namespace("http://www.tfg-basket.es/ontologia/primera-feb#")
+
+FUENTES_DISPONIBLES = ("grafo", "compacto", "mmap")
+LIMITE_BUSQUEDA = 50
+
+
+class FuenteGrafo:
+    nombre = "grafo"
+
+    def __init__(self, almacen, cargador_grafos=None):
+        self.almacen = almacen
+        self.cargador_grafos = cargador_grafos
+
+    def contar_jugadores(self):
+        consulta_conteo = "SELECT (COUNT(?p) AS ?total) WHERE { ?p a <https://schema.org/Person> }"
+        resultado = self.almacen.consultar(consulta_conteo)
+        return str(resultado[0][0])
+
+    def buscar_jugadores(self, busqueda):
+        filtro = f'FILTER(regex(str(?nombre), "{busqueda}", "i"))' if busqueda else ""
+
+        consulta = f"""
+        PREFIX schema: <https://schema.org/>
+        PREFIX owl: <http://www.w3.org/2002/07/owl#>
+        SELECT ?uri ?nombre ?wikidata WHERE {{
+            ?uri a schema:Person ; schema:name ?nombre .
+            {filtro}
+            OPTIONAL {{ ?uri owl:sameAs ?wikidata . }}
+        }} ORDER BY ?nombre LIMIT {LIMITE_BUSQUEDA}
+        """
+
+        resultados = self.almacen.consultar(consulta)
+        lista_jugadores = []
+        for fila in resultados:
+            lista_jugadores.append({
+                'id': str(fila.uri).split('/')[-1],
+                'nombre': str(fila.nombre),
+                'wikidata': str(fila.wikidata) if fila.wikidata else None
+            })
+        return lista_jugadores
+
+    def ficha_jugador(self, id_jugador):
+        """Perfil con analitica, ultimos partidos, carrera y evolucion por temporada."""
+        uri_sujeto = URIRef(f"https://bball-intelligence.com/resource/person/{id_jugador}")
+
+        # Datos de perfil y avanzada
+        consulta_perfil = f"""
+        PREFIX schema: <https://schema.org/>
+        PREFIX feb: <http://www.tfg-basket.es/ontologia/primera-feb#>
+        PREFIX owl: <http://www.w3.org/2002/07/owl#>
+        SELECT ?nombre ?url_pb ?wikidata ?ts ?efg ?val_min ?ortg WHERE {{
+            <{uri_sujeto}> schema:name ?nombre ; schema:url ?url_pb .
+            OPTIONAL {{ <{uri_sujeto}> owl:sameAs ?wikidata . }}
+            OPTIONAL {{
+                <{uri_sujeto}> feb:hasPlayerAnalysis ?analisis .
+                OPTIONAL {{ ?analisis feb:tsPercentage ?ts . }}
+                OPTIONAL {{ ?analisis feb:efgPercentage ?efg . }}
+                OPTIONAL {{ ?analisis feb:valPerMinute ?val_min . }}
+                OPTIONAL {{ ?analisis feb:ortgIndividual ?ortg . }}
+            }}
+        }} ORDER BY DESC(?analisis) LIMIT 1
+        """
+
+        # Actuaciones recientes
+        consulta_partidos = f"""
+        PREFIX feb: <http://www.tfg-basket.es/ontologia/primera-feb#>
+        SELECT ?fecha ?puntos ?valoracion WHERE {{
+            ?act feb:performer <{uri_sujeto}> ;
+                 feb:playedMatch ?partido ;
+                 feb:points ?puntos ;
+                 feb:efficiencyValue ?valoracion .
+            ?partido feb:startDate ?fecha .
+        }} ORDER BY DESC(?fecha) LIMIT 10
+        """
+
+        # Carrera y evolucion por temporada: ya vienen agregadas en capa3, una busqueda cada una
+        consulta_carrera = f"""
+        PREFIX feb: <http://www.tfg-basket.es/ontologia/primera-feb#>
+        SELECT ?partidos ?temporadas ?equipos ?primera ?ultima ?pts ?val ?minutos ?pts40 ?ts ?efg ?ortg WHERE {{
+            <{uri_sujeto}> feb:hasCareerAnalysis ?carrera .
+            ?carrera feb:gamesPlayed ?partidos ; feb:seasonsPlayed ?temporadas ; feb:teamsPlayed ?equipos ;
+                     feb:firstSeason ?primera ; feb:lastSeason ?ultima ; feb:avgPoints ?pts ;
+                     feb:avgEfficiency ?val ; feb:avgMinutes ?minutos ; feb:pointsPer40 ?pts40 ;
+                     feb:tsPercentage ?ts ; feb:efgPercentage ?efg ; feb:ortgIndividual ?ortg .
+        }}
+        """
+
+        consulta_temporadas_carrera = f"""
+        PREFIX feb: <http://www.tfg-basket.es/ontologia/primera-feb#>
+        SELECT ?temporada ?partidos ?pts ?ts ?delta_pts ?delta_ts WHERE {{
+            <{uri_sujeto}> feb:hasSeasonAnalysis ?analisis .
+            ?analisis feb:duringSeason ?temporada ; feb:gamesPlayed ?partidos ;
+                      feb:avgPoints ?pts ; feb:tsPercentage ?ts .
+            OPTIONAL {{ ?analisis feb:deltaAvgPoints ?delta_pts . }}
+            OPTIONAL {{ ?analisis feb:deltaTsPercentage ?delta_ts . }}
+        }} ORDER BY ?temporada
+        """
+
+        # Carga perezosa de las actuaciones: solo las temporadas en las que jugo este jugador
+        if self.cargador_grafos is not None:
+            # El año sale de la temporada del analisis (feb:duringSeason -> feb:startYear), no del formato de su URI
+            consulta_temporadas = (f"SELECT DISTINCT ?ano WHERE {{ <{uri_sujeto}> <{FEB.hasSeasonAnalysis}> ?analisis . "
+                                   f"?analisis <{FEB.duringSeason}> ?temporada . ?temporada <{FEB.startYear}> ?ano }}")
+            temporadas = {int(fila[0]) for fila in self.almacen.consultar(consulta_temporadas)}
+            self.cargador_grafos.asegurar_temporadas("capa2", temporadas)
+
+        res_p = self.almacen.consultar(consulta_perfil)
+        res_m = self.almacen.consultar(consulta_partidos)
+        res_c = self.almacen.consultar(consulta_carrera)
+        res_t = self.almacen.consultar(consulta_temporadas_carrera)
+
+        datos = {}
+        for f in res_p:
+            datos = {
+                'id': id_jugador,
+                'nombre': str(f.nombre),
+                'url_pb': str(f.url_pb),
+                'wikidata': str(f.wikidata) if f.wikidata else None,
+                'ts': round(float(f.ts), 2) if f.ts else None,
+                'efg': round(float(f.efg), 2) if f.efg else None,
+                'val_min': round(float(f.val_min), 2) if f.val_min else None,
+                'ortg': round(float(f.ortg), 2) if f.ortg else None
+            }
+
+        partidos = []
+        for f in res_m:
+            partidos.append({
+                'fecha': str(f.fecha),
+                'puntos': int(float(f.puntos)),
+                'valoracion': int(float(f.valoracion))
+            })
+
+        carrera = {}
+        for f in res_c:
+            carrera = {
+                'partidos': int(f.partidos),
+                'temporadas': int(f.temporadas),
+                'equipos': int(f.equipos),
+                'primera': int(f.primera),
+                'ultima': int(f.ultima),
+                'pts': round(float(f.pts), 1),
+                'val': round(float(f.val), 1),
+                'minutos': round(float(f.minutos), 1),
+                'pts40': round(float(f.pts40), 1),
+                'ts': round(float(f.ts), 2),
+                'efg': round(float(f.efg), 2),
+                'ortg': round(float(f.ortg), 2)
+            }
+
+        evolucion = []
+        for f in res_t:
+            evolucion.append({
+                'temporada': int(str(f.temporada).split('/')[-1]),
+                'partidos': int(f.partidos),
+                'pts': round(float(f.pts), 1),
+                'ts': round(float(f.ts), 2),
+                'delta_pts': round(float(f.delta_pts), 1) if f.delta_pts is not None else None,
+                'delta_ts': round(float(f.delta_ts), 2) if f.delta_ts is not None else None
+            })
+
+        return datos, partidos, carrera, evolucion
+
+
+def _redondeo(valor, decimales):
+    # Igual que en la fuente grafo: un valor ausente (o cero) se muestra como '-'
+    valor = float(valor)
+    return round(valor, decimales) if valor and not math.isnan(valor) else None
+
+
+class FuenteCompacta:
+    nombre = "compacto"
+
+    def __init__(self, modelo):
+        self.modelo = modelo
+
+    def contar_jugadores(self):
+        return str(len(self.modelo.jugadores))
+
+    def buscar_jugadores(self, busqueda):
+        if busqueda:
+            try:
+                patron = re.compile(busqueda, re.IGNORECASE)
+            except re.error:
+                patron = re.compile(re.escape(busqueda), re.IGNORECASE)
+            candidatos = (jugador for jugador in self.modelo.orden_nombres if patron.search(jugador.nombre))
+        else:
+            candidatos = iter(self.modelo.orden_nombres)
+        lista_jugadores = []
+        for jugador in candidatos:
+            lista_jugadores.append({'id': jugador.id, 'nombre': jugador.nombre, 'wikidata': jugador.wikidata})
+            if len(lista_jugadores) == LIMITE_BUSQUEDA:
+                break
+        return lista_jugadores
+
+    def ficha_jugador(self, id_jugador):
+        jugador = self.modelo.por_id.get(id_jugador)
+        if jugador is None:
+            return {}, [], {}, []
+
+        datos = {'id': id_jugador, 'nombre': jugador.nombre, 'url_pb': jugador.url, 'wikidata': jugador.wikidata,
+                 'ts': None, 'efg': None, 'val_min': None, 'ortg': None}
+        analisis = self.modelo.analisis_de(jugador)
+        if len(analisis):
+            # Mismo analisis que ORDER BY DESC(?analisis) en SPARQL: la URI .../{jugador}_{club}_{temporada} mayor
+            elegido = analisis[max(range(len(analisis)), key=lambda i: f"{analisis['equipo'][i]}_{analisis['temporada'][i]}")]
+            datos.update({'ts': _redondeo(elegido['ts'], 2), 'efg': _redondeo(elegido['efg'], 2),
+                          'val_min': _redondeo(elegido['val_min'], 2), 'ortg': _redondeo(elegido['ortg'], 2)})
+
+        partidos = []
+        for actuacion in self.modelo.actuaciones_de(jugador)[::-1][:10]:
+            partidos.append({
+                'fecha': self.modelo.partidos[actuacion['partido']].fecha,
+                'puntos': int(actuacion['puntos']),
+                'valoracion': int(actuacion['valoracion'])
+            })
+
+        carrera = {}
+        fila = self.modelo.carrera_de(jugador)
+        if fila is not None:
+            carrera = {campo: int(fila[campo]) for campo in ('partidos', 'temporadas', 'equipos', 'primera', 'ultima')}
+            carrera.update({campo: round(float(fila[campo]), 1) for campo in ('pts', 'val', 'minutos', 'pts40')})
+            carrera.update({campo: round(float(fila[campo]), 2) for campo in ('ts', 'efg', 'ortg')})
+
+        evolucion = []
+        for fila in self.modelo.temporadas_de(jugador):
+            evolucion.append({
+                'temporada': int(fila['temporada']),
+                'partidos': int(fila['partidos']),
+                'pts': round(float(fila['pts']), 1),
+                'ts': round(float(fila['ts']), 2),
+                'delta_pts': None if math.isnan(fila['delta_pts']) else round(float(fila['delta_pts']), 1),
+                'delta_ts': None if math.isnan(fila['delta_ts']) else round(float(fila['delta_ts']), 2)
+            })
+
+        return datos, partidos, carrera, evolucion
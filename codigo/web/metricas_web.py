@@ -0,0 +1,159 @@
+import bisect
+import json
+import os
+import threading
+import time
+from flask import Response, g, request, has_request_context, before_render_template, template_rendered
+
+# Metricas por peticion de la web: latencia de cada ruta separada en consulta SPARQL,
+# carga perezosa de grafos y renderizado de plantilla, expuesta en /metrics (formato Prometheus)
+# y un log de consultas lentas con el texto SPARQL.
+#
+# Variables de entorno:
+#   BBALL_METRICAS_WEB      = 1 (por defecto) | 0  -> con 0 no se instala ningun hook (coste nulo)
+#   BBALL_CONSULTA_LENTA_MS = umbral en milisegundos del log de consultas lentas (por defecto 500)
+
+directorio_actual = os.path.dirname(os.path.abspath(__file__))
+RUTA_LOG_LENTAS = os.path.abspath(os.path.join(directorio_actual, "../../datos/metricas/consultas_lentas.jsonl"))
+
+# Limites de los cubos del histograma (segundos), al estilo de los clientes de Prometheus
+CUBOS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+FASES = ("consulta", "carga_grafos", "render", "total")
+
+
+class Histograma:
+    def __init__(self):
+        self.cubos = [0] * (len(CUBOS) + 1)
+        self.suma = 0.0
+        self.cuenta = 0
+
+    def observar(self, segundos):
+        self.cubos[bisect.bisect_left(CUBOS, segundos)] += 1
+        self.suma += segundos
+        self.cuenta += 1
+
+
+class MetricasWeb:
+    def __init__(self, umbral_lenta_ms, ruta_log=RUTA_LOG_LENTAS):
+        self.umbral_lenta = umbral_lenta_ms / 1000
+        self.ruta_log = ruta_log
+        self.histogramas = {}
+        self.consultas_lentas = 0
+        self.cerrojo = threading.Lock()
+
+    # --- Envolturas del almacen ---
+
+    def envolver_consultas(self, almacen):
+        """Sustituye almacen.consultar por una version cronometrada (solo en esta instancia)."""
+        consultar_original = almacen.consultar
+
+        def consultar(sparql):
+            inicio = time.perf_counter()
+            try:
+                return consultar_original(sparql)
+            finally:
+                self._anotar_consulta(sparql, time.perf_counter() - inicio)
+        almacen.consultar = consultar
+
+    def envolver_cargador(self, cargador_grafos):
+        """La carga perezosa de temporadas se mide aparte para no inflar el tiempo de consulta."""
+        asegurar_original = cargador_grafos.asegurar_temporadas
+
+        def asegurar_temporadas(*args, **kwargs):
+            inicio = time.perf_counter()
+            try:
+                return asegurar_original(*args, **kwargs)
+            finally:
+                if has_request_context() and "tiempos_peticion" in g:
+                    g.tiempos_peticion["carga_grafos"] += time.perf_counter() - inicio
+        cargador_grafos.asegurar_temporadas = asegurar_temporadas
+
+    def _anotar_consulta(self, sparql, segundos):
+        # Fuera de una peticion (arranque, pruebas) solo interesa el log de lentas
+        en_peticion = has_request_context() and "tiempos_peticion" in g
+        if en_peticion:
+            g.tiempos_peticion["consulta"] += segundos
+            g.consultas_peticion += 1
+        if segundos >= self.umbral_lenta:
+            self._registrar_lenta(sparql, segundos, request.path if en_peticion else None)
+
+    def _registrar_lenta(self, sparql, segundos, ruta):
+        entrada = {
+            "momento": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "ruta": ruta,
+            "ms": round(segundos * 1000, 1),
+            "sparql": " ".join(sparql.split()),
+        }
+        with self.cerrojo:
+            self.consultas_lentas += 1
+            os.makedirs(os.path.dirname(self.ruta_log), exist_ok=True)
+            with open(self.ruta_log, "a", encoding="utf-8") as archivo:
+                archivo.write(json.dumps(entrada, ensure_ascii=False) + "\n")
+        print(f"[consulta lenta] {entrada['ms']} ms en {entrada['ruta']}")
+
+    # --- Hooks de Flask ---
+
+    def instalar(self, app):
+        app.before_request(self._al_empezar)
+        app.after_request(self._al_terminar)
+        before_render_template.connect(self._antes_de_render, app)
+        template_rendered.connect(self._despues_de_render, app)
+        app.add_url_rule("/metrics", "metrics", self.exponer)
+
+    def _al_empezar(self):
+        g.inicio_peticion = time.perf_counter()
+        g.tiempos_peticion = dict.fromkeys(FASES[:-1], 0.0)
+        g.consultas_peticion = 0
+
+    def _antes_de_render(self, emisor, template, context, **extra):
+        g.inicio_render = time.perf_counter()
+
+    def _despues_de_render(self, emisor, template, context, **extra):
+        if "inicio_render" in g and "tiempos_peticion" in g:
+            g.tiempos_peticion["render"] += time.perf_counter() - g.inicio_render
+
+    def _al_terminar(self, respuesta):
+        # Los estaticos y el propio /metrics no se miden; la regla (no la URL) evita una serie por jugador
+        if request.url_rule is None or request.endpoint in ("static", "metrics") or "inicio_peticion" not in g:
+            return respuesta
+        tiempos = dict(g.tiempos_peticion, total=time.perf_counter() - g.inicio_peticion)
+        ruta = request.url_rule.rule
+        with self.cerrojo:
+            for fase, segundos in tiempos.items():
+                clave = (ruta, fase)
+                if clave not in self.histogramas:
+                    self.histogramas[clave] = Histograma()
+                self.histogramas[clave].observar(segundos)
+        respuesta.headers["Server-Timing"] = ", ".join(f"{fase};dur={segundos * 1000:.1f}" for fase, segundos in tiempos.items())
+        respuesta.headers["X-Consultas-SPARQL"] = str(g.consultas_peticion)
+        return respuesta
+
+    def exponer(self):
+        lineas = ["# HELP bball_web_segundos Latencia por ruta y fase (consulta SPARQL, carga de grafos, render, total)",
+                  "# TYPE bball_web_segundos histogram"]
+        with self.cerrojo:
+            for (ruta, fase), histograma in sorted(self.histogramas.items()):
+                etiquetas = f'ruta="{ruta}",fase="{fase}"'
+                acumulado = 0
+                for limite, cantidad in zip(CUBOS, histograma.cubos):
+                    acumulado += cantidad
+                    lineas.append(f'bball_web_segundos_bucket{{{etiquetas},le="{limite}"}} {acumulado}')
+                lineas.append(f'bball_web_segundos_bucket{{{etiquetas},le="+Inf"}} {histograma.cuenta}')
+                lineas.append(f"bball_web_segundos_sum{{{etiquetas}}} {histograma.suma:.6f}")
+                lineas.append(f"bball_web_segundos_count{{{etiquetas}}} {histograma.cuenta}")
+            lineas.append("# TYPE bball_web_consultas_lentas_total counter")
+            lineas.append(f"bball_web_consultas_lentas_total {self.consultas_lentas}")
+        return Response("\n".join(lineas) + "\n", mimetype="text/plain; version=0.0.4")
+
+
+def instrumentar(app, almacen, cargador_grafos=None):
+    """Activa las metricas si BBALL_METRICAS_WEB no es 0. Devuelve el objeto MetricasWeb o None."""
+    if os.environ.get("BBALL_METRICAS_WEB", "1") == "0":
+        return None
+    metricas = MetricasWeb(float(os.environ.get("BBALL_CONSULTA_LENTA_MS", "500")))
+    if almacen is not None:
+        metricas.envolver_consultas(almacen)
+    if cargador_grafos is not None:
+        metricas.envolver_cargador(cargador_grafos)
+    metricas.instalar(app)
+    return metricas
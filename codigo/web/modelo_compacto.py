@@ -0,0 +1,346 @@
+import json
+import os
+import numpy as np
+import pandas as pd
+from web.clasificaciones import extraer_id
+
+# Modelo de lectura compacto para la web (BBALL_FUENTE=compacto), cargado directamente de las
+# capas procesadas en lugar del grafo maestro. En rdflib cada tripleta son varios objetos Python
+# (URIRef, Literal y las entradas de los indices del grafo), cientos de bytes por dato; aqui:
+#   - jugadores, clubes, equipos-temporada (nombre de la temporada y plantilla) y partidos son
+#     objetos con __slots__ (sin __dict__)
+#   - las actuaciones y analisis son arrays estructurados de numpy, una fila de tamano fijo por
+#     registro, ordenados por el indice entero del jugador; un vector de desplazamientos da el
+#     bloque de cada jugador sin buscar (inicio = desplazamientos[i], fin = desplazamientos[i + 1])
+#   - una permutacion de las actuaciones por club y partido, con sus desplazamientos, da los partidos
+#     de un club; con ella se sirven la ficha de partido, la temporada de un equipo y el cara a cara
+#
+# limpieza/capa3_binario.py vuelca este mismo modelo a archivos binarios de ancho fijo, una columna
+# por archivo; ModeloCompacto.desde_binario() los abre con np.memmap en solo lectura, de modo que
+# todos los workers comparten las mismas paginas de la cache del sistema operativo y arrancar un
+# worker es leer un JSON de entidades (BBALL_FUENTE=mmap).
+
+directorio_actual = os.path.dirname(os.path.abspath(__file__))
+CARPETA_PROCESADOS = os.path.abspath(os.path.join(directorio_actual, "../../datos/procesados"))
+RUTA_INTERLINKING = os.path.abspath(os.path.join(directorio_actual, "../../datos/grafo/interlinking_wikidata.ttl"))
+CARPETA_BINARIO = os.path.join(CARPETA_PROCESADOS, "binario")
+PREFIJO_PERSONA = "https://bball-intelligence.com/resource/person/"
+
+ESTADISTICAS = ["minutos", "puntos", "valoracion", "t2_metidos", "t2_intentados", "t3_metidos", "t3_intentados",
+                "t1_metidos", "t1_intentados", "rebotes_ofensivos", "rebotes_defensivos", "rebotes_totales",
+                "asistencias", "robos", "tapones", "perdidas", "mas_menos", "faltas_cometidas", "faltas_recibidas"]
+
+# Las estadisticas de partido son enteros pequenos (exactos en float32); los porcentajes y medias se
+# guardan en float64 para redondear igual que los literales del grafo
+TIPO_ACTUACION = np.dtype([("jugador", np.int32), ("partido", np.int32), ("equipo", np.int32)]
+                          + [(columna, np.float32) for columna in ESTADISTICAS])
+TIPO_ANALISIS = np.dtype([("jugador", np.int32), ("equipo", np.int32), ("temporada", np.int16),
+                          ("ts", np.float64), ("efg", np.float64), ("val_min", np.float64), ("ortg", np.float64)])
+TIPO_TEMPORADA = np.dtype([("jugador", np.int32), ("temporada", np.int16), ("partidos", np.int32), ("pts", np.float64),
+                           ("ts", np.float64), ("delta_pts", np.float64), ("delta_ts", np.float64)])
+TIPO_CARRERA = np.dtype([("partidos", np.int32), ("temporadas", np.int16), ("equipos", np.int16), ("primera", np.int16),
+                         ("ultima", np.int16), ("pts", np.float64), ("val", np.float64), ("minutos", np.float64),
+                         ("pts40", np.float64), ("ts", np.float64), ("efg", np.float64), ("ortg", np.float64)])
+
+# Estadisticas de equipo de capa2_partidos (columnas <estadistica>_local y <estadistica>_visitante)
+ESTADISTICAS_EQUIPO = ["cobertura", "rebotes", "asistencias", "robos", "perdidas", "valoracion", "porc_t3"]
+TIPO_ESTADISTICAS_PARTIDO = np.dtype([(f"{columna}_{lado}", np.float64) for lado in ("local", "visitante") for columna in ESTADISTICAS_EQUIPO])
+
+# Arrays del modelo que se vuelcan a disco (las tablas estructuradas, una columna por archivo, y los indices)
+TABLAS_BINARIAS = ("actuaciones", "estadisticas_partidos", "analisis", "temporadas_jugador", "carreras", "desplazamiento_actuaciones",
+                   "orden_por_equipo", "desplazamiento_equipos", "desplazamiento_analisis", "desplazamiento_temporadas")
+
+
+class Jugador:
+    __slots__ = ("indice", "id", "nombre", "url", "wikidata")
+
+    def __init__(self, indice, identificador, nombre, url, wikidata=None):
+        self.indice = indice
+        self.id = identificador
+        self.nombre = nombre
+        self.url = url
+        self.wikidata = wikidata
+
+
+class Club:
+    __slots__ = ("indice", "id", "nombre")
+
+    def __init__(self, indice, identificador, nombre):
+        self.indice = indice
+        self.id = identificador
+        self.nombre = nombre
+
+
+class EquipoTemporada:
+    __slots__ = ("club", "temporada", "nombre", "jugadores")
+
+    def __init__(self, club, temporada, nombre, jugadores=()):
+        self.club = club
+        self.temporada = temporada
+        self.nombre = nombre
+        self.jugadores = jugadores
+
+
+class Partido:
+    __slots__ = ("indice", "id", "fecha", "temporada", "jornada", "local", "visitante", "puntos_local", "puntos_visitante")
+
+    def __init__(self, indice, identificador, fecha, temporada, jornada, local, visitante, puntos_local, puntos_visitante):
+        self.indice = indice
+        self.id = identificador
+        self.fecha = fecha
+        self.temporada = temporada
+        self.jornada = jornada
+        self.local = local
+        self.visitante = visitante
+        self.puntos_local = puntos_local
+        self.puntos_visitante = puntos_visitante
+
+
+class TablaColumnas:
+    """Columnas de ancho fijo (arrays o memmaps) con la interfaz de un array estructurado de numpy."""
+
+    def __init__(self, columnas):
+        self.columnas = columnas
+
+    def __len__(self):
+        return len(next(iter(self.columnas.values()))) if self.columnas else 0
+
+    def __getitem__(self, clave):
+        if isinstance(clave, str):
+            return self.columnas[clave]
+        if isinstance(clave, (int, np.integer)):
+            return {campo: columna[clave] for campo, columna in self.columnas.items()}
+        return TablaColumnas({campo: columna[clave] for campo, columna in self.columnas.items()})
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    @property
+    def nbytes(self):
+        return sum(columna.nbytes for columna in self.columnas.values())
+
+
+def _desplazamientos(columna_jugador, total):
+    """Inicio del bloque de cada jugador en un array ordenado por jugador (y el final del ultimo)."""
+    return np.searchsorted(columna_jugador, np.arange(total + 1)).astype(np.int64)
+
+
+def _leer_wikidata(ruta):
+    if not os.path.exists(ruta):
+        return {}
+    from rdflib import Graph
+    from rdflib.namespace import OWL
+    grafo = Graph()
+    grafo.parse(ruta, format="turtle")
+    return {str(s)[len(PREFIJO_PERSONA):]: str(o) for s, o in grafo.subject_objects(OWL.sameAs)
+            if str(s).startswith(PREFIJO_PERSONA)}
+
+
+class ModeloCompacto:
+    def __init__(self, carpeta=CARPETA_PROCESADOS, ruta_interlinking=RUTA_INTERLINKING):
+        capa1 = os.path.join(carpeta, "capa1")
+        capa2 = os.path.join(carpeta, "capa2")
+        capa3 = os.path.join(carpeta, "capa3")
+
+        # --- Entidades (capa1) ---
+        wikidata = _leer_wikidata(ruta_interlinking)
+        tabla = pd.read_csv(os.path.join(capa1, "capa1_jugadores.csv"))
+        self.jugadores = [Jugador(i, extraer_id(url), nombre, url)
+                          for i, (url, nombre) in enumerate(zip(tabla['url_jugador'], tabla['nombre_jugador']))]
+        for jugador in self.jugadores:
+            jugador.wikidata = wikidata.get(jugador.id)
+        self.por_id = {jugador.id: jugador for jugador in self.jugadores}
+        # Orden por nombre precalculado para el buscador (mismo orden que ORDER BY ?nombre)
+        self.orden_nombres = sorted(self.jugadores, key=lambda jugador: jugador.nombre)
+
+        tabla = pd.read_csv(os.path.join(capa1, "capa1_equipos.csv"))
+        self.clubes = [Club(i, extraer_id(uri), nombre) for i, (uri, nombre) in enumerate(zip(tabla['uri_equipo'], tabla['nombre_equipo']))]
+        self.club_por_id = {club.id: club for club in self.clubes}
+
+        plantillas = pd.read_csv(os.path.join(capa1, "capa1_plantillas.csv"))
+        plantillas['id_equipo'] = plantillas['uri_equipo'].map(extraer_id)
+        plantillas['jugador'] = self._indices_jugador(plantillas['url_jugador'])
+        # Jugadores de la plantilla (indices del modelo; los que no estan en el maestro se descartan)
+        miembros = plantillas[plantillas['jugador'] >= 0].groupby(['id_equipo', 'anio_inicio'])['jugador'].apply(tuple).to_dict()
+        tabla = pd.read_csv(os.path.join(capa1, "capa1_equipos_temporada.csv"))
+        self.equipos_temporada = {}
+        for uri, temporada, nombre in zip(tabla['uri_equipo'], tabla['ano_inicio'], tabla['nombre_equipo']):
+            id_club = extraer_id(uri)
+            if id_club in self.club_por_id:
+                self.equipos_temporada[(id_club, int(temporada))] = EquipoTemporada(
+                    self.club_por_id[id_club], int(temporada), nombre, miembros.get((id_club, temporada), ()))
+
+        # --- Partidos y actuaciones (capa2) ---
+        tabla = pd.read_csv(os.path.join(capa2, "capa2_partidos.csv")).sort_values(['fecha', 'id_partido'], kind="stable")
+        self.partidos = []
+        for fila in tabla.itertuples(index=False):
+            local = self.club_por_id.get(extraer_id(fila.uri_local))
+            visitante = self.club_por_id.get(extraer_id(fila.uri_visitante))
+            self.partidos.append(Partido(len(self.partidos), fila.id_partido, fila.fecha, int(fila.ano_inicio), fila.jornada,
+                                         local, visitante, fila.puntos_local, fila.puntos_visitante))
+        self.partido_por_id = {partido.id: partido for partido in self.partidos}
+        # Una fila por partido, en el mismo orden (NaN si falta el dato o la columna)
+        self.estadisticas_partidos = np.full(len(tabla), np.nan, dtype=TIPO_ESTADISTICAS_PARTIDO)
+        for campo in TIPO_ESTADISTICAS_PARTIDO.names:
+            if campo in tabla.columns:
+                self.estadisticas_partidos[campo] = tabla[campo].to_numpy(dtype=float)
+
+        tabla = pd.read_csv(os.path.join(capa2, "capa2_estadisticas_detalladas.csv"),
+                            usecols=['url_jugador', 'id_partido', 'uri_equipo'] + ESTADISTICAS)
+        self.actuaciones = np.zeros(len(tabla), dtype=TIPO_ACTUACION)
+        self.actuaciones["jugador"] = self._indices_jugador(tabla['url_jugador'])
+        self.actuaciones["partido"] = tabla['id_partido'].map(lambda i: self.partido_por_id[i].indice if i in self.partido_por_id else -1)
+        self.actuaciones["equipo"] = tabla['uri_equipo'].map(extraer_id).map(lambda i: self.club_por_id[i].indice if i in self.club_por_id else -1)
+        for columna in ESTADISTICAS:
+            self.actuaciones[columna] = tabla[columna].fillna(0).to_numpy()
+        # Por jugador y, dentro de cada jugador, en orden cronologico (el indice de partido ya sigue la fecha)
+        self.actuaciones = self.actuaciones[(self.actuaciones["jugador"] >= 0) & (self.actuaciones["partido"] >= 0)]
+        self.actuaciones = self.actuaciones[np.lexsort((self.actuaciones["partido"], self.actuaciones["jugador"]))]
+        self.desplazamiento_actuaciones = _desplazamientos(self.actuaciones["jugador"], len(self.jugadores))
+        # Segundo indice por club: permutacion de las filas ordenadas por equipo y partido, con sus desplazamientos
+        self.orden_por_equipo = np.lexsort((self.actuaciones["partido"], self.actuaciones["equipo"])).astype(np.int32)
+        self.desplazamiento_equipos = _desplazamientos(self.actuaciones["equipo"][self.orden_por_equipo], len(self.clubes))
+
+        # --- Analitica (capa3) ---
+        tabla = pd.read_csv(os.path.join(capa3, "capa3_jugadores_avanzado.csv"))
+        self.analisis = np.zeros(len(tabla), dtype=TIPO_ANALISIS)
+        self.analisis["jugador"] = self._indices_jugador(tabla['url_jugador'])
+        self.analisis["equipo"] = tabla['uri_equipo'].map(extraer_id).astype(int)
+        self.analisis["temporada"] = tabla['ano_inicio']
+        for campo, columna in (("ts", "ts_porcentaje"), ("efg", "efg_porcentaje"), ("val_min", "valoracion_por_minuto"),
+                               ("ortg", "ortg_individual")):
+            self.analisis[campo] = tabla[columna]
+        self.analisis = self.analisis[self.analisis["jugador"] >= 0]
+        self.analisis = self.analisis[np.argsort(self.analisis["jugador"], kind="stable")]
+        self.desplazamiento_analisis = _desplazamientos(self.analisis["jugador"], len(self.jugadores))
+
+        self.temporadas_jugador = np.zeros(0, dtype=TIPO_TEMPORADA)
+        ruta = os.path.join(capa3, "capa3_jugadores_temporadas.csv")
+        if os.path.exists(ruta):
+            tabla = pd.read_csv(ruta)
+            self.temporadas_jugador = np.zeros(len(tabla), dtype=TIPO_TEMPORADA)
+            self.temporadas_jugador["jugador"] = self._indices_jugador(tabla['url_jugador'])
+            for campo, columna in (("temporada", "ano_inicio"), ("partidos", "partidos_jugados"), ("pts", "puntos_promedio"),
+                                   ("ts", "ts_porcentaje"), ("delta_pts", "delta_puntos_promedio"), ("delta_ts", "delta_ts_porcentaje")):
+                self.temporadas_jugador[campo] = tabla[columna]
+            self.temporadas_jugador = self.temporadas_jugador[self.temporadas_jugador["jugador"] >= 0]
+            self.temporadas_jugador = self.temporadas_jugador[np.lexsort((self.temporadas_jugador["temporada"],
+                                                                          self.temporadas_jugador["jugador"]))]
+        self.desplazamiento_temporadas = _desplazamientos(self.temporadas_jugador["jugador"], len(self.jugadores))
+
+        # Una fila por jugador (partidos = 0 si no tiene carrera en capa3)
+        self.carreras = np.zeros(len(self.jugadores), dtype=TIPO_CARRERA)
+        ruta = os.path.join(capa3, "capa3_jugadores_carrera.csv")
+        if os.path.exists(ruta):
+            tabla = pd.read_csv(ruta)
+            indices = self._indices_jugador(tabla['url_jugador'])
+            validos = indices >= 0
+            for campo, columna in (("partidos", "partidos_jugados"), ("temporadas", "temporadas_jugadas"),
+                                   ("equipos", "equipos_distintos"), ("primera", "primera_temporada"),
+                                   ("ultima", "ultima_temporada"), ("pts", "puntos_promedio"), ("val", "valoracion_promedio"),
+                                   ("minutos", "minutos_promedio"), ("pts40", "puntos_por_40"), ("ts", "ts_porcentaje"),
+                                   ("efg", "efg_porcentaje"), ("ortg", "ortg_individual")):
+                self.carreras[campo][indices[validos]] = tabla[columna].to_numpy()[validos]
+
+    def _indices_jugador(self, urls):
+        return urls.map(extraer_id).map(lambda i: self.por_id[i].indice if i in self.por_id else -1).to_numpy(np.int32)
+
+    # --- Acceso por jugador ---
+
+    def _bloque(self, array, desplazamientos, jugador):
+        return array[desplazamientos[jugador.indice]:desplazamientos[jugador.indice + 1]]
+
+    def actuaciones_de(self, jugador):
+        return self._bloque(self.actuaciones, self.desplazamiento_actuaciones, jugador)
+
+    # --- Acceso por club ---
+
+    def _filas_de_club(self, club):
+        return self.orden_por_equipo[self.desplazamiento_equipos[club.indice]:self.desplazamiento_equipos[club.indice + 1]]
+
+    def actuaciones_de_club(self, club, partido=None):
+        """Actuaciones del club en orden de partido; con partido, solo las de ese partido (busqueda binaria)."""
+        filas = self._filas_de_club(club)
+        if partido is not None:
+            indices = self.actuaciones["partido"][filas]
+            filas = filas[np.searchsorted(indices, partido.indice):np.searchsorted(indices, partido.indice, side="right")]
+        return self.actuaciones[filas]
+
+    def partidos_de_club(self, club):
+        """Indices (cronologicos, sin repetir) de los partidos en los que jugo el club."""
+        indices = np.asarray(self.actuaciones["partido"][self._filas_de_club(club)])
+        return indices[np.r_[True, indices[1:] != indices[:-1]]] if len(indices) else indices
+
+    def analisis_de(self, jugador):
+        return self._bloque(self.analisis, self.desplazamiento_analisis, jugador)
+
+    def temporadas_de(self, jugador):
+        return self._bloque(self.temporadas_jugador, self.desplazamiento_temporadas, jugador)
+
+    def carrera_de(self, jugador):
+        carrera = self.carreras[jugador.indice]
+        return carrera if carrera["partidos"] > 0 else None
+
+    def bytes_ocupados(self):
+        """Tamano de los arrays (con memmap es lo mapeado, no lo residente; los objetos con __slots__ aparte)."""
+        return sum(getattr(self, nombre).nbytes for nombre in TABLAS_BINARIAS)
+
+    # --- Volcado binario y apertura con memmap ---
+
+    def exportar_binario(self, carpeta=CARPETA_BINARIO):
+        """Una columna por archivo (.bin, ancho fijo) y un esquema JSON con tipos, longitudes y entidades."""
+        os.makedirs(carpeta, exist_ok=True)
+        esquema = {"tablas": {}}
+        for nombre in TABLAS_BINARIAS:
+            array = getattr(self, nombre)
+            campos = array.dtype.names or (None,)
+            esquema["tablas"][nombre] = {"filas": len(array), "columnas": {}}
+            for campo in campos:
+                columna = np.ascontiguousarray(array if campo is None else array[campo])
+                archivo = f"{nombre}.bin" if campo is None else f"{nombre}.{campo}.bin"
+                columna.tofile(os.path.join(carpeta, archivo))
+                esquema["tablas"][nombre]["columnas"][campo or ""] = {"archivo": archivo, "tipo": columna.dtype.str}
+        esquema["entidades"] = {
+            "jugadores": [[j.id, j.nombre, j.url, j.wikidata] for j in self.jugadores],
+            "clubes": [[c.id, c.nombre] for c in self.clubes],
+            "equipos_temporada": [[e.club.indice, e.temporada, e.nombre, [int(j) for j in e.jugadores]]
+                                  for e in self.equipos_temporada.values()],
+            "partidos": [[p.id, p.fecha, p.temporada, None if pd.isna(p.jornada) else p.jornada,
+                          p.local.indice if p.local else None, p.visitante.indice if p.visitante else None,
+                          p.puntos_local, p.puntos_visitante] for p in self.partidos],
+        }
+        # El esquema se escribe al final: si existe, las columnas que describe ya estan completas
+        ruta_temporal = os.path.join(carpeta, "esquema.json.tmp")
+        with open(ruta_temporal, "w", encoding="utf-8") as archivo:
+            json.dump(esquema, archivo, ensure_ascii=False, default=lambda valor: valor.item())
+        os.replace(ruta_temporal, os.path.join(carpeta, "esquema.json"))
+
+    @classmethod
+    def desde_binario(cls, carpeta=CARPETA_BINARIO):
+        """Abre un volcado de exportar_binario(): entidades desde el JSON y columnas con np.memmap (solo lectura)."""
+        with open(os.path.join(carpeta, "esquema.json"), encoding="utf-8") as archivo:
+            esquema = json.load(archivo)
+        modelo = cls.__new__(cls)
+        entidades = esquema["entidades"]
+        modelo.jugadores = [Jugador(i, *fila) for i, fila in enumerate(entidades["jugadores"])]
+        modelo.por_id = {jugador.id: jugador for jugador in modelo.jugadores}
+        modelo.orden_nombres = sorted(modelo.jugadores, key=lambda jugador: jugador.nombre)
+        modelo.clubes = [Club(i, *fila) for i, fila in enumerate(entidades["clubes"])]
+        modelo.club_por_id = {club.id: club for club in modelo.clubes}
+        modelo.equipos_temporada = {(modelo.clubes[c].id, t): EquipoTemporada(modelo.clubes[c], t, nombre, tuple(miembros))
+                                    for c, t, nombre, miembros in entidades["equipos_temporada"]}
+        club = lambda indice: None if indice is None else modelo.clubes[indice]
+        modelo.partidos = [Partido(i, id_partido, fecha, temporada, jornada, club(local), club(visitante), pl, pv)
+                           for i, (id_partido, fecha, temporada, jornada, local, visitante, pl, pv) in enumerate(entidades["partidos"])]
+        modelo.partido_por_id = {partido.id: partido for partido in modelo.partidos}
+
+        for nombre, tabla in esquema["tablas"].items():
+            columnas = {}
+            for campo, descripcion in tabla["columnas"].items():
+                tipo = np.dtype(descripcion["tipo"])
+                # np.memmap no admite archivos vacios
+                columnas[campo] = (np.memmap(os.path.join(carpeta, descripcion["archivo"]), dtype=tipo, mode="r", shape=(tabla["filas"],))
+                                   if tabla["filas"] else np.zeros(0, dtype=tipo))
+            setattr(modelo, nombre, columnas[""] if "" in columnas else TablaColumnas(columnas))
+        return modelo
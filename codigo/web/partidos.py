@@ -0,0 +1,274 @@
+import os
+import numpy as np
+import pandas as pd
+from web.clasificaciones import extraer_id
+from web.modelo_compacto import ESTADISTICAS_EQUIPO
+
+# Indice de partidos en memoria desde los CSV de capa2 (el grafo tiene los mismos datos, pero
+# montar una ficha de partido por SPARQL recorre todas las MatchPerformance).
+# Las lineas de estadisticas se guardan en un unico bloque float32 ordenado por partido y equipo,
+# asi que la ficha de un partido es un corte contiguo; los partidos de un equipo en una temporada
+# y los de un cruce entre dos equipos son listas de filas precalculadas. Todo son diccionarios: una
+# consulta no depende del tamano de la liga.
+#
+# Presupuesto de memoria (BBALL_MEMORIA_PARTIDOS_MB, 64 por defecto): si las fichas no caben, se
+# conservan las de las temporadas mas recientes y el resto de partidos se sirve sin ficha.
+#
+# Con BBALL_FUENTE=compacto o mmap las mismas vistas salen de VistaPartidosCompacta, que no lee los
+# CSV: recorre el indice por club del modelo compacto (en mmap, las columnas mapeadas de disco).
+
+directorio_actual = os.path.dirname(os.path.abspath(__file__))
+CARPETA_PROCESADOS = os.path.abspath(os.path.join(directorio_actual, "../../datos/procesados"))
+MEMORIA_POR_DEFECTO_MB = 64
+
+COLUMNAS_FICHA = ["minutos", "puntos", "t2_metidos", "t2_intentados", "t3_metidos", "t3_intentados", "t1_metidos",
+                  "t1_intentados", "rebotes_ofensivos", "rebotes_defensivos", "rebotes_totales", "asistencias",
+                  "robos", "tapones", "perdidas", "valoracion", "mas_menos"]
+
+
+def _numero(valor):
+    if pd.isna(valor):
+        return None
+    return int(valor) if float(valor).is_integer() else round(float(valor), 2)
+
+
+def _balance_equipo(id_equipo, nombre, temporada, temporadas, plantilla, partidos):
+    victorias = 0
+    for p in partidos:
+        propio, rival = (p["local"], p["visitante"]) if p["local"]["id"] == id_equipo else (p["visitante"], p["local"])
+        p["rival"] = rival
+        p["es_local"] = propio is p["local"]
+        p["victoria"] = (propio["puntos"] or 0) > (rival["puntos"] or 0)
+        victorias += p["victoria"]
+    return {"id": id_equipo, "nombre": nombre, "temporada": temporada, "temporadas": temporadas, "plantilla": plantilla,
+            "victorias": int(victorias), "derrotas": len(partidos) - int(victorias), "partidos": partidos}
+
+
+def _balance_cruce(equipos, partidos):
+    balance = {e: {"victorias": 0, "puntos": 0} for e, _ in equipos}
+    for p in partidos:
+        local, visitante = p["local"], p["visitante"]
+        for propio in (local, visitante):
+            balance[propio["id"]]["puntos"] += propio["puntos"] or 0
+        ganador = local if (local["puntos"] or 0) > (visitante["puntos"] or 0) else visitante
+        balance[ganador["id"]]["victorias"] += 1
+    equipos = [{"id": e, "nombre": nombre, "victorias": balance[e]["victorias"],
+                "puntos_promedio": round(balance[e]["puntos"] / len(partidos), 1)} for e, nombre in equipos]
+    return {"equipos": equipos, "partidos": partidos}
+
+
+class IndicePartidos:
+    def __init__(self, carpeta=CARPETA_PROCESADOS, memoria_mb=None):
+        if memoria_mb is None:
+            memoria_mb = float(os.environ.get("BBALL_MEMORIA_PARTIDOS_MB", MEMORIA_POR_DEFECTO_MB))
+        self.presupuesto = int(memoria_mb * 1024 * 1024)
+        self.partidos = None
+        self.por_partido = {}
+        self.por_equipo_temporada = {}
+        self.por_cruce = {}
+        self.fichas = {}
+        self.temporadas_con_ficha = []
+
+        ruta_partidos = os.path.join(carpeta, "capa2", "capa2_partidos.csv")
+        ruta_detallada = os.path.join(carpeta, "capa2", "capa2_estadisticas_detalladas.csv")
+        if not os.path.exists(ruta_partidos):
+            return
+
+        equipos = pd.read_csv(os.path.join(carpeta, "capa1", "capa1_equipos.csv"))
+        self.nombres_equipos = dict(zip(equipos['uri_equipo'].map(extraer_id), equipos['nombre_equipo']))
+        jugadores = pd.read_csv(os.path.join(carpeta, "capa1", "capa1_jugadores.csv"), usecols=['url_jugador', 'nombre_jugador'])
+        self.nombres_jugadores = dict(zip(jugadores['url_jugador'].map(extraer_id), jugadores['nombre_jugador']))
+        # Nombre de cada equipo en cada temporada y su plantilla (solo jugadores del maestro)
+        equipos_temporada = pd.read_csv(os.path.join(carpeta, "capa1", "capa1_equipos_temporada.csv"))
+        self.nombres_temporada = dict(zip(zip(equipos_temporada['uri_equipo'].map(extraer_id), equipos_temporada['ano_inicio'].astype(int)),
+                                          equipos_temporada['nombre_equipo']))
+        plantillas = pd.read_csv(os.path.join(carpeta, "capa1", "capa1_plantillas.csv"), usecols=['url_jugador', 'uri_equipo', 'anio_inicio'])
+        plantillas['id_jugador'] = plantillas['url_jugador'].map(extraer_id)
+        plantillas = plantillas[plantillas['id_jugador'].isin(self.nombres_jugadores)]
+        self.plantillas = {(extraer_id(uri), int(temporada)): list(grupo) for (uri, temporada), grupo
+                           in plantillas.groupby(['uri_equipo', 'anio_inicio'])['id_jugador']}
+
+        partidos = pd.read_csv(ruta_partidos).sort_values(['fecha', 'id_partido'], kind="stable").reset_index(drop=True)
+        partidos['id_local'] = partidos['uri_local'].map(extraer_id)
+        partidos['id_visitante'] = partidos['uri_visitante'].map(extraer_id)
+        self.partidos = partidos.drop(columns=['uri_local', 'uri_visitante'])
+        self.registros = self.partidos.to_dict("records")
+        usado = int(self.partidos.memory_usage(deep=True).sum()) * 2  # La tabla y su copia en registros
+
+        for fila, (id_partido, temporada, local, visitante) in enumerate(
+                zip(partidos['id_partido'], partidos['ano_inicio'], partidos['id_local'], partidos['id_visitante'])):
+            self.por_partido[id_partido] = fila
+            self.por_equipo_temporada.setdefault((local, int(temporada)), []).append(fila)
+            self.por_equipo_temporada.setdefault((visitante, int(temporada)), []).append(fila)
+            self.por_cruce.setdefault(frozenset((local, visitante)), []).append(fila)
+        self.temporadas = sorted(int(t) for t in partidos['ano_inicio'].unique())
+
+        if os.path.exists(ruta_detallada):
+            self._cargar_fichas(ruta_detallada, usado)
+
+    def _cargar_fichas(self, ruta_detallada, usado):
+        detallada = pd.read_csv(ruta_detallada, usecols=['url_jugador', 'id_partido', 'uri_equipo', 'ano_inicio'] + COLUMNAS_FICHA)
+        detallada = detallada[detallada['id_partido'].isin(self.por_partido)]
+        # Por partido, equipo y puntos (de mas a menos): la ficha de cada equipo sale ya ordenada
+        detallada = detallada.sort_values(['id_partido', 'uri_equipo', 'puntos'], ascending=[True, True, False], kind="stable")
+
+        # Temporadas de la mas reciente a la mas antigua mientras quepan en el presupuesto
+        bytes_por_fila = 4 * len(COLUMNAS_FICHA) + 2 * 4
+        filas_temporada = detallada['ano_inicio'].value_counts()
+        for temporada in sorted(filas_temporada.index, reverse=True):
+            coste = int(filas_temporada[temporada]) * bytes_por_fila
+            if usado + coste > self.presupuesto:
+                print(f"Fichas de partido: presupuesto de {self.presupuesto // (1024 * 1024)} MB alcanzado, "
+                      f"temporadas anteriores a {temporada + 1} sin ficha")
+                break
+            usado += coste
+            self.temporadas_con_ficha.append(int(temporada))
+        detallada = detallada[detallada['ano_inicio'].isin(self.temporadas_con_ficha)]
+
+        self.valores = detallada[COLUMNAS_FICHA].to_numpy(dtype=np.float32)
+        # Identificadores numericos de proballers como int32 (un str por fila costaria mas que la propia ficha)
+        self.ids_jugador = pd.to_numeric(detallada['url_jugador'].map(extraer_id), errors="coerce").fillna(-1).to_numpy(np.int32)
+        self.ids_equipo_ficha = pd.to_numeric(detallada['uri_equipo'].map(extraer_id), errors="coerce").fillna(-1).to_numpy(np.int32)
+        claves = detallada['id_partido'].to_numpy()
+        if len(claves):
+            inicios = np.flatnonzero(np.r_[True, claves[1:] != claves[:-1]])
+            finales = np.r_[inicios[1:], len(claves)]
+            self.fichas = {claves[i]: (int(i), int(f)) for i, f in zip(inicios, finales)}
+        self.memoria_usada = usado
+
+    def disponible(self):
+        return self.partidos is not None
+
+    def nombre_equipo(self, identificador):
+        return self.nombres_equipos.get(identificador, identificador)
+
+    # --- Consultas ---
+
+    def _resumen(self, fila):
+        p = self.registros[fila]
+        return {"id": p['id_partido'], "fecha": p['fecha'], "temporada": int(p['ano_inicio']), "jornada": _numero(p['jornada']),
+                "local": {"id": p['id_local'], "nombre": self.nombre_equipo(p['id_local']), "puntos": _numero(p['puntos_local'])},
+                "visitante": {"id": p['id_visitante'], "nombre": self.nombre_equipo(p['id_visitante']),
+                              "puntos": _numero(p['puntos_visitante'])}}
+
+    def _ficha_equipo(self, inicio, fin, id_equipo):
+        jugadores = []
+        for i in range(inicio, fin):
+            if str(self.ids_equipo_ficha[i]) != id_equipo:
+                continue
+            identificador = str(self.ids_jugador[i])
+            linea = {"id": identificador, "nombre": self.nombres_jugadores.get(identificador, "")}
+            linea.update({columna: _numero(valor) for columna, valor in zip(COLUMNAS_FICHA, self.valores[i])})
+            jugadores.append(linea)
+        return jugadores
+
+    def partido(self, id_partido):
+        """Resultado, estadisticas de equipo y ficha de cada jugador (None si el partido no existe)."""
+        if id_partido not in self.por_partido:
+            return None
+        fila = self.por_partido[id_partido]
+        resumen = self._resumen(fila)
+        p = self.registros[fila]
+        for lado, sufijo in (("local", "_local"), ("visitante", "_visitante")):
+            resumen[lado]["equipo"] = {columna[:-len(sufijo)]: _numero(p[columna]) for columna in self.partidos.columns
+                                       if columna.endswith(sufijo) and not columna.startswith(("id_", "puntos_"))}
+            resumen[lado]["jugadores"] = None
+        if id_partido in self.fichas:
+            inicio, fin = self.fichas[id_partido]
+            for lado in ("local", "visitante"):
+                resumen[lado]["jugadores"] = self._ficha_equipo(inicio, fin, resumen[lado]["id"])
+        return resumen
+
+    def equipo_temporada(self, id_equipo, temporada):
+        """Partidos de un equipo en una temporada con su balance."""
+        filas = self.por_equipo_temporada.get((id_equipo, temporada))
+        if filas is None:
+            return None
+        temporadas = sorted(t for (e, t) in self.por_equipo_temporada if e == id_equipo)
+        nombre = self.nombres_temporada.get((id_equipo, temporada), self.nombre_equipo(id_equipo))
+        plantilla = sorted(({"id": i, "nombre": self.nombres_jugadores[i]} for i in self.plantillas.get((id_equipo, temporada), [])),
+                           key=lambda jugador: jugador["nombre"])
+        return _balance_equipo(id_equipo, nombre, temporada, temporadas, plantilla, [self._resumen(fila) for fila in filas])
+
+    def cara_a_cara(self, id_a, id_b):
+        """Todos los enfrentamientos entre dos equipos, con victorias y puntos medios de cada uno."""
+        filas = self.por_cruce.get(frozenset((id_a, id_b)))
+        if filas is None or id_a == id_b:
+            return None
+        return _balance_cruce([(e, self.nombre_equipo(e)) for e in (id_a, id_b)], [self._resumen(fila) for fila in filas])
+
+
+class VistaPartidosCompacta:
+    """Las consultas de IndicePartidos sobre un ModeloCompacto, a traves de su indice por club."""
+
+    def __init__(self, modelo):
+        self.modelo = modelo
+
+    def disponible(self):
+        return len(self.modelo.partidos) > 0
+
+    def nombre_equipo(self, identificador):
+        club = self.modelo.club_por_id.get(identificador)
+        return club.nombre if club else identificador
+
+    # --- Consultas ---
+
+    def _resumen(self, partido):
+        lados = {}
+        for lado, club, puntos in (("local", partido.local, partido.puntos_local),
+                                   ("visitante", partido.visitante, partido.puntos_visitante)):
+            lados[lado] = {"id": club.id if club else None, "nombre": club.nombre if club else "", "puntos": _numero(puntos)}
+        return {"id": partido.id, "fecha": partido.fecha, "temporada": int(partido.temporada),
+                "jornada": _numero(partido.jornada), **lados}
+
+    def _ficha_equipo(self, club, partido):
+        filas = self.modelo.actuaciones_de_club(club, partido)
+        jugadores = []
+        # De mas a menos puntos, como en IndicePartidos
+        for i in np.argsort(-np.asarray(filas["puntos"]), kind="stable"):
+            jugador = self.modelo.jugadores[filas["jugador"][i]]
+            linea = {"id": jugador.id, "nombre": jugador.nombre}
+            linea.update({columna: _numero(filas[columna][i]) for columna in COLUMNAS_FICHA})
+            jugadores.append(linea)
+        return jugadores
+
+    def partido(self, id_partido):
+        """Resultado, estadisticas de equipo y ficha de cada jugador (None si el partido no existe)."""
+        partido = self.modelo.partido_por_id.get(id_partido)
+        if partido is None:
+            return None
+        resumen = self._resumen(partido)
+        for lado, club in (("local", partido.local), ("visitante", partido.visitante)):
+            resumen[lado]["equipo"] = {columna: _numero(self.modelo.estadisticas_partidos[f"{columna}_{lado}"][partido.indice])
+                                       for columna in ESTADISTICAS_EQUIPO}
+            resumen[lado]["jugadores"] = self._ficha_equipo(club, partido) if club else None
+        return resumen
+
+    def equipo_temporada(self, id_equipo, temporada):
+        """Partidos de un equipo en una temporada con su balance."""
+        club = self.modelo.club_por_id.get(id_equipo)
+        if club is None:
+            return None
+        partidos = [self.modelo.partidos[i] for i in self.modelo.partidos_de_club(club)]
+        de_temporada = [p for p in partidos if p.temporada == temporada]
+        if not de_temporada:
+            return None
+        temporadas = sorted({int(p.temporada) for p in partidos})
+        # Nombre de la temporada y plantilla desde el equipo-temporada de capa1 (si no esta, el del club y sin plantilla)
+        equipo = self.modelo.equipos_temporada.get((id_equipo, temporada))
+        nombre = equipo.nombre if equipo else club.nombre
+        plantilla = sorted(({"id": self.modelo.jugadores[i].id, "nombre": self.modelo.jugadores[i].nombre}
+                            for i in (equipo.jugadores if equipo else ())), key=lambda jugador: jugador["nombre"])
+        return _balance_equipo(id_equipo, nombre, temporada, temporadas, plantilla, [self._resumen(p) for p in de_temporada])
+
+    def cara_a_cara(self, id_a, id_b):
+        """Todos los enfrentamientos entre dos equipos, con victorias y puntos medios de cada uno."""
+        club_a, club_b = self.modelo.club_por_id.get(id_a), self.modelo.club_por_id.get(id_b)
+        if club_a is None or club_b is None or id_a == id_b:
+            return None
+        # Los indices de partido siguen la fecha: la interseccion ya sale en orden cronologico
+        comunes = np.intersect1d(self.modelo.partidos_de_club(club_a), self.modelo.partidos_de_club(club_b))
+        if not len(comunes):
+            return None
+        return _balance_cruce([(club_a.id, club_a.nombre), (club_b.id, club_b.nombre)],
+                              [self._resumen(self.modelo.partidos[i]) for i in comunes])
@@ -0,0 +1,297 @@
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+import numpy as np
+
+# Prueba de carga autocontenida de la web: arranca la app en local (servidor de desarrollo de Flask
+# o uvicorn con asgi.py), la calienta, lanza durante un tiempo fijo la mezcla de rutas.py con N
+# clientes concurrentes (bucle cerrado: cada cliente pide la siguiente ruta al recibir la respuesta)
+# y escribe un informe JSON con throughput, latencias p50/p95/p99 (global y por tipo de pagina),
+# codigos de respuesta y RSS de cada proceso del servidor (maximo muestreado durante la carga).
+# Si alguna medida supera los umbrales (umbrales.json) el proceso termina con codigo 1.
+#
+#   python carga.py [--modo flask|asgi] [--workers 1] [--fuente grafo|compacto|mmap]
+#                   [--concurrencia 8] [--duracion 60] [--calentamiento 30] [--semilla 0]
+#                   [--rutas rutas.txt] [--url http://host:puerto] [--umbrales umbrales.json] [--salida ruta.json]
+#
+# --rutas reproduce un archivo de rutas grabado (una por linea, p. ej. sacado del log de acceso)
+# en lugar de generar la mezcla; --url mide un servidor ya arrancado (sin RSS salvo que sea local y
+# se indique --pid).
+
+ruta_script = os.path.dirname(os.path.abspath(__file__))
+raiz = os.path.abspath(os.path.join(ruta_script, "..", "..", ".."))
+carpeta_codigo = os.path.join(raiz, "codigo")
+carpeta_resultados = os.path.join(raiz, "datos", "benchmarks")
+
+sys.path.append(ruta_script)
+from rutas import Mezcla, tipo_de_ruta
+
+PUERTOS = {"flask": 5000, "asgi": 8000}
+ESPERA_ARRANQUE_S = 600  # Con BBALL_FUENTE=grafo la carga del grafo tarda minutos
+
+
+def argumento(nombre, por_defecto):
+    if nombre in sys.argv:
+        return sys.argv[sys.argv.index(nombre) + 1]
+    return por_defecto
+
+
+# --- Servidor ---
+
+def arrancar_servidor(modo, puerto, workers, fuente):
+    entorno = dict(os.environ)
+    if fuente:
+        entorno["BBALL_FUENTE"] = fuente
+    if modo == "flask":
+        # Sin debug: el recargador duplicaria el proceso (y la memoria)
+        orden = [sys.executable, "-c", f"from app import app; app.run(port={puerto}, threaded=True)"]
+        carpeta = os.path.join(carpeta_codigo, "web")
+    elif modo == "asgi":
+        orden = [sys.executable, "-m", "uvicorn", "web.asgi:aplicacion", "--host", "127.0.0.1", "--port", str(puerto),
+                 "--workers", str(workers), "--log-level", "warning"]
+        carpeta = carpeta_codigo
+    else:
+        raise ValueError(f"Modo desconocido '{modo}'. Opciones: flask, asgi")
+    os.makedirs(carpeta_resultados, exist_ok=True)
+    log = open(os.path.join(carpeta_resultados, f"carga_servidor_{modo}.log"), "w", encoding="utf-8")
+    return subprocess.Popen(orden, cwd=carpeta, env=entorno, stdout=log, stderr=subprocess.STDOUT)
+
+
+def esperar_servidor(url, proceso, limite=ESPERA_ARRANQUE_S):
+    fin = time.time() + limite
+    while time.time() < fin:
+        if proceso is not None and proceso.poll() is not None:
+            sys.exit(f"El servidor termino al arrancar (codigo {proceso.returncode}), ver su log en {carpeta_resultados}")
+        try:
+            urllib.request.urlopen(url + "/clasificaciones", timeout=5)
+            return
+        except urllib.error.HTTPError:
+            return
+        except OSError:
+            time.sleep(1)
+    sys.exit(f"El servidor no respondio en {limite} s")
+
+
+def procesos_del_arbol(pid):
+    """El proceso y todos sus descendientes (los workers de uvicorn), leyendo /proc."""
+    hijos = {}
+    for entrada in os.listdir("/proc"):
+        if not entrada.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entrada}/stat") as archivo:
+                # El nombre del proceso va entre parentesis y puede tener espacios: el ppid va despues
+                padre = int(archivo.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        hijos.setdefault(padre, []).append(int(entrada))
+    arbol, pendientes = [], [pid]
+    while pendientes:
+        actual = pendientes.pop()
+        arbol.append(actual)
+        pendientes.extend(hijos.get(actual, []))
+    return arbol
+
+
+def rss_mb(pid):
+    try:
+        with open(f"/proc/{pid}/status") as archivo:
+            for linea in archivo:
+                if linea.startswith("VmRSS:"):
+                    return int(linea.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+class MuestreadorRSS(threading.Thread):
+    def __init__(self, pid, intervalo=0.5):
+        super().__init__(daemon=True)
+        self.pid = pid
+        self.intervalo = intervalo
+        self.maximos = {}
+        self.parar = threading.Event()
+
+    def run(self):
+        while not self.parar.is_set():
+            for proceso in procesos_del_arbol(self.pid):
+                memoria = rss_mb(proceso)
+                if memoria is not None:
+                    self.maximos[proceso] = max(memoria, self.maximos.get(proceso, 0))
+            self.parar.wait(self.intervalo)
+
+
+# --- Carga ---
+
+class RutasGrabadas:
+    """Reproduce en bucle un archivo de rutas (una por linea), con la misma interfaz que Mezcla.siguiente."""
+
+    def __init__(self, ruta):
+        with open(ruta, encoding="utf-8") as archivo:
+            self.rutas = [linea.strip() for linea in archivo if linea.strip()]
+        self.posicion = 0
+
+    def siguiente(self):
+        ruta = self.rutas[self.posicion % len(self.rutas)]
+        self.posicion += 1
+        return tipo_de_ruta(ruta), ruta
+
+
+def lanzar_carga(url, siguiente, concurrencia, duracion):
+    """Peticiones de 'concurrencia' clientes durante 'duracion' segundos: lista de (tipo, estado, segundos)."""
+    medidas = []
+    cerrojo = threading.Lock()
+    fin = time.time() + duracion
+
+    def cliente():
+        while time.time() < fin:
+            with cerrojo:
+                tipo, ruta = siguiente()
+            inicio = time.perf_counter()
+            try:
+                with urllib.request.urlopen(url + ruta, timeout=120) as respuesta:
+                    respuesta.read()
+                    estado = respuesta.status
+            except urllib.error.HTTPError as error:
+                estado = error.code
+            except OSError:
+                estado = 0  # Conexion rechazada o cortada
+            with cerrojo:
+                medidas.append((tipo, estado, time.perf_counter() - inicio))
+
+    clientes = [threading.Thread(target=cliente) for _ in range(concurrencia)]
+    for hilo in clientes:
+        hilo.start()
+    for hilo in clientes:
+        hilo.join()
+    return medidas
+
+
+def resumir(medidas, duracion):
+    latencias = np.array([segundos * 1000 for _, estado, segundos in medidas if 200 <= estado < 400])
+    errores = sum(1 for _, estado, _ in medidas if not 200 <= estado < 400)
+    resumen = {"peticiones": len(medidas), "correctas": len(latencias), "errores": errores,
+               "tasa_errores": round(errores / len(medidas), 4) if medidas else 0.0,
+               "peticiones_s": round(len(latencias) / duracion, 2)}
+    for percentil in (50, 95, 99):
+        resumen[f"p{percentil}_ms"] = round(float(np.percentile(latencias, percentil)), 1) if len(latencias) else None
+    return resumen
+
+
+def evaluar_umbrales(informe, umbrales):
+    """Lista de incumplimientos ('medida: valor > limite'); vacia si la ejecucion pasa."""
+    incumplidos = []
+
+    def comprobar(nombre, resumen, limites):
+        for clave, limite in limites.items():
+            medida, sentido = clave.rsplit("_", 1)
+            valor = resumen.get(medida)
+            if valor is None:
+                continue
+            if (sentido == "max" and valor > limite) or (sentido == "min" and valor < limite):
+                incumplidos.append(f"{nombre}.{medida}: {valor} {'>' if sentido == 'max' else '<'} {limite}")
+
+    comprobar("global", informe["global"], umbrales.get("global", {}))
+    for tipo, limites in umbrales.get("por_tipo", {}).items():
+        if tipo in informe["por_tipo"]:
+            comprobar(tipo, informe["por_tipo"][tipo], limites)
+    rss_maximo = umbrales.get("rss_mb_por_proceso_max")
+    for pid, memoria in informe["rss_mb"].items():
+        if rss_maximo is not None and memoria > rss_maximo:
+            incumplidos.append(f"rss[{pid}]: {memoria} > {rss_maximo}")
+    return incumplidos
+
+
+def ejecutar_prueba():
+    modo = argumento("--modo", "flask")
+    workers = int(argumento("--workers", "1"))
+    fuente = argumento("--fuente", None)
+    concurrencia = int(argumento("--concurrencia", "8"))
+    duracion = float(argumento("--duracion", "60"))
+    calentamiento = float(argumento("--calentamiento", "30"))
+    semilla = int(argumento("--semilla", "0"))
+    ruta_umbrales = argumento("--umbrales", os.path.join(ruta_script, "umbrales.json"))
+    ruta_resultado = argumento("--salida", os.path.join(carpeta_resultados, f"carga_{time.strftime('%Y%m%dT%H%M%S')}.json"))
+    url = argumento("--url", None)
+    pid = int(argumento("--pid", "0")) or None
+
+    if "--rutas" in sys.argv:
+        grabadas = RutasGrabadas(argumento("--rutas", None))
+        siguiente = grabadas.siguiente
+        origen = f"grabadas ({len(grabadas.rutas)} rutas)"
+    else:
+        siguiente = Mezcla(semilla).siguiente
+        origen = f"mezcla zipf (semilla {semilla})"
+
+    print(f"--- Prueba de carga: {modo}, {concurrencia} clientes, {duracion:g} s, rutas {origen} ---")
+    proceso = None
+    if url is None:
+        puerto = PUERTOS[modo]
+        url = f"http://127.0.0.1:{puerto}"
+        proceso = arrancar_servidor(modo, puerto, workers, fuente)
+        pid = proceso.pid
+    try:
+        inicio = time.perf_counter()
+        esperar_servidor(url, proceso)
+        print(f"Servidor listo en {time.perf_counter() - inicio:.1f} s ({url})")
+        if calentamiento > 0:
+            print(f"Calentando {calentamiento:g} s...")
+            lanzar_carga(url, siguiente, concurrencia, calentamiento)
+
+        muestreador = MuestreadorRSS(pid) if pid else None
+        if muestreador:
+            muestreador.start()
+        medidas = lanzar_carga(url, siguiente, concurrencia, duracion)
+        if muestreador:
+            muestreador.parar.set()
+            muestreador.join()
+    finally:
+        if proceso is not None:
+            proceso.terminate()
+            proceso.wait()
+
+    informe = {"fecha": time.strftime("%Y-%m-%dT%H:%M:%S"), "modo": modo, "workers": workers,
+               "fuente": fuente or os.environ.get("BBALL_FUENTE", "grafo"), "url": url, "rutas": origen,
+               "concurrencia": concurrencia, "duracion_s": duracion, "calentamiento_s": calentamiento,
+               "global": resumir(medidas, duracion), "por_tipo": {}, "estados": {},
+               "rss_mb": {str(p): round(m, 1) for p, m in sorted(muestreador.maximos.items())} if muestreador else {}}
+    for tipo in sorted({tipo for tipo, _, _ in medidas}):
+        informe["por_tipo"][tipo] = resumir([m for m in medidas if m[0] == tipo], duracion)
+    for _, estado, _ in medidas:
+        informe["estados"][str(estado)] = informe["estados"].get(str(estado), 0) + 1
+
+    umbrales = {}
+    if os.path.exists(ruta_umbrales):
+        with open(ruta_umbrales, encoding="utf-8") as archivo:
+            umbrales = json.load(archivo)
+    informe["umbrales"] = umbrales
+    informe["incumplidos"] = evaluar_umbrales(informe, umbrales)
+
+    total = informe["global"]
+    print(f"{total['peticiones_s']} pet/s | p50 {total['p50_ms']} ms | p95 {total['p95_ms']} ms | p99 {total['p99_ms']} ms "
+          f"| errores {total['tasa_errores']:.2%} | estados {informe['estados']}")
+    for tipo, resumen in informe["por_tipo"].items():
+        print(f"   {tipo:<16} {resumen['peticiones']:>6} pet | p50 {resumen['p50_ms']} ms | p95 {resumen['p95_ms']} ms "
+              f"| p99 {resumen['p99_ms']} ms")
+    for proceso_servidor, memoria in informe["rss_mb"].items():
+        print(f"   RSS proceso {proceso_servidor}: {memoria} MB")
+
+    os.makedirs(os.path.dirname(ruta_resultado), exist_ok=True)
+    with open(ruta_resultado, "w", encoding="utf-8") as archivo:
+        json.dump(informe, archivo, indent=2)
+    print(f"Informe guardado en: {ruta_resultado}")
+
+    if informe["incumplidos"]:
+        print("UMBRALES SUPERADOS:")
+        for incumplido in informe["incumplidos"]:
+            print(f"   {incumplido}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    ejecutar_prueba()
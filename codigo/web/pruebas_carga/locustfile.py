@@ -0,0 +1,48 @@
+import os
+import sys
+from locust import HttpUser, task, between
+
+# Prueba de carga con locust sobre la mezcla de rutas.py. Se lanza igual contra los dos modos:
+#   python app.py                       (servidor de desarrollo de Flask, puerto 5000)
+#   python asgi.py                      (uvicorn + pool acotado, puerto 8000)
+#   locust -f locustfile.py --host http://127.0.0.1:8000 --headless -u 50 -r 10 -t 2m --csv resultados
+# Las respuestas 503 (admision) y 504 (tiempo limite) cuentan como fallos para ver cuantas hay.
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from rutas import PESOS, Mezcla
+
+
+class Visitante(HttpUser):
+    wait_time = between(0.1, 1.0)
+
+    def on_start(self):
+        self.mezcla = Mezcla(semilla=None)
+
+    def visitar(self, tipo):
+        ruta = self.mezcla.ruta(tipo)
+        # Agrupado por tipo de pagina, no por URL (una serie por jugador no se podria leer)
+        self.client.get(ruta, name=tipo)
+
+    @task(PESOS["jugador"])
+    def jugador(self):
+        self.visitar("jugador")
+
+    @task(PESOS["buscador"])
+    def buscador(self):
+        self.visitar("buscador")
+
+    @task(PESOS["clasificaciones"])
+    def clasificaciones(self):
+        self.visitar("clasificaciones")
+
+    @task(PESOS["partido"])
+    def partido(self):
+        self.visitar("partido")
+
+    @task(PESOS["api_forma"])
+    def api_forma(self):
+        self.visitar("api_forma")
+
+    @task(PESOS["inicio"])
+    def inicio(self):
+        self.visitar("inicio")
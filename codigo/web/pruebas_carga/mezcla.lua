@@ -0,0 +1,41 @@
+-- Mezcla de rutas para wrk (generada con: python rutas.py 5000)
+--   wrk -t4 -c64 -d60s --latency -s mezcla.lua http://127.0.0.1:8000
+-- Cada conexion recorre rutas.txt desde una posicion distinta; al final se cuentan 503 y 504.
+
+local rutas = {}
+for linea in io.lines("rutas.txt") do
+    rutas[#rutas + 1] = linea
+end
+
+local hilos = {}
+local contador = 0
+
+function setup(hilo)
+    hilo:set("id", #hilos)
+    table.insert(hilos, hilo)
+end
+
+function init(args)
+    contador = id * 997
+    saturadas = 0
+    agotadas = 0
+end
+
+function request()
+    contador = contador + 1
+    return wrk.format("GET", rutas[(contador % #rutas) + 1])
+end
+
+function response(estado, cabeceras, cuerpo)
+    if estado == 503 then saturadas = saturadas + 1 end
+    if estado == 504 then agotadas = agotadas + 1 end
+end
+
+function done(resumen, latencia, peticiones)
+    local total503, total504 = 0, 0
+    for _, hilo in ipairs(hilos) do
+        total503 = total503 + hilo:get("saturadas")
+        total504 = total504 + hilo:get("agotadas")
+    end
+    io.write(string.format("503 (admision): %d  504 (tiempo limite): %d\n", total503, total504))
+end
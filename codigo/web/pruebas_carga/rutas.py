@@ -0,0 +1,96 @@
+import os
+import random
+import re
+import sys
+from functools import lru_cache
+from itertools import accumulate
+from urllib.parse import quote
+import pandas as pd
+
+# Mezcla de peticiones para las pruebas de carga de la web: las mismas rutas que usa un visitante,
+# con jugadores y partidos reales de las capas procesadas.
+# La popularidad de los jugadores sigue una Zipf (el de rango r se visita con peso 1 / r^s): el rango
+# es el orden por minutos de carrera de capa3, asi las fichas mas visitadas son tambien las mas
+# pesadas, como en produccion. Las busquedas son prefijos (3 a 5 letras) del nombre o apellido de
+# un jugador elegido con la misma Zipf, como los que se escriben en el buscador.
+#   python rutas.py [n] [semilla]   -> escribe rutas.txt (una ruta por linea) para wrk (mezcla.lua)
+
+ruta_script = os.path.dirname(os.path.abspath(__file__))
+raiz = os.path.abspath(os.path.join(ruta_script, "..", "..", ".."))
+CARPETA_PROCESADOS = os.path.join(raiz, "datos", "procesados")
+
+# Peso de cada tipo de pagina en la mezcla (las fichas de jugador son las que lanzan SPARQL pesado)
+PESOS = {"jugador": 6, "buscador": 2, "clasificaciones": 1, "partido": 1, "api_forma": 1, "inicio": 1}
+EXPONENTE_ZIPF = 1.1
+
+
+@lru_cache(maxsize=1)
+def identificadores():
+    """Ids y nombres de jugadores (de mas a menos minutos de carrera) e ids de partido (se leen una vez por proceso)."""
+    jugadores = pd.read_csv(os.path.join(CARPETA_PROCESADOS, "capa1", "capa1_jugadores.csv"))
+    ruta_carrera = os.path.join(CARPETA_PROCESADOS, "capa3", "capa3_jugadores_carrera.csv")
+    if os.path.exists(ruta_carrera):
+        minutos = pd.read_csv(ruta_carrera, usecols=['url_jugador', 'minutos_total'])
+        jugadores = jugadores.merge(minutos, on='url_jugador', how='left')
+        jugadores = jugadores.sort_values('minutos_total', ascending=False, na_position='last', kind="stable")
+    ids_jugador = [re.search(r'/(\d+)/?', url).group(1) for url in jugadores['url_jugador']]
+    partidos = pd.read_csv(os.path.join(CARPETA_PROCESADOS, "capa2", "capa2_partidos.csv"), usecols=['id_partido'])
+    return ids_jugador, jugadores['nombre_jugador'].fillna("").tolist(), partidos['id_partido'].tolist()
+
+
+class Mezcla:
+    def __init__(self, semilla=0, exponente=EXPONENTE_ZIPF, pesos=PESOS):
+        self.azar = random.Random(semilla)
+        self.ids_jugador, self.nombres, self.ids_partido = identificadores()
+        # Pesos acumulados: cada eleccion es una busqueda binaria, no un recorrido de la lista
+        self.acumulados = list(accumulate(1 / rango ** exponente for rango in range(1, len(self.ids_jugador) + 1)))
+        self.tipos = list(pesos)
+        self.pesos_tipos = list(pesos.values())
+
+    def _jugador(self):
+        return self.azar.choices(range(len(self.ids_jugador)), cum_weights=self.acumulados)[0]
+
+    def _prefijo(self):
+        for _ in range(20):
+            palabras = [p for p in self.nombres[self._jugador()].split() if p.isalpha() and len(p) >= 3]
+            if palabras:
+                palabra = self.azar.choice(palabras)
+                return palabra[:self.azar.randint(3, 5)].lower()
+        return ""
+
+    def ruta(self, tipo):
+        if tipo == "jugador":
+            return f"/jugador/{self.ids_jugador[self._jugador()]}"
+        if tipo == "buscador":
+            return f"/jugadores?nombre={quote(self._prefijo())}"
+        if tipo == "clasificaciones":
+            return "/clasificaciones?tipo=" + self.azar.choice(["jugadores", "equipos"])
+        if tipo == "partido":
+            return f"/partido/{self.azar.choice(self.ids_partido)}"
+        if tipo == "api_forma":
+            return f"/api/jugador/{self.ids_jugador[self._jugador()]}/forma"
+        return "/"
+
+    def siguiente(self):
+        """(tipo, ruta) de la proxima peticion."""
+        tipo = self.azar.choices(self.tipos, weights=self.pesos_tipos)[0]
+        return tipo, self.ruta(tipo)
+
+    def rutas(self, n):
+        return [self.siguiente()[1] for _ in range(n)]
+
+
+def tipo_de_ruta(ruta):
+    """Tipo de pagina de una ruta de la mezcla (para agrupar latencias)."""
+    if ruta.startswith("/api/"):
+        return "api_forma"
+    seccion = ruta.split("?")[0].split("/")[1]
+    return {"": "inicio", "jugadores": "buscador"}.get(seccion, seccion)
+
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    semilla = int(sys.argv[2]) if len(sys.argv) > 2 else 0
+    with open(os.path.join(ruta_script, "rutas.txt"), "w", encoding="utf-8") as archivo:
+        archivo.write("\n".join(Mezcla(semilla).rutas(n)) + "\n")
+    print(f"{n} rutas escritas en {os.path.join(ruta_script, 'rutas.txt')}")
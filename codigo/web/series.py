@@ -0,0 +1,71 @@
+import os
+import numpy as np
+import pandas as pd
+from web.clasificaciones import extraer_id
+
+# Series precalculadas por limpieza/capa2_ventanas.py (forma reciente, rachas y splits casa/fuera).
+# Los CSV ya vienen ordenados por jugador/equipo y fecha, asi que cada jugador o equipo ocupa
+# un bloque contiguo de filas: se guarda (inicio, fin) de cada bloque y una consulta es un corte.
+
+directorio_actual = os.path.dirname(os.path.abspath(__file__))
+CARPETA_VENTANAS = os.path.abspath(os.path.join(directorio_actual, "../../datos/procesados/ventanas"))
+
+
+class TablaPorBloques:
+    def __init__(self, ruta, columna_uri):
+        self.tabla = None
+        self.bloques = {}
+        if not os.path.exists(ruta):
+            return
+        tabla = pd.read_csv(ruta)
+        ids = tabla[columna_uri].map(extraer_id).to_numpy()
+        tabla = tabla.drop(columns=[columna_uri])
+        tabla.insert(0, "id", ids)
+        # Un bloque empieza donde cambia el identificador respecto a la fila anterior
+        inicios = np.flatnonzero(np.r_[True, ids[1:] != ids[:-1]]) if len(ids) else np.array([], dtype=int)
+        finales = np.r_[inicios[1:], len(ids)]
+        self.bloques = {ids[i]: (int(i), int(f)) for i, f in zip(inicios, finales)}
+        self.tabla = tabla
+
+    def filas(self, identificador):
+        if identificador not in self.bloques:
+            return None
+        inicio, fin = self.bloques[identificador]
+        return self.tabla.iloc[inicio:fin]
+
+
+def a_registros(tabla):
+    # NaN no es JSON valido: se devuelve como null
+    return tabla.astype(object).where(tabla.notna(), None).to_dict("records")
+
+
+class IndiceSeries:
+    def __init__(self, carpeta=CARPETA_VENTANAS):
+        self.jugadores = TablaPorBloques(os.path.join(carpeta, "ventanas_jugadores.csv"), "url_jugador")
+        self.equipos = TablaPorBloques(os.path.join(carpeta, "ventanas_equipos.csv"), "uri_equipo")
+        self.splits_jugadores = TablaPorBloques(os.path.join(carpeta, "splits_jugadores.csv"), "url_jugador")
+        self.splits_equipos = TablaPorBloques(os.path.join(carpeta, "splits_equipos.csv"), "uri_equipo")
+
+    def disponible(self):
+        return self.jugadores.tabla is not None
+
+    def forma_jugador(self, id_jugador, ultimos=10):
+        filas = self.jugadores.filas(id_jugador)
+        return None if filas is None else a_registros(filas.iloc[-ultimos:])
+
+    def forma_equipo(self, id_equipo, temporada=None):
+        filas = self.equipos.filas(id_equipo)
+        if filas is None:
+            return None
+        if temporada is None:
+            temporada = int(filas["ano_inicio"].iloc[-1])
+        return temporada, a_registros(filas[filas["ano_inicio"] == temporada])
+
+    def splits(self, tipo, identificador, temporada=None):
+        tabla = self.splits_jugadores if tipo == "jugador" else self.splits_equipos
+        filas = tabla.filas(identificador)
+        if filas is None:
+            return None
+        if temporada is not None:
+            filas = filas[filas["ano_inicio"] == temporada]
+        return a_registros(filas)
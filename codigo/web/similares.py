@@ -0,0 +1,171 @@
+import os
+import numpy as np
+import pandas as pd
+from web.clasificaciones import CARPETA_CAPA3, extraer_id
+
+# "Jugadores como X": cada temporada de un jugador (sumando sus equipos) es un vector de rasgos
+# por 40 minutos y de eficiencia, estandarizados (z-score) y normalizados a norma 1, de modo que
+# la similitud coseno con todas las demas es un solo producto de matrices. Para muchas consultas a
+# la vez se multiplica por lotes; opcionalmente hay un LSH de hiperplanos aleatorios que reduce los
+# candidatos antes de ordenar (a este tamano el exacto ya tarda menos de un milisegundo).
+
+MINUTOS_MINIMOS = 200   # Por debajo los rasgos por minuto son ruido: no se ofrecen como resultado
+TAMANO_LOTE = 512
+
+# Rasgo -> etiqueta para la web
+RASGOS = {
+    "puntos_40": "Puntos/40",
+    "rebotes_of_40": "Reb. of./40",
+    "rebotes_def_40": "Reb. def./40",
+    "asistencias_40": "Asist./40",
+    "robos_40": "Robos/40",
+    "tapones_40": "Tapones/40",
+    "perdidas_40": "Perdidas/40",
+    "tiros_40": "Tiros campo/40",
+    "ratio_triples": "% tiros de 3",
+    "ratio_libres": "Tiros libres/tiro",
+    "ts_porcentaje": "TS%",
+    "efg_porcentaje": "eFG%",
+}
+
+
+def _dividir(numerador, denominador):
+    return np.where(denominador > 0, numerador / np.where(denominador > 0, denominador, 1), np.nan)
+
+
+def calcular_rasgos(tabla):
+    """Rasgos por 40 minutos y de eficiencia de cada jugador-temporada, desde los totales sumados."""
+    por_40 = lambda columna: 40 * _dividir(tabla[columna].to_numpy(float), tabla['minutos_total'].to_numpy(float))
+    intentos = tabla['tiros_campo_intentados_total'].to_numpy(float)
+    libres = tabla['t1_intentados_total'].to_numpy(float)
+    return pd.DataFrame({
+        "puntos_40": por_40('puntos_total'),
+        "rebotes_of_40": por_40('rebotes_ofensivos_total'),
+        "rebotes_def_40": por_40('rebotes_defensivos_total'),
+        "asistencias_40": por_40('asistencias_total'),
+        "robos_40": por_40('robos_total'),
+        "tapones_40": por_40('tapones_total'),
+        "perdidas_40": por_40('perdidas_total'),
+        "tiros_40": por_40('tiros_campo_intentados_total'),
+        "ratio_triples": _dividir(tabla['t3_intentados_total'].to_numpy(float), intentos),
+        "ratio_libres": _dividir(libres, intentos),
+        "ts_porcentaje": 100 * _dividir(tabla['puntos_total'].to_numpy(float), 2 * (intentos + 0.44 * libres)),
+        "efg_porcentaje": 100 * _dividir(tabla['tiros_campo_metidos_total'].to_numpy(float)
+                                         + 0.5 * tabla['t3_metidos_total'].to_numpy(float), intentos),
+    }, index=tabla.index)
+
+
+class IndiceSimilitud:
+    def __init__(self, carpeta_capa3=CARPETA_CAPA3, minutos_minimos=MINUTOS_MINIMOS):
+        self.matriz = None
+        self.filas = {}
+        ruta = os.path.join(carpeta_capa3, "capa3_jugadores_avanzado.csv")
+        if not os.path.exists(ruta):
+            return
+        avanzado = pd.read_csv(ruta)
+        totales = [c for c in avanzado.columns if c.endswith('_total')] + ['partidos_jugados']
+        tabla = avanzado.groupby(['url_jugador', 'ano_inicio'], as_index=False).agg(
+            {**{c: 'sum' for c in totales}, 'nombre_jugador': 'first'})
+        rasgos = calcular_rasgos(tabla)
+
+        # Media y desviacion solo de las temporadas con minutos suficientes (las de 20 minutos deforman la escala)
+        validas = tabla['minutos_total'].to_numpy() >= minutos_minimos
+        media = rasgos[validas].mean()
+        desviacion = rasgos[validas].std().replace(0, 1).fillna(1)
+        z = ((rasgos - media) / desviacion).fillna(0).clip(-4, 4).to_numpy(dtype=np.float32)
+        self.normas = np.linalg.norm(z, axis=1)
+        self.matriz = z / np.where(self.normas > 0, self.normas, 1)[:, None]
+
+        self.ids = tabla['url_jugador'].map(extraer_id).to_numpy()
+        self.temporadas = tabla['ano_inicio'].to_numpy()
+        self.nombres = tabla['nombre_jugador'].to_numpy()
+        self.minutos = tabla['minutos_total'].to_numpy(dtype=float)
+        self.partidos = tabla['partidos_jugados'].to_numpy()
+        self.rasgos = rasgos.to_numpy(dtype=float)
+        self.validas = validas
+        self.filas = {(identificador, int(temporada)): fila
+                      for fila, (identificador, temporada) in enumerate(zip(self.ids, self.temporadas))}
+        self.planos = None
+
+    def disponible(self):
+        return self.matriz is not None
+
+    def temporadas_de(self, identificador):
+        return sorted(t for (i, t) in self.filas if i == identificador)
+
+    # --- Busqueda exacta ---
+
+    def _mascara(self, consulta, temporada):
+        """Candidatos validos para una consulta: minutos suficientes, otro jugador y (si se pide) misma temporada."""
+        mascara = self.validas & (self.ids != self.ids[consulta])
+        if temporada is not None:
+            mascara = mascara & (self.temporadas == temporada)
+        return mascara
+
+    def similares_lote(self, consultas, k=10, temporada=None):
+        """Top-k exacto de varias filas a la vez: un producto (lote x d) @ (d x n) por cada TAMANO_LOTE consultas."""
+        resultado = []
+        for inicio in range(0, len(consultas), TAMANO_LOTE):
+            lote = np.asarray(consultas[inicio:inicio + TAMANO_LOTE])
+            similitudes = self.matriz[lote] @ self.matriz.T
+            for consulta, fila in zip(lote, similitudes):
+                fila = np.where(self._mascara(consulta, temporada), fila, -np.inf)
+                mejores = np.argpartition(-fila, min(k, len(fila) - 1))[:k]
+                mejores = mejores[np.isfinite(fila[mejores])]
+                resultado.append(mejores[np.argsort(-fila[mejores], kind="stable")])
+        return resultado
+
+    # --- Busqueda aproximada (LSH de hiperplanos aleatorios) ---
+
+    def construir_lsh(self, tablas=12, bits=8, semilla=0):
+        generador = np.random.default_rng(semilla)
+        self.planos = generador.standard_normal((tablas, bits, self.matriz.shape[1])).astype(np.float32)
+        potencias = 1 << np.arange(bits)
+        # Firma de cada fila en cada tabla: el lado de cada hiperplano, empaquetado en un entero
+        firmas = ((np.einsum('tbd,nd->tnb', self.planos, self.matriz) > 0) * potencias).sum(axis=2)
+        self.potencias = potencias
+        self.cubetas = []
+        for firmas_tabla in firmas:
+            orden = np.argsort(firmas_tabla, kind="stable")
+            claves, inicios = np.unique(firmas_tabla[orden], return_index=True)
+            finales = np.r_[inicios[1:], len(orden)]
+            self.cubetas.append({int(c): orden[i:f] for c, i, f in zip(claves, inicios, finales)})
+
+    def _similares_aproximado(self, consulta, k, temporada):
+        if self.planos is None:
+            self.construir_lsh()
+        firmas = ((self.planos @ self.matriz[consulta] > 0) * self.potencias).sum(axis=1)
+        candidatos = np.unique(np.concatenate([self.cubetas[t].get(int(f), np.array([], dtype=int))
+                                               for t, f in enumerate(firmas)]))
+        candidatos = candidatos[self._mascara(consulta, temporada)[candidatos]]
+        if len(candidatos) < k:
+            return self.similares_lote([consulta], k, temporada)[0]
+        similitudes = self.matriz[candidatos] @ self.matriz[consulta]
+        return candidatos[np.argsort(-similitudes, kind="stable")[:k]]
+
+    # --- API ---
+
+    def similares(self, identificador, temporada=None, k=10, en_temporada=None, aproximado=False):
+        """Las k temporadas de otros jugadores mas parecidas a la de un jugador (la ultima si no se indica)."""
+        if not self.disponible():
+            return None
+        if temporada is None:
+            temporadas = self.temporadas_de(identificador)
+            if not temporadas:
+                return None
+            temporada = temporadas[-1]
+        consulta = self.filas.get((identificador, temporada))
+        if consulta is None:
+            return None
+        if aproximado:
+            vecinos = self._similares_aproximado(consulta, k, en_temporada)
+        else:
+            vecinos = self.similares_lote([consulta], k, en_temporada)[0]
+        return {"referencia": self._fila_a_dict(consulta, consulta),
+                "similares": [self._fila_a_dict(fila, consulta) for fila in vecinos]}
+
+    def _fila_a_dict(self, fila, consulta):
+        rasgos = {r: (None if np.isnan(v) else round(float(v), 2)) for r, v in zip(RASGOS, self.rasgos[fila])}
+        return {"id": str(self.ids[fila]), "nombre": str(self.nombres[fila]), "temporada": int(self.temporadas[fila]),
+                "partidos": int(self.partidos[fila]), "minutos": int(self.minutos[fila]),
+                "similitud": round(float(self.matriz[fila] @ self.matriz[consulta]), 3), "rasgos": rasgos}